@@ -0,0 +1,69 @@
+"""
+Compares searching articles dumped one per file against searching them in an article corpus, and
+measures random access to corpus articles by id.
+
+Run from project directory: python -m benchmarks.article_corpus
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, utils
+from webcrawler.corpus import ArticleCorpusReader, ArticleCorpusWriter
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_ARTICLES = 10000
+NUMBER_OF_RANDOM_READS = 1000
+SEARCHED_TEXT = 'Netanyahu'
+
+
+def _get_directory_megabytes(directory_path):
+    return sum(os.path.getsize(os.path.join(directory_path, file_name)) for file_name in
+               os.listdir(directory_path)) / 2.0 ** 20
+
+
+def main():
+    articles_directory = tempfile.mkdtemp()
+    corpora_directory = tempfile.mkdtemp()
+    try:
+        raw_articles = [synthetic.generate_bbc_raw_article(article_index) for article_index in
+                        xrange(NUMBER_OF_ARTICLES)]
+        for article_index, raw_article in enumerate(raw_articles):
+            raw_article.dump(os.path.join(articles_directory, 'article%d.txt' % article_index))
+        start_time = time.time()
+        found_in_files = analyzers.search_for_text_in_material_files(
+            BBCRawArticle, utils.list_directory_files(articles_directory), SEARCHED_TEXT)
+        print '{articles} article files ({size:.1f} MB): search {seconds:.2f}s'.format(
+            articles=NUMBER_OF_ARTICLES, size=_get_directory_megabytes(articles_directory),
+            seconds=time.time() - start_time)
+
+        for compression in (None, 'zlib'):
+            corpus_directory = os.path.join(corpora_directory, str(compression))
+            with ArticleCorpusWriter(corpus_directory, compression) as corpus_writer:
+                for article_index, raw_article in enumerate(raw_articles):
+                    corpus_writer.add('article%d' % article_index, raw_article)
+            start_time = time.time()
+            found_in_corpus = analyzers.search_for_text_in_corpus(corpus_directory, SEARCHED_TEXT)
+            search_seconds = time.time() - start_time
+            assert len(found_in_corpus) == len(found_in_files), 'Corpus search found other articles'
+            with ArticleCorpusReader(corpus_directory) as corpus_reader:
+                article_ids = random.Random(0).sample(corpus_reader.article_ids,
+                                                      NUMBER_OF_RANDOM_READS)
+                start_time = time.time()
+                for article_id in article_ids:
+                    corpus_reader.get(article_id)
+                read_seconds = (time.time() - start_time) / NUMBER_OF_RANDOM_READS
+            print ('corpus, {compression} compression ({size:.1f} MB): search {search:.2f}s, '
+                   'random read {read:.3f} ms').format(
+                compression=compression or 'no', size=_get_directory_megabytes(corpus_directory),
+                search=search_seconds, read=read_seconds * 1000)
+    finally:
+        shutil.rmtree(articles_directory)
+        shutil.rmtree(corpora_directory)
+
+
+if __name__ == '__main__':
+    main()
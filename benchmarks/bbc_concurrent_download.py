@@ -0,0 +1,43 @@
+"""
+Measures wall-clock time of a full BBC front page sweep against a local stand-in server, as the
+number of download workers increases.
+
+Run from project directory: python -m benchmarks.bbc_concurrent_download
+"""
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from benchmarks.local_server import LocalHttpServer
+from webcrawler.downloader import BBCNewsDownloader
+from webcrawler.fetcher import HttpFetcher
+
+NUMBER_OF_ARTICLES = 40
+RESPONSE_DELAY_SECONDS = 0.1
+WORKER_COUNTS = (1, 2, 4, 8, 16)
+
+
+def main():
+    pages = synthetic.generate_bbc_site_pages(NUMBER_OF_ARTICLES)
+    with LocalHttpServer(pages, RESPONSE_DELAY_SECONDS) as server:
+        print 'Articles: {articles}, server delay: {delay}s'.format(
+            articles=NUMBER_OF_ARTICLES, delay=RESPONSE_DELAY_SECONDS)
+        for workers in WORKER_COUNTS:
+            download_directory = tempfile.mkdtemp()
+            fetcher = HttpFetcher(workers=workers)
+            try:
+                downloader = BBCNewsDownloader(download_directory, fetcher)
+                downloader.DOWNLOAD_URL = server.url
+                start_time = time.time()
+                downloader.download_data()
+                elapsed_seconds = time.time() - start_time
+            finally:
+                fetcher.close()
+                shutil.rmtree(download_directory)
+            print 'workers={workers:<3} {seconds:.2f}s'.format(workers=workers,
+                                                            seconds=elapsed_seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# coding=utf-8
+"""
+Compares searching the same in-memory materials many times with the former `analyzers.has_text`,
+which lower-cased the whole material text (or rebuilt lists of lowered JSON keys and values) on
+every call, and with a `query.TextQuery` built once, whose normalized material text is cached.
+Reports the time per document of the first and of the repeated searches.
+
+Run from project directory: python -m benchmarks.compiled_query
+"""
+import datetime
+import time
+
+from benchmarks import synthetic
+from webcrawler.query import NormalizedTextCache, TextQuery
+
+NUMBER_OF_ARTICLES = 2000
+NUMBER_OF_LANDING_UPDATES = 50000
+NUMBER_OF_PASSES = 5
+ARTICLE_TEXTS = ('netanyahu', 'Minister said', 'climate talks', 'London')
+LANDING_UPDATE_TEXTS = (u'TURKISH', u'WIZZ AIR', u'איסטנבול', u'נחתה')
+
+
+def _legacy_has_text(raw_material, text):
+    """`analyzers.has_text` before compiled queries, ignoring case."""
+    text = text.lower()
+    if hasattr(raw_material, 'to_text'):
+        return text in raw_material.to_text().lower()
+    material_dict = raw_material.to_dict()
+    lowered_keys = [key.lower() if isinstance(key, basestring) else key for key in
+                    material_dict.keys()]
+    lowered_values = [value.lower() if isinstance(value, basestring) else value for value in
+                      material_dict.values()]
+    return text in lowered_keys or text in lowered_values
+
+
+def _measure_passes(search, materials, texts):
+    """:return: Matches of each text, and seconds per document of the first and later passes."""
+    pass_seconds = []
+    for _ in xrange(NUMBER_OF_PASSES):
+        start_time = time.time()
+        matches = [sum(1 for material in materials if search(material, text)) for text in texts]
+        pass_seconds.append(time.time() - start_time)
+    searches = float(len(materials) * len(texts))
+    return (matches, pass_seconds[0] / searches,
+            sum(pass_seconds[1:]) / (NUMBER_OF_PASSES - 1) / searches)
+
+
+def _benchmark(name, materials, texts, queries):
+    legacy_matches, legacy_first, legacy_repeated = _measure_passes(
+        _legacy_has_text, materials, texts)
+    query_matches, query_first, query_repeated = _measure_passes(
+        lambda material, query: query.matches(material), materials, queries)
+    print '{name}: {documents} documents, {texts} texts, {passes} passes'.format(
+        name=name, documents=len(materials), texts=len(texts), passes=NUMBER_OF_PASSES)
+    for label, first_seconds, repeated_seconds in (('former has_text', legacy_first,
+                                                    legacy_repeated),
+                                                   ('compiled query', query_first,
+                                                    query_repeated)):
+        print '  {label:<16} first pass {first:.2f}us/document, later passes ' \
+              '{repeated:.2f}us/document'.format(label=label, first=first_seconds * 1e6,
+                                                 repeated=repeated_seconds * 1e6)
+    print '  speedup of later passes: {speedup:.1f}x'.format(
+        speedup=legacy_repeated / query_repeated)
+    for text, legacy_count, query_count in zip(texts, legacy_matches, query_matches):
+        print u'  {text!r:<24} matched by former has_text {legacy}, by query {query}'.format(
+            text=text, legacy=legacy_count, query=query_count)
+    return legacy_matches, query_matches
+
+
+def main():
+    articles = [synthetic.generate_bbc_raw_article(seed) for seed in xrange(NUMBER_OF_ARTICLES)]
+    # The caches are large enough for all the materials.
+    cache = NormalizedTextCache(max_entries=NUMBER_OF_ARTICLES, max_characters=2 ** 26)
+    legacy_matches, query_matches = _benchmark(
+        'BBC articles', articles, ARTICLE_TEXTS,
+        [TextQuery(text, cache=cache) for text in ARTICLE_TEXTS])
+    # Articles are plain text, so both find the same articles.
+    assert legacy_matches == query_matches
+
+    landing_updates = synthetic.generate_landing_updates(0, NUMBER_OF_LANDING_UPDATES,
+                                                         datetime.datetime(2018, 1, 1))
+    cache = NormalizedTextCache(max_entries=NUMBER_OF_LANDING_UPDATES, max_characters=2 ** 26)
+    # The former search found only whole values, so queries find every update it found, and also
+    # updates with the text inside a value (e.g. 'TURKISH' in 'TURKISH AIRLINES').
+    legacy_matches, query_matches = _benchmark(
+        'landing updates', landing_updates, LANDING_UPDATE_TEXTS,
+        [TextQuery(text, cache=cache) for text in LANDING_UPDATE_TEXTS])
+    assert all(legacy_count <= query_count for legacy_count, query_count in
+               zip(legacy_matches, query_matches))
+
+
+if __name__ == '__main__':
+    main()
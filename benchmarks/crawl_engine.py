@@ -0,0 +1,64 @@
+"""
+Measures crawl throughput (URLs per minute) of BBC section crawling against a local fake site, as
+the number of workers increases. The fake site disallows one of its sections in robots.txt, and
+every crawl is checked to download exactly the articles of the other sections.
+
+Run from project directory: python -m benchmarks.crawl_engine
+"""
+import os
+import shutil
+import tempfile
+
+from benchmarks import synthetic
+from benchmarks.local_server import LocalHttpServer
+from webcrawler.downloader import BBCNewsDownloader
+from webcrawler.fetcher import HttpFetcher
+
+NUMBER_OF_ARTICLES = 1000
+NUMBER_OF_SECTIONS = 20
+RESPONSE_DELAY_SECONDS = 0.01
+WORKER_COUNTS = (1, 8, 32)
+
+
+def _create_fake_site():
+    """:return: Pages of the site by path, and the number of articles the crawl should download."""
+    pages = synthetic.generate_bbc_site_pages(NUMBER_OF_ARTICLES, NUMBER_OF_SECTIONS)
+    section_paths = sorted(path for path in pages if
+                           BBCNewsDownloader._is_news_section_url(path) and path != '/')
+    disallowed_section_path = section_paths[0]
+    pages['/robots.txt'] = 'User-agent: *\nDisallow: %s\n' % disallowed_section_path
+    disallowed_article_count = pages[disallowed_section_path].count('block-link__overlay-link')
+    return pages, NUMBER_OF_ARTICLES - disallowed_article_count
+
+
+def main():
+    pages, expected_article_count = _create_fake_site()
+    with LocalHttpServer(pages, RESPONSE_DELAY_SECONDS) as server:
+        print 'Articles: {articles}, sections: {sections}, server delay: {delay}s'.format(
+            articles=NUMBER_OF_ARTICLES, sections=NUMBER_OF_SECTIONS, delay=RESPONSE_DELAY_SECONDS)
+        for workers in WORKER_COUNTS:
+            download_directory = tempfile.mkdtemp()
+            fetcher = HttpFetcher(workers=workers)
+            try:
+                downloader = BBCNewsDownloader(download_directory, fetcher, crawl_sections=True)
+                downloader.DOWNLOAD_URL = server.url
+                crawl_stats = downloader.download_data()
+                downloaded_article_count = len([file_name for file_name in
+                                                os.listdir(download_directory) if
+                                                file_name.endswith('.html')])
+            finally:
+                fetcher.close()
+                shutil.rmtree(download_directory)
+            assert downloaded_article_count == expected_article_count, \
+                'Downloaded %d articles instead of %d' % (downloaded_article_count,
+                                                          expected_article_count)
+            print ('workers={workers:<3} {urls} URLs in {seconds:.2f}s, {urls_per_minute:.0f} '
+                   'URLs/min, {disallowed} disallowed').format(
+                workers=workers, urls=crawl_stats.crawled_url_count,
+                seconds=crawl_stats.elapsed_seconds,
+                urls_per_minute=crawl_stats.urls_per_minute,
+                disallowed=len(crawl_stats.disallowed_urls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Measures deduplication on a synthetic crawl of BBC articles where every article was downloaded
+under several URLs (some copies with another script) and some again after a light edit:
+extraction time, raw material files and searched files with and without `ExtractionDeduplicator`,
+and the disk space of the downloads before and after `ContentAddressedStore.deduplicate_directory`.
+
+Run from project directory: python -m benchmarks.dedup
+"""
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, utils
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.dedup import ContentAddressedStore, ExtractionDeduplicator
+from webcrawler.extraction import extract_directory
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_ARTICLES = 1000
+# Number of URLs each article is downloaded from.
+COPIES_PER_ARTICLE = 3
+# Rate of articles which were also downloaded after a light edit.
+REVISED_ARTICLE_RATE = 0.2
+_PARAGRAPH_REGEX = re.compile(r'<p>([^<]{40,})</p>')
+
+
+def _write_crawl(directory_path):
+    randomizer = random.Random(0)
+    for seed in xrange(NUMBER_OF_ARTICLES):
+        html = synthetic.generate_bbc_article_html(seed)
+        for copy_index in xrange(COPIES_PER_ARTICLE):
+            # The last copy differs by a script, as pages served under some URLs do.
+            if copy_index == COPIES_PER_ARTICLE - 1:
+                html = html.replace('</head>', '<script>var section = 1;</script></head>')
+            with open(os.path.join(directory_path, 'article%d_%d.html' % (seed, copy_index)),
+                      'w') as page_file:
+                page_file.write(html)
+        if randomizer.random() < REVISED_ARTICLE_RATE:
+            paragraph = _PARAGRAPH_REGEX.search(html).group(1)
+            with open(os.path.join(directory_path, 'article%d_revised.html' % seed), 'w') as \
+                    page_file:
+                page_file.write(html.replace(paragraph, paragraph[:-12] + ' (updated)', 1))
+
+
+def _get_disk_usage_kb(directory_path):
+    """:return: Disk space of a directory, counting hard linked files once (as du does)."""
+    return int(subprocess.check_output(['du', '-sk', directory_path]).split()[0])
+
+
+def _extract_and_search(source_directory, destination_directory, deduplicator):
+    start_time = time.time()
+    report = extract_directory(BBCNewsExtractor, source_directory, destination_directory,
+                               workers=1, incremental=False, deduplicator=deduplicator)
+    extraction_seconds = time.time() - start_time
+    file_paths = utils.list_directory_files(destination_directory)
+    start_time = time.time()
+    analyzers.search_for_text_in_material_files(BBCRawArticle, file_paths, 'Netanyahu')
+    return report, extraction_seconds, len(file_paths), time.time() - start_time
+
+
+def main():
+    directory_path = tempfile.mkdtemp()
+    download_directory = os.path.join(directory_path, 'downloads')
+    os.mkdir(download_directory)
+    try:
+        _write_crawl(download_directory)
+        for deduplicator_name in ('without deduplication', 'with deduplication'):
+            destination_directory = tempfile.mkdtemp()
+            try:
+                deduplicator = ExtractionDeduplicator(destination_directory) if \
+                    deduplicator_name == 'with deduplication' else None
+                report, extraction_seconds, material_file_count, search_seconds = \
+                    _extract_and_search(download_directory, destination_directory, deduplicator)
+            finally:
+                shutil.rmtree(destination_directory)
+            print '{name}: extracted {extracted} files in {extraction:.2f}s, {duplicates} ' \
+                  'duplicates, {near_duplicates} near duplicates (ratio {ratio:.1%}), searched ' \
+                  '{materials} material files in {search:.2f}s'.format(
+                      name=deduplicator_name, extracted=report.extracted_file_count,
+                      extraction=extraction_seconds, duplicates=report.duplicate_file_count,
+                      near_duplicates=report.near_duplicate_file_count,
+                      ratio=report.deduplication_ratio, materials=material_file_count,
+                      search=search_seconds)
+        disk_usage_before = _get_disk_usage_kb(download_directory)
+        content_store = ContentAddressedStore(os.path.join(directory_path, 'content'))
+        start_time = time.time()
+        stats = content_store.deduplicate_directory(download_directory)
+        print 'Content-addressed downloads: {stats}, in {seconds:.2f}s, disk ' \
+              '{before}KB -> {after}KB'.format(
+                  stats=stats, seconds=time.time() - start_time, before=disk_usage_before,
+                  after=_get_disk_usage_kb(directory_path))
+    finally:
+        shutil.rmtree(directory_path)
+
+
+if __name__ == '__main__':
+    main()
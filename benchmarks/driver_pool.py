@@ -0,0 +1,89 @@
+"""
+Measures browser-mode flight schedule snapshots with and without a `WebDriverPool`, using a
+stand-in web driver whose startup is delayed to simulate starting a browser. With the pool, drivers
+are started once, schedule pages linked from the pager are downloaded in parallel and several
+downloaders share the drivers.
+
+Run from project directory: python -m benchmarks.driver_pool
+"""
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_web_driver import StaticHtmlWebDriver
+from benchmarks.local_server import LocalHttpServer
+from benchmarks.schedule_site import SCHEDULE_PATH, FlightScheduleSite
+from webcrawler.downloader import FlightLandingScheduleDownloader
+from webcrawler.driver_pool import WebDriverPool
+
+DRIVER_STARTUP_SECONDS = 0.5
+RESPONSE_DELAY_SECONDS = 0.05
+NUMBER_OF_SNAPSHOTS = 6
+NUMBER_OF_PARALLEL_DOWNLOADERS = 3
+POOL_SIZE = 3
+
+
+class _SlowStartingWebDriver(StaticHtmlWebDriver):
+    def __init__(self, executable_path=None):
+        time.sleep(DRIVER_STARTUP_SECONDS)
+        super(_SlowStartingWebDriver, self).__init__(executable_path)
+
+
+def _download_snapshots(server_url, number_of_snapshots, driver_pool=None):
+    download_directory = tempfile.mkdtemp()
+    try:
+        for _ in xrange(number_of_snapshots):
+            downloader = FlightLandingScheduleDownloader(
+                download_directory, None, _SlowStartingWebDriver, use_http=False,
+                driver_pool=driver_pool)
+            downloader.DOWNLOAD_URL = server_url + SCHEDULE_PATH
+            downloader.download_data()
+    finally:
+        shutil.rmtree(download_directory)
+
+
+def _download_snapshots_in_parallel(server_url, driver_pool=None):
+    number_of_snapshots = NUMBER_OF_SNAPSHOTS // NUMBER_OF_PARALLEL_DOWNLOADERS
+    threads = [threading.Thread(target=_download_snapshots,
+                                args=(server_url, number_of_snapshots, driver_pool)) for _ in
+               xrange(NUMBER_OF_PARALLEL_DOWNLOADERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _measure(description, download_function, server_url, driver_pool=None):
+    StaticHtmlWebDriver.session_count = 0
+    start_time = time.time()
+    download_function(server_url, driver_pool)
+    elapsed_seconds = time.time() - start_time
+    print '{description:<34} {milliseconds:6.0f}ms per snapshot, {sessions} drivers started'.format(
+        description=description, milliseconds=1000 * elapsed_seconds / NUMBER_OF_SNAPSHOTS,
+        sessions=StaticHtmlWebDriver.session_count)
+
+
+def main():
+    site = FlightScheduleSite(3600, has_page_links=True)
+    print ('Snapshots: {snapshots} of 3 pages, driver startup: {startup}s, '
+           'server delay: {delay}s').format(snapshots=NUMBER_OF_SNAPSHOTS,
+                                            startup=DRIVER_STARTUP_SECONDS,
+                                            delay=RESPONSE_DELAY_SECONDS)
+    with LocalHttpServer(site, RESPONSE_DELAY_SECONDS) as server:
+        download_sequentially = lambda server_url, driver_pool: _download_snapshots(
+            server_url, NUMBER_OF_SNAPSHOTS, driver_pool)
+        _measure('no pool', download_sequentially, server.url)
+        with WebDriverPool(None, _SlowStartingWebDriver, POOL_SIZE) as driver_pool:
+            driver_pool.start_drivers()
+            _measure('pool', download_sequentially, server.url, driver_pool)
+        _measure('no pool, %d downloaders' % NUMBER_OF_PARALLEL_DOWNLOADERS,
+                 _download_snapshots_in_parallel, server.url)
+        with WebDriverPool(None, _SlowStartingWebDriver, POOL_SIZE) as driver_pool:
+            driver_pool.start_drivers()
+            _measure('pool, %d downloaders' % NUMBER_OF_PARALLEL_DOWNLOADERS,
+                     _download_snapshots_in_parallel, server.url, driver_pool)
+
+
+if __name__ == '__main__':
+    main()
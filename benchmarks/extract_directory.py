@@ -0,0 +1,53 @@
+"""
+Measures extraction throughput (files per second) of a synthetic corpus against the number of
+worker processes.
+
+Run from project directory: python -m benchmarks.extract_directory
+"""
+import datetime
+import os
+import shutil
+import tempfile
+
+from benchmarks import synthetic
+from webcrawler.data_extractor import BBCNewsExtractor, FlightLandingScheduleExtractor
+from webcrawler.extraction import extract_directory
+
+NUMBER_OF_FILES = 2000
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def _write_corpus(directory_path, page_generator):
+    for file_index in xrange(NUMBER_OF_FILES):
+        with open(os.path.join(directory_path, 'page%d.html' % file_index), 'w') as page_file:
+            page_file.write(page_generator(file_index))
+
+
+def _benchmark_extractor(extractor_type, page_generator):
+    source_directory = tempfile.mkdtemp()
+    try:
+        _write_corpus(source_directory, page_generator)
+        print '{extractor}, {files} files:'.format(extractor=extractor_type.__name__,
+                                                  files=NUMBER_OF_FILES)
+        for workers in WORKER_COUNTS:
+            destination_directory = tempfile.mkdtemp()
+            try:
+                report = extract_directory(extractor_type, source_directory, destination_directory,
+                                           workers)
+            finally:
+                shutil.rmtree(destination_directory)
+            print '  workers={workers:<3} {rate:.1f} files/sec, {failed} failed'.format(
+                workers=workers, rate=report.files_per_second, failed=len(report.failed_files))
+    finally:
+        shutil.rmtree(source_directory)
+
+
+def main():
+    update_time = datetime.datetime.now()
+    _benchmark_extractor(BBCNewsExtractor, synthetic.generate_bbc_article_html)
+    _benchmark_extractor(FlightLandingScheduleExtractor,
+                         lambda seed: synthetic.generate_schedule_page_html(seed, update_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures repeated extraction of the same BBC articles in one process: without caches, filling a
+`ParsedFileCache` and again from it, with an empty `ExtractionResultCache`, after a change of the
+extractor's `VERSION` (which makes the cached results unused, while the parsed files are still
+cached) and with the filled result cache and no parsed files.
+
+Run from project directory: python -m benchmarks.extraction_cache
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.extraction import extract_directory
+from webcrawler.extraction_cache import ExtractionResultCache, ParsedFileCache
+
+NUMBER_OF_ARTICLES = 1000
+
+
+class ChangedBBCNewsExtractor(BBCNewsExtractor):
+    """The extractor after a change of its extracted material."""
+    VERSION = BBCNewsExtractor.VERSION + 1
+
+
+def _extract(description, extractor_type, source_directory, result_cache=None,
+             parsed_file_cache=None):
+    destination_directory = tempfile.mkdtemp()
+    try:
+        start_time = time.time()
+        report = extract_directory(extractor_type, source_directory, destination_directory,
+                                   workers=1, incremental=False, result_cache=result_cache,
+                                   parsed_file_cache=parsed_file_cache)
+        seconds = time.time() - start_time
+    finally:
+        shutil.rmtree(destination_directory)
+    assert report.extracted_file_count == NUMBER_OF_ARTICLES
+    print '  {description:<32} {seconds:6.2f}s, {rate:8.1f} files/sec'.format(
+        description=description, seconds=seconds, rate=NUMBER_OF_ARTICLES / seconds)
+
+
+def main():
+    directory_path = tempfile.mkdtemp()
+    source_directory = os.path.join(directory_path, 'downloads')
+    os.mkdir(source_directory)
+    try:
+        for seed in xrange(NUMBER_OF_ARTICLES):
+            with open(os.path.join(source_directory, 'article%d.html' % seed), 'w') as page_file:
+                page_file.write(synthetic.generate_bbc_article_html(seed))
+        print 'Extracting {articles} articles:'.format(articles=NUMBER_OF_ARTICLES)
+        _extract('without caches', BBCNewsExtractor, source_directory)
+        parsed_file_cache = ParsedFileCache()
+        _extract('filling the parsed file cache', BBCNewsExtractor, source_directory,
+                 parsed_file_cache=parsed_file_cache)
+        _extract('from the parsed file cache', BBCNewsExtractor, source_directory,
+                 parsed_file_cache=parsed_file_cache)
+        result_cache = ExtractionResultCache(os.path.join(directory_path, 'cache'))
+        _extract('filling the result cache', BBCNewsExtractor, source_directory, result_cache)
+        _extract('changed extractor, parsed files', ChangedBBCNewsExtractor, source_directory,
+                 result_cache, parsed_file_cache)
+        _extract('from the result cache', BBCNewsExtractor, source_directory, result_cache)
+        print 'Result cache: {hits} hits, {misses} misses, {size:.1f}MB'.format(
+            hits=result_cache.hit_count, misses=result_cache.miss_count,
+            size=result_cache.size / 2.0 ** 20)
+    finally:
+        shutil.rmtree(directory_path)
+
+
+if __name__ == '__main__':
+    main()
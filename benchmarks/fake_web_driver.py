@@ -0,0 +1,133 @@
+"""Stand-in of a Selenium web driver, for running Selenium downloaders without a browser."""
+import re
+import threading
+import urlparse
+
+import lxml.html
+import requests
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                        WebDriverException)
+from selenium.webdriver.common.by import By
+
+_POST_BACK_HREF_REGEX = re.compile(r"__doPostBack\('([^']*)','([^']*)'\)")
+
+
+class StaticHtmlWebDriver(object):
+    """
+    Minimal web driver over plain HTTP, which can be passed as the `driver_type` of a
+    `SeleniumDataDownloader`. Pages are loaded with GET and parsed with lxml, elements are found by
+    id and ASP.NET postback links can be clicked. Elements become stale once another page is loaded,
+    as in a browser, but pages run no scripts and so never change by themselves.
+    """
+    # Number of drivers created, i.e. browser sessions started.
+    session_count = 0
+    _session_count_lock = threading.Lock()
+
+    def __init__(self, executable_path=None):
+        with StaticHtmlWebDriver._session_count_lock:
+            StaticHtmlWebDriver.session_count += 1
+        self.page_load_count = 0
+        self._session = requests.Session()
+        self._is_open = True
+        self._url = None
+        self._page_source = u''
+        self._document = None
+        self._page_generation = 0
+
+    @property
+    def current_url(self):
+        self._check_is_open()
+        return self._url
+
+    @property
+    def page_source(self):
+        self._check_is_open()
+        return self._page_source
+
+    def get(self, url):
+        self._check_is_open()
+        self._load_page(url, self._session.get(url))
+
+    def refresh(self):
+        self.get(self._url)
+
+    def find_element(self, by=By.ID, value=None):
+        self._check_is_open()
+        if by != By.ID:
+            raise WebDriverException('Only finding elements by id is supported.')
+        elements = self._document.xpath('//*[@id=$id]', id=value) if \
+            self._document is not None else []
+        if not elements:
+            raise NoSuchElementException('No element with id %s' % value)
+        return StaticHtmlWebElement(self, elements[0], self._page_generation)
+
+    def find_element_by_id(self, id_):
+        return self.find_element(By.ID, id_)
+
+    def close(self):
+        # The only window of the driver is closed, which ends the session.
+        self.quit()
+
+    def quit(self):
+        self._is_open = False
+        self._session.close()
+
+    def _post_back(self, event_target, event_argument):
+        """Submit the page form as the `__doPostBack` script of ASP.NET pages does."""
+        form = self._document.forms[0]
+        form_fields = {hidden_input.name: hidden_input.value or '' for hidden_input in
+                       form.xpath('.//input[@type="hidden"]')}
+        form_fields['__EVENTTARGET'] = event_target
+        form_fields['__EVENTARGUMENT'] = event_argument
+        post_url = urlparse.urljoin(self._url, form.get('action') or self._url)
+        self._load_page(post_url, self._session.post(post_url, data=form_fields))
+
+    def _load_page(self, url, response):
+        response.raise_for_status()
+        response.encoding = response.encoding or 'utf-8'
+        self._url = url
+        self._page_source = response.text
+        self._document = lxml.html.document_fromstring(response.content)
+        self._page_generation += 1
+        self.page_load_count += 1
+
+    def _check_is_open(self):
+        if not self._is_open:
+            raise WebDriverException('The driver was closed.')
+
+
+class StaticHtmlWebElement(object):
+    """Element of a page loaded by `StaticHtmlWebDriver`."""
+
+    def __init__(self, driver, element, page_generation):
+        self._driver = driver
+        self._element = element
+        self._page_generation = page_generation
+
+    @property
+    def text(self):
+        self._check_is_not_stale()
+        return unicode(self._element.text_content())
+
+    def get_attribute(self, name):
+        self._check_is_not_stale()
+        if name == 'outerHTML':
+            return lxml.html.tostring(self._element, encoding=unicode)
+        return self._element.get(name)
+
+    def is_enabled(self):
+        self._check_is_not_stale()
+        return True
+
+    def click(self):
+        self._check_is_not_stale()
+        href = self._element.get('href', '')
+        post_back_match = _POST_BACK_HREF_REGEX.search(href)
+        if post_back_match is not None:
+            self._driver._post_back(*post_back_match.groups())
+        elif href:
+            self._driver.get(urlparse.urljoin(self._driver.current_url, href))
+
+    def _check_is_not_stale(self):
+        if self._page_generation != self._driver._page_generation:
+            raise StaleElementReferenceException('The element is not attached to the page.')
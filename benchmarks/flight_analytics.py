@@ -0,0 +1,139 @@
+"""
+Compares the vectorized flight analytics of `flight_analytics` with loops over `FlightLandingUpdate`
+objects (grouped by flight number and date with `flight_events.get_flight_key`), checking that both
+give the same results, then measures the vectorized analytics on tens of millions of rows.
+
+Run from project directory: python -m benchmarks.flight_analytics
+"""
+import datetime
+import time
+
+import numpy
+
+from benchmarks import synthetic
+from webcrawler import flight_analytics
+from webcrawler.flight_events import get_flight_key
+from webcrawler.flight_store import FlightUpdateColumns
+
+LOOP_UPDATE_COUNT = 200000
+SCALED_UPDATE_COUNTS = (10 ** 7, 3 * 10 ** 7)
+MAX_ON_TIME_DELAY_MINUTES = 15
+
+
+def _get_delay_minutes(landing_update):
+    try:
+        planned_hour, planned_minute = map(int, landing_update.planned_time.split(':'))
+        updated_hour, updated_minute = map(int, landing_update.updated_time.split(':'))
+    except ValueError:
+        return None
+    delay = (updated_hour - planned_hour) * 60 + updated_minute - planned_minute
+    return (delay + 12 * 60) % (24 * 60) - 12 * 60
+
+
+def _latest_per_flight_with_loop(landing_updates):
+    latest_landing_updates = {}
+    for landing_update in landing_updates:
+        flight_key = get_flight_key(landing_update)
+        latest_landing_update = latest_landing_updates.get(flight_key)
+        if latest_landing_update is None or landing_update.schedule_update_timestamp >= \
+                latest_landing_update.schedule_update_timestamp:
+            latest_landing_updates[flight_key] = landing_update
+    return latest_landing_updates.values()
+
+
+def _punctuality_by_company_with_loop(landing_updates):
+    flight_counts, on_time_counts = {}, {}
+    for landing_update in _latest_per_flight_with_loop(landing_updates):
+        delay = _get_delay_minutes(landing_update)
+        if delay is None or flight_analytics.get_status_category(landing_update.status) == \
+                flight_analytics.CANCELED_STATUS:
+            continue
+        company = landing_update.company
+        flight_counts[company] = flight_counts.get(company, 0) + 1
+        on_time_counts[company] = on_time_counts.get(company, 0) + \
+            (delay <= MAX_ON_TIME_DELAY_MINUTES)
+    return {company: float(on_time_counts[company]) / flight_count for company, flight_count in
+            flight_counts.iteritems()}
+
+
+def _status_transitions_with_loop(landing_updates):
+    updates_by_flight = {}
+    for landing_update in landing_updates:
+        updates_by_flight.setdefault(get_flight_key(landing_update), []).append(landing_update)
+    transitions = {}
+    for flight_updates in updates_by_flight.itervalues():
+        flight_updates.sort(key=lambda landing_update: landing_update.schedule_update_timestamp)
+        categories = [flight_analytics.get_status_category(landing_update.status) for
+                      landing_update in flight_updates]
+        for previous_category, category in zip(categories, categories[1:]):
+            if previous_category != category:
+                transitions[previous_category, category] = \
+                    transitions.get((previous_category, category), 0) + 1
+    return transitions
+
+
+def _measure(function, *args):
+    start_time = time.time()
+    result = function(*args)
+    return result, time.time() - start_time
+
+
+def _benchmark_against_loops(landing_updates, columns):
+    print '{updates} updates:'.format(updates=len(landing_updates))
+    loop_latest, loop_seconds = _measure(_latest_per_flight_with_loop, landing_updates)
+    latest_rows, vectorized_seconds = _measure(columns.latest_per_flight)
+    assert len(loop_latest) == len(latest_rows)
+    print '  {name:<24} loop {loop:.3f}s, vectorized {vectorized:.4f}s'.format(
+        name='latest per flight', loop=loop_seconds, vectorized=vectorized_seconds)
+
+    loop_rates, loop_seconds = _measure(_punctuality_by_company_with_loop, landing_updates)
+    punctuality, vectorized_seconds = _measure(
+        flight_analytics.punctuality_by, columns, 'company', None, MAX_ON_TIME_DELAY_MINUTES)
+    assert all(abs(punctuality[company][1] - rate) < 1e-9 for company, rate in
+               loop_rates.iteritems()) and len(loop_rates) == len(punctuality)
+    print '  {name:<24} loop {loop:.3f}s, vectorized {vectorized:.4f}s'.format(
+        name='on-time rate by company', loop=loop_seconds, vectorized=vectorized_seconds)
+
+    loop_transitions, loop_seconds = _measure(_status_transitions_with_loop, landing_updates)
+    transitions, vectorized_seconds = _measure(flight_analytics.status_transitions, columns)
+    assert loop_transitions == transitions
+    print '  {name:<24} loop {loop:.3f}s, vectorized {vectorized:.4f}s'.format(
+        name='status transitions', loop=loop_seconds, vectorized=vectorized_seconds)
+
+
+def _scale_columns(columns, update_count):
+    """:return: Columns repeated up to the number of updates, with later schedule update times."""
+    repeat_count = -(-update_count // len(columns))
+    scaled_columns = {column: numpy.tile(values, repeat_count)[:update_count] for column, values in
+                      columns.columns.iteritems()}
+    time_span = int(columns['schedule_update_minutes'].ptp()) + 5
+    scaled_columns['schedule_update_minutes'] += numpy.repeat(
+        numpy.arange(repeat_count) * time_span, len(columns))[:update_count]
+    return FlightUpdateColumns(scaled_columns, columns.dictionaries, columns.other_time_values)
+
+
+def _benchmark_scale(columns, update_count):
+    scaled_columns = _scale_columns(columns, update_count)
+    _, latest_seconds = _measure(scaled_columns.latest_per_flight)
+    _, punctuality_seconds = _measure(flight_analytics.punctuality_by, scaled_columns,
+                                      'flight_from')
+    _, transitions_seconds = _measure(flight_analytics.status_transitions, scaled_columns, None,
+                                      24 * 60)
+    print ('{updates} updates: latest per flight {latest:.2f}s, on-time rate by origin '
+           '{punctuality:.2f}s, daily status transitions {transitions:.2f}s').format(
+        updates=update_count, latest=latest_seconds, punctuality=punctuality_seconds,
+        transitions=transitions_seconds)
+
+
+def main():
+    landing_updates = synthetic.generate_landing_updates(0, LOOP_UPDATE_COUNT,
+                                                         datetime.datetime(2018, 1, 1))
+    columns = FlightUpdateColumns.from_landing_updates(landing_updates)
+    _benchmark_against_loops(landing_updates, columns)
+    del landing_updates
+    for update_count in SCALED_UPDATE_COUNTS:
+        _benchmark_scale(columns, update_count)
+
+
+if __name__ == '__main__':
+    main()
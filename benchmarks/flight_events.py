@@ -0,0 +1,104 @@
+# coding=utf-8
+"""
+Compares storing every row of every flight schedule snapshot with storing only the changes of
+flights in a `FlightEventLog`, for a day of snapshots taken every 5 minutes in which each flight
+changes a few times, and is in the schedule from `HOURS_IN_SCHEDULE` before its landing to as many
+hours after it. Checks that the state rebuilt from the event log at a time equals the snapshot
+of that time, and reports diffing and rebuilding times.
+
+Run from project directory: python -m benchmarks.flight_events
+"""
+import datetime
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from webcrawler.flight_events import FlightEventRecorder, FlightEventLog
+from webcrawler.flight_store import FlightUpdateStore
+from webcrawler.raw_material import FlightLandingUpdate
+
+NUMBER_OF_FLIGHTS = 300
+NUMBER_OF_SNAPSHOTS = 24 * 12
+CHANGE_PROBABILITY = 0.03
+HOURS_IN_SCHEDULE = 6
+_STATUSES = (u'לא סופי', u'סופי', u'עיכוב', u'בנחיתה', u'נחתה')
+
+
+def _generate_snapshots():
+    """:return: Landing updates of every snapshot, for flights whose state changes at random."""
+    random_generator = random.Random(0)
+    first_time = datetime.datetime(2018, 1, 1)
+    states = [[u'COMPANY %d' % (flight_index % 10), u'ORIGIN %d' % (flight_index % 30),
+               '%02d:%02d' % divmod(flight_index * 4 % (24 * 60), 60), '', 3, _STATUSES[0]]
+              for flight_index in xrange(NUMBER_OF_FLIGHTS)]
+    snapshots = []
+    for snapshot_index in xrange(NUMBER_OF_SNAPSHOTS):
+        snapshot_time = first_time + datetime.timedelta(minutes=5 * snapshot_index)
+        for state in states:
+            if random_generator.random() < CHANGE_PROBABILITY:
+                state[5] = random_generator.choice(_STATUSES)
+                state[3] = '%02d:%02d' % (random_generator.randint(0, 23),
+                                          random_generator.randint(0, 59))
+        snapshots.append([FlightLandingUpdate(snapshot_time, company, 'FL %d' % flight_index,
+                                              flight_from, planned_time, updated_time, terminal,
+                                              status)
+                          for flight_index, (company, flight_from, planned_time, updated_time,
+                                             terminal, status) in enumerate(states) if
+                          abs(flight_index * 4 % (24 * 60) - 5 * snapshot_index) <=
+                          HOURS_IN_SCHEDULE * 60])
+    return snapshots
+
+
+def _get_flight_states(landing_updates):
+    return sorted((landing_update.flight_number, landing_update.company,
+                   landing_update.flight_from, landing_update.planned_time,
+                   landing_update.updated_time, landing_update.terminal, landing_update.status)
+                  for landing_update in landing_updates)
+
+
+def _get_directory_size(directory_path):
+    return sum(os.path.getsize(os.path.join(directory_path, file_name)) for file_name in
+               os.listdir(directory_path))
+
+
+def main():
+    snapshots = _generate_snapshots()
+    row_count = sum(len(snapshot) for snapshot in snapshots)
+    json_bytes = sum(len(json.dumps(landing_update.to_dict(), indent=2)) for snapshot in
+                     snapshots for landing_update in snapshot)
+    directory_path = tempfile.mkdtemp()
+    try:
+        store = FlightUpdateStore(os.path.join(directory_path, 'store'))
+        store.append([landing_update for snapshot in snapshots for landing_update in snapshot])
+        store_bytes = _get_directory_size(store.directory_path)
+
+        log_file_path = os.path.join(directory_path, 'events.log')
+        recorder = FlightEventRecorder(log_file_path)
+        start_time = time.time()
+        event_count = sum(len(recorder.add_snapshot(snapshot)) for snapshot in snapshots)
+        diff_seconds = time.time() - start_time
+        log_bytes = os.path.getsize(log_file_path)
+
+        middle_snapshot = snapshots[len(snapshots) // 2]
+        start_time = time.time()
+        rebuilt_state = FlightEventLog(log_file_path).get_state_at(
+            middle_snapshot[0].schedule_update_time)
+        rebuild_seconds = time.time() - start_time
+        assert _get_flight_states(rebuilt_state) == _get_flight_states(middle_snapshot)
+    finally:
+        shutil.rmtree(directory_path)
+    print 'Snapshots: {snapshots} of {flights} flights, {rows} rows'.format(
+        snapshots=NUMBER_OF_SNAPSHOTS, flights=NUMBER_OF_FLIGHTS, rows=row_count)
+    print 'snapshot rows as JSON: {size:.2f}MB'.format(size=json_bytes / 2.0 ** 20)
+    print 'snapshot rows in store: {size:.2f}MB'.format(size=store_bytes / 2.0 ** 20)
+    print 'event log: {events} events, {size:.2f}MB'.format(events=event_count,
+                                                            size=log_bytes / 2.0 ** 20)
+    print 'diffing: {rate:,.0f} rows/sec, rebuilding state at midday: {seconds:.3f}s'.format(
+        rate=row_count / diff_seconds, seconds=rebuild_seconds)
+
+
+if __name__ == '__main__':
+    main()
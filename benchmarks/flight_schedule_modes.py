@@ -0,0 +1,102 @@
+"""
+Compares downloading a flight schedule snapshot (all its pages) over plain HTTP, replaying the
+ASP.NET postbacks, with downloading it through a web driver. Reports the latency of a snapshot
+and the peak memory of each mode, measured in a separate process per mode. Also checks that a site
+whose postbacks cannot be replayed over HTTP is downloaded with the web driver instead.
+
+The web driver is `StaticHtmlWebDriver`, so the browser mode runs without a browser; a real browser
+adds its startup time and hundreds of MB on top of the reported numbers.
+
+Run from project directory: python -m benchmarks.flight_schedule_modes
+"""
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+from benchmarks.fake_web_driver import StaticHtmlWebDriver
+from benchmarks.local_server import LocalHttpServer
+from benchmarks.schedule_site import SCHEDULE_PATH, FlightScheduleSite
+from webcrawler.downloader import FlightLandingScheduleDownloader
+
+RESPONSE_DELAY_SECONDS = 0.05
+NUMBER_OF_SNAPSHOTS = 10
+# Mode name -> (whether to download over HTTP, whether the pager links to every page).
+MODES = {'http-sequential': (True, False),
+         'http-concurrent': (True, True),
+         'browser': (False, False)}
+
+
+def _measure_mode(mode_name):
+    """:return: Seconds per snapshot and peak memory in KB."""
+    use_http, has_page_links = MODES[mode_name]
+    site = FlightScheduleSite(3600, has_page_links=has_page_links)
+    download_directory = tempfile.mkdtemp()
+    try:
+        with LocalHttpServer(site, RESPONSE_DELAY_SECONDS) as server:
+            start_time = time.time()
+            for _ in xrange(NUMBER_OF_SNAPSHOTS):
+                downloader = FlightLandingScheduleDownloader(download_directory, None,
+                                                             StaticHtmlWebDriver,
+                                                             use_http=use_http)
+                downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+                downloader.download_data()
+                downloader.fetcher.close()
+            elapsed_seconds = time.time() - start_time
+    finally:
+        shutil.rmtree(download_directory)
+    return (elapsed_seconds / NUMBER_OF_SNAPSHOTS,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _check_fallback():
+    """
+    :return: Download mode used for a site whose page state field is not named as in ASP.NET, so
+        its postbacks cannot be replayed over HTTP.
+    """
+    site = FlightScheduleSite(3600)
+
+    def get_page_with_renamed_state(path, form_fields):
+        if form_fields is not None and '__STATE' in form_fields:
+            form_fields['__VIEWSTATE'] = form_fields.pop('__STATE')
+        page = site(path, form_fields)
+        return page.replace('__VIEWSTATE', '__STATE') if page is not None else None
+
+    download_directory = tempfile.mkdtemp()
+    try:
+        with LocalHttpServer(get_page_with_renamed_state) as server:
+            downloader = FlightLandingScheduleDownloader(download_directory, None,
+                                                         StaticHtmlWebDriver)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                downloader.download_data()
+            downloader.fetcher.close()
+            assert len(os.listdir(download_directory)) == \
+                downloader.NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD
+            return downloader.last_download_mode
+    finally:
+        shutil.rmtree(download_directory)
+
+
+def main():
+    if len(sys.argv) == 2:
+        print '%f %d' % _measure_mode(sys.argv[1])
+        return
+    print 'Snapshots: {snapshots} of 3 pages, server delay: {delay}s'.format(
+        snapshots=NUMBER_OF_SNAPSHOTS, delay=RESPONSE_DELAY_SECONDS)
+    for mode_name in sorted(MODES):
+        seconds_per_snapshot, peak_memory_kb = map(float, subprocess.check_output(
+            [sys.executable, '-m', 'benchmarks.flight_schedule_modes', mode_name]).split())
+        print '{mode:<16} {milliseconds:6.1f}ms per snapshot, peak memory {memory:.1f}MB'.format(
+            mode=mode_name, milliseconds=1000 * seconds_per_snapshot,
+            memory=peak_memory_kb / 1024)
+    print 'Site without page state downloaded with mode: %s' % _check_fallback()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures the latency from the publication of a flight schedule update to its pages being written,
+when downloading perpetually from a local stand-in of the schedule website whose schedule updates
+every second, starting to poll in the middle of an update period. Also reports browser sessions
+started, page loads and pages skipped as unchanged. The stand-in driver (`StaticHtmlWebDriver`)
+needs no browser.
+
+Run from project directory: python -m benchmarks.flight_schedule_polling
+"""
+import os
+import re
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks.fake_web_driver import StaticHtmlWebDriver
+from benchmarks.local_server import LocalHttpServer
+from benchmarks.schedule_site import SCHEDULE_PATH, FlightScheduleSite
+from webcrawler.downloader import FlightLandingScheduleDownloader
+
+SECONDS_BETWEEN_UPDATES = 1.0
+NUMBER_OF_UPDATES = 10
+# Part of an update period passed when polling starts, so that the downloader does not start in
+# phase with the updates.
+START_PHASE = 0.6
+
+_SCHEDULE_FILE_NAME_REGEX = re.compile(r'page(\d+)_.* (\d\d):(\d\d):\d\d\.html$')
+
+
+class _FastScheduleDownloader(FlightLandingScheduleDownloader):
+    SECONDS_BETWEEN_SCHEDULE_UPDATES = SECONDS_BETWEEN_UPDATES
+    SECONDS_BETWEEN_PAGE_CHECKS = 0.01
+    MIN_SECONDS_BETWEEN_PAGE_RELOADS = 0.02
+    MAX_SECONDS_BETWEEN_PAGE_RELOADS = 0.2
+
+
+def _get_update_latencies(site, download_directory):
+    """
+    :return: Seconds from the publication of every downloaded update to its last page written, by
+        update order.
+    """
+    last_write_times = {}
+    for file_name in os.listdir(download_directory):
+        match = _SCHEDULE_FILE_NAME_REGEX.search(file_name)
+        if match is None:
+            continue
+        hour, minute = int(match.group(2)), int(match.group(3))
+        update_index = site.get_update_index(site.first_update_time.replace(hour=hour,
+                                                                            minute=minute))
+        write_time = os.path.getmtime(os.path.join(download_directory, file_name))
+        last_write_times[update_index] = max(write_time, last_write_times.get(update_index, 0))
+    return [last_write_times[update_index] - site.get_update_publish_time(update_index) for
+            update_index in sorted(last_write_times)]
+
+
+def main():
+    site = FlightScheduleSite(SECONDS_BETWEEN_UPDATES)
+    download_directory = tempfile.mkdtemp()
+    try:
+        with LocalHttpServer(site) as server:
+            downloader = _FastScheduleDownloader(download_directory, None, StaticHtmlWebDriver,
+                                                 use_http=False)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            time.sleep(START_PHASE * SECONDS_BETWEEN_UPDATES)
+            start_cpu_seconds = resource.getrusage(resource.RUSAGE_SELF).ru_utime
+            start_time = time.time()
+            downloader.download_data_perpetually(max_updates=NUMBER_OF_UPDATES)
+            elapsed_seconds = time.time() - start_time
+            cpu_seconds = resource.getrusage(resource.RUSAGE_SELF).ru_utime - start_cpu_seconds
+            request_count = server.request_count
+        latencies = _get_update_latencies(site, download_directory)
+    finally:
+        shutil.rmtree(download_directory)
+    print 'Updates: {updates}, one every {seconds}s'.format(updates=NUMBER_OF_UPDATES,
+                                                           seconds=SECONDS_BETWEEN_UPDATES)
+    # The first update is downloaded when the download starts, after it was published.
+    print 'latency of the first update: {first:.3f}s'.format(first=latencies[0])
+    print 'latency of the next updates: {mean:.3f}s mean, {max:.3f}s max, {last:.3f}s last'.format(
+        mean=sum(latencies[1:]) / len(latencies[1:]), max=max(latencies[1:]), last=latencies[-1])
+    print 'browser sessions: {sessions}, requests: {requests}'.format(
+        sessions=StaticHtmlWebDriver.session_count, requests=request_count)
+    print 'pages written: {written}, unchanged pages skipped: {unchanged}'.format(
+        written=downloader.written_page_count, unchanged=downloader.unchanged_page_count)
+    print 'elapsed: {elapsed:.2f}s, CPU: {cpu:.2f}s'.format(elapsed=elapsed_seconds,
+                                                           cpu=cpu_seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares loading landing updates and finding the most recent update of each flight, between the
+JSON directory written by `utils.save_landing_updates_to_directory` and `FlightUpdateStore`.
+
+Run from project directory: python -m benchmarks.flight_store
+"""
+import datetime
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import utils
+from webcrawler.flight_store import FlightUpdateStore, convert_json_directory
+from webcrawler.raw_material import FlightLandingUpdate
+
+JSON_UPDATE_COUNT = 20000
+STORE_UPDATE_COUNTS = (100000, 1000000)
+SEGMENT_SIZE = 100000
+
+
+def _latest_keys(landing_updates):
+    return sorted((update.flight_number, update.schedule_update_time) for update in
+                  landing_updates)
+
+
+def _benchmark_against_json():
+    landing_updates = synthetic.generate_landing_updates(0, JSON_UPDATE_COUNT,
+                                                         datetime.datetime(2018, 1, 1))
+    json_directory, store_directory = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        utils.save_landing_updates_to_directory(landing_updates, json_directory)
+        start_time = time.time()
+        json_latest = utils.get_most_recent_landing_updates(utils.load_raw_material_from_files(
+            FlightLandingUpdate, utils.list_directory_files(json_directory)))
+        json_seconds = time.time() - start_time
+
+        store = FlightUpdateStore(store_directory)
+        convert_json_directory(json_directory, store)
+        start_time = time.time()
+        columns = store.read_columns()
+        # Of each flight number, like `utils.get_most_recent_landing_updates`.
+        store_latest = columns.to_landing_updates(columns.latest_per_flight(per_date=False))
+        store_seconds = time.time() - start_time
+    finally:
+        shutil.rmtree(json_directory)
+        shutil.rmtree(store_directory)
+    assert _latest_keys(json_latest) == _latest_keys(store_latest), 'Results differ'
+    print '{updates} updates, latest per flight: JSON files {json:.2f}s, store {store:.3f}s'.format(
+        updates=JSON_UPDATE_COUNT, json=json_seconds, store=store_seconds)
+
+
+def _benchmark_store_scale(update_count):
+    store_directory = tempfile.mkdtemp()
+    try:
+        store = FlightUpdateStore(store_directory)
+        landing_updates = synthetic.generate_landing_updates(1, SEGMENT_SIZE,
+                                                             datetime.datetime(2018, 1, 1))
+        for _ in xrange(update_count // SEGMENT_SIZE):
+            store.append(landing_updates)
+        start_time = time.time()
+        columns = store.read_columns()
+        read_seconds = time.time() - start_time
+        start_time = time.time()
+        columns.latest_per_flight()
+        columns.delays_by_origin()
+        columns.in_time_range(datetime.datetime(2018, 1, 1, 12), datetime.datetime(2018, 1, 2))
+        query_seconds = time.time() - start_time
+    finally:
+        shutil.rmtree(store_directory)
+    print '{updates} updates in store: read {read:.3f}s, 3 queries {query:.3f}s'.format(
+        updates=len(columns), read=read_seconds, query=query_seconds)
+
+
+def main():
+    _benchmark_against_json()
+    for update_count in STORE_UPDATE_COUNTS:
+        _benchmark_store_scale(update_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Measures incremental extraction of a synthetic BBC download directory: a full extraction, a run
+without changes, a run after a day's delta (a few new and changed files, and touched but unchanged
+files) and the resumption of an extraction interrupted midway.
+
+Run from project directory: python -m benchmarks.incremental_extraction
+"""
+import os
+import shutil
+import tempfile
+
+from benchmarks import synthetic
+from webcrawler import common, utils
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.extraction import extract_directory
+
+NUMBER_OF_FILES = 3000
+NUMBER_OF_NEW_FILES = 20
+NUMBER_OF_CHANGED_FILES = 10
+NUMBER_OF_TOUCHED_FILES = 100
+INTERRUPT_AFTER_FILES = 1000
+
+
+def _write_page(directory_path, file_index, seed):
+    with open(os.path.join(directory_path, 'page%d.html' % file_index), 'w') as page_file:
+        page_file.write(synthetic.generate_bbc_article_html(seed))
+
+
+class _Interruption(BaseException):
+    """Stands for a crash, escaping the error handling of the extraction."""
+
+
+def _get_interrupting_writer(file_count):
+    written_files = []
+
+    def write(downloaded_file_path, raw_materials, directory_path):
+        if len(written_files) == file_count:
+            raise _Interruption()
+        BBCNewsExtractor.save_raw_material(downloaded_file_path, raw_materials, directory_path)
+        written_files.append(downloaded_file_path)
+    return write
+
+
+def _extract(description, source_directory, destination_directory, **kwargs):
+    report = extract_directory(BBCNewsExtractor, source_directory, destination_directory,
+                               workers=1, parser=common.LXML_PARSER, **kwargs)
+    print '{description:<28} {seconds:7.2f}s, {extracted} extracted, {skipped} skipped'.format(
+        description=description, seconds=report.elapsed_seconds,
+        extracted=report.extracted_file_count, skipped=report.skipped_file_count)
+
+
+def main():
+    source_directory = tempfile.mkdtemp()
+    destination_directory = tempfile.mkdtemp()
+    try:
+        for file_index in xrange(NUMBER_OF_FILES):
+            _write_page(source_directory, file_index, file_index)
+        print 'Downloaded files: %d' % NUMBER_OF_FILES
+        _extract('full', source_directory, destination_directory, incremental=False)
+        _extract('first incremental', source_directory, destination_directory)
+        _extract('no changes', source_directory, destination_directory)
+
+        for file_index in xrange(NUMBER_OF_FILES, NUMBER_OF_FILES + NUMBER_OF_NEW_FILES):
+            _write_page(source_directory, file_index, file_index)
+        for file_index in xrange(NUMBER_OF_CHANGED_FILES):
+            _write_page(source_directory, file_index, -1 - file_index)
+        for file_path in utils.list_directory_files(source_directory)[:NUMBER_OF_TOUCHED_FILES]:
+            os.utime(file_path, None)
+        _extract('delta', source_directory, destination_directory)
+
+        shutil.rmtree(destination_directory)
+        os.mkdir(destination_directory)
+        try:
+            _extract('interrupted', source_directory, destination_directory,
+                     writer=_get_interrupting_writer(INTERRUPT_AFTER_FILES))
+        except _Interruption:
+            print 'interrupted after %d files' % INTERRUPT_AFTER_FILES
+        _extract('resumed', source_directory, destination_directory)
+        assert len(utils.list_directory_files(destination_directory)) == \
+            NUMBER_OF_FILES + NUMBER_OF_NEW_FILES
+    finally:
+        shutil.rmtree(source_directory)
+        shutil.rmtree(destination_directory)
+
+
+if __name__ == '__main__':
+    main()
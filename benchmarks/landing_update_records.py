@@ -0,0 +1,74 @@
+"""
+Measures memory per `FlightLandingUpdate` and the rate of creating, converting, searching and
+reducing them to the most recent update per flight.
+
+Run from project directory: python -m benchmarks.landing_update_records
+"""
+import datetime
+import json
+import sys
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, utils
+from webcrawler.raw_material import FlightLandingUpdate
+
+NUMBER_OF_RECORDS = 300000
+
+
+def _get_memory_per_record(landing_updates):
+    """
+    Average size of a record with its attributes, where objects shared by several records (such
+    as interned strings) are counted once.
+    """
+    counted_object_ids = set()
+    total_size = 0
+    for landing_update in landing_updates:
+        attribute_values = [getattr(landing_update, attribute) for attribute in
+                            getattr(landing_update, '__slots__', ())]
+        if hasattr(landing_update, '__dict__'):
+            total_size += sys.getsizeof(landing_update.__dict__)
+            attribute_values += landing_update.__dict__.values()
+        total_size += sys.getsizeof(landing_update)
+        for attribute_value in attribute_values:
+            if id(attribute_value) not in counted_object_ids:
+                counted_object_ids.add(id(attribute_value))
+                total_size += sys.getsizeof(attribute_value)
+    return total_size / float(len(landing_updates))
+
+
+def _report_rate(operation, start_time):
+    print '  {operation:<24} {rate:,.0f} records/sec'.format(
+        operation=operation, rate=NUMBER_OF_RECORDS / (time.time() - start_time))
+
+
+def main():
+    # Serializing to JSON and back gives every record its own string objects, as when loading files.
+    record_dicts = json.loads(json.dumps([landing_update.to_dict() for landing_update in
+                                          synthetic.generate_landing_updates(
+                                              0, NUMBER_OF_RECORDS,
+                                              datetime.datetime(2018, 1, 1))]))
+    start_time = time.time()
+    landing_updates = [FlightLandingUpdate.from_dict(record_dict) for record_dict in record_dicts]
+    creation_start_time = start_time
+    del record_dicts
+    print '{records} records, {memory:.0f} bytes per unsearched record:'.format(
+        records=NUMBER_OF_RECORDS, memory=_get_memory_per_record(landing_updates))
+    _report_rate('from_dict', creation_start_time)
+    start_time = time.time()
+    for landing_update in landing_updates:
+        landing_update.to_dict()
+    _report_rate('to_dict', start_time)
+    # Later searches use the normalized text kept by the first.
+    for operation in ('has_text', 'has_text again'):
+        start_time = time.time()
+        for landing_update in landing_updates:
+            analyzers.has_text(landing_update, u'LY 123')
+        _report_rate(operation, start_time)
+    start_time = time.time()
+    utils.get_most_recent_landing_updates(landing_updates)
+    _report_rate('most recent per flight', start_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import BaseHTTPServer
+import hashlib
+import SocketServer
+import threading
+import time
+import urlparse
+
+
+class _ThreadingHttpServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class LocalHttpServer(object):
+    """
+    Local stand-in for a website, serving fixed pages from a background thread.
+    Use as a context manager:
+
+        with LocalHttpServer({'/': front_page}) as server:
+            requests.get(server.url + '/')
+    """
+
+    def __init__(self, pages, response_delay_seconds=0):
+        """
+        :param pages: Content of each served page by its path, or a function of the path and the
+            posted form fields (None for GET requests) returning the content of the page, None if
+            there is no such page or an HTTP error status to respond with.
+        :type pages: dict[str, str] | (str, dict[str, str]) -> str | int
+        :param response_delay_seconds: Delay before every response, simulating network latency.
+        """
+        self.pages = pages
+        self.response_delay_seconds = response_delay_seconds
+        self.request_count = 0
+        self._request_count_lock = threading.Lock()
+        self._server = _ThreadingHttpServer(('127.0.0.1', 0), self._create_handler_class())
+        self._server_thread = threading.Thread(target=self._server.serve_forever)
+        self._server_thread.daemon = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return 'http://{host}:{port}'.format(host=host, port=port)
+
+    def __enter__(self):
+        self._server_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count_request(self):
+        with self._request_count_lock:
+            self.request_count += 1
+
+    def _create_handler_class(self):
+        server = self
+
+        class PageRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                form_content = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._respond(dict(urlparse.parse_qsl(form_content, keep_blank_values=True)))
+
+            def _respond(self, form_fields=None):
+                server._count_request()
+                time.sleep(server.response_delay_seconds)
+                path = self.path.rstrip('/') or '/'
+                if callable(server.pages):
+                    page = server.pages(path, form_fields)
+                else:
+                    page = server.pages.get(path)
+                if page is None or isinstance(page, int):
+                    self.send_error(page or 404)
+                    return
+                etag = '"%s"' % hashlib.sha1(page).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, *args):
+                pass
+
+        return PageRequestHandler
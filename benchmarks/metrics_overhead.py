@@ -0,0 +1,90 @@
+"""
+Measures the cost of the instrumentation of `metrics`: the cost of a disabled and of an enabled
+timer and counter, and the time of extracting a synthetic directory of BBC articles and searching
+it with metrics disabled and enabled. Prints the Prometheus export of the enabled run, without
+histogram buckets.
+
+Run from project directory: python -m benchmarks.metrics_overhead
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, common, metrics, utils
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.extraction import extract_directory
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_CALLS = 200000
+NUMBER_OF_FILES = 1000
+NUMBER_OF_RUNS = 3
+
+
+def _measure_calls():
+    """:return: Seconds per timed operation and per counter increment."""
+    start_time = time.time()
+    for _ in xrange(NUMBER_OF_CALLS):
+        with metrics.measure('benchmark', label='value'):
+            pass
+    timer_seconds = (time.time() - start_time) / NUMBER_OF_CALLS
+    start_time = time.time()
+    for _ in xrange(NUMBER_OF_CALLS):
+        metrics.increment('benchmark_total', label='value')
+    return timer_seconds, (time.time() - start_time) / NUMBER_OF_CALLS
+
+
+def _measure_extraction_and_search(source_directory):
+    """:return: Best seconds of extracting the directory and of searching the extracted files."""
+    extraction_seconds, search_seconds = [], []
+    for _ in xrange(NUMBER_OF_RUNS):
+        destination_directory = tempfile.mkdtemp()
+        try:
+            start_time = time.time()
+            extract_directory(BBCNewsExtractor, source_directory, destination_directory, workers=1,
+                              parser=common.LXML_PARSER, incremental=False)
+            extraction_seconds.append(time.time() - start_time)
+            start_time = time.time()
+            analyzers.search_for_text_in_material_files(
+                BBCRawArticle, utils.list_directory_files(destination_directory), 'Netanyahu')
+            search_seconds.append(time.time() - start_time)
+        finally:
+            shutil.rmtree(destination_directory)
+    return min(extraction_seconds), min(search_seconds)
+
+
+def main():
+    source_directory = tempfile.mkdtemp()
+    try:
+        for file_index in xrange(NUMBER_OF_FILES):
+            with open(os.path.join(source_directory, 'article%d.html' % file_index), 'w') as \
+                    page_file:
+                page_file.write(synthetic.generate_bbc_article_html(file_index))
+        print '{calls} calls:'.format(calls=NUMBER_OF_CALLS)
+        results = {}
+        for is_enabled in (False, True):
+            if is_enabled:
+                metrics.enable()
+            timer_seconds, counter_seconds = _measure_calls()
+            metrics.reset()
+            results[is_enabled] = _measure_extraction_and_search(source_directory)
+            print '  metrics {state:<8} timer {timer:.2f}us, counter {counter:.2f}us'.format(
+                state='enabled' if is_enabled else 'disabled', timer=timer_seconds * 1e6,
+                counter=counter_seconds * 1e6)
+        print '{files} articles:'.format(files=NUMBER_OF_FILES)
+        for is_enabled in (False, True):
+            extraction_seconds, search_seconds = results[is_enabled]
+            print '  metrics {state:<8} extraction {extraction:.3f}s, search {search:.3f}s'.format(
+                state='enabled' if is_enabled else 'disabled', extraction=extraction_seconds,
+                search=search_seconds)
+        print
+        print ''.join(line for line in metrics.to_prometheus_text().splitlines(True) if
+                      '_bucket{' not in line)
+    finally:
+        metrics.disable()
+        shutil.rmtree(source_directory)
+
+
+if __name__ == '__main__':
+    main()
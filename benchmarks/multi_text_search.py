@@ -0,0 +1,93 @@
+"""
+Compares counting many texts in the normalized text of articles with a single pass of an
+`AhoCorasickAutomaton` and with one scan of the text per searched text (as
+`analyzers.search_for_texts_in_material_files` does up to `_MAX_TEXTS_SCANNED_ONE_BY_ONE` texts),
+checking that both give the same counts, for a growing number of texts. Then compares both in
+`search_for_texts_in_material_files` over a directory of article files, including loading them.
+
+Run from project directory: python -m benchmarks.multi_text_search
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, utils
+from webcrawler.aho_corasick import AhoCorasickAutomaton
+from webcrawler.query import normalize_text
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_ARTICLES = 500
+TEXT_COUNTS = (1, 4, 16, 64, 128, 256, 512, 1024)
+NUMBER_OF_ARTICLE_FILES = 5000
+FILE_SEARCH_TEXT_COUNTS = (16, 64, 256, 1024)
+
+
+def _get_searched_texts(text_count):
+    """:return: Normalized common words, names and phrases, most of them rare in the articles."""
+    random_generator = random.Random(text_count)
+    words = list(synthetic._WORDS) + synthetic._RARE_WORDS
+    searched_texts = set()
+    for _ in xrange(text_count):
+        phrase_words = random_generator.sample(words, random_generator.randint(1, 2))
+        searched_texts.add(normalize_text(' '.join(phrase_words)))
+    return sorted(searched_texts)
+
+
+def _measure(count_texts, article_texts):
+    start_time = time.time()
+    match_counts = [count_texts(article_text) for article_text in article_texts]
+    return match_counts, (time.time() - start_time) / len(article_texts)
+
+
+def _search_files(file_paths, searched_texts, max_texts_scanned_one_by_one):
+    analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE = max_texts_scanned_one_by_one
+    start_time = time.time()
+    results = analyzers.search_for_texts_in_material_files(BBCRawArticle, file_paths,
+                                                           searched_texts)
+    return results, time.time() - start_time
+
+
+def _compare_file_searches():
+    directory_path = tempfile.mkdtemp()
+    max_texts_scanned_one_by_one = analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE
+    try:
+        for seed in xrange(NUMBER_OF_ARTICLE_FILES):
+            synthetic.generate_bbc_raw_article(seed).dump(
+                os.path.join(directory_path, 'article%d.txt' % seed))
+        file_paths = utils.list_directory_files(directory_path)
+        print '{files} article files:'.format(files=NUMBER_OF_ARTICLE_FILES)
+        for text_count in FILE_SEARCH_TEXT_COUNTS:
+            searched_texts = _get_searched_texts(text_count)
+            automaton_results, automaton_seconds = _search_files(file_paths, searched_texts, 0)
+            scan_results, scan_seconds = _search_files(file_paths, searched_texts, text_count)
+            assert automaton_results == scan_results, 'Results differ'
+            print '  {texts:>5} texts: automaton {automaton:6.2f}s, scans {scans:6.2f}s'.format(
+                texts=len(searched_texts), automaton=automaton_seconds, scans=scan_seconds)
+    finally:
+        analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE = max_texts_scanned_one_by_one
+        shutil.rmtree(directory_path)
+
+
+def main():
+    article_texts = [normalize_text(synthetic.generate_bbc_raw_article(seed).to_text()) for seed
+                     in xrange(NUMBER_OF_ARTICLES)]
+    print '{articles} articles, scans up to {threshold} texts:'.format(
+        articles=NUMBER_OF_ARTICLES, threshold=analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE)
+    for text_count in TEXT_COUNTS:
+        searched_texts = _get_searched_texts(text_count)
+        automaton = AhoCorasickAutomaton(searched_texts)
+        automaton_counts, automaton_seconds = _measure(automaton.count_matches, article_texts)
+        scan_counts, scan_seconds = _measure(
+            lambda text: analyzers._count_each_text(searched_texts, text), article_texts)
+        assert automaton_counts == scan_counts, 'Counts differ'
+        print ('  {texts:>5} texts: automaton {automaton:8.1f}us/article, scans {scans:8.1f}'
+               'us/article').format(texts=len(searched_texts), automaton=automaton_seconds * 1e6,
+                                    scans=scan_seconds * 1e6)
+    _compare_file_searches()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares extraction time per page of the BeautifulSoup parser and of the lxml fast path, after
+checking that both extract exactly the same raw material.
+
+Run from project directory: python -m benchmarks.parser_backends
+"""
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import common
+from webcrawler.data_extractor import BBCNewsExtractor, FlightLandingScheduleExtractor
+
+NUMBER_OF_PAGES = 100
+PARSERS = (common.WEB_SCRAPPING_PARSER, common.LXML_PARSER)
+
+
+def _material_key(raw_material):
+    if hasattr(raw_material, 'to_text'):
+        return raw_material.to_text()
+    return raw_material.to_dict()
+
+
+def _extract_all(extractor_type, file_paths, parser):
+    start_time = time.time()
+    extracted_materials = [extractor_type(file_path, parser).extract_raw_material() for
+                           file_path in file_paths]
+    return extracted_materials, (time.time() - start_time) / len(file_paths)
+
+
+def _benchmark_extractor(extractor_type, page_generator):
+    directory_path = tempfile.mkdtemp()
+    try:
+        file_paths = []
+        for page_index in xrange(NUMBER_OF_PAGES):
+            file_path = os.path.join(directory_path, 'page%d.html' % page_index)
+            with open(file_path, 'w') as page_file:
+                page_file.write(page_generator(page_index))
+            file_paths.append(file_path)
+        results = {parser: _extract_all(extractor_type, file_paths, parser) for parser in PARSERS}
+    finally:
+        shutil.rmtree(directory_path)
+
+    reference_materials = results[common.WEB_SCRAPPING_PARSER][0]
+    for parser, (extracted_materials, _) in results.iteritems():
+        for reference, extracted in zip(reference_materials, extracted_materials):
+            assert map(_material_key, reference) == map(_material_key, extracted), \
+                '{parser} extracted different material'.format(parser=parser)
+    print '{extractor} ({pages} pages, identical output):'.format(
+        extractor=extractor_type.__name__, pages=NUMBER_OF_PAGES)
+    reference_seconds = results[common.WEB_SCRAPPING_PARSER][1]
+    for parser in PARSERS:
+        seconds_per_page = results[parser][1]
+        print '  {parser:<12} {milliseconds:.2f} ms/page  x{speedup:.1f}'.format(
+            parser=parser, milliseconds=seconds_per_page * 1000,
+            speedup=reference_seconds / seconds_per_page)
+
+
+def main():
+    update_time = datetime.datetime.now()
+    _benchmark_extractor(BBCNewsExtractor, synthetic.generate_bbc_article_html)
+    _benchmark_extractor(FlightLandingScheduleExtractor,
+                         lambda seed: synthetic.generate_schedule_page_html(seed, update_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Reproducible benchmark suite of the nightly batch: downloading synthetic BBC articles and airport
+schedule pages from a local server, extracting them, dumping and loading raw material and searching
+it. Every case runs in its own process, so that its peak memory is measured separately, on
+synthetic corpora generated from fixed seeds at a configurable scale.
+
+Results are saved as JSON, and can be compared with the results of an earlier run: a case whose
+throughput dropped, or whose peak memory grew, by more than the threshold is flagged as a
+regression, and the suite then exits with status 1.
+
+Run from project directory: python -m benchmarks.run_suite [--scale 2] [--output results.json]
+    [--compare baseline.json] [--threshold 0.1] [--cases bbc_extract,bbc_search]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from benchmarks.local_server import LocalHttpServer
+from benchmarks.schedule_site import SCHEDULE_PATH, FlightScheduleSite
+from webcrawler import analyzers, common, utils
+from webcrawler.data_extractor import BBCNewsExtractor, FlightLandingScheduleExtractor
+from webcrawler.downloader import BBCNewsDownloader, FlightLandingScheduleDownloader
+from webcrawler.extraction import extract_directory
+from webcrawler.fetcher import HttpFetcher
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
+
+# Corpus sizes at scale 1.
+ARTICLES_PER_SCALE = 200
+SNAPSHOTS_PER_SCALE = 10
+LANDING_UPDATES_PER_SCALE = 5000
+SEARCHED_TEXT = 'Netanyahu'
+DOWNLOAD_WORKERS = 4
+DEFAULT_THRESHOLD = 0.1
+DEFAULT_REPEAT = 3
+
+
+def _write_pages(directory_path, pages):
+    """:param pages: Content of each page by file name."""
+    for file_name, page in pages:
+        with open(os.path.join(directory_path, file_name), 'w') as page_file:
+            page_file.write(page)
+
+
+def _write_article_pages(directory_path, scale):
+    _write_pages(directory_path, (('article%d.html' % seed,
+                                   synthetic.generate_bbc_article_html(seed))
+                                  for seed in xrange(ARTICLES_PER_SCALE * scale)))
+
+
+def _write_schedule_pages(directory_path, scale):
+    update_time = datetime.datetime(2018, 1, 1, 8, 0)
+    _write_pages(directory_path, (('schedule%d.html' % seed,
+                                   synthetic.generate_schedule_page_html(seed, update_time))
+                                  for seed in xrange(SNAPSHOTS_PER_SCALE * 3 * scale)))
+
+
+def _dump_articles(directory_path, scale):
+    for seed in xrange(ARTICLES_PER_SCALE * scale):
+        synthetic.generate_bbc_raw_article(seed).dump(
+            os.path.join(directory_path, 'article%d.txt' % seed))
+
+
+def _dump_landing_updates(directory_path, scale):
+    utils.save_landing_updates_to_directory(synthetic.generate_landing_updates(
+        0, LANDING_UPDATES_PER_SCALE * scale, datetime.datetime(2018, 1, 1)), directory_path)
+
+
+def _run_bbc_download(directory_path, scale):
+    pages = synthetic.generate_bbc_site_pages(ARTICLES_PER_SCALE * scale)
+    with LocalHttpServer(pages) as server:
+        fetcher = HttpFetcher(workers=DOWNLOAD_WORKERS)
+        try:
+            downloader = BBCNewsDownloader(directory_path, fetcher)
+            downloader.DOWNLOAD_URL = server.url
+            start_time = time.time()
+            downloader.download_data()
+            return len(os.listdir(directory_path)), time.time() - start_time
+        finally:
+            fetcher.close()
+
+
+def _run_schedule_download(directory_path, scale):
+    with LocalHttpServer(FlightScheduleSite(3600)) as server:
+        page_count = 0
+        start_time = time.time()
+        for _ in xrange(SNAPSHOTS_PER_SCALE * scale):
+            downloader = FlightLandingScheduleDownloader(directory_path, None)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            downloader.download_data()
+            downloader.fetcher.close()
+            page_count += downloader.written_page_count
+        return page_count, time.time() - start_time
+
+
+def _run_extraction(extractor_type, write_pages, parser, directory_path, scale):
+    source_directory = os.path.join(directory_path, 'source')
+    destination_directory = os.path.join(directory_path, 'destination')
+    os.mkdir(source_directory)
+    os.mkdir(destination_directory)
+    write_pages(source_directory, scale)
+    start_time = time.time()
+    report = extract_directory(extractor_type, source_directory, destination_directory, workers=1,
+                               parser=parser, incremental=False)
+    assert not report.failed_files
+    return report.extracted_file_count, time.time() - start_time
+
+
+def _run_dump_and_load(material_type, dump, directory_path, scale):
+    """:return: Number of files dumped and loaded, and seconds of dumping and loading them."""
+    start_time = time.time()
+    dump(directory_path, scale)
+    file_paths = utils.list_directory_files(directory_path)
+    for file_path in file_paths:
+        material_type.load(file_path)
+    return len(file_paths), time.time() - start_time
+
+
+def _run_search(material_type, dump, text, directory_path, scale):
+    dump(directory_path, scale)
+    file_paths = utils.list_directory_files(directory_path)
+    start_time = time.time()
+    analyzers.search_for_text_in_material_files(material_type, file_paths, text)
+    return len(file_paths), time.time() - start_time
+
+
+# Case name -> function of a temporary directory and the scale, returning the number of items
+# processed and the seconds it took.
+CASES = {
+    'bbc_download': _run_bbc_download,
+    'schedule_download': _run_schedule_download,
+    'bbc_extract': lambda directory_path, scale: _run_extraction(
+        BBCNewsExtractor, _write_article_pages, common.WEB_SCRAPPING_PARSER, directory_path,
+        scale),
+    'bbc_extract_lxml': lambda directory_path, scale: _run_extraction(
+        BBCNewsExtractor, _write_article_pages, common.LXML_PARSER, directory_path, scale),
+    'schedule_extract': lambda directory_path, scale: _run_extraction(
+        FlightLandingScheduleExtractor, _write_schedule_pages, common.WEB_SCRAPPING_PARSER,
+        directory_path, scale),
+    'schedule_extract_lxml': lambda directory_path, scale: _run_extraction(
+        FlightLandingScheduleExtractor, _write_schedule_pages, common.LXML_PARSER, directory_path,
+        scale),
+    'bbc_dump_load': lambda directory_path, scale: _run_dump_and_load(
+        BBCRawArticle, _dump_articles, directory_path, scale),
+    'landing_update_dump_load': lambda directory_path, scale: _run_dump_and_load(
+        FlightLandingUpdate, _dump_landing_updates, directory_path, scale),
+    'bbc_search': lambda directory_path, scale: _run_search(
+        BBCRawArticle, _dump_articles, SEARCHED_TEXT, directory_path, scale),
+    'landing_update_search': lambda directory_path, scale: _run_search(
+        FlightLandingUpdate, _dump_landing_updates, u'TURKISH', directory_path, scale),
+}
+
+
+def _run_case(case_name, scale):
+    """Run a case in the current process. :return: Its result, see `run_case_in_new_process`."""
+    directory_path = tempfile.mkdtemp()
+    try:
+        item_count, seconds = CASES[case_name](directory_path, scale)
+    finally:
+        shutil.rmtree(directory_path)
+    return {'items': item_count, 'seconds': seconds,
+            'items_per_second': item_count / seconds if seconds else 0.0,
+            'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def run_case_in_new_process(case_name, scale):
+    """
+    :return: Number of items the case processed, seconds it took, its throughput and the peak
+        memory of its process.
+    :rtype: dict
+    """
+    output = subprocess.check_output([sys.executable, '-m', 'benchmarks.run_suite', '--run-case',
+                                      case_name, '--scale', str(scale)])
+    return json.loads(output.splitlines()[-1])
+
+
+def run_suite(case_names, scale, repeat=DEFAULT_REPEAT):
+    """
+    Run every case `repeat` times, keeping its fastest run and its largest peak memory.
+
+    :rtype: dict
+    """
+    results = {}
+    for case_name in case_names:
+        runs = [run_case_in_new_process(case_name, scale) for _ in xrange(repeat)]
+        result = min(runs, key=lambda run: run['seconds'])
+        result['peak_memory_kb'] = max(run['peak_memory_kb'] for run in runs)
+        results[case_name] = result
+        print '{case:<26} {items:>6} items {rate:>10.1f}/sec, peak memory {memory:.1f}MB'.format(
+            case=case_name, items=result['items'], rate=result['items_per_second'],
+            memory=result['peak_memory_kb'] / 1024.0)
+    return {'time': time.time(), 'scale': scale, 'repeat': repeat,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'commit': _get_commit(), 'results': results}
+
+
+def _get_commit():
+    """:return: Commit of the project the suite ran on, None if it is not known."""
+    try:
+        with open(os.devnull, 'w') as null_file:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                           stderr=null_file).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    :param baseline: Results of an earlier run, as returned by `run_suite`.
+    :param current: Results of the current run.
+    :param threshold: Largest relative drop of throughput or growth of peak memory which is not a
+        regression.
+    :return: Descriptions of the regressions.
+    :rtype: list[str]
+    """
+    if baseline['scale'] != current['scale']:
+        print 'Warning: comparing runs of different scales ({baseline} and {current})'.format(
+            baseline=baseline['scale'], current=current['scale'])
+    regressions = []
+    print 'Compared with {commit} ({time:%Y-%m-%d %H:%M}):'.format(
+        commit=(baseline.get('commit') or 'unknown commit')[:10],
+        time=datetime.datetime.fromtimestamp(baseline['time']))
+    for case_name in sorted(set(baseline['results']) & set(current['results'])):
+        baseline_result = baseline['results'][case_name]
+        current_result = current['results'][case_name]
+        throughput_change = _get_relative_change(baseline_result['items_per_second'],
+                                                 current_result['items_per_second'])
+        memory_change = _get_relative_change(baseline_result['peak_memory_kb'],
+                                             current_result['peak_memory_kb'])
+        flags = []
+        if throughput_change < -threshold:
+            flags.append('throughput')
+        if memory_change > threshold:
+            flags.append('memory')
+        if flags:
+            regressions.append('%s: %s regression' % (case_name, ' and '.join(flags)))
+        print '  {case:<26} throughput {throughput:+7.1%}, peak memory {memory:+7.1%}{flag}'.format(
+            case=case_name, throughput=throughput_change, memory=memory_change,
+            flag='  REGRESSION' if flags else '')
+    return regressions
+
+
+def _get_relative_change(baseline_value, current_value):
+    return (current_value - baseline_value) / float(baseline_value) if baseline_value else 0.0
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument('--scale', type=int, default=1,
+                                 help='multiplier of the corpus sizes')
+    argument_parser.add_argument('--cases', help='comma-separated cases to run, all by default: ' +
+                                 ', '.join(sorted(CASES)))
+    argument_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                                 help='number of runs of each case, the fastest is kept')
+    argument_parser.add_argument('--output', help='file to save the results to as JSON')
+    argument_parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    argument_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                 help='relative change flagged as a regression')
+    argument_parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    arguments = argument_parser.parse_args()
+    if arguments.run_case:
+        print json.dumps(_run_case(arguments.run_case, arguments.scale))
+        return
+    case_names = arguments.cases.split(',') if arguments.cases else sorted(CASES)
+    unknown_case_names = [case_name for case_name in case_names if case_name not in CASES]
+    if unknown_case_names:
+        argument_parser.error('unknown cases: %s' % ', '.join(unknown_case_names))
+    print 'Scale {scale}, {repeat} runs per case:'.format(scale=arguments.scale,
+                                                         repeat=arguments.repeat)
+    results = run_suite(case_names, arguments.scale, arguments.repeat)
+    if arguments.output:
+        with common.atomic_write(arguments.output) as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            regressions = compare_results(json.load(baseline_file), results, arguments.threshold)
+        if regressions:
+            print 'Regressions:\n  ' + '\n  '.join(regressions)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
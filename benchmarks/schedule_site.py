@@ -0,0 +1,87 @@
+"""Stand-in of the landing schedule website of Ben-Gurion airport, served by `LocalHttpServer`."""
+import base64
+import datetime
+import hashlib
+import re
+import time
+
+from benchmarks import synthetic
+
+SCHEDULE_PATH = '/OnlineFlights.aspx'
+NEXT_PAGE_EVENT_TARGET = 'ctl00$rptPaging$ctl06$aNext'
+_PAGE_NUMBER_EVENT_TARGET_REGEX = re.compile(r'^ctl00\$rptPaging\$ctl(\d\d)\$aPage$')
+
+
+class FlightScheduleSite(object):
+    """
+    Serves schedule pages the way the ASP.NET website does: the first page is requested with GET,
+    and every next page by posting the form of the current page back, with the next page button as
+    the event target and the page state in the hidden `__VIEWSTATE` and `__EVENTVALIDATION` fields.
+
+    The schedule is updated every `seconds_between_updates` seconds (instead of every 5 minutes),
+    and its shown update time advances by 5 minutes on every update. The first page changes on
+    every update, while the other pages change on every other update.
+    """
+
+    def __init__(self, seconds_between_updates, number_of_pages=3, number_of_flights_per_page=20,
+                 first_update_time=datetime.datetime(2018, 1, 1, 8, 0), has_page_links=False):
+        """
+        :param has_page_links: Whether the pager links to every page by its number, besides the
+            next page button.
+        """
+        self.seconds_between_updates = seconds_between_updates
+        self.has_page_links = has_page_links
+        self.number_of_pages = number_of_pages
+        self.number_of_flights_per_page = number_of_flights_per_page
+        self.first_update_time = first_update_time
+        self.start_time = time.time()
+
+    @property
+    def current_update_index(self):
+        return int((time.time() - self.start_time) // self.seconds_between_updates)
+
+    def get_update_time(self, update_index):
+        """:return: Update time shown in the pages of an update."""
+        return self.first_update_time + datetime.timedelta(minutes=5 * update_index)
+
+    def get_update_index(self, update_time):
+        """Reverse of `get_update_time`, ignoring the date."""
+        first_update_minutes = self.first_update_time.hour * 60 + self.first_update_time.minute
+        return (update_time.hour * 60 + update_time.minute - first_update_minutes) // 5
+
+    def get_update_publish_time(self, update_index):
+        """:return: Time (since epoch) when the update was published."""
+        return self.start_time + update_index * self.seconds_between_updates
+
+    def get_page_html(self, update_index, page_number):
+        """:rtype: str"""
+        update_index_of_content = update_index if page_number == 1 else update_index // 2
+        view_state = base64.b64encode('page=%d' % page_number)
+        return synthetic.generate_schedule_page_html(
+            (page_number, update_index_of_content), self.get_update_time(update_index),
+            self.number_of_flights_per_page,
+            {'__EVENTTARGET': '', '__EVENTARGUMENT': '', '__VIEWSTATE': view_state,
+             '__EVENTVALIDATION': self._get_event_validation(view_state)},
+            self.number_of_pages if self.has_page_links else None)
+
+    def __call__(self, path, form_fields):
+        if path != SCHEDULE_PATH:
+            return None
+        if form_fields is None:
+            return self.get_page_html(self.current_update_index, 1)
+        view_state = form_fields.get('__VIEWSTATE', '')
+        if form_fields.get('__EVENTVALIDATION') != self._get_event_validation(view_state):
+            return None
+        event_target = form_fields.get('__EVENTTARGET', '')
+        page_number_match = _PAGE_NUMBER_EVENT_TARGET_REGEX.match(event_target)
+        if event_target == NEXT_PAGE_EVENT_TARGET:
+            page_number = int(base64.b64decode(view_state).split('=')[1]) + 1
+        elif page_number_match is not None and self.has_page_links:
+            page_number = int(page_number_match.group(1))
+        else:
+            return None
+        return self.get_page_html(self.current_update_index, min(page_number, self.number_of_pages))
+
+    @staticmethod
+    def _get_event_validation(view_state):
+        return hashlib.sha1('validation:' + view_state).hexdigest()
@@ -0,0 +1,50 @@
+"""
+Compares searching a directory of raw articles with an inverted index against a linear scan of all
+files, for a growing number of articles.
+
+Run from project directory: python -m benchmarks.search_index
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers
+from webcrawler.raw_material import BBCRawArticle
+
+CORPUS_SIZES = (500, 2000, 8000)
+SEARCHED_TEXTS = ('Netanyahu', 'Kaloru', 'minister Sami', 'xylophone')
+
+
+def _time_searches(directory_path):
+    start_time = time.time()
+    results = [sorted(analyzers.search_for_text_in_material_directory(BBCRawArticle,
+                                                                      directory_path, text))
+               for text in SEARCHED_TEXTS]
+    return results, (time.time() - start_time) / len(SEARCHED_TEXTS)
+
+
+def main():
+    for corpus_size in CORPUS_SIZES:
+        directory_path = tempfile.mkdtemp()
+        try:
+            for article_index in xrange(corpus_size):
+                synthetic.generate_bbc_raw_article(article_index).dump(
+                    os.path.join(directory_path, 'article%d.txt' % article_index))
+            scan_results, scan_seconds = _time_searches(directory_path)
+            start_time = time.time()
+            analyzers.index_material_directory(BBCRawArticle, directory_path)
+            indexing_seconds = time.time() - start_time
+            index_results, index_seconds = _time_searches(directory_path)
+        finally:
+            shutil.rmtree(directory_path)
+        assert scan_results == index_results, 'Index search returned different files'
+        print ('{articles} articles: scan {scan:.1f} ms/query, index {index:.1f} ms/query '
+               '(built in {build:.1f}s)').format(articles=corpus_size, scan=scan_seconds * 1000,
+                                                index=index_seconds * 1000,
+                                                build=indexing_seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures adds and lookups of a `SeenUrlStore` holding many URLs, the observed false positive rate
+of its Bloom filter and the memory of the filter compared to a set of the URLs.
+
+Run from project directory: python -m benchmarks.seen_url_store
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from webcrawler.url_store import SeenUrlStore, normalize_url
+
+NUMBER_OF_URLS = 200000
+NUMBER_OF_NEW_URL_LOOKUPS = 200000
+FALSE_POSITIVE_RATE = 0.001
+
+
+def _article_url(article_id):
+    return normalize_url('/news/world-%d?at_medium=RSS' % article_id, 'http://www.bbc.com')
+
+
+def main():
+    directory_path = tempfile.mkdtemp()
+    try:
+        with SeenUrlStore(directory_path, NUMBER_OF_URLS, FALSE_POSITIVE_RATE) as seen_urls:
+            urls = [_article_url(article_id) for article_id in xrange(NUMBER_OF_URLS)]
+            start_time = time.time()
+            for url in urls:
+                seen_urls.add(url)
+            seen_urls.flush()
+            add_seconds = time.time() - start_time
+
+            start_time = time.time()
+            for url in urls:
+                assert url in seen_urls
+            seen_lookup_seconds = time.time() - start_time
+
+            start_time = time.time()
+            for article_id in xrange(NUMBER_OF_URLS, NUMBER_OF_URLS + NUMBER_OF_NEW_URL_LOOKUPS):
+                assert _article_url(article_id) not in seen_urls
+            new_lookup_seconds = time.time() - start_time
+            stats = seen_urls.stats
+
+        start_time = time.time()
+        SeenUrlStore(directory_path, NUMBER_OF_URLS, FALSE_POSITIVE_RATE).close()
+        reopen_seconds = time.time() - start_time
+    finally:
+        shutil.rmtree(directory_path)
+
+    url_set_bytes = sys.getsizeof(set(urls)) + sum(sys.getsizeof(url) for url in urls)
+    print 'URLs: {urls}'.format(urls=stats.url_count)
+    print 'add:           {microseconds:.1f}us per URL'.format(
+        microseconds=1e6 * add_seconds / NUMBER_OF_URLS)
+    print 'seen lookup:   {microseconds:.1f}us per URL'.format(
+        microseconds=1e6 * seen_lookup_seconds / NUMBER_OF_URLS)
+    print 'new lookup:    {microseconds:.1f}us per URL (including normalization)'.format(
+        microseconds=1e6 * new_lookup_seconds / NUMBER_OF_NEW_URL_LOOKUPS)
+    print 'reopen:        {seconds:.2f}s'.format(seconds=reopen_seconds)
+    print 'false positive rate: {observed:.5f} observed, {expected:.5f} expected'.format(
+        observed=stats.false_positive_rate, expected=stats.expected_false_positive_rate)
+    print 'Bloom filter: {filter_kb:.0f}KB, set of URLs: {set_kb:.0f}KB'.format(
+        filter_kb=stats.filter_size_in_bytes / 1024.0, set_kb=url_set_bytes / 1024.0)
+
+
+if __name__ == '__main__':
+    main()
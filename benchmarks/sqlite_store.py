@@ -0,0 +1,117 @@
+"""
+Compares answering questions from directories of raw material files, by loading and scanning every
+file, with `RawMaterialStore`: searching articles for text, searching only their headers, finding
+the most recent update of each flight and finding delayed flights.
+
+Run from project directory: python -m benchmarks.sqlite_store
+"""
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, utils
+from webcrawler.flight_store import FlightUpdateColumns
+from webcrawler.query import TextQuery
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
+from webcrawler.sqlite_store import RawMaterialStore, convert_material_directory
+
+NUMBER_OF_ARTICLES = 5000
+NUMBER_OF_LANDING_UPDATES = 20000
+SEARCHED_TEXTS = ('Netanyahu', 'minister Sami', 'climate talks', 'xylophone')
+MAX_ON_TIME_DELAY_MINUTES = 15
+
+
+def _get_article_id(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def _scan_articles(directory_path, text, fields=None):
+    """:return: Ids of the articles in the directory with the text, found by loading every file."""
+    file_paths = utils.list_directory_files(directory_path)
+    if fields is None:
+        return [_get_article_id(file_path) for file_path in
+                analyzers.search_for_text_in_material_files(BBCRawArticle, file_paths, text)]
+    query = TextQuery(text, cache=None)
+    return [_get_article_id(file_path) for file_path in file_paths if
+            any(query.matches(BBCRawArticle(getattr(BBCRawArticle.load(file_path), field), '',
+                                            [])) for field in fields)]
+
+
+def _load_landing_updates(directory_path):
+    return utils.load_raw_material_from_files(FlightLandingUpdate,
+                                              utils.list_directory_files(directory_path))
+
+
+def _scan_latest_per_flight(directory_path):
+    columns = FlightUpdateColumns.from_landing_updates(_load_landing_updates(directory_path))
+    return columns.to_landing_updates(columns.latest_per_flight())
+
+
+def _scan_delayed_landing_updates(directory_path):
+    landing_updates = _load_landing_updates(directory_path)
+    delays = FlightUpdateColumns.from_landing_updates(landing_updates).delay_minutes()
+    return [landing_update for landing_update, delay in zip(landing_updates, delays) if
+            delay > MAX_ON_TIME_DELAY_MINUTES]
+
+
+def _time(function, *arguments, **keyword_arguments):
+    start_time = time.time()
+    result = function(*arguments, **keyword_arguments)
+    return result, time.time() - start_time
+
+
+def _compare(name, scan, store_query, key=sorted):
+    scan_result, scan_seconds = _time(*scan)
+    store_result, store_seconds = _time(*store_query)
+    assert key(scan_result) == key(store_result), '%s: results differ' % name
+    print '  {name:<28} files {scan:8.1f}ms, store {store:7.2f}ms, {results} results'.format(
+        name=name, scan=scan_seconds * 1000, store=store_seconds * 1000,
+        results=len(store_result))
+
+
+def _get_landing_update_keys(landing_updates):
+    return sorted((landing_update.flight_number, landing_update.schedule_update_timestamp) for
+                  landing_update in landing_updates)
+
+
+def main():
+    directory_path = tempfile.mkdtemp()
+    article_directory = os.path.join(directory_path, 'articles')
+    landing_update_directory = os.path.join(directory_path, 'landing_updates')
+    os.mkdir(article_directory)
+    os.mkdir(landing_update_directory)
+    try:
+        for seed in xrange(NUMBER_OF_ARTICLES):
+            synthetic.generate_bbc_raw_article(seed).dump(
+                os.path.join(article_directory, 'article%d.txt' % seed))
+        utils.save_landing_updates_to_directory(synthetic.generate_landing_updates(
+            0, NUMBER_OF_LANDING_UPDATES, datetime.datetime(2018, 1, 1)), landing_update_directory)
+        with RawMaterialStore(os.path.join(directory_path, 'store.sqlite')) as store:
+            start_time = time.time()
+            convert_material_directory(BBCRawArticle, article_directory, store)
+            convert_material_directory(FlightLandingUpdate, landing_update_directory, store)
+            print 'Stored {articles} articles and {updates} landing updates in {seconds:.1f}s, ' \
+                  'database of {size:.1f}MB'.format(
+                      articles=store.article_count, updates=store.landing_update_count,
+                      seconds=time.time() - start_time,
+                      size=os.path.getsize(store.database_path) / 2.0 ** 20)
+            for text in SEARCHED_TEXTS:
+                _compare('search %r' % text, (_scan_articles, article_directory, text),
+                         (store.search_articles, text))
+            _compare('search headers %r' % 'minister', (_scan_articles, article_directory,
+                                                        'minister', ['header']),
+                     (store.search_articles, 'minister', ['header']))
+            _compare('latest per flight', (_scan_latest_per_flight, landing_update_directory),
+                     (store.latest_per_flight,), _get_landing_update_keys)
+            _compare('delayed flights', (_scan_delayed_landing_updates, landing_update_directory),
+                     (store.find_delayed_landing_updates, MAX_ON_TIME_DELAY_MINUTES),
+                     _get_landing_update_keys)
+    finally:
+        shutil.rmtree(directory_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares peak memory of searching a corpus of raw articles after loading all of it into a list,
+against loading it lazily with `iter_load`. Each mode runs in a fresh interpreter so that its peak
+memory is measured separately.
+
+Run from project directory: python -m benchmarks.streaming_load
+"""
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from webcrawler import analyzers, utils
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_ARTICLES = 3000
+PARAGRAPHS_PER_ARTICLE = 60
+SEARCHED_TEXT = 'Netanyahu'
+LOAD_MODES = ('list', 'iter')
+
+
+def _search(load_mode, directory_path):
+    file_paths = utils.list_directory_files(directory_path)
+    if load_mode == 'list':
+        raw_articles = utils.load_raw_material_from_files(BBCRawArticle, file_paths)
+    else:
+        raw_articles = utils.iter_load_raw_material_from_files(BBCRawArticle, file_paths)
+    return sum(1 for raw_article in raw_articles if analyzers.has_text(raw_article, SEARCHED_TEXT))
+
+
+def _run_search_in_new_interpreter(load_mode, directory_path):
+    start_time = time.time()
+    output = subprocess.check_output([sys.executable, '-m', 'benchmarks.streaming_load', load_mode,
+                                      directory_path])
+    articles_found, peak_memory_kilobytes = map(int, output.split())
+    return articles_found, peak_memory_kilobytes, time.time() - start_time
+
+
+def main():
+    directory_path = tempfile.mkdtemp()
+    try:
+        for article_index in xrange(NUMBER_OF_ARTICLES):
+            synthetic.generate_bbc_raw_article(article_index, PARAGRAPHS_PER_ARTICLE).dump(
+                os.path.join(directory_path, 'article%d.txt' % article_index))
+        corpus_megabytes = sum(os.path.getsize(file_path) for file_path in
+                               utils.list_directory_files(directory_path)) / 2.0 ** 20
+        print '{articles} articles, {size:.1f} MB:'.format(articles=NUMBER_OF_ARTICLES,
+                                                          size=corpus_megabytes)
+        for load_mode in LOAD_MODES:
+            articles_found, peak_memory_kilobytes, seconds = _run_search_in_new_interpreter(
+                load_mode, directory_path)
+            print '  {mode:<5} peak memory {memory:.1f} MB, {seconds:.2f}s, {found} found'.format(
+                mode=load_mode, memory=peak_memory_kilobytes / 1024.0, seconds=seconds,
+                found=articles_found)
+    finally:
+        shutil.rmtree(directory_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        found_articles_count = _search(*sys.argv[1:])
+        print found_articles_count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    else:
+        main()
@@ -0,0 +1,92 @@
+"""
+Compares making a downloaded BBC site searchable with the batch flow (download, then extract the
+download directory, then index it) and with `pipeline.run_download_pipeline`, which extracts and
+indexes every article while the crawl is still running. Reports the mean and maximal delay from an
+article's download to its raw material being written, the total time until everything is
+searchable and the counters of the pipeline stages.
+
+Run from project directory: python -m benchmarks.streaming_pipeline
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from benchmarks.local_server import LocalHttpServer
+from webcrawler import analyzers, common, pipeline
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.downloader import BBCNewsDownloader
+from webcrawler.extraction import extract_directory
+from webcrawler.fetcher import HttpFetcher
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_ARTICLES = 400
+NUMBER_OF_SECTIONS = 10
+RESPONSE_DELAY_SECONDS = 0.02
+DOWNLOAD_WORKERS = 4
+
+
+def _get_extraction_delays(download_directory, raw_material_directory):
+    """:return: Seconds from writing each downloaded article to writing its raw material."""
+    delays = []
+    for file_name in os.listdir(download_directory):
+        if file_name.startswith('.'):
+            continue
+        raw_material_file_path = os.path.join(raw_material_directory,
+                                              os.path.splitext(file_name)[0] + '.txt')
+        delays.append(os.path.getmtime(raw_material_file_path) -
+                      os.path.getmtime(os.path.join(download_directory, file_name)))
+    return delays
+
+
+def _download_batch(downloader, raw_material_directory):
+    downloader.download_data()
+    extract_directory(BBCNewsExtractor, downloader.download_directory, raw_material_directory,
+                      workers=1, parser=common.LXML_PARSER)
+    analyzers.index_material_directory(BBCRawArticle, raw_material_directory)
+
+
+def _download_streaming(downloader, raw_material_directory):
+    return pipeline.run_download_pipeline(downloader, BBCNewsExtractor, BBCRawArticle,
+                                          raw_material_directory, common.LXML_PARSER)
+
+
+def _measure(description, download_function, server_url):
+    download_directory = tempfile.mkdtemp()
+    raw_material_directory = tempfile.mkdtemp()
+    fetcher = HttpFetcher(DOWNLOAD_WORKERS)
+    try:
+        downloader = BBCNewsDownloader(download_directory, fetcher, crawl_sections=True)
+        downloader.DOWNLOAD_URL = server_url
+        start_time = time.time()
+        stage_stats = download_function(downloader, raw_material_directory) or []
+        elapsed_seconds = time.time() - start_time
+        delays = _get_extraction_delays(download_directory, raw_material_directory)
+        searched_text = BBCRawArticle.load(os.path.join(
+            raw_material_directory, sorted(os.listdir(raw_material_directory))[-1])).header
+        assert analyzers.search_for_text_in_material_directory(
+            BBCRawArticle, raw_material_directory, searched_text)
+    finally:
+        fetcher.close()
+        shutil.rmtree(download_directory)
+        shutil.rmtree(raw_material_directory)
+    print ('{description:<10} searchable after {elapsed:.2f}s, download to extraction '
+           '{mean:.2f}s mean, {max:.2f}s max').format(
+        description=description, elapsed=elapsed_seconds, mean=sum(delays) / len(delays),
+        max=max(delays))
+    for stats in stage_stats:
+        print '  %s' % stats
+
+
+def main():
+    pages = synthetic.generate_bbc_site_pages(NUMBER_OF_ARTICLES, NUMBER_OF_SECTIONS)
+    print 'Articles: {articles}, server delay: {delay}s'.format(articles=NUMBER_OF_ARTICLES,
+                                                                delay=RESPONSE_DELAY_SECONDS)
+    with LocalHttpServer(pages, RESPONSE_DELAY_SECONDS) as server:
+        _measure('batch', _download_batch, server.url)
+        _measure('streaming', _download_streaming, server.url)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# coding=utf-8
+"""Generation of synthetic pages shaped like the pages of the crawled websites."""
+import datetime
+import random
+
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
+
+_WORDS = ('government', 'minister', 'election', 'market', 'report', 'police', 'court', 'climate',
+          'health', 'school', 'president', 'talks', 'economy', 'energy', 'city', 'village',
+          'players', 'season', 'record', 'officials', 'said', 'the', 'a', 'of', 'and', 'in', 'on',
+          'with', 'after', 'before', 'new', 'first', 'year', 'week', 'London')
+_SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'de', 'ba', 'zo', 'pe', 'qu', 'ri',
+              'fa', 'gu', 'ho', 'je', 'wy', 'xe')
+# Names and rare words, each appearing in a small part of the articles.
+_RARE_WORDS = ['Netanyahu'] + [(first + second + third).capitalize() for first in _SYLLABLES for
+                               second in _SYLLABLES for third in _SYLLABLES]
+_RARE_WORD_PROBABILITY = 0.05
+
+
+_FLIGHT_COMPANIES = ('EL AL ISRAEL AIRLINES', 'TURKISH AIRLINES', 'LUFTHANSA', 'WIZZ AIR',
+                     'AEGEAN AIRLINES', 'DELTA AIRLINES')
+_FLIGHT_ORIGINS = (u'איסטנבול', u'לונדון', u'פריז', u'ניו יורק', u'רומא', u'אתונה', u'ברלין')
+_FLIGHT_STATUSES = (u'נחתה', u'סופי', u'בזמן', u'עיכוב', u'מבוטלת', u'לא סופי')
+
+
+def _sentence(random_generator, number_of_words):
+    words = [random_generator.choice(_RARE_WORDS)
+             if random_generator.random() < _RARE_WORD_PROBABILITY else
+             random_generator.choice(_WORDS) for _ in xrange(number_of_words)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(random_generator):
+    return ' '.join(_sentence(random_generator, random_generator.randint(8, 20)) for _ in
+                    xrange(random_generator.randint(1, 4)))
+
+
+def generate_bbc_article_html(seed, number_of_paragraphs=12):
+    """
+    :return: HTML of a BBC article page, with the `story-body` structure of the real website.
+    :rtype: str
+    """
+    random_generator = random.Random(seed)
+    body_tags = []
+    for paragraph_index in xrange(number_of_paragraphs):
+        if paragraph_index and paragraph_index % 5 == 0:
+            body_tags.append('<h2 class="story-body__crosshead">%s</h2>' %
+                             _sentence(random_generator, 4))
+        body_tags.append('<p>%s</p>' % _paragraph(random_generator))
+    body_tags.insert(len(body_tags) // 2,
+                     '<div class="social-embed"><p class="twite__title">Tweet about %s</p></div>' %
+                     random_generator.choice(_WORDS))
+    body_tags.append('<p aria-hidden="true">Share this with Email</p>')
+    return ('<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            '<title>Article {seed}</title></head><body>\n'
+            '<div class="story-body">\n'
+            '<h1 class="story-body__h1">{header}</h1>\n'
+            '<div class="story-body__inner" property="articleBody">\n'
+            '<p class="story-body__introduction">{introduction}</p>\n'
+            '{body}\n'
+            '</div></div></body></html>\n').format(
+        seed=seed, header=_sentence(random_generator, 6),
+        introduction=_paragraph(random_generator), body='\n'.join(body_tags))
+
+
+def generate_bbc_raw_article(seed, number_of_paragraphs=12):
+    """:rtype: BBCRawArticle"""
+    random_generator = random.Random(seed)
+    return BBCRawArticle(_sentence(random_generator, 6), _paragraph(random_generator),
+                         [_paragraph(random_generator) for _ in xrange(number_of_paragraphs)])
+
+
+def generate_bbc_front_page_html(article_paths, section_paths=()):
+    """
+    :param article_paths: Paths of the articles linked from the front page, e.g. '/news/world-1'.
+    :param section_paths: Paths of the news sections linked from the front page, e.g. '/news/uk'.
+    :return: HTML of BBC main page (or of a section page) linking to the given pages.
+    :rtype: str
+    """
+    links = ['<div class="media__content"><h3 class="media__title">'
+             '<a class="block-link__overlay-link" href="{path}" rev="news|headline">'
+             'Article</a></h3></div>'.format(path=path) for path in article_paths]
+    links.extend('<a class="navigation__link" href="{path}">Section</a>'.format(path=path) for
+                 path in section_paths)
+    return ('<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8"><title>BBC</title>'
+            '</head><body>\n{links}\n</body></html>\n').format(links='\n'.join(links))
+
+
+def generate_bbc_site_pages(number_of_articles, number_of_sections=0):
+    """
+    :param number_of_sections: Number of news section pages, linked from the front page and from
+        each other. The articles are split between the front page and the sections.
+    :return: Pages of a BBC stand-in website by path, including the front page ('/').
+    :rtype: dict[str, str]
+    """
+    article_paths = ['/news/world-%d' % article_id for article_id in xrange(number_of_articles)]
+    pages = {path: generate_bbc_article_html(path) for path in article_paths}
+    section_paths = ['/news/' + section_name.lower() for section_name in
+                     _RARE_WORDS[1:number_of_sections + 1]]
+    pages['/'] = generate_bbc_front_page_html(article_paths[::number_of_sections + 1],
+                                              section_paths)
+    for section_index, section_path in enumerate(section_paths, 1):
+        pages[section_path] = generate_bbc_front_page_html(
+            article_paths[section_index::number_of_sections + 1], section_paths)
+    return pages
+
+
+def _random_flight_fields(random_generator):
+    company = random_generator.choice(_FLIGHT_COMPANIES)
+    planned_minutes = random_generator.randint(0, 24 * 60 - 1)
+    updated_minutes = min(planned_minutes + random_generator.choice((0, 0, 5, 20, 45)),
+                          24 * 60 - 1)
+    return {'company': company,
+            'flight_number': '%s %d' % (company[:2], random_generator.randint(100, 999)),
+            'flight_from': random_generator.choice(_FLIGHT_ORIGINS),
+            'planned_time': '%02d:%02d' % divmod(planned_minutes, 60),
+            'updated_time': '%02d:%02d' % divmod(updated_minutes, 60),
+            'terminal': random_generator.choice((1, 3)),
+            'status': random_generator.choice(_FLIGHT_STATUSES)}
+
+
+def _flight_row_html(random_generator, row_class):
+    flight_fields = _random_flight_fields(random_generator)
+    if random_generator.random() < 0.8:
+        company_tag = '<img class="logoImg" src="/logo.png" alt="%s"/>' % flight_fields['company']
+    else:
+        company_tag = '<span class="noIcon">%s</span>' % flight_fields['company']
+    return (u'<tr class="{row_class}">'
+            u'<td class="flightIcons">{company_tag}</td>'
+            u'<td class="FlightNum">{flight_number}</td>'
+            u'<td class="FlightFrom"><span>{flight_from}</span></td>'
+            u'<td class="FlightTime">{planned_time}</td>'
+            u'<td class="finalTime">{updated_time}</td>'
+            u'<td class="localTerminal">{terminal}</td>'
+            u'<td class="status"><div>{status}</div></td></tr>').format(
+        row_class=row_class, company_tag=company_tag, **flight_fields)
+
+
+def generate_landing_updates(seed, number_of_updates, first_update_time,
+                             number_of_flights=500):
+    """
+    :return: Landing updates of a fixed set of flights, as downloaded every 5 minutes starting at
+        the given time.
+    :rtype: list[FlightLandingUpdate]
+    """
+    random_generator = random.Random(seed)
+    flight_numbers = sorted({_random_flight_fields(random_generator)['flight_number'] for _ in
+                             xrange(number_of_flights)})
+    landing_updates = []
+    for update_index in xrange(number_of_updates):
+        flight_fields = _random_flight_fields(random_generator)
+        flight_fields['flight_number'] = flight_numbers[update_index % len(flight_numbers)]
+        schedule_update_time = first_update_time + datetime.timedelta(
+            minutes=5 * (update_index // len(flight_numbers)))
+        landing_updates.append(FlightLandingUpdate(
+            schedule_update_time, flight_fields['company'], flight_fields['flight_number'],
+            flight_fields['flight_from'], flight_fields['planned_time'],
+            flight_fields['updated_time'], flight_fields['terminal'], flight_fields['status']))
+    return landing_updates
+
+
+def generate_schedule_page_html(seed, update_time, number_of_flights=20, hidden_fields=None,
+                                number_of_pages=None):
+    """
+    :param update_time: Schedule update time shown in the page.
+    :type update_time: datetime.datetime
+    :param hidden_fields: Values of hidden fields of the page form (e.g. ASP.NET page state).
+    :type hidden_fields: dict[str, str]
+    :param number_of_pages: Number of pages linked by page number from the pager, besides the next
+        page button. No page number links if None.
+    :return: UTF-8 encoded HTML of a landing schedule page of Ben-Gurion airport, with the
+        `ctl00_rptIncomingFlights...` structure of the real website.
+    :rtype: str
+    """
+    random_generator = random.Random(seed)
+    rows = [u'<tr class="odd"><th>Company</th><th>Flight</th><th>From</th><th>Time</th>'
+            u'<th>Final time</th><th>Terminal</th><th>Status</th></tr>']
+    for row_index in xrange(number_of_flights):
+        rows.append(_flight_row_html(random_generator, 'even' if row_index % 2 == 0 else 'odd'))
+    hidden_inputs = [u'<input type="hidden" name="{name}" id="{name}" value="{value}" />'.format(
+        name=name, value=value) for name, value in sorted((hidden_fields or {}).iteritems())]
+    page_links = [u'<a id="ctl00_rptPaging_ctl{index:02d}_aPage" href="javascript:__doPostBack('
+                  u'\'ctl00$rptPaging$ctl{index:02d}$aPage\',\'\')">{index}</a>'.format(index=index)
+                  for index in xrange(1, (number_of_pages or 0) + 1)]
+    return (u'<!DOCTYPE html>\n<html dir="rtl"><head><meta charset="utf-8">'
+            u'<title>טיסות נכנסות</title>'
+            u'</head><body><form method="post" id="aspnetForm">\n{hidden_inputs}\n'
+            u'<p id="ctl00_rptIncomingFlights_ctl00_pInformationStatusMessage">'
+            u'עודכן בשעה {update_time}</p>\n'
+            u'<table id="ctl00_rptIncomingFlights_ctl00_tblFlights">\n{rows}\n</table>\n'
+            u'{page_links}\n<a id="ctl00_rptPaging_ctl06_aNext" '
+            u'href="javascript:__doPostBack(\'ctl00$rptPaging$ctl06$aNext\',\'\')">&gt;</a>\n'
+            u'</form></body></html>\n').format(
+        hidden_inputs=u'\n'.join(hidden_inputs), page_links=u'\n'.join(page_links),
+        update_time=update_time.strftime('%H:%M'),
+        rows=u'\n'.join(rows)).encode('utf-8')
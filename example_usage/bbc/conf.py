@@ -1,3 +1,4 @@
 DOWNLOAD_MATERIAL_DIR = './articles'
 RAW_MATERIAL_DIR = './raw_articles'
 SEARCHED_WORD = 'Netanyahu'
+DOWNLOAD_WORKERS = 8
@@ -1,9 +1,10 @@
 import os
 
 from webcrawler.downloader import BBCNewsDownloader
-from conf import DOWNLOAD_MATERIAL_DIR
+from webcrawler.fetcher import HttpFetcher
+from conf import DOWNLOAD_MATERIAL_DIR, DOWNLOAD_WORKERS
 
 if __name__ == '__main__':
     if not os.path.exists(DOWNLOAD_MATERIAL_DIR):
         os.mkdir(DOWNLOAD_MATERIAL_DIR)
-    BBCNewsDownloader(DOWNLOAD_MATERIAL_DIR).download_data()
+    BBCNewsDownloader(DOWNLOAD_MATERIAL_DIR, HttpFetcher(DOWNLOAD_WORKERS)).download_data()
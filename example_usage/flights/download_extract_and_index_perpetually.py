@@ -0,0 +1,25 @@
+import os
+
+from webcrawler import common
+from webcrawler.data_extractor import FlightLandingScheduleExtractor
+from webcrawler.downloader import FlightLandingScheduleDownloader
+from webcrawler.pipeline import run_download_pipeline
+from webcrawler.raw_material import FlightLandingUpdate
+from conf import SCHEDULE_DIRECTORY, RAW_MATERIAL_DIR, CHROME_DRIVER_LOCATION
+
+
+def main():
+    for directory_path in (SCHEDULE_DIRECTORY, RAW_MATERIAL_DIR):
+        if not os.path.exists(directory_path):
+            os.mkdir(directory_path)
+    print 'Downloading, extracting and indexing flight schedule perpetually. Type Ctrl+C to stop.'
+    downloader = FlightLandingScheduleDownloader(SCHEDULE_DIRECTORY, CHROME_DRIVER_LOCATION)
+    try:
+        run_download_pipeline(downloader, FlightLandingScheduleExtractor, FlightLandingUpdate,
+                              RAW_MATERIAL_DIR, common.LXML_PARSER, perpetually=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
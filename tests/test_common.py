@@ -0,0 +1,48 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from webcrawler import common
+
+
+class AtomicWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory_path, 'written.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _read_file(self):
+        with open(self.file_path) as written_file:
+            return written_file.read()
+
+    def test_concurrent_writers_do_not_collide(self):
+        with common.atomic_write(self.file_path) as first_file:
+            first_file.write('first')
+            with common.atomic_write(self.file_path) as second_file:
+                second_file.write('second')
+            self.assertEqual(self._read_file(), 'second')
+        self.assertEqual(self._read_file(), 'first')
+        self.assertEqual(os.listdir(self.directory_path), ['written.txt'])
+
+    def test_failed_write_keeps_previous_file(self):
+        with common.atomic_write(self.file_path) as written_file:
+            written_file.write('previous')
+        with self.assertRaises(ValueError):
+            with common.atomic_write(self.file_path) as written_file:
+                written_file.write('partial')
+                raise ValueError()
+        self.assertEqual(self._read_file(), 'previous')
+        self.assertEqual(os.listdir(self.directory_path), ['written.txt'])
+
+    def test_permissions_of_new_file(self):
+        with common.atomic_write(self.file_path) as written_file:
+            written_file.write('content')
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o666 & ~common._UMASK)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import synthetic
+from webcrawler.corpus import (INDEX_FILE_NAME, SEGMENT_FILE_EXTENSION, ArticleCorpusReader,
+                               ArticleCorpusWriter, convert_article_directory)
+from webcrawler.raw_material import BBCRawArticle
+
+NUMBER_OF_ARTICLES = 10
+
+
+def _get_article_fields(raw_article):
+    return raw_article.header, raw_article.introduction, raw_article.paragraphs
+
+
+class ArticleCorpusTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.corpus_directory = os.path.join(self.directory_path, 'corpus')
+        self.articles = [(u'article%d' % seed, synthetic.generate_bbc_raw_article(seed)) for
+                         seed in xrange(NUMBER_OF_ARTICLES)]
+        # Text of any characters, and an article without introduction and paragraphs.
+        self.articles.append((u'כתבה', BBCRawArticle(u'Tabs\tand\nnew lines', u'שלום', [u'"{}"'])))
+        self.articles.append((u'empty', BBCRawArticle(u'Header', u'', [])))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _write_articles(self, **writer_arguments):
+        with ArticleCorpusWriter(self.corpus_directory, **writer_arguments) as corpus_writer:
+            for article_id, raw_article in self.articles:
+                corpus_writer.add(article_id, raw_article)
+
+    def _get_segment_file_names(self):
+        return sorted(file_name for file_name in os.listdir(self.corpus_directory) if
+                      file_name.endswith(SEGMENT_FILE_EXTENSION))
+
+    def _check_articles(self, articles):
+        with ArticleCorpusReader(self.corpus_directory) as corpus_reader:
+            self.assertEqual(len(corpus_reader), len(articles))
+            self.assertEqual([(article_id, _get_article_fields(raw_article)) for
+                              article_id, raw_article in corpus_reader.iter_articles()],
+                             [(article_id, _get_article_fields(raw_article)) for
+                              article_id, raw_article in articles])
+            for article_id, raw_article in reversed(articles):
+                self.assertEqual(_get_article_fields(corpus_reader.get(article_id)),
+                                 _get_article_fields(raw_article))
+            self.assertNotIn(u'article%d' % NUMBER_OF_ARTICLES, corpus_reader)
+            self.assertRaises(KeyError, corpus_reader.get, u'article%d' % NUMBER_OF_ARTICLES)
+
+    def test_round_trip(self):
+        self._write_articles()
+        self._check_articles(self.articles)
+        self.assertEqual(len(self._get_segment_file_names()), 1)
+
+    def test_round_trip_with_zlib(self):
+        self._write_articles(compression='zlib')
+        self._check_articles(self.articles)
+        uncompressed_directory = self.corpus_directory
+        self.corpus_directory = os.path.join(self.directory_path, 'uncompressed')
+        self._write_articles()
+        segment_file_name, = self._get_segment_file_names()
+        self.assertLess(os.path.getsize(os.path.join(uncompressed_directory, segment_file_name)),
+                        os.path.getsize(os.path.join(self.corpus_directory, segment_file_name)))
+
+    def test_unknown_compression(self):
+        self.assertRaises(ValueError, ArticleCorpusWriter, self.corpus_directory, 'gzip')
+
+    def test_segments_roll_at_max_size(self):
+        self._write_articles(max_segment_bytes=1)
+        # A record is written to a segment below its maximal size, so each is in its own segment.
+        self.assertEqual(len(self._get_segment_file_names()), len(self.articles))
+        self._check_articles(self.articles)
+        # A reopened writer appends to the last segment while it has room.
+        with ArticleCorpusWriter(self.corpus_directory,
+                                 max_segment_bytes=2 ** 20) as corpus_writer:
+            corpus_writer.add(u'added', self.articles[0][1])
+        self.assertEqual(len(self._get_segment_file_names()), len(self.articles))
+        self._check_articles(self.articles + [(u'added', self.articles[0][1])])
+
+    def test_article_with_existing_id_is_replaced(self):
+        self._write_articles()
+        replacing_article = BBCRawArticle(u'Replaced', u'Introduction', [u'Paragraph.'])
+        with ArticleCorpusWriter(self.corpus_directory, compression='zlib') as corpus_writer:
+            corpus_writer.add(u'article0', replacing_article)
+        # Read in the order stored, where the replacing article is last.
+        self._check_articles(self.articles[1:] + [(u'article0', replacing_article)])
+
+    def test_torn_last_index_line_is_ignored(self):
+        self._write_articles()
+        with open(os.path.join(self.corpus_directory, INDEX_FILE_NAME), 'a') as index_file:
+            index_file.write('article%d\t0' % NUMBER_OF_ARTICLES)
+        self._check_articles(self.articles)
+
+    def test_convert_article_directory(self):
+        article_directory = os.path.join(self.directory_path, 'articles')
+        os.mkdir(article_directory)
+        file_paths = {}
+        for article_id, raw_article in self.articles[:NUMBER_OF_ARTICLES]:
+            file_paths[article_id] = os.path.join(article_directory, '%s.txt' % article_id)
+            raw_article.dump(file_paths[article_id])
+        with ArticleCorpusWriter(self.corpus_directory) as corpus_writer:
+            convert_article_directory(article_directory, corpus_writer)
+        with ArticleCorpusReader(self.corpus_directory) as corpus_reader:
+            self.assertEqual(sorted(corpus_reader.article_ids), sorted(file_paths))
+            for article_id, file_path in file_paths.iteritems():
+                self.assertEqual(_get_article_fields(corpus_reader.get(article_id)),
+                                 _get_article_fields(BBCRawArticle.load(file_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
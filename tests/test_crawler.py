@@ -0,0 +1,144 @@
+import re
+import threading
+import time
+import unittest
+import urlparse
+import warnings
+
+from benchmarks.local_server import LocalHttpServer
+from webcrawler.crawler import CrawlEngine, CrawlPolicy, PolitenessScheduler, UrlFrontier
+from webcrawler.fetcher import HttpFetcher
+
+_LINK_REGEX = re.compile(r'href="([^"]+)"')
+
+
+def get_links_page(*paths):
+    return '<html><body>%s</body></html>' % ''.join('<a href="%s">link</a>' % path for path in
+                                                    paths)
+
+
+class RecordingPolicy(CrawlPolicy):
+    """Follows every link, recording the crawled paths and failing on some of them."""
+
+    def __init__(self, failing_paths=()):
+        self.failing_paths = failing_paths
+        self.crawled_paths = []
+        self._lock = threading.Lock()
+
+    def handle_response(self, url, response):
+        path = urlparse.urlparse(url).path
+        if path in self.failing_paths:
+            raise ValueError('Unexpected page')
+        with self._lock:
+            self.crawled_paths.append(path)
+
+    def select_links(self, url, page_source):
+        return [(urlparse.urljoin(url, link_path), 0) for link_path in
+                _LINK_REGEX.findall(page_source)]
+
+
+class UrlFrontierTest(unittest.TestCase):
+    def test_order_by_priority_then_addition(self):
+        frontier = UrlFrontier()
+        frontier.add('http://example.com/c', priority=1)
+        frontier.add('http://example.com/a', priority=0, depth=2)
+        frontier.add('http://example.com/d', priority=1)
+        frontier.add('http://example.com/b', priority=0)
+        self.assertEqual([frontier.pop() for _ in xrange(4)],
+                         [('http://example.com/a', 2), ('http://example.com/b', 0),
+                          ('http://example.com/c', 0), ('http://example.com/d', 0)])
+        self.assertIsNone(frontier.pop())
+
+    def test_url_queued_once(self):
+        frontier = UrlFrontier()
+        self.assertTrue(frontier.add('http://example.com/page/'))
+        self.assertFalse(frontier.add('HTTP://Example.com/page#top'))
+        self.assertEqual(frontier.pop(), ('http://example.com/page', 0))
+        # Still seen after it was taken out.
+        self.assertFalse(frontier.add('http://example.com/page'))
+        self.assertEqual(len(frontier), 0)
+
+
+class PolitenessSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.fetcher = HttpFetcher(retries=0)
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def test_robots_rules(self):
+        pages = {'/robots.txt': 'User-agent: *\nDisallow: /private\n', '/': 'front'}
+        with LocalHttpServer(pages) as server:
+            scheduler = PolitenessScheduler(self.fetcher)
+            self.assertTrue(scheduler.is_allowed(server.url + '/'))
+            self.assertTrue(scheduler.is_allowed(server.url + '/public/page'))
+            self.assertFalse(scheduler.is_allowed(server.url + '/private/page'))
+            # Fetched once per domain.
+            self.assertEqual(server.request_count, 1)
+            self.assertTrue(PolitenessScheduler(self.fetcher, obey_robots=False).is_allowed(
+                server.url + '/private/page'))
+
+    def test_missing_robots_allows_everything(self):
+        with LocalHttpServer({}) as server:
+            self.assertTrue(PolitenessScheduler(self.fetcher).is_allowed(server.url + '/page'))
+
+    def test_politeness_delay_per_domain(self):
+        scheduler = PolitenessScheduler(self.fetcher, seconds_between_requests=0.2)
+        start_time = time.time()
+        for _ in xrange(3):
+            scheduler.wait_for_turn('http://example.com/page')
+        self.assertGreaterEqual(time.time() - start_time, 0.4)
+        # Another domain does not wait for the first one.
+        start_time = time.time()
+        scheduler.wait_for_turn('http://example.org/page')
+        self.assertLess(time.time() - start_time, 0.1)
+
+
+class CrawlEngineTest(unittest.TestCase):
+    PAGES = {'/': get_links_page('/a', '/private'), '/a': get_links_page('/b'),
+             '/b': get_links_page('/c'), '/c': get_links_page(),
+             '/private': get_links_page(), '/robots.txt': 'User-agent: *\nDisallow: /private\n'}
+
+    def _crawl(self, policy, max_depth, workers=1, max_urls=None):
+        fetcher = HttpFetcher(workers=workers, retries=0)
+        try:
+            with LocalHttpServer(self.PAGES) as server:
+                engine = CrawlEngine(fetcher, policy, max_depth=max_depth, max_urls=max_urls)
+                with warnings.catch_warnings(record=True) as caught_warnings:
+                    warnings.simplefilter('always')
+                    stats = engine.crawl([server.url + '/'])
+        finally:
+            fetcher.close()
+        return stats, caught_warnings, server.url
+
+    def test_depth_limit(self):
+        policy = RecordingPolicy()
+        stats, _, url = self._crawl(policy, max_depth=1)
+        self.assertEqual(policy.crawled_paths, ['/', '/a'])
+        self.assertEqual(stats.crawled_url_count, 2)
+        self.assertEqual(stats.disallowed_urls, [url + '/private'])
+        policy = RecordingPolicy()
+        self._crawl(policy, max_depth=0)
+        self.assertEqual(policy.crawled_paths, ['/'])
+        policy = RecordingPolicy()
+        self._crawl(policy, max_depth=3, workers=4)
+        self.assertEqual(sorted(policy.crawled_paths), ['/', '/a', '/b', '/c'])
+
+    def test_max_urls(self):
+        policy = RecordingPolicy()
+        stats, _, _ = self._crawl(policy, max_depth=3, max_urls=2)
+        self.assertEqual(policy.crawled_paths, ['/', '/a'])
+        self.assertEqual(stats.crawled_url_count, 2)
+
+    def test_policy_error_fails_only_its_url(self):
+        policy = RecordingPolicy(failing_paths=['/a'])
+        stats, caught_warnings, url = self._crawl(policy, max_depth=3, workers=2)
+        self.assertEqual(policy.crawled_paths, ['/'])
+        self.assertEqual(stats.crawled_url_count, 1)
+        self.assertEqual(stats.failed_urls, [url + '/a'])
+        self.assertEqual(len(caught_warnings), 1)
+        self.assertIn('Unexpected page', str(caught_warnings[0].message))
+
+
+if __name__ == '__main__':
+    unittest.main()
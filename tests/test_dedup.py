@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests.test_schedule_http import read_fixture
+from webcrawler.data_extractor import BBCNewsExtractor, FlightLandingScheduleExtractor
+from webcrawler.dedup import ExtractionDeduplicator
+from webcrawler.raw_material import BBCRawArticle
+
+ARTICLE_PARAGRAPHS = ['The council approved the new budget for the city libraries on Tuesday '
+                      'after a long debate about opening hours.',
+                      'Officials said the libraries would open on Sundays from next month, and '
+                      'that the reading rooms would be renovated over the summer.',
+                      'Residents welcomed the decision, although some asked for more computers '
+                      'and longer evening hours in the smaller branches.']
+
+
+def _get_schedule_html(flight_number):
+    """:return: The recorded schedule page, with another number of its first flight."""
+    return read_fixture('iaa_schedule_page.html').replace('>LY 008<', '>%s<' % flight_number)
+
+
+class ExtractionDeduplicatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.downloads_directory = os.path.join(self.directory_path, 'downloads')
+        self.extracted_directory = os.path.join(self.directory_path, 'extracted')
+        os.mkdir(self.downloads_directory)
+        os.mkdir(self.extracted_directory)
+        self.modification_time = 1500000000
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _write_download(self, file_name, content):
+        """Write a downloaded file, modified after the files written before."""
+        file_path = os.path.join(self.downloads_directory, file_name)
+        with open(file_path, 'w') as download_file:
+            download_file.write(content)
+        self.modification_time += 60
+        os.utime(file_path, (self.modification_time, self.modification_time))
+        return file_path
+
+    def _write_schedule_page(self, page_number, update_time, flight_number):
+        return self._write_download('flights_schedule_page%d_2017-07-14 %s:00.html' %
+                                    (page_number, update_time), _get_schedule_html(flight_number))
+
+    def _is_duplicate(self, deduplicator, file_path):
+        return deduplicator.is_duplicate(file_path, FlightLandingScheduleExtractor)
+
+    def test_schedule_page_is_compared_with_previous_snapshot(self):
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        self.assertFalse(self._is_duplicate(deduplicator,
+                                            self._write_schedule_page(1, '08:05', 'LY 001')))
+        # Only the update time changed.
+        self.assertTrue(self._is_duplicate(deduplicator,
+                                           self._write_schedule_page(1, '08:10', 'LY 001')))
+        self.assertFalse(self._is_duplicate(deduplicator,
+                                            self._write_schedule_page(1, '08:15', 'LY 002')))
+        # The page returns to its earlier landings.
+        self.assertFalse(self._is_duplicate(deduplicator,
+                                            self._write_schedule_page(1, '08:20', 'LY 001')))
+        # Another page with the same landings.
+        self.assertFalse(self._is_duplicate(deduplicator,
+                                            self._write_schedule_page(2, '08:20', 'LY 001')))
+        deduplicator.save()
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        self.assertTrue(self._is_duplicate(deduplicator,
+                                           self._write_schedule_page(1, '08:25', 'LY 001')))
+        self.assertFalse(self._is_duplicate(deduplicator,
+                                            self._write_schedule_page(2, '08:25', 'LY 002')))
+        self.assertEqual(deduplicator.stats.duplicate_file_count, 1)
+
+    def test_discarded_schedule_page(self):
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        self._is_duplicate(deduplicator, self._write_schedule_page(1, '08:05', 'LY 001'))
+        failed_file_path = self._write_schedule_page(1, '08:10', 'LY 002')
+        self.assertFalse(self._is_duplicate(deduplicator, failed_file_path))
+        deduplicator.discard(failed_file_path)
+        # The previous snapshot is the one before the discarded page.
+        self.assertTrue(self._is_duplicate(deduplicator,
+                                           self._write_schedule_page(1, '08:15', 'LY 001')))
+
+    def test_article_is_compared_with_all_articles(self):
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        article_html = '<html><body><p>%s</p></body></html>' % ARTICLE_PARAGRAPHS[0]
+        original_file_path = self._write_download('article.html', article_html)
+        self.assertFalse(deduplicator.is_duplicate(original_file_path, BBCNewsExtractor))
+        self._write_download('other.html', '<html><body><p>Other</p></body></html>')
+        copy_file_path = self._write_download('copy.html', article_html)
+        self.assertTrue(deduplicator.is_duplicate(copy_file_path, BBCNewsExtractor))
+        deduplicator.save()
+        # The content of removed downloads is forgotten.
+        os.remove(original_file_path)
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        self.assertFalse(deduplicator.is_duplicate(copy_file_path, BBCNewsExtractor))
+
+    def test_near_duplicate_saved_by_latest_download(self):
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        original_file_path = self._write_download('article.html', '')
+        first_revision_file_path = self._write_download('article-1.html', '')
+        second_revision_file_path = self._write_download('article-2.html', '')
+        original = BBCRawArticle('Libraries open on Sundays', '', ARTICLE_PARAGRAPHS)
+        first_revision = BBCRawArticle('Libraries to open on Sundays', '', ARTICLE_PARAGRAPHS)
+        second_revision = BBCRawArticle('Libraries will open on Sundays', '', ARTICLE_PARAGRAPHS)
+        self.assertEqual(deduplicator.get_saved_file_path(original_file_path, [original]),
+                         original_file_path)
+        # Extracted out of download order, as by several worker processes.
+        self.assertEqual(deduplicator.get_saved_file_path(second_revision_file_path,
+                                                          [second_revision]), original_file_path)
+        self.assertIsNone(deduplicator.get_saved_file_path(first_revision_file_path,
+                                                           [first_revision]))
+        self.assertEqual(deduplicator.stats.near_duplicate_file_count, 2)
+        deduplicator.save()
+        deduplicator = ExtractionDeduplicator(self.extracted_directory)
+        self.assertIsNone(deduplicator.get_saved_file_path(first_revision_file_path,
+                                                           [first_revision]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from benchmarks.fake_web_driver import StaticHtmlWebDriver
+from benchmarks.local_server import LocalHttpServer
+from tests.test_schedule_http import SCHEDULE_PATH, ScheduleSite
+from webcrawler.downloader import FlightLandingScheduleDownloader, _SchedulePage
+from webcrawler.driver_pool import WebDriverPool
+
+
+class _FakeWebDriver(object):
+    """Web driver which only knows whether it is open, recording whether it was quit holding the
+    lock of its pool."""
+
+    def __init__(self, executable_path=None):
+        self.pool = None
+        self.is_open = True
+        self.was_quit_holding_lock = False
+
+    @property
+    def current_url(self):
+        if not self.is_open:
+            raise WebDriverException('The driver was closed.')
+        return 'about:blank'
+
+    def quit(self):
+        if self.pool is not None:
+            self.was_quit_holding_lock = not self._can_lock_from_another_thread()
+        self.is_open = False
+
+    def _can_lock_from_another_thread(self):
+        results = []
+
+        def try_to_lock():
+            is_locked = self.pool._condition.acquire(False)
+            if is_locked:
+                self.pool._condition.release()
+            results.append(is_locked)
+
+        thread = threading.Thread(target=try_to_lock)
+        thread.start()
+        thread.join()
+        return results[0]
+
+
+class WebDriverPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WebDriverPool(None, _FakeWebDriver, size=2, max_uses=3)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def _lease(self, timeout=None):
+        driver = self.pool.lease(timeout)
+        driver.pool = self.pool
+        return driver
+
+    def test_lease_up_to_size(self):
+        first_driver = self._lease()
+        second_driver = self._lease()
+        self.assertIsNot(first_driver, second_driver)
+        self.assertEqual(self.pool.created_driver_count, 2)
+        self.assertRaises(TimeoutException, self.pool.lease, 0)
+        self.pool.release(first_driver)
+        self.assertIs(self._lease(timeout=0), first_driver)
+        self.assertEqual(self.pool.created_driver_count, 2)
+
+    def test_lease_timeout(self):
+        self._lease()
+        self._lease()
+        start_time = time.time()
+        self.assertRaises(TimeoutException, self.pool.lease, 0.2)
+        self.assertGreaterEqual(time.time() - start_time, 0.2)
+
+    def test_lease_waits_for_release(self):
+        driver = self._lease()
+        self._lease()
+        release_timer = threading.Timer(0.1, self.pool.release, [driver])
+        release_timer.start()
+        try:
+            self.assertIs(self.pool.lease(timeout=5), driver)
+        finally:
+            release_timer.join()
+
+    def test_recycle_after_max_uses(self):
+        driver = self._lease()
+        for _ in xrange(self.pool.max_uses - 1):
+            self.pool.release(driver)
+            self.assertIs(self._lease(), driver)
+        self.pool.release(driver)
+        self.assertFalse(driver.is_open)
+        self.assertFalse(driver.was_quit_holding_lock)
+        self.assertEqual(self.pool.recycled_driver_count, 1)
+        self.assertIsNot(self._lease(), driver)
+        self.assertEqual(self.pool.created_driver_count, 2)
+
+    def test_replace_closed_driver(self):
+        driver = self._lease()
+        self.pool.release(driver)
+        # The browser of the idle driver exits.
+        driver.is_open = False
+        new_driver = self._lease()
+        self.assertIsNot(new_driver, driver)
+        self.assertFalse(driver.was_quit_holding_lock)
+        self.assertEqual(self.pool.created_driver_count, 2)
+        # The closed driver does not count towards the size of the pool.
+        self._lease(timeout=0)
+
+    def test_release_closed_driver(self):
+        driver = self._lease()
+        driver.is_open = False
+        self.pool.release(driver)
+        self.assertEqual(self.pool.recycled_driver_count, 1)
+        self.assertIsNot(self._lease(), driver)
+
+    def test_double_release(self):
+        driver = self._lease()
+        self.pool.release(driver)
+        self.assertRaises(ValueError, self.pool.release, driver)
+        # The driver is idle once, so two leases do not share it.
+        self.assertIsNot(self._lease(), self._lease())
+
+    def test_release_driver_of_another_pool(self):
+        self.assertRaises(ValueError, self.pool.release, _FakeWebDriver())
+
+    def test_close_with_leased_drivers(self):
+        idle_driver = self._lease()
+        leased_driver = self._lease()
+        self.pool.release(idle_driver)
+        self.pool.close()
+        self.assertFalse(idle_driver.is_open)
+        self.assertFalse(idle_driver.was_quit_holding_lock)
+        self.assertTrue(leased_driver.is_open)
+        self.assertRaises(WebDriverException, self.pool.lease, 0)
+        self.pool.release(leased_driver)
+        self.assertFalse(leased_driver.is_open)
+        self.assertFalse(leased_driver.was_quit_holding_lock)
+
+    def test_close_wakes_waiting_lease(self):
+        self._lease()
+        self._lease()
+        close_timer = threading.Timer(0.1, self.pool.close)
+        close_timer.start()
+        try:
+            self.assertRaises(WebDriverException, self.pool.lease, 5)
+        finally:
+            close_timer.join()
+
+
+class BrowserScheduleDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.download_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.download_directory)
+
+    def _download(self, site, driver_pool=None):
+        with LocalHttpServer(site) as server:
+            downloader = FlightLandingScheduleDownloader(self.download_directory, None,
+                                                         StaticHtmlWebDriver, use_http=False,
+                                                         driver_pool=driver_pool)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            downloader.download_data()
+        return downloader
+
+    def _get_written_update_times(self):
+        """:return: Page number, update time in the file name and in the page of every file."""
+        written_update_times = []
+        for file_name in os.listdir(self.download_directory):
+            page_number, update_time = re.search(r'page(\d)_.* (\d\d:\d\d):00\.html$',
+                                                 file_name).groups()
+            with open(os.path.join(self.download_directory, file_name)) as page_file:
+                page_update_time = _SchedulePage(file_name, page_file.read()).update_time
+            written_update_times.append((int(page_number), update_time,
+                                         page_update_time.strftime('%H:%M')))
+        return sorted(written_update_times)
+
+    def _assert_pages_of_update_written(self, update_time):
+        self.assertEqual(self._get_written_update_times(),
+                         [(page_number, update_time, update_time) for page_number in
+                          xrange(1, FlightLandingScheduleDownloader.
+                                 NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD + 1)])
+
+    def test_pooled_pages_of_another_update_are_downloaded_again(self):
+        site = ScheduleSite()
+        # The schedule is updated after the first page was loaded, before the pooled driver loads
+        # it again.
+        site.update_times = ['08:05', '08:10']
+        with WebDriverPool(None, StaticHtmlWebDriver, size=3) as driver_pool:
+            downloader = self._download(site, driver_pool)
+        self.assertEqual(downloader.last_schedule_update_time.minute, 10)
+        self._assert_pages_of_update_written('08:10')
+
+    def test_pages_of_another_update_are_downloaded_again(self):
+        site = ScheduleSite()
+        site.update_times = ['08:05', '08:10']
+        downloader = self._download(site)
+        self.assertEqual(downloader.last_schedule_update_time.minute, 10)
+        self._assert_pages_of_update_written('08:10')
+
+    def test_pages_of_other_updates_in_every_attempt(self):
+        site = ScheduleSite()
+        site.update_times = ['08:%02d' % minute for minute in xrange(0, 60, 5)]
+        self.assertRaises(ValueError, self._download, site)
+        self.assertEqual(os.listdir(self.download_directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from benchmarks import synthetic
+from webcrawler import utils
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.extraction import extract_directory
+
+NUMBER_OF_ARTICLES = 5
+BROKEN_FILE_NAME = 'article2.html'
+
+
+class ExtractDirectoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.source_directory = os.path.join(self.directory_path, 'downloads')
+        self.destination_directory = os.path.join(self.directory_path, 'raw_material')
+        os.mkdir(self.source_directory)
+        os.mkdir(self.destination_directory)
+        for seed in xrange(NUMBER_OF_ARTICLES):
+            page_html = synthetic.generate_bbc_article_html(seed)
+            if 'article%d.html' % seed == BROKEN_FILE_NAME:
+                page_html = '<html><body>Not an article</body></html>'
+            with open(os.path.join(self.source_directory, 'article%d.html' % seed),
+                      'w') as page_file:
+                page_file.write(page_html)
+        self.broken_file_path = os.path.join(self.source_directory, BROKEN_FILE_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _extract(self, **extraction_arguments):
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter('always')
+            report = extract_directory(BBCNewsExtractor, self.source_directory,
+                                       self.destination_directory, workers=2, chunk_size=1,
+                                       **extraction_arguments)
+        return report, [str(warning.message) for warning in caught_warnings]
+
+    def test_failing_file_is_reported_and_skipped(self):
+        report, warning_messages = self._extract()
+        self.assertEqual(report.extracted_file_count, NUMBER_OF_ARTICLES - 1)
+        self.assertEqual(report.failed_files.keys(), [self.broken_file_path])
+        self.assertIn('AttributeError', report.failed_files[self.broken_file_path])
+        self.assertEqual(len(warning_messages), 1)
+        self.assertIn('Could not extract %s' % self.broken_file_path, warning_messages[0])
+        self.assertEqual(len(utils.list_directory_files(self.destination_directory)),
+                         NUMBER_OF_ARTICLES - 1)
+        # The failed file is not recorded, so it is extracted again by the next extraction.
+        report, _ = self._extract()
+        self.assertEqual((report.skipped_file_count, report.failed_files.keys()),
+                         (NUMBER_OF_ARTICLES - 1, [self.broken_file_path]))
+
+    def test_failing_writer_skips_only_its_file(self):
+        written_file_paths = []
+
+        def write(downloaded_file_path, raw_materials, destination_directory):
+            if downloaded_file_path.endswith('article0.html'):
+                raise IOError('Disk full')
+            written_file_paths.append(downloaded_file_path)
+
+        report, warning_messages = self._extract(writer=write, incremental=False)
+        self.assertEqual(sorted(report.failed_files),
+                         [os.path.join(self.source_directory, 'article0.html'),
+                          self.broken_file_path])
+        self.assertEqual(len(written_file_paths), NUMBER_OF_ARTICLES - 2)
+        self.assertEqual(report.extracted_file_count, NUMBER_OF_ARTICLES - 2)
+        self.assertEqual(len(warning_messages), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import synthetic
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.extraction import extract_directory
+from webcrawler.extraction_cache import ParsedFileCache, parsed_file_cache
+
+NUMBER_OF_ARTICLES = 3
+
+
+class ParsedFileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.source_directory = os.path.join(self.directory_path, 'downloads')
+        os.mkdir(self.source_directory)
+        for seed in xrange(NUMBER_OF_ARTICLES):
+            with open(os.path.join(self.source_directory, 'article%d.html' % seed),
+                      'w') as page_file:
+                page_file.write(synthetic.generate_bbc_article_html(seed))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _extract(self, workers, parsed_file_cache=None):
+        destination_directory = tempfile.mkdtemp(dir=self.directory_path)
+        report = extract_directory(BBCNewsExtractor, self.source_directory,
+                                   destination_directory, workers=workers, incremental=False,
+                                   parsed_file_cache=parsed_file_cache)
+        self.assertEqual(report.extracted_file_count, NUMBER_OF_ARTICLES)
+
+    def test_opt_in(self):
+        file_path = os.path.join(self.source_directory, 'article0.html')
+        self.assertIsNone(BBCNewsExtractor(file_path).cache)
+        parsed_file_cache.clear()
+        self._extract(workers=1)
+        self.assertEqual(len(parsed_file_cache), 0)
+
+    def test_extract_directory_with_cache(self):
+        cache = ParsedFileCache()
+        self._extract(workers=1, parsed_file_cache=cache)
+        self.assertEqual((cache.hit_count, cache.miss_count), (0, 2 * NUMBER_OF_ARTICLES))
+        self._extract(workers=1, parsed_file_cache=cache)
+        self.assertEqual(cache.hit_count, NUMBER_OF_ARTICLES)
+        # Not used by worker processes.
+        self._extract(workers=2, parsed_file_cache=cache)
+        self.assertEqual(cache.hit_count, NUMBER_OF_ARTICLES)
+
+
+if __name__ == '__main__':
+    unittest.main()
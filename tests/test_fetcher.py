@@ -0,0 +1,92 @@
+import threading
+import time
+import unittest
+
+import requests
+
+from benchmarks.local_server import LocalHttpServer
+from webcrawler.fetcher import HttpFetcher
+
+NUMBER_OF_PAGES = 8
+
+
+class HttpFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.fetcher = HttpFetcher(workers=4, max_connections_per_host=2, retries=2,
+                                   backoff_seconds=0.01)
+        # Responses left to fail by page path.
+        self.failure_counts = {}
+        self.active_request_count = 0
+        self.max_active_request_count = 0
+        self._lock = threading.Lock()
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def _get_page(self, path, form_fields):
+        """Page of a path like /<number>, served more slowly for lower numbers."""
+        with self._lock:
+            self.active_request_count += 1
+            self.max_active_request_count = max(self.max_active_request_count,
+                                                self.active_request_count)
+            failure_count = self.failure_counts.get(path, 0)
+            self.failure_counts[path] = failure_count - 1
+        try:
+            if failure_count > 0:
+                return 503
+            if path == '/missing':
+                return None
+            time.sleep(0.01 * (NUMBER_OF_PAGES - int(path[1:])))
+            return 'Page %s' % path
+        finally:
+            with self._lock:
+                self.active_request_count -= 1
+
+    def test_server_errors_are_retried(self):
+        self.failure_counts = {'/1': 2, '/2': 3}
+        with LocalHttpServer(self._get_page) as server:
+            response = self.fetcher.fetch(server.url + '/1')
+            self.assertEqual((response.status_code, response.content), (200, 'Page /1'))
+            self.assertEqual(server.request_count, 3)
+            # The last response is returned once the retries are exhausted.
+            self.assertEqual(self.fetcher.fetch(server.url + '/2').status_code, 503)
+            self.assertEqual(server.request_count, 6)
+            # Other errors are not retried.
+            self.assertEqual(self.fetcher.fetch(server.url + '/missing').status_code, 404)
+            self.assertEqual(server.request_count, 7)
+
+    def test_connection_errors_are_retried_and_raised(self):
+        with LocalHttpServer(self._get_page) as server:
+            url = server.url + '/1'
+        start_time = time.time()
+        self.assertRaises(requests.ConnectionError, self.fetcher.fetch, url)
+        # Waited before each retry, doubling the wait.
+        self.assertGreaterEqual(time.time() - start_time, 0.03)
+
+    def test_concurrent_requests_per_host_are_bounded(self):
+        with LocalHttpServer(self._get_page) as server:
+            responses = self.fetcher.map(self.fetcher.fetch, ['%s/%d' % (server.url, page_number)
+                                                              for page_number in
+                                                              xrange(NUMBER_OF_PAGES)])
+        self.assertEqual([response.status_code for response in responses],
+                         [200] * NUMBER_OF_PAGES)
+        self.assertEqual(self.max_active_request_count, 2)
+
+    def test_map_keeps_order_and_reports_each_failure(self):
+        def fetch_content(url):
+            response = self.fetcher.fetch(url)
+            response.raise_for_status()
+            return response.content
+
+        # Later pages are served first.
+        with LocalHttpServer(self._get_page) as server:
+            urls = ['%s/%d' % (server.url, page_number) for page_number in xrange(3)]
+            urls.insert(1, server.url + '/missing')
+            results = self.fetcher.map(fetch_content, urls, return_exceptions=True)
+            self.assertRaises(requests.HTTPError, self.fetcher.map, fetch_content, urls)
+        self.assertEqual([results[0]] + results[2:], ['Page /0', 'Page /1', 'Page /2'])
+        self.assertIsInstance(results[1], requests.HTTPError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# coding=utf-8
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from webcrawler import flight_events
+from webcrawler.flight_events import FlightEventLog, FlightEventRecorder, FlightStateTracker
+from webcrawler.raw_material import FlightLandingUpdate
+
+FIRST_DAY = datetime.datetime(2018, 1, 1)
+
+
+def _get_landing_update(schedule_update_time, flight_number, planned_time, status=u'לא סופי'):
+    return FlightLandingUpdate(schedule_update_time, u'EL AL', flight_number, u'PARIS',
+                               planned_time, '', 3, status)
+
+
+def _get_flight_states(landing_updates):
+    return sorted((landing_update.flight_number, landing_update.flight_date,
+                   landing_update.planned_time, landing_update.status) for landing_update in
+                  landing_updates)
+
+
+def _get_event_summaries(events):
+    return [(event.event_type, event.flight_number, event.flight_date) for event in events]
+
+
+def _get_daily_snapshots(day_count):
+    """
+    :return: Snapshots of every 6 hours of a schedule with the same two flights every day, each in
+        the schedule from 6 hours before its landing to 6 hours after it, while it is not empty.
+    """
+    snapshots = []
+    for hours in xrange(0, 24 * day_count, 6):
+        snapshot_time = FIRST_DAY + datetime.timedelta(hours=hours)
+        snapshot = [_get_landing_update(snapshot_time, flight_number, planned_time) for
+                    flight_number, planned_time in ((u'LY 008', '10:00'), (u'LY 010', '20:00')) if
+                    abs(hours % 24 - int(planned_time[:2])) <= 6]
+        if snapshot:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+class FlightDateTest(unittest.TestCase):
+    def test_flight_date(self):
+        update_time = datetime.datetime(2018, 1, 1, 22, 30)
+        self.assertEqual(_get_landing_update(update_time, u'LY 008', '23:50').flight_date,
+                         datetime.date(2018, 1, 1))
+        self.assertEqual(_get_landing_update(update_time, u'LY 008', '00:20').flight_date,
+                         datetime.date(2018, 1, 2))
+        update_time = datetime.datetime(2018, 1, 2, 1, 30)
+        self.assertEqual(_get_landing_update(update_time, u'LY 008', '23:50').flight_date,
+                         datetime.date(2018, 1, 1))
+        self.assertEqual(_get_landing_update(update_time, u'LY 008', u' 00:20 ').flight_date,
+                         datetime.date(2018, 1, 2))
+        self.assertEqual(_get_landing_update(update_time, u'LY 008', '').flight_date,
+                         datetime.date(2018, 1, 2))
+
+
+class FlightStateTrackerTest(unittest.TestCase):
+    def test_same_flight_number_on_several_days(self):
+        tracker = FlightStateTracker()
+        events = []
+        for snapshot in _get_daily_snapshots(2):
+            events.extend(tracker.diff_snapshot(snapshot))
+        self.assertEqual(_get_event_summaries(events), [
+            ('new_flight', u'LY 008', '2018-01-01'),
+            ('new_flight', u'LY 010', '2018-01-01'),
+            ('removed_flight', u'LY 008', '2018-01-01'),
+            ('new_flight', u'LY 008', '2018-01-02'),
+            ('removed_flight', u'LY 010', '2018-01-01'),
+            ('new_flight', u'LY 010', '2018-01-02'),
+            ('removed_flight', u'LY 008', '2018-01-02')])
+        self.assertEqual([event.time for event in events if
+                          event.event_type == flight_events.REMOVED_FLIGHT_EVENT],
+                         [FIRST_DAY + datetime.timedelta(hours=hours) for hours in (18, 30, 42)])
+        self.assertEqual(len(tracker), 1)
+
+    def test_changes_are_tracked_per_day(self):
+        tracker = FlightStateTracker()
+        first_time = FIRST_DAY + datetime.timedelta(hours=23)
+        tracker.diff([_get_landing_update(first_time, u'LY 008', '22:00', u'נחתה')])
+        second_time = first_time + datetime.timedelta(minutes=10)
+        events = tracker.diff([_get_landing_update(second_time, u'LY 008', '22:00', u'נחתה'),
+                               _get_landing_update(second_time, u'LY 008', '00:05')])
+        # The flight of the next day is another flight, not a change of the landed flight.
+        self.assertEqual(_get_event_summaries(events), [('new_flight', u'LY 008', '2018-01-02')])
+        self.assertEqual(len(tracker), 2)
+
+
+class FlightEventRecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.log_file_path = os.path.join(self.directory_path, 'events.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def test_state_at_time(self):
+        snapshots = _get_daily_snapshots(3)
+        recorder = FlightEventRecorder(self.log_file_path)
+        for snapshot in snapshots:
+            recorder.add_snapshot(snapshot)
+        log = FlightEventLog(self.log_file_path)
+        for snapshot in snapshots:
+            self.assertEqual(_get_flight_states(log.get_state_at(snapshot[0].schedule_update_time)),
+                             _get_flight_states(snapshot))
+        # The recorder continues from the state in the log.
+        recorder = FlightEventRecorder(self.log_file_path)
+        self.assertEqual(recorder.add_snapshot(snapshots[-1]), [])
+
+    def test_flights_removed_from_pages(self):
+        recorder = FlightEventRecorder(self.log_file_path)
+        first_time = FIRST_DAY + datetime.timedelta(hours=10)
+        recorder.add_page('page1', [_get_landing_update(first_time, u'LY 001', '10:00'),
+                                    _get_landing_update(first_time, u'LY 002', '10:10')])
+        recorder.add_page('page2', [_get_landing_update(first_time, u'LY 003', '10:20'),
+                                    _get_landing_update(first_time, u'LY 004', '10:30')])
+        # LY 001 left the schedule and LY 003 moved to the first page. The second page did not
+        # change, so it was not downloaded again.
+        second_time = first_time + datetime.timedelta(minutes=5)
+        recorder.add_page('page1', [_get_landing_update(second_time, u'LY 002', '10:10'),
+                                    _get_landing_update(second_time, u'LY 003', '10:20')])
+        self.assertEqual(recorder.flush(), [flight_events.FlightEvent(
+            flight_events.common.datetime_to_timestamp(second_time),
+            flight_events.REMOVED_FLIGHT_EVENT, u'LY 001', {}, '2018-01-01')])
+        third_time = second_time + datetime.timedelta(minutes=5)
+        recorder.add_page('page1', [_get_landing_update(third_time, u'LY 002', '10:10'),
+                                    _get_landing_update(third_time, u'LY 004', '10:30')])
+        events = recorder.add_page('page2', [_get_landing_update(third_time, u'LY 003', '10:20'),
+                                             _get_landing_update(third_time, u'LY 005', '10:40')])
+        self.assertEqual(_get_event_summaries(events), [('new_flight', u'LY 005', '2018-01-01')])
+        # LY 004 left the schedule, after it left the second page for the first.
+        recorder.add_page('page1', [_get_landing_update(
+            third_time + datetime.timedelta(minutes=5), u'LY 002', '10:10')])
+        self.assertEqual(_get_event_summaries(recorder.flush()), [('removed_flight', u'LY 004',
+                                                                   '2018-01-01')])
+        self.assertEqual(_get_flight_states(FlightEventLog(self.log_file_path).get_state_at()),
+                         [(flight_number, datetime.date(2018, 1, 1), planned_time, u'לא סופי') for
+                          flight_number, planned_time in ((u'LY 002', '10:10'),
+                                                          (u'LY 003', '10:20'),
+                                                          (u'LY 005', '10:40'))])
+
+    def test_events_without_flight_date(self):
+        with open(self.log_file_path, 'w') as log_file:
+            log_file.write('[1514800800,"new_flight","LY 008",{"company":"EL AL","from":"PARIS",'
+                           '"planned_time":"10:00","updated_time":"","terminal":3,'
+                           '"status":"final"}]\n')
+        self.assertEqual(_get_flight_states(FlightEventLog(self.log_file_path).get_state_at()),
+                         [(u'LY 008', datetime.date(2018, 1, 1), '10:00', 'final')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+
+from benchmarks.fake_web_driver import StaticHtmlWebDriver
+from benchmarks.local_server import LocalHttpServer
+from benchmarks.schedule_site import SCHEDULE_PATH, FlightScheduleSite
+from webcrawler.downloader import FlightLandingScheduleDownloader
+
+SECONDS_BETWEEN_UPDATES = 1.0
+NUMBER_OF_UPDATES = 6
+# Part of an update period passed when polling starts.
+START_PHASE = 0.6
+# Latency allowed after the first updates, well below the start phase, with time for the local
+# requests of all pages.
+MAX_LATENCY_SECONDS = 0.4
+_SCHEDULE_FILE_NAME_REGEX = re.compile(r'page1_.* (\d\d):(\d\d):\d\d\.html$')
+
+
+class _FastScheduleDownloader(FlightLandingScheduleDownloader):
+    SECONDS_BETWEEN_SCHEDULE_UPDATES = SECONDS_BETWEEN_UPDATES
+    SECONDS_BETWEEN_PAGE_CHECKS = 0.01
+    MIN_SECONDS_BETWEEN_PAGE_RELOADS = 0.01
+    MAX_SECONDS_BETWEEN_PAGE_RELOADS = 0.1
+
+
+class ScheduleUpdatePollingTest(unittest.TestCase):
+    def setUp(self):
+        self.download_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.download_directory)
+
+    def _get_update_latencies(self, site):
+        """:return: Seconds from the publication of every update to its first page written."""
+        latencies = {}
+        for file_name in os.listdir(self.download_directory):
+            match = _SCHEDULE_FILE_NAME_REGEX.search(file_name)
+            if match is not None:
+                update_index = site.get_update_index(site.first_update_time.replace(
+                    hour=int(match.group(1)), minute=int(match.group(2))))
+                latencies[update_index] = os.path.getmtime(
+                    os.path.join(self.download_directory, file_name)) - \
+                    site.get_update_publish_time(update_index)
+        return [latencies[update_index] for update_index in sorted(latencies)]
+
+    def _poll_out_of_phase(self, use_http):
+        site = FlightScheduleSite(SECONDS_BETWEEN_UPDATES)
+        with LocalHttpServer(site) as server:
+            downloader = _FastScheduleDownloader(self.download_directory, None,
+                                                 StaticHtmlWebDriver, use_http=use_http)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            time.sleep(START_PHASE * SECONDS_BETWEEN_UPDATES)
+            downloader.download_data_perpetually(max_updates=NUMBER_OF_UPDATES)
+        latencies = self._get_update_latencies(site)
+        self.assertEqual(len(latencies), NUMBER_OF_UPDATES)
+        # The first update is seen when polling starts, the next ones soon after they are published
+        # however late in the update period polling started.
+        self.assertGreaterEqual(latencies[0], START_PHASE * SECONDS_BETWEEN_UPDATES)
+        self.assertLess(max(latencies[2:]), MAX_LATENCY_SECONDS)
+
+    def test_browser_polling_is_not_delayed_by_start_phase(self):
+        self._poll_out_of_phase(use_http=False)
+
+    def test_http_polling_is_not_delayed_by_start_phase(self):
+        self._poll_out_of_phase(use_http=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
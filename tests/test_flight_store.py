@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import datetime
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from webcrawler import flight_analytics
+from webcrawler.flight_store import FlightUpdateColumns, FlightUpdateStore
+from webcrawler.raw_material import FlightLandingUpdate
+
+
+def _landing_update(flight_number, planned_time, updated_time, minute=0):
+    return FlightLandingUpdate(datetime.datetime(2018, 1, 1, 8, minute), u'EL AL', flight_number,
+                               u'PARIS', planned_time, updated_time, 3, u'LANDED')
+
+
+class FlightUpdateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.store = FlightUpdateStore(self.directory_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _read_landing_updates(self):
+        columns = self.store.read_columns()
+        return columns.to_landing_updates(xrange(len(columns)))
+
+    def test_round_trip(self):
+        landing_updates = [_landing_update(u'LY001', u'08:15', u'08:40'),
+                           _landing_update(u'LY002', u'23:59', u'', minute=5)]
+        self.store.append(landing_updates)
+        self.assertEqual([update.to_dict() for update in self._read_landing_updates()],
+                         [update.to_dict() for update in landing_updates])
+
+    def test_other_time_values_of_several_segments(self):
+        # The second segment's codes of 'A' and 'B' are swapped in the store, and must not be
+        # swapped back.
+        self.store.append([_landing_update(u'LY001', u'B', u'08:00')])
+        self.store.append([_landing_update(u'LY002', u'A', u'B')])
+        self.store.append([_landing_update(u'LY003', u'C', u'A')])
+        self.assertEqual([(update.planned_time, update.updated_time) for update in
+                          self._read_landing_updates()],
+                         [(u'B', u'08:00'), (u'A', u'B'), (u'C', u'A')])
+
+    def test_compact_keeps_other_time_values(self):
+        self.store.append([_landing_update(u'LY001', u'B', u'08:00')])
+        self.store.append([_landing_update(u'LY002', u'A', u'B')])
+        self.store.compact()
+        self.assertEqual(len(self.store.segment_paths), 1)
+        self.assertEqual([(update.planned_time, update.updated_time) for update in
+                          self._read_landing_updates()], [(u'B', u'08:00'), (u'A', u'B')])
+
+
+class FlightUpdateColumnsTest(unittest.TestCase):
+    @staticmethod
+    def _landing_update(update_time, flight_number, planned_time, updated_time, status):
+        return FlightLandingUpdate(update_time, u'EL AL', flight_number, u'PARIS', planned_time,
+                                   updated_time, 3, status)
+
+    def setUp(self):
+        # LY001 lands every evening; its update after midnight is of the flight of the day before.
+        self.landing_updates = [
+            self._landing_update(datetime.datetime(2018, 1, 1, 20), u'LY001', u'23:50', u'23:50',
+                                 u'סופי'),
+            self._landing_update(datetime.datetime(2018, 1, 2, 0, 30), u'LY001', u'23:50',
+                                 u'00:20', u'נחתה'),
+            self._landing_update(datetime.datetime(2018, 1, 2, 20), u'LY001', u'23:50', u'23:55',
+                                 u'עיכוב'),
+            self._landing_update(datetime.datetime(2018, 1, 2, 21), u'LY001', u'23:50', u'23:50',
+                                 u'בזמן'),
+            self._landing_update(datetime.datetime(2018, 1, 2, 21), u'LY002', u'לא ידוע', u'',
+                                 u'מבוטלת')]
+        self.columns = FlightUpdateColumns.from_landing_updates(self.landing_updates)
+
+    def test_flight_days(self):
+        self.assertEqual([datetime.date(1970, 1, 1) + datetime.timedelta(int(day)) for day in
+                          self.columns.flight_days()],
+                         [landing_update.flight_date for landing_update in self.landing_updates])
+
+    def test_latest_per_flight_and_date(self):
+        self.assertEqual(list(self.columns.latest_per_flight()), [1, 3, 4])
+        self.assertEqual(list(self.columns.latest_per_flight(per_date=False)), [3, 4])
+        self.assertEqual(list(self.columns.order_by_flight(numpy.array([3, 1, 2, 0]))), [0, 1, 2, 3])
+
+    def test_punctuality_of_every_date(self):
+        # Canceled and unknown flights are not counted.
+        self.assertEqual(flight_analytics.punctuality_by(self.columns, 'flight_number'),
+                         {u'LY001': (2, 0.5, 15.0)})
+
+    def test_status_transitions_within_flights(self):
+        self.assertEqual(flight_analytics.status_transitions(self.columns),
+                         {(flight_analytics.FINAL_STATUS, flight_analytics.LANDED_STATUS): 1,
+                          (flight_analytics.DELAYED_STATUS, flight_analytics.ON_TIME_STATUS): 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from webcrawler import analyzers
+from webcrawler.index import InvertedIndex
+from webcrawler.raw_material import BBCRawArticle
+
+ARTICLES = {
+    'minister.txt': BBCRawArticle(u'Prime minister visits', u'The prime minister arrived.',
+                                  [u'Talks about climate and ministers.']),
+    'talks.txt': BBCRawArticle(u'Climate talks', u'Talks resumed in Bonn.',
+                               [u'The administration said nothing.']),
+    'sport.txt': BBCRawArticle(u'Football', u'A late goal.', [u'The crowd cheered.']),
+}
+
+
+class InvertedIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        for file_name, article in ARTICLES.iteritems():
+            article.dump(os.path.join(self.directory_path, file_name))
+        self.index = InvertedIndex(self.directory_path, BBCRawArticle)
+        self.index.update()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _get_candidate_file_names(self, text):
+        return sorted(os.path.basename(file_path) for file_path in
+                      self.index.get_candidate_file_paths(text))
+
+    def test_partial_terms(self):
+        # Inside a term.
+        self.assertEqual(self._get_candidate_file_names('inist'), ['minister.txt', 'talks.txt'])
+        self.assertEqual(self._get_candidate_file_names('ROW'), ['sport.txt'])
+        self.assertEqual(self._get_candidate_file_names('lim'), ['minister.txt', 'talks.txt'])
+        self.assertEqual(self._get_candidate_file_names('xylophone'), [])
+        # The first term may end a term and the last may start one.
+        self.assertEqual(self._get_candidate_file_names('ime minis'), ['minister.txt'])
+        self.assertEqual(self._get_candidate_file_names('and ministers'), ['minister.txt'])
+        self.assertEqual(self._get_candidate_file_names('prime minister arrived'),
+                         ['minister.txt'])
+        # Terms in the middle must match exactly.
+        self.assertEqual(self._get_candidate_file_names('the prim minister'), [])
+        self.assertIsNone(self.index.get_candidate_file_paths(u'...'))
+
+    def test_partial_terms_after_update(self):
+        self.assertEqual(self._get_candidate_file_names('oal'), ['sport.txt'])
+        BBCRawArticle(u'Elections', u'The coalition won.', []).dump(
+            os.path.join(self.directory_path, 'elections.txt'))
+        self.index.update()
+        self.assertEqual(self._get_candidate_file_names('oal'), ['elections.txt', 'sport.txt'])
+        self.assertEqual(self._get_candidate_file_names('the coal'), ['elections.txt'])
+
+
+class IndexedSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        for file_name, article in ARTICLES.iteritems():
+            article.dump(os.path.join(self.directory_path, file_name))
+        analyzers.index_material_directory(BBCRawArticle, self.directory_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _search(self, text):
+        return sorted(os.path.basename(file_path) for file_path in
+                      analyzers.search_for_text_in_material_directory(BBCRawArticle,
+                                                                      self.directory_path, text))
+
+    def test_file_rewritten_without_directory_change(self):
+        self.assertEqual(self._search('football'), ['sport.txt'])
+        directory_stat = os.stat(self.directory_path)
+        file_path = os.path.join(self.directory_path, 'talks.txt')
+        with open(file_path, 'r+') as article_file:
+            content = article_file.read().replace('Climate', 'Footbal')
+            article_file.seek(0)
+            article_file.write(content)
+        # Rewritten in place within the resolution of the directory's modification time.
+        os.utime(self.directory_path, (directory_stat.st_atime, directory_stat.st_mtime))
+        self.assertEqual(self._search('footbal'), ['sport.txt', 'talks.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
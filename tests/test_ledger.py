@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.ledger import ExtractionLedger
+
+
+class NewerBBCNewsExtractor(BBCNewsExtractor):
+    VERSION = BBCNewsExtractor.VERSION + 1
+
+
+class ExtractionLedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory_path, 'article.html')
+        self._write_file('<p>An article</p>')
+        self.ledger = ExtractionLedger(self.directory_path)
+        self.assertTrue(self.ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+        self.ledger.record_extraction(self.file_path, BBCNewsExtractor)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _write_file(self, content, modification_time=1000000000):
+        with open(self.file_path, 'w') as written_file:
+            written_file.write(content)
+        os.utime(self.file_path, (modification_time, modification_time))
+
+    def test_unchanged_file_is_skipped(self):
+        self.assertFalse(self.ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+        # Touched without changing its content.
+        self._write_file('<p>An article</p>', modification_time=1000000100)
+        self.assertFalse(self.ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+
+    def test_changed_file_is_extracted(self):
+        # Another content of the same size, found by its hash.
+        self._write_file('<p>An ARTICLE</p>', modification_time=1000000100)
+        self.assertTrue(self.ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+        self._write_file('<p>A longer article</p>')
+        self.assertTrue(self.ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+        self.ledger.record_extraction(self.file_path, BBCNewsExtractor)
+        self.assertFalse(self.ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+
+    def test_file_of_another_extractor_version_is_extracted(self):
+        self.assertTrue(self.ledger.needs_extraction(self.file_path, NewerBBCNewsExtractor))
+
+    def test_saved_ledger_is_loaded(self):
+        self.ledger.save()
+        # Without a temporary file left behind.
+        self.assertEqual(sorted(os.listdir(self.directory_path)),
+                         [ExtractionLedger.FILE_NAME, 'article.html'])
+        loaded_ledger = ExtractionLedger(self.directory_path)
+        self.assertEqual(len(loaded_ledger), 1)
+        self.assertFalse(loaded_ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+        self._write_file('<p>A longer article</p>')
+        self.assertTrue(loaded_ledger.needs_extraction(self.file_path, BBCNewsExtractor))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from webcrawler.downloader import DataDownloader
+from webcrawler.manifest import DownloadManifest
+
+URL = 'http://www.bbc.com/news/world-1'
+VALIDATORS = {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2018 10:00:00 GMT'}
+
+
+class StubResponse(object):
+    def __init__(self, status_code, content='', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+class StubFetcher(object):
+    """Responds with given responses, keeping the headers of the requests."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.request_headers = []
+
+    def fetch(self, url, headers=None):
+        self.request_headers.append(headers)
+        return self.responses.pop(0)
+
+
+class StubDownloader(DataDownloader):
+    def download_data(self):
+        pass
+
+
+class DownloadManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.download_directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.download_directory, 'world-1.html')
+
+    def tearDown(self):
+        shutil.rmtree(self.download_directory)
+
+    def _download(self, *responses):
+        """:return: Whether the file was written, and the headers of the requests."""
+        downloader = StubDownloader(self.download_directory)
+        downloader.manifest.start_run()
+        fetcher = StubFetcher(responses)
+        is_written = downloader._download_file(fetcher, URL, self.file_path)
+        downloader.manifest.save()
+        return is_written, fetcher.request_headers
+
+    def _read_file(self):
+        with open(self.file_path) as downloaded_file:
+            return downloaded_file.read()
+
+    def test_missing_manifest_file(self):
+        manifest = DownloadManifest(self.download_directory)
+        self.assertEqual(manifest.run_number, 0)
+        self.assertIsNone(manifest.get_entry(URL))
+        self.assertEqual(manifest.get_conditional_headers(URL), {})
+        self.assertFalse(manifest.is_unchanged(URL, 'hash'))
+        self.assertEqual(manifest.changed_since(0), [])
+
+    def test_download_with_validators(self):
+        self.assertEqual(self._download(StubResponse(200, 'first', VALIDATORS)), (True, [{}]))
+        self.assertEqual(self._read_file(), 'first')
+        manifest = DownloadManifest(self.download_directory)
+        self.assertEqual(manifest.run_number, 1)
+        self.assertEqual(manifest.get_conditional_headers(URL),
+                         {'If-None-Match': '"v1"',
+                          'If-Modified-Since': 'Mon, 01 Jan 2018 10:00:00 GMT'})
+        self.assertEqual(manifest.changed_since(0), [self.file_path])
+        # Changed content is written.
+        self.assertTrue(self._download(StubResponse(200, 'second', {'ETag': '"v2"'}))[0])
+        self.assertEqual(self._read_file(), 'second')
+        manifest = DownloadManifest(self.download_directory)
+        self.assertEqual(manifest.get_conditional_headers(URL), {'If-None-Match': '"v2"'})
+        self.assertEqual(manifest.changed_since(1), [self.file_path])
+
+    def test_not_modified(self):
+        self._download(StubResponse(200, 'first', VALIDATORS))
+        fetch_time = DownloadManifest(self.download_directory).get_entry(URL)['fetch_time']
+        is_written, request_headers = self._download(StubResponse(304))
+        self.assertFalse(is_written)
+        self.assertEqual(request_headers[0]['If-None-Match'], '"v1"')
+        self.assertEqual(self._read_file(), 'first')
+        manifest = DownloadManifest(self.download_directory)
+        self.assertGreaterEqual(manifest.get_entry(URL)['fetch_time'], fetch_time)
+        self.assertEqual(manifest.changed_since(1), [])
+
+    def test_unchanged_content_without_validators(self):
+        self._download(StubResponse(200, 'first'))
+        os.utime(self.file_path, (0, 0))
+        self.assertEqual(self._download(StubResponse(200, 'first')), (False, [{}]))
+        self.assertEqual(os.path.getmtime(self.file_path), 0)
+        self.assertEqual(DownloadManifest(self.download_directory).changed_since(1), [])
+
+    def test_removed_file_is_downloaded_again(self):
+        self._download(StubResponse(200, 'first', VALIDATORS))
+        os.remove(self.file_path)
+        # Without conditional headers, since the file must be written again.
+        self.assertEqual(self._download(StubResponse(200, 'first', VALIDATORS)), (True, [{}]))
+        self.assertEqual(self._read_file(), 'first')
+
+    def test_error_response_is_not_recorded(self):
+        self.assertRaises(requests.HTTPError, self._download, StubResponse(500))
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertIsNone(DownloadManifest(self.download_directory).get_entry(URL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from webcrawler.metrics import MetricsRegistry
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry(buckets=(0.1, 1.0))
+        self.registry.enabled = True
+
+    def test_disabled_registry_records_nothing(self):
+        self.registry.enabled = False
+        self.registry.increment('pages_total')
+        self.registry.observe('fetch_seconds', 0.5)
+        with self.assertRaises(ValueError):
+            with self.registry.measure('parse'):
+                raise ValueError()
+        self.assertEqual(self.registry.to_prometheus_text(), '')
+        self.assertEqual(self.registry.to_json_lines(), '')
+
+    def test_measure_counts_errors(self):
+        with self.registry.measure('parse', parser='lxml'):
+            pass
+        with self.assertRaises(ValueError):
+            with self.registry.measure('parse', parser='lxml'):
+                raise ValueError()
+        self.assertEqual(self.registry.get_histogram('parse_seconds', parser='lxml')[0], 2)
+        self.assertEqual(self.registry.get_counter('parse_errors_total', parser='lxml'), 1)
+        self.assertEqual(self.registry.get_counter('parse_errors_total', parser='html.parser'), 0)
+
+    def test_histogram_buckets_include_their_upper_bound(self):
+        for value in (0.05, 0.1, 0.5, 1.0, 2.0):
+            self.registry.observe('fetch_seconds', value, host='bbc.com')
+        self.assertEqual(self.registry.get_histogram('fetch_seconds', host='bbc.com'), (5, 3.65))
+        self.assertEqual(self.registry.to_prometheus_text(prefix=''), (
+            '# TYPE fetch_seconds histogram\n'
+            'fetch_seconds_bucket{host="bbc.com",le="0.1"} 2\n'
+            'fetch_seconds_bucket{host="bbc.com",le="1.0"} 4\n'
+            'fetch_seconds_bucket{host="bbc.com",le="+Inf"} 5\n'
+            'fetch_seconds_sum{host="bbc.com"} 3.65\n'
+            'fetch_seconds_count{host="bbc.com"} 5\n'))
+
+    def test_prometheus_labels_are_escaped(self):
+        self.registry.increment('pages_total', 2, url='a "b"\\c\nd')
+        self.registry.increment('pages_total', url=u'חדשות')
+        self.registry.increment('pages_total', 3)
+        self.assertEqual(self.registry.to_prometheus_text().splitlines(), [
+            '# TYPE webcrawler_pages_total counter',
+            'webcrawler_pages_total 3',
+            r'webcrawler_pages_total{url="a \"b\"\\c\nd"} 2',
+            'webcrawler_pages_total{url="\xd7\x97\xd7\x93\xd7\xa9\xd7\x95\xd7\xaa"} 1'])
+
+    def test_json_lines(self):
+        self.registry.increment('pages_total', 2, downloader='bbc')
+        self.registry.observe('fetch_seconds', 0.5)
+        records = [json.loads(line) for line in self.registry.to_json_lines().splitlines()]
+        self.assertEqual(len(set(record.pop('time') for record in records)), 1)
+        self.assertEqual(records, [
+            {'name': 'pages_total', 'type': 'counter', 'labels': {'downloader': 'bbc'},
+             'value': 2},
+            {'name': 'fetch_seconds', 'type': 'histogram', 'labels': {}, 'count': 1, 'sum': 0.5,
+             'buckets': [0.1, 1.0], 'bucket_counts': [0, 1, 0]}])
+
+
+if __name__ == '__main__':
+    unittest.main()
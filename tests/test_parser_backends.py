@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from tests.test_schedule_http import read_fixture
+from webcrawler import common
+from webcrawler.data_extractor import BBCNewsExtractor, FlightLandingScheduleExtractor
+
+PARSERS = (common.WEB_SCRAPPING_PARSER, common.LXML_PARSER)
+ARTICLE_PARAGRAPHS = [
+    u'Delegates believe the new rulebook will deliver the promises made in the landmark '
+    u'agreement.',
+    u'However, some countries are unhappy that the deal lacks the ambition to cut carbon quickly '
+    u'enough.',
+    u'What was agreed?',
+    u'Countries will have to report their emissions every two years, using a common format.',
+    u'"This is a step forward," said the president of the talks, Michal Kurtyka.',
+    u'Follow Matt on Twitter.']
+
+
+class ParserBackendsTest(unittest.TestCase):
+    """Both parsers extract the same material from recorded pages and their variants."""
+
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _extract_with_every_parser(self, extractor_type, page_html):
+        """:return: Material extracted by the parsers, after checking that they all extract it."""
+        file_path = os.path.join(self.directory_path, 'page.html')
+        with open(file_path, 'w') as page_file:
+            page_file.write(page_html)
+        extracted_materials = [extractor_type(file_path, parser).extract_raw_material() for
+                               parser in PARSERS]
+        for parser, raw_materials in zip(PARSERS[1:], extracted_materials[1:]):
+            self.assertEqual([raw_material.__reduce__() for raw_material in raw_materials],
+                             [raw_material.__reduce__() for raw_material in
+                              extracted_materials[0]], '%s extracted different material' % parser)
+        return extracted_materials[0]
+
+    def test_bbc_article(self):
+        article, = self._extract_with_every_parser(BBCNewsExtractor,
+                                                   read_fixture('bbc_article_page.html'))
+        self.assertEqual(article.header, u'Climate talks: Ministers agree on emissions rulebook')
+        self.assertEqual(article.introduction,
+                         u'Negotiators meeting in Poland have secured agreement on a range of '
+                         u'measures that will make the Paris climate pact operational in 2020.')
+        # Without the tweet, the hidden sharing text, the caption and the page footer.
+        self.assertEqual(article.paragraphs, ARTICLE_PARAGRAPHS)
+
+    def test_bbc_article_without_introduction(self):
+        page_html = re.sub(r'<p class="story-body__introduction">.*?</p>', '',
+                           read_fixture('bbc_article_page.html'))
+        article, = self._extract_with_every_parser(BBCNewsExtractor, page_html)
+        self.assertEqual(article.introduction, u'')
+        self.assertEqual(article.paragraphs, ARTICLE_PARAGRAPHS)
+
+    def test_bbc_article_tweet_blocks(self):
+        # Tweet paragraphs with several classes, and a tweet block which is a paragraph itself.
+        page_html = read_fixture('bbc_article_page.html').replace(
+            'class="twite__title"', 'class="js-embed  twite__title"').replace(
+            '<p>Follow Matt', '<p class="twite">Tweet by @BBCNews</p><p>Follow Matt')
+        article, = self._extract_with_every_parser(BBCNewsExtractor, page_html)
+        self.assertEqual(article.paragraphs, ARTICLE_PARAGRAPHS)
+
+    def test_schedule_page(self):
+        landing_updates = self._extract_with_every_parser(FlightLandingScheduleExtractor,
+                                                          read_fixture('iaa_schedule_page.html'))
+        self.assertEqual([landing_update.flight_number for landing_update in landing_updates],
+                         [u'LY 008', u'TK 784', u'6H 062', u'LH 686'])
+        self.assertEqual(landing_updates[0].schedule_update_time.time(), datetime.time(8, 5))
+        self.assertEqual((landing_updates[0].company, landing_updates[0].flight_from),
+                         (u'אל על', u'ניו יורק'))
+        # A company without a logo, and a landing without an updated time.
+        self.assertEqual((landing_updates[2].company, landing_updates[2].updated_time,
+                          landing_updates[2].terminal), (u'ישראייר', u'', 1))
+
+    def test_schedule_page_with_empty_cells(self):
+        page_html = read_fixture('iaa_schedule_page.html').replace(
+            '<span>איסטנבול</span>', '<span></span>').replace(
+            '<div>עיכוב</div>', '<div></div>').replace(
+            '<td class="FlightTime">08:20</td>', '<td class="FlightTime"> </td>')
+        landing_updates = self._extract_with_every_parser(FlightLandingScheduleExtractor,
+                                                          page_html)
+        self.assertEqual((landing_updates[1].flight_from, landing_updates[1].status,
+                          landing_updates[1].planned_time), (u'', u'', u''))
+
+    def test_schedule_page_without_landings(self):
+        page_html = re.sub(r'(?s)</tr>\s*<tr class="even">.*</tr>', '</tr>',
+                           read_fixture('iaa_schedule_page.html'))
+        self.assertEqual(self._extract_with_every_parser(FlightLandingScheduleExtractor,
+                                                         page_html), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
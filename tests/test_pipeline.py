@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+
+from benchmarks import synthetic
+from webcrawler.data_extractor import BBCNewsExtractor
+from webcrawler.pipeline import DirectoryWatcher, Pipeline, PipelineStage, create_extraction_stage
+
+NUMBER_OF_ARTICLES = 4
+# Longest wait for something that happens in another thread.
+TIMEOUT_SECONDS = 5
+
+
+class PipelineTest(unittest.TestCase):
+    def test_full_queue_blocks_the_producer(self):
+        processing_event = threading.Event()
+        put_items = []
+        stage = PipelineStage('wait', lambda item: processing_event.wait(TIMEOUT_SECONDS),
+                              queue_size=1)
+
+        def produce():
+            for item in xrange(4):
+                pipeline.put(item)
+                put_items.append(item)
+
+        with Pipeline([stage]) as pipeline:
+            producer_thread = threading.Thread(target=produce)
+            producer_thread.start()
+            time.sleep(0.2)
+            # One item is processed, one is queued and the third waits for room in the queue.
+            self.assertEqual(put_items, [0, 1])
+            self.assertTrue(producer_thread.is_alive())
+            processing_event.set()
+            producer_thread.join(TIMEOUT_SECONDS)
+        self.assertEqual(put_items, [0, 1, 2, 3])
+        self.assertEqual(pipeline.stats()[0].processed_count, 4)
+
+    def test_failing_item_is_skipped(self):
+        received_items = []
+
+        def invert(item):
+            return [1.0 / item]
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter('always')
+            with Pipeline([PipelineStage('invert', invert, workers=2),
+                           PipelineStage('receive', received_items.append)]) as pipeline:
+                for item in (1, 0, 2, 4):
+                    pipeline.put(item)
+        self.assertEqual(sorted(received_items), [0.25, 0.5, 1.0])
+        invert_stats, receive_stats = pipeline.stats()
+        self.assertEqual((invert_stats.processed_count, invert_stats.failed_count,
+                          invert_stats.output_count), (4, 1, 3))
+        self.assertEqual((receive_stats.processed_count, receive_stats.failed_count), (3, 0))
+        self.assertEqual(len(caught_warnings), 1)
+        self.assertIn('could not process 0', str(caught_warnings[0].message))
+
+    def test_stage_is_flushed_periodically(self):
+        flush_event = threading.Event()
+        stage = PipelineStage('flush', lambda item: None, flush=flush_event.set,
+                              seconds_between_flushes=0.05)
+        with Pipeline([stage]) as pipeline:
+            pipeline.put(1)
+            # Flushed while the pipeline runs, without more items.
+            self.assertTrue(flush_event.wait(TIMEOUT_SECONDS))
+            flush_event.clear()
+        # And when it is closed.
+        self.assertTrue(flush_event.is_set())
+
+
+class ExtractionStageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.download_directory = os.path.join(self.directory_path, 'downloads')
+        self.raw_material_directory = os.path.join(self.directory_path, 'raw_material')
+        os.mkdir(self.download_directory)
+        os.mkdir(self.raw_material_directory)
+        self.file_paths = []
+        for seed in xrange(NUMBER_OF_ARTICLES):
+            file_path = os.path.join(self.download_directory, 'article%d.html' % seed)
+            with open(file_path, 'w') as page_file:
+                page_file.write(synthetic.generate_bbc_article_html(seed))
+            self.file_paths.append(file_path)
+        self.written_file_paths = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _write(self, downloaded_file_path, raw_materials, directory_path):
+        # Slow enough for a file passed twice to be extracted by two workers at once.
+        time.sleep(0.05)
+        self.written_file_paths.append(downloaded_file_path)
+        BBCNewsExtractor.save_raw_material(downloaded_file_path, raw_materials, directory_path)
+
+    def _extract(self, file_paths, workers=1):
+        """:return: Counters of the extraction stage."""
+        stage = create_extraction_stage(BBCNewsExtractor, self.raw_material_directory,
+                                        writer=self._write, workers=workers)
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter('always')
+            with Pipeline([stage, PipelineStage('receive', lambda raw_material: None)]) as \
+                    pipeline:
+                for file_path in file_paths:
+                    pipeline.put(file_path)
+        self.assertEqual([str(warning.message) for warning in caught_warnings], [])
+        return pipeline.stats()[0]
+
+    def test_extracted_files_are_skipped_by_later_runs(self):
+        self.assertEqual(self._extract(self.file_paths).output_count, NUMBER_OF_ARTICLES)
+        self.assertEqual(sorted(self.written_file_paths), self.file_paths)
+        with open(self.file_paths[0], 'a') as page_file:
+            page_file.write('<p>Changed</p>')
+        stats = self._extract(self.file_paths)
+        self.assertEqual((stats.processed_count, stats.output_count), (NUMBER_OF_ARTICLES, 1))
+        self.assertEqual(self.written_file_paths[NUMBER_OF_ARTICLES:], self.file_paths[:1])
+
+    def test_file_passed_twice_is_extracted_once(self):
+        stats = self._extract(self.file_paths[:1] * 2 + self.file_paths[1:], workers=2)
+        self.assertEqual((stats.failed_count, stats.output_count), (0, NUMBER_OF_ARTICLES))
+        self.assertEqual(sorted(self.written_file_paths), self.file_paths)
+
+
+class DirectoryWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.watcher = DirectoryWatcher(self.directory_path, seconds_between_polls=0.01)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _write_file(self, file_name, content):
+        file_path = os.path.join(self.directory_path, file_name)
+        with open(file_path, 'w') as written_file:
+            written_file.write(content)
+        return file_path
+
+    def test_new_and_modified_files(self):
+        first_file_path = self._write_file('first.html', 'first')
+        self.assertEqual(self.watcher.poll(), [first_file_path])
+        self.assertEqual(self.watcher.poll(), [])
+        second_file_path = self._write_file('second.html', 'second')
+        self._write_file('.second.html.tmp', 'hidden')
+        self.assertEqual(self.watcher.poll(), [second_file_path])
+        self._write_file('first.html', 'first, modified')
+        self.assertEqual(self.watcher.poll(), [first_file_path])
+
+    def test_watch_polls_once_more_when_stopped(self):
+        stop_event = threading.Event()
+        stop_event.set()
+        file_path = self._write_file('first.html', 'first')
+        seen_file_paths = []
+        self.watcher.watch(seen_file_paths.append, stop_event)
+        self.assertEqual(seen_file_paths, [file_path])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# coding=utf-8
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from webcrawler import analyzers
+from webcrawler.aho_corasick import AhoCorasickAutomaton
+from webcrawler.query import TextQuery, normalized_text_cache
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
+
+
+def _get_landing_update():
+    return FlightLandingUpdate(datetime.datetime(2018, 1, 1, 10, 5), u'TURKISH AIRLINES',
+                               u'TK 784', u'איסטנבול', '10:00', '10:20', 3, u'נחתה')
+
+
+class JsonMaterialSearchTest(unittest.TestCase):
+    def test_values_are_searched_by_substring(self):
+        landing_update = _get_landing_update()
+        self.assertTrue(analyzers.has_text(landing_update, u'turkish'))
+        self.assertTrue(analyzers.has_text(landing_update, u'TK 784'))
+        self.assertTrue(analyzers.has_text(landing_update, u'איסטנבול'))
+        self.assertTrue(analyzers.has_text(landing_update, u'10:20'))
+        self.assertFalse(analyzers.has_text(landing_update, u'turkish', case_sensitive=True))
+
+    def test_field_names_are_not_searched_by_substring(self):
+        landing_update = _get_landing_update()
+        for text in (u'time', u'tat', u'nu', u'd_t', u'planned'):
+            self.assertFalse(analyzers.has_text(landing_update, text), text)
+            self.assertEqual(TextQuery(text, cache=None).count(landing_update), 0)
+        self.assertTrue(analyzers.has_text(landing_update, u'status'))
+        self.assertTrue(analyzers.has_text(landing_update, u'Planned_Time'))
+        self.assertEqual(TextQuery(u'status', cache=None).count(landing_update), 1)
+        # Fields are not found by their names in the values of certain fields.
+        self.assertFalse(TextQuery(u'status', fields=['status'], cache=None).matches(
+            landing_update))
+
+    def test_text_is_not_found_across_values(self):
+        landing_update = _get_landing_update()
+        self.assertFalse(analyzers.has_text(landing_update, u'airlines tk'))
+        self.assertFalse(TextQuery(u'airlines.tk', mode=TextQuery.REGEX,
+                                   cache=None).matches(landing_update))
+
+    def test_search_for_texts_in_files(self):
+        directory_path = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(directory_path, 'update.json')
+            _get_landing_update().dump(file_path)
+            files_with_text, text_match_counts = analyzers.search_for_texts_in_material_files(
+                FlightLandingUpdate, [file_path], [u'status', u'turkish', u'time', u'nu'])
+        finally:
+            shutil.rmtree(directory_path)
+        self.assertEqual(files_with_text, {u'status': [file_path], u'turkish': [file_path],
+                                           u'time': [], u'nu': []})
+        self.assertEqual(text_match_counts, {u'status': 1, u'turkish': 1, u'time': 0, u'nu': 0})
+
+
+class SearchForTextsTest(unittest.TestCase):
+    TEXTS = [u'', u'ana', u'Banana', u'an', u'jerusalem']
+
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.file_paths = []
+        for file_id, paragraph in enumerate((u'A banana in Havana.', u'A paragraph.')):
+            file_path = os.path.join(self.directory_path, 'article%d.json' % file_id)
+            BBCRawArticle(u'Header', u'Introduction', [paragraph]).dump(file_path)
+            self.file_paths.append(file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def _search(self):
+        return analyzers.search_for_texts_in_material_files(BBCRawArticle, self.file_paths,
+                                                            self.TEXTS)
+
+    def test_scans_and_automaton_give_the_same_results(self):
+        results = self._search()
+        self.assertEqual(results[1], {u'': 0, u'ana': 3, u'Banana': 1, u'an': 3, u'jerusalem': 0})
+        max_texts_scanned_one_by_one = analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE
+        analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE = 0
+        try:
+            self.assertEqual(self._search(), results)
+        finally:
+            analyzers._MAX_TEXTS_SCANNED_ONE_BY_ONE = max_texts_scanned_one_by_one
+
+    def test_empty_text_is_found_in_every_file(self):
+        files_with_text, _ = self._search()
+        self.assertEqual(files_with_text[u''], self.file_paths)
+        self.assertEqual(files_with_text[u'ana'], self.file_paths[:1])
+        article = BBCRawArticle(u'Header', u'Introduction', [u'A paragraph.'])
+        self.assertTrue(analyzers.has_text(article, u''))
+        self.assertRaises(ValueError, AhoCorasickAutomaton, [u'ana', u''])
+
+
+class HasTextTest(unittest.TestCase):
+    def test_normalized_text_is_not_cached(self):
+        normalized_text_cache.clear()
+        article = BBCRawArticle(u'Header', u'Introduction', [u'A paragraph about Jerusalem.'])
+        self.assertTrue(analyzers.has_text(article, u'jerusalem'))
+        self.assertTrue(analyzers.has_text(_get_landing_update(), u'turkish'))
+        self.assertEqual(len(normalized_text_cache), 0)
+
+    def test_query_is_built_once(self):
+        article = BBCRawArticle(u'Header', u'Introduction', [u'A paragraph about Jerusalem.'])
+        analyzers.has_text(article, u'Jerusalem')
+        query = analyzers._has_text_queries[(u'Jerusalem', False)]
+        self.assertTrue(analyzers.has_text(article, u'Jerusalem'))
+        self.assertIs(analyzers._has_text_queries[(u'Jerusalem', False)], query)
+        self.assertFalse(analyzers.has_text(article, u'jerusalem', case_sensitive=True))
+
+    def test_landing_update_is_normalized_once(self):
+        landing_update = _get_landing_update()
+        self.assertTrue(analyzers.has_text(landing_update, u'turkish'))
+        to_dict = FlightLandingUpdate.to_dict
+        FlightLandingUpdate.to_dict = None
+        try:
+            self.assertTrue(analyzers.has_text(landing_update, u'status'))
+            self.assertFalse(analyzers.has_text(landing_update, u'wizz'))
+        finally:
+            FlightLandingUpdate.to_dict = to_dict
+        # Changing the dictionary of the update does not change what is found in it.
+        landing_update.to_dict()[FlightLandingUpdate.COMPANY_FIELD] = u'WIZZ AIR'
+        self.assertFalse(analyzers.has_text(landing_update, u'wizz'))
+        self.assertTrue(analyzers.has_text(landing_update, u'Turkish', case_sensitive=False))
+        self.assertFalse(analyzers.has_text(landing_update, u'Turkish', case_sensitive=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import datetime
+import os
+import resource
+import shutil
+import tempfile
+import unittest
+
+from webcrawler import raw_material, utils
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate, MappedBBCRawArticle
+
+# More articles than open files allowed while loading them.
+_NUMBER_OF_ARTICLES = 200
+_MAX_OPEN_FILES = 64
+
+
+class BBCRawArticleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.file_paths = []
+        for article_index in xrange(_NUMBER_OF_ARTICLES):
+            file_path = os.path.join(self.directory_path, 'article%d.txt' % article_index)
+            BBCRawArticle('Header %d' % article_index, 'Introduction',
+                          ['First paragraph', 'Second paragraph']).dump(file_path)
+            self.file_paths.append(file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def test_load_raw_material_from_files_does_not_keep_files_open(self):
+        open_files_limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (_MAX_OPEN_FILES, open_files_limits[1]))
+        try:
+            articles = utils.load_raw_material_from_files(BBCRawArticle, self.file_paths)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, open_files_limits)
+        self.assertEqual(len(articles), _NUMBER_OF_ARTICLES)
+        self.assertFalse(any(isinstance(article, MappedBBCRawArticle) for article in articles))
+        self.assertEqual(articles[1].header, 'Header 1')
+
+    def test_iter_load_matches_load(self):
+        for file_path, article in zip(self.file_paths, BBCRawArticle.iter_load(self.file_paths)):
+            loaded_article = BBCRawArticle.load(file_path)
+            self.assertEqual(article.to_text(), loaded_article.to_text())
+            self.assertEqual(article.paragraphs, loaded_article.paragraphs)
+
+
+class FlightLandingUpdateTest(unittest.TestCase):
+    def setUp(self):
+        raw_material._interned_strings.clear()
+
+    @staticmethod
+    def _get_landing_update(flight_from):
+        return FlightLandingUpdate(datetime.datetime(2018, 1, 1, 10, 5), u'Turkish Airlines',
+                                   u'TK 784', flight_from, '10:00', '10:20', 3, u'Landed')
+
+    def test_to_dict_is_not_shared(self):
+        landing_update = self._get_landing_update(u'Istanbul')
+        landing_update.to_dict()[FlightLandingUpdate.STATUS_FIELD] = u'Delayed'
+        self.assertEqual(landing_update.to_dict()[FlightLandingUpdate.STATUS_FIELD], u'Landed')
+        self.assertEqual(FlightLandingUpdate.from_dict(landing_update.to_dict()).__reduce__(),
+                         landing_update.__reduce__())
+
+    def test_interned_strings_are_bounded(self):
+        first_flight_from = self._get_landing_update(u'Istanbul').flight_from
+        self.assertIs(self._get_landing_update(u''.join(u'Istanbul')).flight_from,
+                      first_flight_from)
+        for update_index in xrange(2 * raw_material._MAX_INTERNED_STRINGS):
+            self._get_landing_update(u'Origin %d' % update_index)
+        self.assertLessEqual(len(raw_material._interned_strings),
+                             raw_material._MAX_INTERNED_STRINGS)
+        self.assertIs(self._get_landing_update(u''.join(u'Istanbul')).flight_from,
+                      first_flight_from)
+
+
+if __name__ == '__main__':
+    unittest.main()
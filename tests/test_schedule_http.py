@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from benchmarks.fake_web_driver import StaticHtmlWebDriver
+from benchmarks.local_server import LocalHttpServer
+from webcrawler.downloader import FlightLandingScheduleDownloader, _SchedulePage
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'fixtures')
+SCHEDULE_PATH = '/OnlineFlights.aspx'
+NEXT_PAGE_EVENT_TARGET = 'ctl00$rptPaging$ctl06$aNext'
+NUMBER_OF_PAGES = FlightLandingScheduleDownloader.NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD
+_PAGE_NUMBER_EVENT_TARGET_REGEX = re.compile(r'^ctl00\$rptPaging\$ctl(\d\d)\$aPage$')
+
+
+def read_fixture(file_name):
+    with open(os.path.join(FIXTURE_DIRECTORY, file_name)) as fixture_file:
+        return fixture_file.read()
+
+
+def get_schedule_page_html(page_number, update_time, has_page_state=True):
+    """
+    :return: The recorded schedule page, as page number of the schedule of an update time. The page
+        number is kept in a hidden field of the form, besides the ASP.NET page state.
+    """
+    page_html = read_fixture('iaa_schedule_page.html').replace(
+        'בשעה 08:05', 'בשעה ' + update_time).replace(
+        '>LY 008<', '>LY %03d<' % page_number).replace(
+        'name="wpcmVal" id="wpcmVal" value=""', 'name="wpcmVal" id="wpcmVal" value="%d"' %
+        page_number)
+    if not has_page_state:
+        page_html = re.sub(r'<input type="hidden" name="__VIEWSTATE"[^>]*>', '', page_html)
+    return page_html
+
+
+class ScheduleSite(object):
+    """Serves the recorded page as every page of the schedule, the way the website does."""
+
+    def __init__(self, has_page_state=True):
+        self.has_page_state = has_page_state
+        # Update times shown by the first page and by the pages posted back, one per request.
+        self.update_times = ['08:05']
+
+    def _get_update_time(self):
+        return self.update_times.pop(0) if len(self.update_times) > 1 else self.update_times[0]
+
+    def __call__(self, path, form_fields):
+        if path != SCHEDULE_PATH:
+            return None
+        if form_fields is None:
+            return get_schedule_page_html(1, self._get_update_time(), self.has_page_state)
+        if self.has_page_state and '__VIEWSTATE' not in form_fields:
+            return None
+        event_target = form_fields.get('__EVENTTARGET', '')
+        page_number_match = _PAGE_NUMBER_EVENT_TARGET_REGEX.match(event_target)
+        if event_target == NEXT_PAGE_EVENT_TARGET:
+            page_number = int(form_fields['wpcmVal']) + 1
+        elif page_number_match is not None:
+            page_number = int(page_number_match.group(1))
+        else:
+            return None
+        return get_schedule_page_html(page_number, self._get_update_time(), self.has_page_state)
+
+
+class SchedulePageTest(unittest.TestCase):
+    def setUp(self):
+        self.page = _SchedulePage('http://www.iaa.gov.il/he-IL/airports/BenGurion/Pages/'
+                                  'OnlineFlights.aspx', read_fixture('iaa_schedule_page.html'))
+
+    def test_update_time(self):
+        self.assertEqual((self.page.update_time.hour, self.page.update_time.minute), (8, 5))
+
+    def test_page_number_event_targets(self):
+        self.assertEqual(self.page.get_page_number_event_targets(),
+                         {1: 'ctl00$rptPaging$ctl01$aPage', 2: 'ctl00$rptPaging$ctl02$aPage',
+                          3: 'ctl00$rptPaging$ctl03$aPage'})
+        self.assertEqual(self.page.get_page_number_link_ids(),
+                         {1: 'ctl00_rptPaging_ctl01_aPage', 2: 'ctl00_rptPaging_ctl02_aPage',
+                          3: 'ctl00_rptPaging_ctl03_aPage'})
+
+    def test_event_target(self):
+        self.assertEqual(self.page.get_event_target('ctl00_rptPaging_ctl06_aNext'),
+                         NEXT_PAGE_EVENT_TARGET)
+        self.assertRaises(ValueError, self.page.get_event_target, 'ctl00_rptPaging_ctl09_aNext')
+
+    def test_post_back(self):
+        post_back_url, form_fields = self.page.get_post_back('ctl00$rptPaging$ctl02$aPage')
+        self.assertEqual(post_back_url, 'http://www.iaa.gov.il/he-IL/airports/BenGurion/Pages/'
+                                        'OnlineFlights.aspx')
+        self.assertEqual(form_fields['__EVENTTARGET'], 'ctl00$rptPaging$ctl02$aPage')
+        self.assertEqual(form_fields['__EVENTARGUMENT'], '')
+        self.assertEqual(form_fields['__VIEWSTATE'],
+                         '/wEPDwUBMA9kFgJmD2QWAgIBD2QWBAIBD2QWAgIDDxYCHgRUZXh0BQXXoNeZ15XXldeY')
+        self.assertEqual(form_fields['__EVENTVALIDATION'],
+                         '/wEdAAe0UVl0J3HeCzDdFVHn6Zh+Jm2G9dEKbnXQ')
+        self.assertEqual(form_fields['__VIEWSTATEGENERATOR'], 'BAB98CB3')
+        # Hidden inputs without a name are not posted.
+        self.assertNotIn(None, form_fields)
+
+    def test_post_back_without_page_state(self):
+        page = _SchedulePage('http://localhost/OnlineFlights.aspx',
+                             get_schedule_page_html(1, '08:05', has_page_state=False))
+        self.assertRaises(ValueError, page.get_post_back, NEXT_PAGE_EVENT_TARGET)
+
+    def test_not_a_schedule_page(self):
+        self.assertRaises(ValueError, _SchedulePage, 'http://localhost/',
+                          '<html><body><p>Service unavailable</p></body></html>')
+
+
+class HttpScheduleDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.download_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.download_directory)
+
+    def _download(self, site):
+        with LocalHttpServer(site) as server:
+            downloader = FlightLandingScheduleDownloader(self.download_directory, None,
+                                                         StaticHtmlWebDriver)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            with warnings.catch_warnings(record=True) as caught_warnings:
+                warnings.simplefilter('always')
+                downloader.download_data()
+        return downloader, caught_warnings
+
+    def _get_written_update_times(self):
+        return sorted(re.search(r'page(\d)_.* (\d\d:\d\d):00\.html$', file_name).groups() for
+                      file_name in os.listdir(self.download_directory))
+
+    def test_download_over_http(self):
+        downloader, caught_warnings = self._download(ScheduleSite())
+        self.assertEqual(downloader.last_download_mode,
+                         FlightLandingScheduleDownloader.HTTP_DOWNLOAD_MODE)
+        self.assertEqual(caught_warnings, [])
+        self.assertEqual(self._get_written_update_times(),
+                         [(str(page_number), '08:05') for page_number in
+                          xrange(1, NUMBER_OF_PAGES + 1)])
+
+    def test_pages_of_another_update_are_fetched_again(self):
+        site = ScheduleSite()
+        # The schedule is updated after the first page was fetched.
+        site.update_times = ['08:05', '08:10']
+        downloader, _ = self._download(site)
+        self.assertEqual(downloader.last_download_mode,
+                         FlightLandingScheduleDownloader.HTTP_DOWNLOAD_MODE)
+        self.assertEqual(downloader.last_schedule_update_time.minute, 10)
+        self.assertEqual(self._get_written_update_times(),
+                         [(str(page_number), '08:10') for page_number in
+                          xrange(1, NUMBER_OF_PAGES + 1)])
+
+    def test_pages_of_other_updates_in_every_attempt(self):
+        site = ScheduleSite()
+        # Every page shows another update.
+        site.update_times = ['08:%02d' % minute for minute in xrange(0, 60, 5)]
+        with LocalHttpServer(site) as server:
+            downloader = FlightLandingScheduleDownloader(self.download_directory, None,
+                                                         StaticHtmlWebDriver)
+            downloader.DOWNLOAD_URL = server.url + SCHEDULE_PATH
+            self.assertRaises(ValueError, downloader._download_schedule_pages_over_http,
+                              downloader._fetch_first_schedule_page())
+        self.assertEqual(os.listdir(self.download_directory), [])
+
+    def test_fall_back_to_browser(self):
+        downloader, caught_warnings = self._download(ScheduleSite(has_page_state=False))
+        self.assertEqual(downloader.last_download_mode,
+                         FlightLandingScheduleDownloader.BROWSER_DOWNLOAD_MODE)
+        self.assertEqual(len(caught_warnings), 1)
+        self.assertIn('using the browser', str(caught_warnings[0].message))
+        self.assertEqual(self._get_written_update_times(),
+                         [(str(page_number), '08:05') for page_number in
+                          xrange(1, NUMBER_OF_PAGES + 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from webcrawler import analyzers
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
+from webcrawler.sqlite_store import RawMaterialStore
+
+ARTICLES = {
+    u'article0': BBCRawArticle(u'Prime minister visits Paris', u'An introduction.',
+                               [u'Talks about climate.', u'Netanyahu met the minister.']),
+    u'article1': BBCRawArticle(u'Climate talks end', u'The minister left early.',
+                               [u'Delegates agreed on a rulebook.']),
+    u'article2': BBCRawArticle(u'Football results', u'', [u'A 3-0 win for the home team.'])}
+
+
+def _landing_update(update_time, flight_number, planned_time, updated_time, status=u'LANDED'):
+    return FlightLandingUpdate(update_time, u'EL AL', flight_number, u'PARIS', planned_time,
+                               updated_time, 3, status)
+
+
+def _get_keys(landing_updates):
+    return [(landing_update.flight_number, landing_update.schedule_update_time) for
+            landing_update in landing_updates]
+
+
+class RawMaterialStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+        self.store = RawMaterialStore(os.path.join(self.directory_path, 'store.sqlite'),
+                                      batch_size=2)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory_path)
+
+    def _add_articles(self):
+        for article_id in sorted(ARTICLES):
+            self.store.add_article(article_id, ARTICLES[article_id])
+
+    def _count_written_rows(self, table):
+        connection = sqlite3.connect(self.store.database_path)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_material_is_written_in_batches(self):
+        self._add_articles()
+        self.assertEqual(self._count_written_rows('articles'), 2)
+        self.store.flush()
+        self.assertEqual(self._count_written_rows('articles'), 3)
+        # Queries write the pending material first.
+        self.store.add_article(u'article3', ARTICLES[u'article0'])
+        self.assertEqual(self.store.article_count, 4)
+
+    def test_article_with_existing_id_is_replaced(self):
+        self._add_articles()
+        self.store.add_article(u'article0', ARTICLES[u'article2'])
+        self.assertEqual(self.store.article_count, 3)
+        self.assertEqual(self.store.get_article(u'article0').header, u'Football results')
+        self.assertEqual(self.store.search_articles(u'Netanyahu'), [])
+        # The replacing article is the last added.
+        self.assertEqual([article_id for article_id, _ in self.store.iter_articles()],
+                         [u'article1', u'article2', u'article0'])
+
+    def test_search_articles_like_has_text(self):
+        self._add_articles()
+        for text in (u'minister', u'CLIMATE TALKS', u'3-0', u'a 3', u'xylophone', u'et'):
+            self.assertEqual(self.store.search_articles(text),
+                             [article_id for article_id in sorted(ARTICLES) if
+                              analyzers.has_text(ARTICLES[article_id], text)], text)
+        self.assertEqual(self.store.search_articles(u'Climate', case_sensitive=True),
+                         [u'article1'])
+        self.assertEqual(self.store.search_articles(u'nEt', case_sensitive=True), [])
+
+    def test_search_headers(self):
+        self._add_articles()
+        self.assertEqual(self.store.search_articles(u'minister', [u'header']), [u'article0'])
+        self.assertEqual(self.store.search_articles(u'minister', [u'introduction']),
+                         [u'article1'])
+        self.assertEqual(self.store.search_articles(u'minister', []), [])
+        self.assertRaises(ValueError, self.store.search_articles, u'minister', [u'title'])
+
+    def test_find_delayed_landing_updates(self):
+        update_time = datetime.datetime(2018, 1, 1, 20)
+        self.store.add_landing_updates([
+            _landing_update(update_time, u'LY001', u'21:00', u'21:15'),
+            _landing_update(update_time, u'LY002', u'21:00', u'21:16'),
+            # Delayed past midnight.
+            _landing_update(update_time, u'LY003', u'23:50', u'00:30'),
+            _landing_update(update_time, u'LY004', u'21:00', u''),
+            _landing_update(update_time + datetime.timedelta(hours=1), u'LY005', u'22:00',
+                            u'23:00')])
+        self.assertEqual([landing_update.flight_number for landing_update in
+                          self.store.find_delayed_landing_updates()],
+                         [u'LY002', u'LY003', u'LY005'])
+        self.assertEqual([landing_update.flight_number for landing_update in
+                          self.store.find_delayed_landing_updates(
+                              max_on_time_delay_minutes=40, end_time=update_time +
+                              datetime.timedelta(minutes=1))], [])
+        self.assertEqual(_get_keys(self.store.search_landing_updates(u'ly00', [u'number'])),
+                         [(u'LY00%d' % index, update_time) for index in xrange(1, 5)] +
+                         [(u'LY005', update_time + datetime.timedelta(hours=1))])
+
+    def test_latest_per_flight_of_each_date(self):
+        # LY001 lands every evening; its update after midnight is of the flight of the day before.
+        self.store.add_landing_updates([
+            _landing_update(datetime.datetime(2018, 1, 1, 20), u'LY001', u'23:50', u'23:50'),
+            _landing_update(datetime.datetime(2018, 1, 2, 0, 30), u'LY001', u'23:50', u'00:20'),
+            _landing_update(datetime.datetime(2018, 1, 2, 20), u'LY001', u'23:50', u'23:55'),
+            _landing_update(datetime.datetime(2018, 1, 2, 21), u'LY002', u'22:00', u'22:00')])
+        # An update of a flight at an existing time replaces it.
+        self.store.add_landing_updates([
+            _landing_update(datetime.datetime(2018, 1, 2, 20), u'LY001', u'23:50', u'23:55',
+                            u'DELAYED')])
+        self.assertEqual(self.store.landing_update_count, 4)
+        latest_landing_updates = self.store.latest_per_flight()
+        self.assertEqual(_get_keys(latest_landing_updates),
+                         [(u'LY001', datetime.datetime(2018, 1, 2, 0, 30)),
+                          (u'LY001', datetime.datetime(2018, 1, 2, 20)),
+                          (u'LY002', datetime.datetime(2018, 1, 2, 21))])
+        self.assertEqual(latest_landing_updates[1].status, u'DELAYED')
+        self.assertEqual(_get_keys(self.store.search_landing_updates(u'landed', [u'status'])),
+                         [(u'LY001', datetime.datetime(2018, 1, 1, 20)),
+                          (u'LY001', datetime.datetime(2018, 1, 2, 0, 30)),
+                          (u'LY002', datetime.datetime(2018, 1, 2, 21))])
+
+
+if __name__ == '__main__':
+    unittest.main()
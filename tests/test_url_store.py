@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import synthetic
+from benchmarks.local_server import LocalHttpServer
+from webcrawler.downloader import BBCNewsDownloader
+from webcrawler.fetcher import HttpFetcher
+from webcrawler.url_store import SeenUrlStore
+
+
+def get_url(url_id):
+    return 'http://www.bbc.com/news/world-%d' % url_id
+
+
+class SeenUrlStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_path)
+
+    def test_filter_grows_past_its_capacity(self):
+        with SeenUrlStore(self.directory_path, expected_url_count=100) as seen_urls:
+            initial_filter_size = seen_urls.stats.filter_size_in_bytes
+            for url_id in xrange(1000):
+                self.assertTrue(seen_urls.add(get_url(url_id)))
+            self.assertFalse(seen_urls.add(get_url(10)))
+            stats = seen_urls.stats
+            self.assertEqual(stats.url_count, 1000)
+            self.assertGreater(stats.filter_size_in_bytes, 8 * initial_filter_size)
+            self.assertLessEqual(stats.expected_false_positive_rate, 0.001)
+            self.assertTrue(all(get_url(url_id) in seen_urls for url_id in xrange(1000)))
+        with SeenUrlStore(self.directory_path, expected_url_count=100) as seen_urls:
+            self.assertEqual(len(seen_urls), 1000)
+            self.assertEqual(seen_urls.stats.filter_size_in_bytes, stats.filter_size_in_bytes)
+            self.assertIn(get_url(999), seen_urls)
+            self.assertNotIn(get_url(1000), seen_urls)
+
+    def test_small_default_filter(self):
+        with SeenUrlStore(self.directory_path) as seen_urls:
+            self.assertLess(seen_urls.stats.filter_size_in_bytes, 2 ** 20)
+
+    def test_unchanged_filter_is_not_written(self):
+        with SeenUrlStore(self.directory_path) as seen_urls:
+            seen_urls.add(get_url(1))
+            seen_urls.flush()
+            os.remove(seen_urls.filter_file_path)
+            seen_urls.flush()
+            self.assertFalse(os.path.exists(seen_urls.filter_file_path))
+            seen_urls.add(get_url(2))
+        self.assertTrue(os.path.exists(seen_urls.filter_file_path))
+
+
+class BBCNewsSeenArticlesTest(unittest.TestCase):
+    NUMBER_OF_ARTICLES = 5
+
+    def setUp(self):
+        self.download_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.download_directory)
+
+    def test_seen_articles_are_skipped_by_later_runs(self):
+        fetcher = HttpFetcher()
+        pages = synthetic.generate_bbc_site_pages(self.NUMBER_OF_ARTICLES)
+        try:
+            with LocalHttpServer(pages) as server:
+                for expected_crawled_url_count in (self.NUMBER_OF_ARTICLES + 1, 1):
+                    downloader = BBCNewsDownloader(self.download_directory, fetcher,
+                                                   skip_seen_articles=True)
+                    downloader.DOWNLOAD_URL = server.url
+                    stats = downloader.download_data()
+                    self.assertEqual(stats.crawled_url_count, expected_crawled_url_count)
+                    # The store is closed by the end of the download.
+                    self.assertIsNone(downloader.seen_urls)
+        finally:
+            fetcher.close()
+        with SeenUrlStore(self.download_directory) as seen_urls:
+            self.assertEqual(len(seen_urls), self.NUMBER_OF_ARTICLES)
+
+
+if __name__ == '__main__':
+    unittest.main()
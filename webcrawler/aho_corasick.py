@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class AhoCorasickAutomaton(object):
+    """Finds all occurrences of many patterns in a text in a single pass over the text."""
+
+    def __init__(self, patterns):
+        """
+        :param patterns: Non-empty strings to search for. An empty pattern, which would occur
+            everywhere, raises ValueError; callers decide what finding it means (see
+            `analyzers.search_for_texts_in_material_files`).
+        :type patterns: collections.Iterable[basestring]
+        """
+        # Each state of the automaton is a node of a trie of the patterns.
+        self._transitions = [{}]
+        self._fallbacks = [0]
+        self._outputs = [[]]
+        for pattern in set(patterns):
+            self._add_pattern(pattern)
+        self._build_fallbacks()
+
+    def iter_matches(self, text):
+        """
+        :return: Index of the end of each occurrence in the text, with the pattern which occurs.
+        :rtype: collections.Iterator[(int, basestring)]
+        """
+        state = 0
+        for index, character in enumerate(text):
+            while state and character not in self._transitions[state]:
+                state = self._fallbacks[state]
+            state = self._transitions[state].get(character, 0)
+            for pattern in self._outputs[state]:
+                yield index, pattern
+
+    def count_matches(self, text):
+        """
+        :return: Number of occurrences of each pattern found in the text.
+        :rtype: dict[basestring, int]
+        """
+        match_counts = {}
+        for _, pattern in self.iter_matches(text):
+            match_counts[pattern] = match_counts.get(pattern, 0) + 1
+        return match_counts
+
+    def _add_pattern(self, pattern):
+        if not pattern:
+            raise ValueError('Cannot search for an empty pattern.')
+        state = 0
+        for character in pattern:
+            next_state = self._transitions[state].get(character)
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions[state][character] = next_state
+                self._transitions.append({})
+                self._fallbacks.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(pattern)
+
+    def _build_fallbacks(self):
+        """
+        Link each state to the state of the longest proper suffix of its prefix which is also a
+        prefix of a pattern, in breadth-first order so that shorter prefixes are linked first.
+        """
+        states_to_link = deque(self._transitions[0].itervalues())
+        while states_to_link:
+            state = states_to_link.popleft()
+            for character, next_state in self._transitions[state].iteritems():
+                fallback = self._fallbacks[state]
+                while fallback and character not in self._transitions[fallback]:
+                    fallback = self._fallbacks[fallback]
+                next_fallback = self._transitions[fallback].get(character, 0)
+                self._fallbacks[next_state] = next_fallback
+                self._outputs[next_state] = \
+                    self._outputs[next_state] + self._outputs[next_fallback]
+                states_to_link.append(next_state)
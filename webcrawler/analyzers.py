@@ -1,44 +1,52 @@
+import itertools
 import os
 
+from webcrawler import metrics, utils
+from webcrawler.aho_corasick import AhoCorasickAutomaton
+from webcrawler.corpus import ArticleCorpusReader
+from webcrawler.index import InvertedIndex
+from webcrawler.query import (TextQuery, normalize_field_name, normalize_field_values,
+                              normalize_text)
 from webcrawler.raw_material import JsonRawMaterial
 
-
-def _get_lowered_list(iterable):
-    lowered_list = []
-    for element in iterable:
-        if isinstance(element, basestring):
-            lowered_list.append(element.lower())
-        else:
-            lowered_list.append(element)
-    return lowered_list
+# (Material type, directory path) -> index loaded by this process.
+_loaded_indexes = {}
+# (Text, case sensitive) -> literal query of `has_text`, since texts are usually searched in many
+# materials. Cleared when full.
+_has_text_queries = {}
+_MAX_HAS_TEXT_QUERIES = 1000
+# Up to this many texts, `search_for_texts_in_material_files` scans the material once per text,
+# which is faster than a single pass of the Aho-Corasick automaton up to about 500 texts (see its
+# docstring).
+_MAX_TEXTS_SCANNED_ONE_BY_ONE = 256
 
 
 def has_text(raw_material, text, case_sensitive=False):
-    """Whether the material contains a certain text."""
-    if not case_sensitive:
-        text = text.lower()
-    if hasattr(raw_material, 'to_text'):
-        return _has_text_in_text_material(raw_material, text, case_sensitive)
-    if isinstance(raw_material, JsonRawMaterial):
-        return _has_text_in_json_material(text, raw_material, case_sensitive)
-    raise NotImplementedError('No analyzer for this type of material.')
-
-
-def _has_text_in_text_material(raw_material, text, case_sensitive):
-    searched_text = raw_material.to_text()
-    if not case_sensitive:
-        searched_text = searched_text.lower()
-    return text in searched_text
+    """
+    Whether the material contains a certain text, searched as a literal `query.TextQuery`. The
+    query does not cache normalized material text, except in the search cache of material which has
+    one (flight landing updates, which are kept in memory by millions); to search other materials
+    many times, create a query with a cache and use its `matches`.
+    """
+    query_key = (text, case_sensitive)
+    query = _has_text_queries.get(query_key)
+    if query is None:
+        if len(_has_text_queries) >= _MAX_HAS_TEXT_QUERIES:
+            _has_text_queries.clear()
+        query = _has_text_queries[query_key] = TextQuery(text, case_sensitive=case_sensitive,
+                                                         cache=None)
+    return query.matches(raw_material)
 
 
-def _has_text_in_json_material(text, raw_material, case_sensitive):
-    material_dict = raw_material.to_dict()
-    searched_keys = material_dict.keys()
-    searched_values = material_dict.values()
-    if not case_sensitive:
-        searched_keys = _get_lowered_list(searched_keys)
-        searched_values = _get_lowered_list(searched_values)
-    return text in searched_keys or text in searched_values
+def _get_query(text, case_sensitive):
+    """
+    :return: The query, or a literal query of the text for materials loaded from files, which are
+        searched once and so are not cached.
+    :rtype: TextQuery
+    """
+    if isinstance(text, TextQuery):
+        return text
+    return TextQuery(text, case_sensitive=case_sensitive, cache=None)
 
 
 def search_for_text_in_material_files(material_type, file_paths, text, case_sensitive=False):
@@ -49,18 +57,23 @@ def search_for_text_in_material_files(material_type, file_paths, text, case_sens
     :type material_type: Subclass of `RawMaterial`
     :param file_paths: Paths of the files to search text in.
     :type file_paths: list[str]
-    :param text: Text to search
-    :type text: str
-    :param case_sensitive: Whether to search the text with matched case.
+    :param text: Text to search, or a query.
+    :type text: basestring | TextQuery
+    :param case_sensitive: Whether to search the text with matched case. Ignored for a query.
     :type case_sensitive: bool
     :return: List of file paths which contain the searched text.
     :rtype: list[str]
     """
+    query = _get_query(text, case_sensitive)
     files_with_text = []
-    for file_path in file_paths:
-        raw_material = material_type.load(file_path)
-        if has_text(raw_material, text, case_sensitive):
-            files_with_text.append(file_path)
+    with metrics.measure('analysis', analyzer='search_for_text'):
+        for file_path, raw_material in itertools.izip(file_paths,
+                                                      material_type.iter_load(file_paths)):
+            with metrics.measure('analyzer_match', analyzer='search_for_text'):
+                is_match = query.matches(raw_material)
+            if is_match:
+                files_with_text.append(file_path)
+    metrics.increment('analyzed_materials_total', len(file_paths), analyzer='search_for_text')
     return files_with_text
 
 
@@ -68,8 +81,178 @@ def search_for_text_in_material_directory(material_type, directory_path, text,
                                           case_sensitive=False):
     """
     Search for text in directory.
+    If the directory has an `InvertedIndex`, only files which may contain the text according to it
+    are searched (not for regular expression queries). The index is brought up to date first
+    whenever files were added to, removed from or replaced in the directory.
     Read `search_for_text_in_material_files` for further documentation.
     """
-    file_paths = [os.path.join(directory_path, file_name) for file_name in
-                  os.listdir(directory_path)]
-    return search_for_text_in_material_files(material_type, file_paths, text, case_sensitive)
+    query = _get_query(text, case_sensitive)
+    file_paths = None
+    if InvertedIndex.exists(directory_path) and query.mode != TextQuery.REGEX:
+        file_paths = _get_index(material_type, directory_path).get_candidate_file_paths(query.text)
+    if file_paths is None:
+        file_paths = utils.list_directory_files(directory_path)
+    return search_for_text_in_material_files(material_type, file_paths, query)
+
+
+def search_for_texts_in_material_files(material_type, file_paths, texts, case_sensitive=False):
+    """
+    Search for many texts at once, loading each file a single time.
+    A text is found in a JSON material in the same way as `has_text` finds it.
+
+    The text of each file is searched by a single pass of an Aho-Corasick automaton when there are
+    more than `_MAX_TEXTS_SCANNED_ONE_BY_ONE` texts, and otherwise by one scan per text. Although
+    the scans grow with the number of texts, they are built in, while the automaton runs in Python
+    at a cost per character: benchmarks/multi_text_search.py measured the automaton at 0.9-1.7ms
+    per synthetic article for any number of texts, and the scans at 0.05ms for 16 texts, 0.75ms for
+    255 and 1.6ms for 507 texts, where they cross. Searching 5000 article files (with loading them)
+    took 0.8s by scans and 7.5s by the automaton for 16 texts, 5.0s and 8.4s for 255 texts, and
+    16.5s and 8.8s for 1013 texts.
+
+    :param material_type: The type of material the files represent.
+    :type material_type: Subclass of `RawMaterial`
+    :param file_paths: Paths of the files to search texts in.
+    :type file_paths: list[str]
+    :param texts: Texts to search. An empty text is found in every file (like `has_text` finds
+        it), but its occurrences are not counted.
+    :type texts: list[basestring]
+    :param case_sensitive: Whether to search the texts with matched case.
+    :type case_sensitive: bool
+    :return: File paths which contain each text, and the number of times each text was found
+        (including overlapping occurrences).
+    :rtype: (dict[basestring, list[str]], dict[basestring, int])
+    """
+    texts_by_searched_text = {}
+    for text in texts:
+        searched_text = normalize_text(text, case_sensitive)
+        texts_by_searched_text.setdefault(searched_text, []).append(text)
+    empty_texts = texts_by_searched_text.pop(u'', [])
+    count_texts = _get_text_counter(texts_by_searched_text)
+    files_with_text = {text: [] for text in texts}
+    text_match_counts = {text: 0 for text in texts}
+    with metrics.measure('analysis', analyzer='search_for_texts'):
+        for file_path, raw_material in itertools.izip(file_paths,
+                                                      material_type.iter_load(file_paths)):
+            with metrics.measure('analyzer_match', analyzer='search_for_texts'):
+                match_counts = _count_texts(raw_material, count_texts, texts_by_searched_text,
+                                            case_sensitive)
+            for searched_text, match_count in match_counts.iteritems():
+                for text in texts_by_searched_text[searched_text]:
+                    files_with_text[text].append(file_path)
+                    text_match_counts[text] += match_count
+            for text in empty_texts:
+                files_with_text[text].append(file_path)
+    metrics.increment('analyzed_materials_total', len(file_paths), analyzer='search_for_texts')
+    return files_with_text, text_match_counts
+
+
+def _get_text_counter(searched_texts):
+    """
+    :param searched_texts: Non-empty normalized texts.
+    :return: Function of a normalized text returning the number of occurrences of each of the
+        searched texts found in it, by one scan of the text per searched text or, for many texts,
+        by a single pass of an Aho-Corasick automaton.
+    :rtype: (unicode) -> dict[unicode, int]
+    """
+    if len(searched_texts) > _MAX_TEXTS_SCANNED_ONE_BY_ONE:
+        return AhoCorasickAutomaton(searched_texts).count_matches
+    searched_texts = list(searched_texts)
+    return lambda text: _count_each_text(searched_texts, text)
+
+
+def _count_each_text(searched_texts, text):
+    """Same as `AhoCorasickAutomaton.count_matches`, scanning the text for one text at a time."""
+    match_counts = {}
+    for searched_text in searched_texts:
+        index = text.find(searched_text)
+        while index != -1:
+            match_counts[searched_text] = match_counts.get(searched_text, 0) + 1
+            index = text.find(searched_text, index + 1)
+    return match_counts
+
+
+def _count_texts(raw_material, count_texts, searched_texts, case_sensitive):
+    """
+    :param count_texts: Counter of the searched texts, see `_get_text_counter`.
+    :param searched_texts: Normalized texts searched by the counter.
+    :return: Number of occurrences of each searched text in the material.
+    """
+    if hasattr(raw_material, 'to_text'):
+        return count_texts(normalize_text(raw_material.to_text(), case_sensitive))
+    if isinstance(raw_material, JsonRawMaterial):
+        # Values are searched in their text (in which no match spans two of them), and field names
+        # are found only when equal to a searched text.
+        material_dict = raw_material.to_dict()
+        match_counts = count_texts(normalize_field_values(material_dict, case_sensitive))
+        for field in material_dict:
+            normalized_field = normalize_field_name(field, case_sensitive)
+            if normalized_field in searched_texts:
+                match_counts[normalized_field] = match_counts.get(normalized_field, 0) + 1
+        return match_counts
+    raise NotImplementedError('No analyzer for this type of material.')
+
+
+def search_for_texts_in_material_directory(material_type, directory_path, texts,
+                                           case_sensitive=False):
+    """
+    Search for many texts in directory, using its `InvertedIndex` if it has one.
+    Read `search_for_texts_in_material_files` for further documentation.
+    """
+    file_paths = None
+    if InvertedIndex.exists(directory_path):
+        index = _get_index(material_type, directory_path)
+        candidate_file_paths = set()
+        for text in texts:
+            text_candidate_file_paths = index.get_candidate_file_paths(text)
+            if text_candidate_file_paths is None:
+                candidate_file_paths = None
+                break
+            candidate_file_paths.update(text_candidate_file_paths)
+        file_paths = candidate_file_paths
+    if file_paths is None:
+        file_paths = utils.list_directory_files(directory_path)
+    return search_for_texts_in_material_files(material_type, sorted(file_paths), texts,
+                                              case_sensitive)
+
+
+def search_for_text_in_corpus(corpus_directory_path, text, case_sensitive=False):
+    """
+    Search for text in the articles of a corpus written by `corpus.ArticleCorpusWriter`.
+
+    :return: Ids of the articles which contain the searched text.
+    :rtype: list[unicode]
+    """
+    query = _get_query(text, case_sensitive)
+    with metrics.measure('analysis', analyzer='search_for_text_in_corpus'):
+        with ArticleCorpusReader(corpus_directory_path) as corpus_reader:
+            article_ids = [article_id for article_id, raw_article in corpus_reader.iter_articles()
+                           if query.matches(raw_article)]
+            metrics.increment('analyzed_materials_total', len(corpus_reader),
+                              analyzer='search_for_text_in_corpus')
+    return article_ids
+
+
+def index_material_directory(material_type, directory_path):
+    """
+    Create or fully update an `InvertedIndex` of the directory, making later searches in it faster.
+
+    :rtype: webcrawler.index.InvertedIndex
+    """
+    index = _get_index(material_type, directory_path)
+    index.update()
+    return index
+
+
+def _get_index(material_type, directory_path):
+    """
+    :return: Index of the directory, loaded once by this process and updated with the files whose
+        size or modification time changed since they were indexed. The time of the directory is not
+        enough, since it does not change when a file is rewritten in place.
+    :rtype: webcrawler.index.InvertedIndex
+    """
+    index_key = (material_type, os.path.abspath(directory_path))
+    index = _loaded_indexes.get(index_key)
+    if index is None:
+        index = _loaded_indexes[index_key] = InvertedIndex(directory_path, material_type)
+    index.update()
+    return index
@@ -1,9 +1,17 @@
+import calendar
+import contextlib
 from datetime import datetime
+import os
 import re
+import tempfile
 
 WEB_SCRAPPING_PARSER = 'html.parser'
+LXML_PARSER = 'lxml'
 HOUR_REGEX = r'([01]\d|2[0-3]):[0-5]\d'
 AIRPORT_SCHEDULE_UPDATE_TAG_ID = 'ctl00_rptIncomingFlights_ctl00_pInformationStatusMessage'
+# Mask of the permissions of new files, read once since reading it means setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 
 def extract_airport_schedule_update_time(update_message):
@@ -18,3 +26,49 @@ def extract_airport_schedule_update_time(update_message):
     last_update_hour_string = re.search(HOUR_REGEX, update_message).group(0)
     hour, seconds = map(int, last_update_hour_string.split(':'))
     return datetime(year, month, day, hour, seconds)
+
+
+def to_unicode(text):
+    """Convert text (or any other value) to unicode, decoding byte strings as UTF-8."""
+    if isinstance(text, str):
+        return text.decode('utf-8', 'replace')
+    return unicode(text)
+
+
+def datetime_to_timestamp(time):
+    """
+    :param time: Naive datetime, converted as is without time zone conversions.
+    :type time: datetime
+    :return: Whole seconds since epoch.
+    :rtype: int
+    """
+    return calendar.timegm(time.timetuple())
+
+
+def timestamp_to_datetime(timestamp):
+    """Reverse of `datetime_to_timestamp`."""
+    return datetime.utcfromtimestamp(timestamp)
+
+
+@contextlib.contextmanager
+def atomic_write(file_path, mode='w'):
+    """
+    Open a file for writing so that it is replaced only when fully written. The content is written
+    to a hidden temporary file in the same directory, which is renamed to the file on success and
+    removed on failure, so a crash midway leaves either the previous file or the new one.
+    The temporary file is unique, so that several writers of the same file do not collide (the
+    last to finish replaces the others' file).
+    """
+    directory_path, file_name = os.path.split(file_path)
+    temporary_file_descriptor, temporary_file_path = tempfile.mkstemp(
+        prefix='.%s.' % file_name, suffix='.tmp', dir=directory_path or '.')
+    try:
+        with os.fdopen(temporary_file_descriptor, mode) as temporary_file:
+            # Created readable by its owner only, so it is given the permissions of a new file.
+            os.chmod(temporary_file_path, 0o666 & ~_UMASK)
+            yield temporary_file
+        os.rename(temporary_file_path, file_path)
+    except BaseException:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+        raise
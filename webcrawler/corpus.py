@@ -0,0 +1,198 @@
+import json
+import os
+import struct
+import zlib
+
+from webcrawler import utils
+from webcrawler.common import to_unicode
+from webcrawler.raw_material import BBCRawArticle
+
+_RECORD_HEADER_FORMAT = '<IB'
+_RECORD_HEADER_SIZE = struct.calcsize(_RECORD_HEADER_FORMAT)
+_NO_COMPRESSION = 0
+_ZLIB_COMPRESSION = 1
+COMPRESSION_METHODS = {None: _NO_COMPRESSION, 'zlib': _ZLIB_COMPRESSION}
+
+SEGMENT_FILE_EXTENSION = '.articles'
+INDEX_FILE_NAME = 'index.tsv'
+
+
+def _get_segment_file_name(segment_number):
+    return 'segment_{number:08d}{extension}'.format(number=segment_number,
+                                                    extension=SEGMENT_FILE_EXTENSION)
+
+
+class ArticleCorpusWriter(object):
+    """
+    Appends BBC articles to a corpus directory.
+
+    Articles are stored as records in segment files: each record holds the length of its payload,
+    its compression method and the payload - the article as JSON, so article text can contain
+    anything. The location of every article is appended to an index file, which allows reading any
+    article without scanning the segments. Adding an article with an existing id replaces it.
+    Use as a context manager, or call `close` when done.
+    """
+
+    def __init__(self, directory_path, compression=None, max_segment_bytes=64 * 2 ** 20):
+        """
+        :param compression: Compression method of new records, one of `COMPRESSION_METHODS`.
+        :param max_segment_bytes: Size from which articles are written to a new segment file.
+        """
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError('Unknown compression method: %s' % compression)
+        if not os.path.exists(directory_path):
+            os.mkdir(directory_path)
+        self.directory_path = directory_path
+        self._compression_method = COMPRESSION_METHODS[compression]
+        self._max_segment_bytes = max_segment_bytes
+        segment_file_names = sorted(file_name for file_name in os.listdir(directory_path) if
+                                    file_name.endswith(SEGMENT_FILE_EXTENSION))
+        self._segment_number = len(segment_file_names) - 1 if segment_file_names else 0
+        self._segment_file = self._open_segment_file()
+        self._index_file = open(os.path.join(directory_path, INDEX_FILE_NAME), 'a')
+
+    def add(self, article_id, raw_article):
+        """
+        :param article_id: Unique name of the article, without tabs or new lines.
+        :type article_id: basestring
+        :type raw_article: BBCRawArticle
+        """
+        if self._segment_file.tell() >= self._max_segment_bytes:
+            self._segment_file.close()
+            self._segment_number += 1
+            self._segment_file = self._open_segment_file()
+        payload = json.dumps([to_unicode(article_id), to_unicode(raw_article.header),
+                              to_unicode(raw_article.introduction),
+                              [to_unicode(paragraph) for paragraph in raw_article.paragraphs]])
+        if self._compression_method == _ZLIB_COMPRESSION:
+            payload = zlib.compress(payload)
+        record_offset = self._segment_file.tell()
+        self._segment_file.write(struct.pack(_RECORD_HEADER_FORMAT, len(payload),
+                                             self._compression_method))
+        self._segment_file.write(payload)
+        # The record must be in the file before the index points at it.
+        self._segment_file.flush()
+        self._index_file.write('{article_id}\t{segment}\t{offset}\n'.format(
+            article_id=to_unicode(article_id).encode('utf-8'), segment=self._segment_number,
+            offset=record_offset))
+
+    def save_raw_material(self, downloaded_file_path, raw_materials, directory_path=None):
+        """
+        Add an article extracted from a downloaded file, using the file name as article id.
+        Can be used as the writer of `extraction.extract_directory`, ignoring its directory.
+        """
+        article_id = os.path.splitext(os.path.basename(downloaded_file_path))[0]
+        self.add(article_id, raw_materials[0])
+
+    def flush(self):
+        self._segment_file.flush()
+        self._index_file.flush()
+
+    def close(self):
+        self._segment_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _open_segment_file(self):
+        segment_file = open(os.path.join(self.directory_path,
+                                         _get_segment_file_name(self._segment_number)), 'ab')
+        # Position is not necessarily at the end before the first write.
+        segment_file.seek(0, os.SEEK_END)
+        return segment_file
+
+
+class ArticleCorpusReader(object):
+    """Reads articles from a corpus directory written by `ArticleCorpusWriter`."""
+
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        # Article id -> (segment number, record offset).
+        self._article_locations = {}
+        index_file_path = os.path.join(directory_path, INDEX_FILE_NAME)
+        if os.path.exists(index_file_path):
+            with open(index_file_path) as index_file:
+                for line in index_file:
+                    if not line.endswith('\n'):
+                        # Last line was not fully written, and so wasn't its record.
+                        break
+                    article_id, segment_number, offset = line[:-1].split('\t')
+                    self._article_locations[article_id.decode('utf-8')] = (int(segment_number),
+                                                                           int(offset))
+        self._segment_files = {}
+
+    def __len__(self):
+        return len(self._article_locations)
+
+    def __contains__(self, article_id):
+        return to_unicode(article_id) in self._article_locations
+
+    @property
+    def article_ids(self):
+        return self._article_locations.keys()
+
+    def get(self, article_id):
+        """
+        :rtype: BBCRawArticle
+        :raise KeyError: If there is no article with the id in the corpus.
+        """
+        segment_number, offset = self._article_locations[to_unicode(article_id)]
+        segment_file = self._get_segment_file(segment_number)
+        segment_file.seek(offset)
+        return self._read_record(segment_file)[1]
+
+    def iter_articles(self):
+        """
+        Read all articles in the order they are stored, skipping articles that were replaced.
+        :rtype: collections.Iterator[(unicode, BBCRawArticle)]
+        """
+        article_ids_by_location = sorted((location, article_id) for article_id, location in
+                                         self._article_locations.iteritems())
+        for (segment_number, offset), article_id in article_ids_by_location:
+            segment_file = self._get_segment_file(segment_number)
+            if segment_file.tell() != offset:
+                segment_file.seek(offset)
+            yield article_id, self._read_record(segment_file)[1]
+
+    def close(self):
+        for segment_file in self._segment_files.itervalues():
+            segment_file.close()
+        self._segment_files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_segment_file(self, segment_number):
+        if segment_number not in self._segment_files:
+            self._segment_files[segment_number] = open(
+                os.path.join(self.directory_path, _get_segment_file_name(segment_number)), 'rb')
+        return self._segment_files[segment_number]
+
+    @staticmethod
+    def _read_record(segment_file):
+        """:return: Article id and article of the record at the current position."""
+        payload_length, compression_method = struct.unpack(
+            _RECORD_HEADER_FORMAT, segment_file.read(_RECORD_HEADER_SIZE))
+        payload = segment_file.read(payload_length)
+        if compression_method == _ZLIB_COMPRESSION:
+            payload = zlib.decompress(payload)
+        article_id, header, introduction, paragraphs = json.loads(payload)
+        return article_id, BBCRawArticle(header, introduction, paragraphs)
+
+
+def convert_article_directory(directory_path, corpus_writer):
+    """
+    Add articles dumped as files by `BBCRawArticle.dump` to a corpus, using file names as ids.
+
+    :type corpus_writer: ArticleCorpusWriter
+    """
+    for file_path in utils.list_directory_files(directory_path):
+        article_id = os.path.splitext(os.path.basename(file_path))[0]
+        corpus_writer.add(article_id, BBCRawArticle.load(file_path))
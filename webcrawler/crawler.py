@@ -0,0 +1,269 @@
+import abc
+import heapq
+import itertools
+import robotparser
+import threading
+import time
+import urlparse
+import warnings
+
+import requests
+
+from webcrawler import metrics
+from webcrawler.url_store import normalize_url
+
+
+class UrlFrontier(object):
+    """
+    Thread-safe queue of URLs waiting to be crawled, ordered by priority (lower first) and then by
+    the order they were added. URLs are normalized (see `url_store.normalize_url`), and every URL
+    is queued at most once, even after it was taken out.
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._seen_urls = set()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._queue)
+
+    def add(self, url, priority=0, depth=0):
+        """
+        :param depth: Number of links followed from a start URL to reach the URL.
+        :return: Whether the URL was queued, False if it was already seen.
+        :rtype: bool
+        """
+        url = normalize_url(url)
+        with self._lock:
+            if url in self._seen_urls:
+                return False
+            self._seen_urls.add(url)
+            heapq.heappush(self._queue, (priority, next(self._order), url, depth))
+            return True
+
+    def pop(self):
+        """
+        :return: URL with the highest priority and its depth, None if the frontier is empty.
+        :rtype: (str, int)
+        """
+        with self._lock:
+            if not self._queue:
+                return None
+            _, _, url, depth = heapq.heappop(self._queue)
+            return url, depth
+
+
+class PolitenessScheduler(object):
+    """
+    Keeps a crawl polite to every domain: requests to the same domain are spaced by a minimal
+    interval, and URLs disallowed by the domain's robots.txt are not crawled. The robots.txt of
+    every domain is fetched once and cached. Concurrent requests per domain are capped by the
+    fetcher (see `HttpFetcher.max_connections_per_host`).
+    """
+
+    def __init__(self, fetcher, seconds_between_requests=0, user_agent='*', obey_robots=True):
+        """
+        :type fetcher: webcrawler.fetcher.HttpFetcher
+        :param seconds_between_requests: Minimal time between the start of two requests to the
+            same domain.
+        :param user_agent: User agent whose robots.txt rules are obeyed.
+        """
+        self.fetcher = fetcher
+        self.seconds_between_requests = seconds_between_requests
+        self.user_agent = user_agent
+        self.obey_robots = obey_robots
+        # Domain -> earliest time of the next request to it.
+        self._next_request_times = {}
+        self._next_request_times_lock = threading.Lock()
+        # Domain -> parsed robots.txt.
+        self._robots_parsers = {}
+        self._robots_parsers_lock = threading.Lock()
+
+    def is_allowed(self, url):
+        """Whether robots.txt of the URL's domain allows crawling it."""
+        if not self.obey_robots:
+            return True
+        return self._get_robots_parser(url).can_fetch(self.user_agent, url)
+
+    def wait_for_turn(self, url):
+        """Block until a request to the URL's domain can be sent."""
+        if not self.seconds_between_requests:
+            return
+        domain = urlparse.urlparse(url).netloc
+        with self._next_request_times_lock:
+            current_time = time.time()
+            request_time = max(current_time, self._next_request_times.get(domain, 0))
+            self._next_request_times[domain] = request_time + self.seconds_between_requests
+        if request_time > current_time:
+            metrics.increment('sleep_seconds_total', request_time - current_time,
+                              reason='politeness')
+            time.sleep(request_time - current_time)
+
+    def _get_robots_parser(self, url):
+        scheme, domain = urlparse.urlparse(url)[:2]
+        with self._robots_parsers_lock:
+            if domain in self._robots_parsers:
+                return self._robots_parsers[domain]
+            # Fetched under the lock, so every robots.txt is fetched only once.
+            robots_parser = robotparser.RobotFileParser('%s://%s/robots.txt' % (scheme, domain))
+            try:
+                response = self.fetcher.fetch(robots_parser.url)
+            except requests.RequestException:
+                response = None
+            # Same rules as `RobotFileParser.read`: no robots.txt allows everything, while an
+            # unauthorized one disallows everything.
+            if response is not None and response.status_code in (401, 403):
+                robots_parser.disallow_all = True
+            elif response is not None and response.status_code < 400:
+                robots_parser.parse(response.text.splitlines())
+            else:
+                robots_parser.allow_all = True
+            self._robots_parsers[domain] = robots_parser
+            return robots_parser
+
+
+class CrawlPolicy(object):
+    """
+    Decides what a crawl does with every page: how it is requested, how it is saved and which of
+    its links are followed.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def get_request_headers(self, url):
+        """:return: Extra HTTP headers of the request for the URL."""
+        return None
+
+    @abc.abstractmethod
+    def handle_response(self, url, response):
+        """
+        Process the response of a crawled URL, e.g. save it.
+
+        :type response: requests.Response
+        """
+
+    @abc.abstractmethod
+    def select_links(self, url, page_source):
+        """
+        :return: URLs linked from the page which should be crawled, with their priority (lower is
+            crawled first).
+        :rtype: collections.Iterable[(str, int)]
+        """
+
+
+class CrawlStats(object):
+    """Summary of a crawl."""
+
+    def __init__(self):
+        self.crawled_url_count = 0
+        self.failed_urls = []
+        self.disallowed_urls = []
+        self.elapsed_seconds = 0.0
+
+    @property
+    def urls_per_minute(self):
+        if not self.elapsed_seconds:
+            return 0.0
+        return 60 * self.crawled_url_count / self.elapsed_seconds
+
+
+class CrawlEngine(object):
+    """
+    Crawls pages starting from a set of URLs, following links chosen by a crawl policy up to a
+    maximal depth. URLs are taken from a `UrlFrontier` by the fetcher's workers, each waiting for
+    its turn on the domain of its URL by a `PolitenessScheduler`.
+    """
+
+    def __init__(self, fetcher, policy, scheduler=None, max_depth=1, max_urls=None):
+        """
+        :type fetcher: webcrawler.fetcher.HttpFetcher
+        :type policy: CrawlPolicy
+        :param scheduler: Scheduler of requests, defaults to one obeying robots.txt without delays.
+        :type scheduler: PolitenessScheduler
+        :param max_depth: Number of links followed from the start URLs, 0 crawls only them.
+        :param max_urls: Maximal number of URLs to crawl, unlimited if None.
+        """
+        self.fetcher = fetcher
+        self.policy = policy
+        self.scheduler = scheduler or PolitenessScheduler(fetcher)
+        self.max_depth = max_depth
+        self.max_urls = max_urls
+        self.frontier = UrlFrontier()
+        self._stats = None
+        self._started_url_count = 0
+        self._urls_in_progress = 0
+        self._condition = threading.Condition()
+
+    def crawl(self, start_urls):
+        """
+        Crawl until no URLs are left to crawl or `max_urls` were crawled.
+
+        :type start_urls: collections.Iterable[str]
+        :rtype: CrawlStats
+        """
+        self._stats = CrawlStats()
+        self._started_url_count = 0
+        for url in start_urls:
+            self.frontier.add(url)
+        start_time = time.time()
+        workers = [threading.Thread(target=self._work) for _ in
+                   xrange(max(self.fetcher.workers, 1))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self._stats.elapsed_seconds = time.time() - start_time
+        return self._stats
+
+    def _work(self):
+        while True:
+            with self._condition:
+                frontier_entry = self._take_next_url()
+                while frontier_entry is None and self._urls_in_progress:
+                    # URLs being crawled by other workers may add links to the frontier.
+                    self._condition.wait()
+                    frontier_entry = self._take_next_url()
+                if frontier_entry is None:
+                    self._condition.notify_all()
+                    return
+                self._urls_in_progress += 1
+            try:
+                self._crawl_url(*frontier_entry)
+            finally:
+                with self._condition:
+                    self._urls_in_progress -= 1
+                    self._condition.notify_all()
+
+    def _take_next_url(self):
+        if self.max_urls is not None and self._started_url_count >= self.max_urls:
+            return None
+        frontier_entry = self.frontier.pop()
+        if frontier_entry is not None:
+            self._started_url_count += 1
+        return frontier_entry
+
+    def _crawl_url(self, url, depth):
+        # Any error (of the request, robots.txt or the policy) fails only its URL, so that one bad
+        # page does not stop the worker and the rest of the crawl.
+        try:
+            if not self.scheduler.is_allowed(url):
+                with self._condition:
+                    self._stats.disallowed_urls.append(url)
+                return
+            self.scheduler.wait_for_turn(url)
+            response = self.fetcher.fetch(url, headers=self.policy.get_request_headers(url))
+            self.policy.handle_response(url, response)
+            links = []
+            if depth < self.max_depth and response.status_code == requests.codes.ok:
+                links = list(self.policy.select_links(url, response.text))
+        except Exception as error:
+            warnings.warn('Could not crawl %s: %s' % (url, error))
+            with self._condition:
+                self._stats.failed_urls.append(url)
+            return
+        with self._condition:
+            self._stats.crawled_url_count += 1
+        for link_url, priority in links:
+            self.frontier.add(link_url, priority, depth + 1)
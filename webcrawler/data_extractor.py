@@ -1,30 +1,126 @@
 import abc
+import hashlib
+import os
+import re
 
-from bs4 import BeautifulSoup
+import lxml.html
+from bs4 import BeautifulSoup, UnicodeDammit
+from lxml import etree
 
-from webcrawler import common
+from webcrawler import common, metrics, utils
 from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
 
+# Parts of pages which may differ between copies of the same page: scripts, styles and comments.
+_VOLATILE_MARKUP_REGEX = re.compile(r'<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->',
+                                    re.DOTALL | re.IGNORECASE)
+_SCHEDULE_PAGE_NUMBER_REGEX = re.compile(r'_page(\d+)_')
+
+
+def _has_class_xpath(class_name):
+    """XPath predicate of elements having a class, the same way BeautifulSoup matches classes."""
+    return "contains(concat(' ', normalize-space(@class), ' '), ' %s ')" % class_name
+
+
+def _lxml_text(element):
+    return unicode(element.text_content())
+
+
+def _find_first(xpath, element):
+    found_elements = xpath(element)
+    return found_elements[0] if found_elements else None
+
 
 class MaterialExtractor(object):
     """Extracts relevant raw data from downloaded files."""
     __metaclass__ = abc.ABCMeta
+    # Increase when the extracted material changes, so that files are extracted again (see
+    # `webcrawler.ledger.ExtractionLedger`).
+    VERSION = 1
 
-    def __init__(self, downloaded_file_path):
+    def __init__(self, downloaded_file_path, parser=common.WEB_SCRAPPING_PARSER, cache=None):
+        """
+        :param parser: Name of the BeautifulSoup parser used to parse the file.
+            `common.LXML_PARSER` uses lxml directly with precompiled XPath selectors, which is
+            several times faster and extracts the same material.
+        :param cache: Cache of the content and parsed trees of files, e.g.
+            `extraction_cache.parsed_file_cache`, so that extracting the same files again reads
+            and parses each of them once. None (the default) reads and parses the file every
+            time.
+        :type cache: webcrawler.extraction_cache.ParsedFileCache
+        """
         self.downloaded_file_path = downloaded_file_path
-        self._file_content = ''
+        self.parser = parser
+        self.cache = cache
+        self._file_content = None
 
     @property
     def downloaded_file_content(self):
-        if self._file_content:
-            return self._file_content
-        with open(self.downloaded_file_path) as downloaded_file:
-            return downloaded_file.read()
+        if self._file_content is None:
+            if self.cache is not None:
+                self._file_content = self.cache.get_content(self.downloaded_file_path)
+            else:
+                with open(self.downloaded_file_path) as downloaded_file:
+                    self._file_content = downloaded_file.read()
+        return self._file_content
 
     def reload_file(self):
-        self._file_content = ''
+        self._file_content = None
+        if self.cache is not None:
+            self.cache.discard(self.downloaded_file_path)
         return self.downloaded_file_content
 
+    def _parse_soup(self):
+        return self._parse(self.parser, self._parse_content_soup)
+
+    def _parse_content_soup(self, file_content):
+        with metrics.measure('parse', parser=self.parser, source=type(self).__name__):
+            return BeautifulSoup(file_content, self.parser)
+
+    def _parse_lxml_document(self):
+        return self._parse(common.LXML_PARSER, self._parse_content_lxml_document)
+
+    def _parse_content_lxml_document(self, file_content):
+        with metrics.measure('parse', parser=common.LXML_PARSER, source=type(self).__name__):
+            markup = UnicodeDammit(file_content, is_html=True).unicode_markup
+            return lxml.html.document_fromstring(markup)
+
+    def _parse(self, parser, parse_content):
+        if self.cache is None:
+            return parse_content(self.downloaded_file_content)
+        return self.cache.get_tree(self.downloaded_file_path, parser, parse_content)
+
+    def extract_and_measure(self, result_cache=None):
+        """
+        Same as `extract_raw_material`, recording the extraction time, the extracted material and
+        the size of the file in the metrics (see `webcrawler.metrics`).
+
+        :param result_cache: Cache of extracted material, from which material of content extracted
+            before is loaded instead of extracting it, and to which new material is added.
+        :type result_cache: webcrawler.extraction_cache.ExtractionResultCache
+        """
+        if result_cache is None:
+            return self._extract_and_measure()
+        content_hash = hashlib.sha1(self.downloaded_file_content).hexdigest()
+        raw_materials = result_cache.get(content_hash, type(self))
+        if raw_materials is not None:
+            metrics.increment('extraction_cache_hits_total', extractor=type(self).__name__)
+            return raw_materials
+        raw_materials = self._extract_and_measure()
+        result_cache.put(content_hash, type(self), raw_materials)
+        return raw_materials
+
+    def _extract_and_measure(self):
+        if not metrics.is_enabled():
+            return self.extract_raw_material()
+        extractor = type(self).__name__
+        with metrics.measure('extraction', extractor=extractor):
+            raw_materials = self.extract_raw_material()
+        metrics.increment('extracted_files_total', extractor=extractor)
+        metrics.increment('extracted_bytes_total', os.path.getsize(self.downloaded_file_path),
+                          extractor=extractor)
+        metrics.increment('raw_materials_total', len(raw_materials), extractor=extractor)
+        return raw_materials
+
     @abc.abstractmethod
     def extract_raw_material(self):
         """
@@ -32,39 +128,181 @@ class MaterialExtractor(object):
         :rtype: list[newscollector.raw_material.RawMaterial]
         """
 
+    @classmethod
+    def get_content_hash(cls, content):
+        """
+        :param content: Content of a downloaded file.
+        :type content: str
+        :return: Hash of the content without its scripts, styles, comments and whitespace, equal for
+            copies of a page which differ only by them, used to skip extraction of duplicates (see
+            `webcrawler.dedup.ExtractionDeduplicator`).
+        :rtype: str
+        """
+        return hashlib.sha1(' '.join(_VOLATILE_MARKUP_REGEX.sub('', content).split())).hexdigest()
+
+    @classmethod
+    def get_deduplication_scope(cls, downloaded_file_path):
+        """
+        :return: Scope of the downloaded files a file is a duplicate of, if their content hash is
+            equal: None if it is a duplicate of any file extracted before, or a name of a series
+            of snapshots (e.g. of the same page) if it is a duplicate only of the previous
+            snapshot of the series.
+        :rtype: str | None
+        """
+        return None
+
+    @classmethod
+    def save_raw_material(cls, downloaded_file_path, raw_materials, directory_path):
+        """
+        Save raw material extracted from a downloaded file to a directory.
+
+        :param downloaded_file_path: Path of the file the material was extracted from.
+        :param raw_materials: Raw material returned by `extract_raw_material`.
+        :type raw_materials: list[webcrawler.raw_material.RawMaterial]
+        """
+        raise NotImplementedError('No saving method for material of this extractor.')
+
 
 class BBCNewsExtractor(MaterialExtractor):
     """Extracts `BBCRawArticle` from an HTML file of an article downloaded from BBC website."""
+    _STORY_BODY_XPATH = etree.XPath('//div[%s]' % _has_class_xpath('story-body'))
+    _HEADER_XPATH = etree.XPath('.//h1[%s]' % _has_class_xpath('story-body__h1'))
+    _INTRODUCTION_XPATH = etree.XPath('.//p[%s]' % _has_class_xpath('story-body__introduction'))
+    _PARAGRAPH_CANDIDATES_XPATH = etree.XPath('.//*[self::p or self::h2]')
 
     def extract_raw_material(self):
-        soup = BeautifulSoup(self.downloaded_file_content, common.WEB_SCRAPPING_PARSER)
+        if self.parser == common.LXML_PARSER:
+            return self._extract_raw_material_with_lxml()
+        soup = self._parse_soup()
         story_body = soup.find(name='div', attrs={'class': 'story-body'})
         article_header = story_body.find(name='h1', attrs={'class': 'story-body__h1'}).text
-        article_introduction = story_body.find(name='p',
-                                               attrs={'class': 'story-body__introduction'}).text
-        article_paragraph_tags = story_body.find_all(
-            name=['p', 'h2'],
-            attrs={'aria-hidden': '', 'class': self._is_class_name_of_article_content})
-        article_paragraphs = [tag.text for tag in article_paragraph_tags]
+        introduction_tag = story_body.find(name='p', attrs={'class': 'story-body__introduction'})
+        # Some articles (e.g. short updates) have no introduction.
+        article_introduction = introduction_tag.text if introduction_tag is not None else u''
+        article_paragraph_tags = story_body.find_all(name=['p', 'h2'], attrs={'aria-hidden': ''})
+        article_paragraphs = [tag.text for tag in article_paragraph_tags if
+                              self._is_article_content_class_names(tag.get('class') or [])]
+        return [BBCRawArticle(article_header, article_introduction, article_paragraphs)]
+
+    def _extract_raw_material_with_lxml(self):
+        story_body = _find_first(self._STORY_BODY_XPATH, self._parse_lxml_document())
+        article_header = _lxml_text(_find_first(self._HEADER_XPATH, story_body))
+        introduction_element = _find_first(self._INTRODUCTION_XPATH, story_body)
+        article_introduction = _lxml_text(introduction_element) if \
+            introduction_element is not None else u''
+        article_paragraphs = [_lxml_text(element) for element in
+                              self._PARAGRAPH_CANDIDATES_XPATH(story_body)
+                              if self._is_article_content_element(element)]
         return [BBCRawArticle(article_header, article_introduction, article_paragraphs)]
 
+    @classmethod
+    def _is_article_content_element(cls, element):
+        """Same filter as the BeautifulSoup search for paragraphs, applied to an lxml element."""
+        if element.get('aria-hidden'):
+            return False
+        return cls._is_article_content_class_names(element.get('class', '').split())
+
+    @classmethod
+    def save_raw_material(cls, downloaded_file_path, raw_materials, directory_path):
+        """Save the article as a text file named after the downloaded file."""
+        raw_article_file_name = os.path.splitext(os.path.basename(downloaded_file_path))[0] + '.txt'
+        raw_materials[0].dump(os.path.join(directory_path, raw_article_file_name))
+
     @staticmethod
-    def _is_class_name_of_article_content(html_tag_class_name):
-        return html_tag_class_name is None or (
-                html_tag_class_name != 'story-body__introduction' and
-                'twite' not in html_tag_class_name)
+    def _is_article_content_class_names(class_names):
+        """
+        :param class_names: Classes of a paragraph of the story body.
+        :return: Whether the paragraph is article content: neither the introduction nor part of an
+            embedded tweet, by any of its classes.
+        """
+        return not any(class_name == 'story-body__introduction' or 'twite' in class_name for
+                       class_name in class_names)
 
 
 class FlightLandingScheduleExtractor(MaterialExtractor):
     """Extracts `FlightLandingUpdate` objects from a single HTML file of landing schedule."""
+    _SCHEDULE_UPDATE_XPATH = etree.XPath('//*[@id="%s"]' % common.AIRPORT_SCHEDULE_UPDATE_TAG_ID)
+    _LANDING_ROWS_XPATH = etree.XPath('//tr[%s or %s]' % (_has_class_xpath('odd'),
+                                                          _has_class_xpath('even')))
+    _FLIGHT_NUMBER_XPATH = etree.XPath('.//td[%s]' % _has_class_xpath('FlightNum'))
+    _FLIGHT_FROM_XPATH = etree.XPath('.//td[%s]//span' % _has_class_xpath('FlightFrom'))
+    _PLANNED_TIME_XPATH = etree.XPath('.//td[%s]' % _has_class_xpath('FlightTime'))
+    _UPDATED_TIME_XPATH = etree.XPath('.//td[%s]' % _has_class_xpath('finalTime'))
+    _LOCAL_TERMINAL_XPATH = etree.XPath('.//td[%s]' % _has_class_xpath('localTerminal'))
+    _STATUS_XPATH = etree.XPath('.//td[%s]//div' % _has_class_xpath('status'))
+    _LOGO_IMAGE_XPATH = etree.XPath('.//img[%s]' % _has_class_xpath('logoImg'))
+    _NO_ICON_COMPANY_XPATH = etree.XPath('.//td[%s]//span[%s]' % (_has_class_xpath('flightIcons'),
+                                                                  _has_class_xpath('noIcon')))
 
     def extract_raw_material(self):
-        soup = BeautifulSoup(self.downloaded_file_content, common.WEB_SCRAPPING_PARSER)
+        if self.parser == common.LXML_PARSER:
+            return self._extract_raw_material_with_lxml()
+        soup = self._parse_soup()
         schedule_update_message = soup.find(id=common.AIRPORT_SCHEDULE_UPDATE_TAG_ID).text
         schedule_update_time = common.extract_airport_schedule_update_time(schedule_update_message)
         all_landing_tags = soup.find_all(name='tr', attrs={'class': ['odd', 'even']})[1:]
         return [self._extract_landing_update(tag, schedule_update_time) for tag in all_landing_tags]
 
+    def _extract_raw_material_with_lxml(self):
+        document = self._parse_lxml_document()
+        schedule_update_message = _lxml_text(_find_first(self._SCHEDULE_UPDATE_XPATH, document))
+        schedule_update_time = common.extract_airport_schedule_update_time(schedule_update_message)
+        all_landing_rows = self._LANDING_ROWS_XPATH(document)[1:]
+        return [self._extract_landing_update_with_lxml(row, schedule_update_time) for row in
+                all_landing_rows]
+
+    @classmethod
+    def _extract_landing_update_with_lxml(cls, landing_html_row, schedule_update_time):
+        logo_image = _find_first(cls._LOGO_IMAGE_XPATH, landing_html_row)
+        if logo_image is not None:
+            flight_company = unicode(logo_image.get('alt').strip())
+        else:
+            flight_company = _lxml_text(
+                _find_first(cls._NO_ICON_COMPANY_XPATH, landing_html_row)).strip()
+        flight_number = _lxml_text(_find_first(cls._FLIGHT_NUMBER_XPATH, landing_html_row)).strip()
+        flight_from = _lxml_text(_find_first(cls._FLIGHT_FROM_XPATH, landing_html_row)).strip()
+        planned_time = _lxml_text(_find_first(cls._PLANNED_TIME_XPATH, landing_html_row)).strip()
+        updated_time = _lxml_text(_find_first(cls._UPDATED_TIME_XPATH, landing_html_row)).strip()
+        local_terminal = int(_lxml_text(_find_first(cls._LOCAL_TERMINAL_XPATH, landing_html_row)))
+        status = _lxml_text(_find_first(cls._STATUS_XPATH, landing_html_row)).strip()
+        return FlightLandingUpdate(schedule_update_time, flight_company, flight_number, flight_from,
+                                   planned_time, updated_time, local_terminal, status)
+
+    @classmethod
+    def save_raw_material(cls, downloaded_file_path, raw_materials, directory_path):
+        utils.save_landing_updates_to_directory(raw_materials, directory_path)
+
+    @classmethod
+    def get_content_hash(cls, content):
+        """Hash of the landings of a page, equal for pages which differ only by update time."""
+        return cls.get_landings_content_hash(content)
+
+    @classmethod
+    def get_deduplication_scope(cls, downloaded_file_path):
+        """
+        Snapshots of a schedule page are compared only with the previous snapshot of the page with
+        the same number, since the landings of a page (which are not dated) may return to those of
+        an earlier snapshot, e.g. on another day.
+        """
+        directory_path, file_name = os.path.split(os.path.abspath(downloaded_file_path))
+        page_number_match = _SCHEDULE_PAGE_NUMBER_REGEX.search(file_name)
+        if page_number_match is None:
+            return os.path.join(directory_path, file_name)
+        return os.path.join(directory_path, 'page%s' % page_number_match.group(1))
+
+    @classmethod
+    def get_landings_content_hash(cls, page_source):
+        """
+        :param page_source: HTML of a landing schedule page.
+        :type page_source: unicode
+        :return: Hash of the landing rows of the page, which does not depend on the rest of the page
+            (e.g. its update time).
+        :rtype: str
+        """
+        landing_rows = cls._LANDING_ROWS_XPATH(lxml.html.document_fromstring(page_source))
+        return hashlib.sha1(''.join(etree.tostring(row, encoding='utf-8') for row in
+                                    landing_rows)).hexdigest()
+
     @classmethod
     def _extract_landing_update(cls, landing_html_row, schedule_update_time):
         flight_company = cls._extract_flight_company(landing_html_row)
@@ -0,0 +1,380 @@
+import json
+import os
+import re
+import zlib
+
+import numpy
+
+from webcrawler import common, utils
+from webcrawler.ledger import get_file_content_hash
+from webcrawler.query import normalize_text
+
+_WORD_REGEX = re.compile(r'\w+', re.UNICODE)
+SIMHASH_BITS = 64
+# Word -> its hash, since most words of a text appear in texts hashed before. Cleared when full.
+_word_hashes = {}
+_MAX_CACHED_WORD_HASHES = 10 ** 6
+
+
+class DeduplicationStats(object):
+    """Counters of deduplicated files."""
+
+    def __init__(self):
+        self.file_count = 0
+        self.duplicate_file_count = 0
+        # Files whose material is a near duplicate of earlier material, see
+        # `ExtractionDeduplicator`.
+        self.near_duplicate_file_count = 0
+        self.byte_count = 0
+        self.duplicate_byte_count = 0
+
+    @property
+    def deduplication_ratio(self):
+        """Rate of the files that were duplicates or near duplicates."""
+        if not self.file_count:
+            return 0.0
+        return (self.duplicate_file_count + self.near_duplicate_file_count) / \
+            float(self.file_count)
+
+    def __str__(self):
+        return ('{files} files, {duplicates} duplicates, {near_duplicates} near duplicates '
+                '(ratio {ratio:.1%}), {duplicate_bytes} of {bytes} bytes duplicate').format(
+            files=self.file_count, duplicates=self.duplicate_file_count,
+            near_duplicates=self.near_duplicate_file_count, ratio=self.deduplication_ratio,
+            duplicate_bytes=self.duplicate_byte_count, bytes=self.byte_count)
+
+
+class ContentAddressedStore(object):
+    """
+    Directory of files stored once by the SHA-1 hash of their content, shared by any number of
+    downloaded or raw material files through hard links, so identical files take disk space once.
+
+    Only files which are replaced rather than modified in place (such as files written with
+    `common.atomic_write`, like downloads and dumped raw material) may be linked to the store, since
+    modifying a linked file in place modifies all its copies.
+    """
+    OBJECTS_DIRECTORY_NAME = 'objects'
+
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        self.objects_directory_path = os.path.join(directory_path, self.OBJECTS_DIRECTORY_NAME)
+        if not os.path.exists(self.objects_directory_path):
+            os.makedirs(self.objects_directory_path)
+
+    def get_object_path(self, content_hash):
+        return os.path.join(self.objects_directory_path, content_hash[:2], content_hash[2:])
+
+    def __contains__(self, content_hash):
+        return os.path.exists(self.get_object_path(content_hash))
+
+    def add_file(self, file_path):
+        """
+        Store the content of a file, replacing the file by a link to content stored before if it is
+        a duplicate.
+
+        :return: Hash of the file's content, and whether it was already stored.
+        :rtype: (str, bool)
+        :raise OSError: If the file cannot be linked, e.g. when it is on another file system.
+        """
+        content_hash = get_file_content_hash(file_path)
+        object_path = self.get_object_path(content_hash)
+        if not os.path.exists(object_path):
+            if not os.path.exists(os.path.dirname(object_path)):
+                os.mkdir(os.path.dirname(object_path))
+            os.link(file_path, object_path)
+            return content_hash, False
+        if not os.path.samefile(file_path, object_path):
+            # Replaced by renaming, so the file is never missing.
+            directory_path, file_name = os.path.split(file_path)
+            temporary_file_path = os.path.join(directory_path, '.%s.link' % file_name)
+            if os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
+            os.link(object_path, temporary_file_path)
+            os.rename(temporary_file_path, file_path)
+        return content_hash, True
+
+    def deduplicate_directory(self, directory_path):
+        """
+        Store every file of a directory, so that its files which are identical to each other or to
+        files of other directories share their content.
+
+        :rtype: DeduplicationStats
+        """
+        stats = DeduplicationStats()
+        for file_path in sorted(utils.list_directory_files(directory_path)):
+            if not os.path.isfile(file_path):
+                continue
+            file_size = os.path.getsize(file_path)
+            is_linked = os.stat(file_path).st_nlink > 1
+            _, is_duplicate = self.add_file(file_path)
+            stats.file_count += 1
+            stats.byte_count += file_size
+            # A file linked by an earlier deduplication was not stored twice either.
+            if is_duplicate or is_linked:
+                stats.duplicate_file_count += 1
+                stats.duplicate_byte_count += file_size
+        return stats
+
+    def remove_unused_objects(self):
+        """
+        Remove stored content which no file links to anymore.
+        :return: Number of removed objects.
+        """
+        removed_count = 0
+        for object_directory_path in utils.list_directory_files(self.objects_directory_path):
+            for object_path in utils.list_directory_files(object_directory_path):
+                if os.stat(object_path).st_nlink == 1:
+                    os.remove(object_path)
+                    removed_count += 1
+        return removed_count
+
+
+def _mix_hashes(hashes):
+    """SplitMix64 finalizer: spreads every bit of 64 bit hashes over all bits, in place."""
+    hashes ^= hashes >> numpy.uint64(30)
+    hashes *= numpy.uint64(0xbf58476d1ce4e5b9)
+    hashes ^= hashes >> numpy.uint64(27)
+    hashes *= numpy.uint64(0x94d049bb133111eb)
+    hashes ^= hashes >> numpy.uint64(31)
+    return hashes
+
+
+def _get_word_hashes(words):
+    word_hashes = map(_word_hashes.get, words)
+    if None in word_hashes:
+        for index, word in enumerate(words):
+            if word_hashes[index] is None:
+                word_hashes[index] = _word_hashes[word] = \
+                    zlib.crc32(word.encode('utf-8')) & 0xffffffff
+    return numpy.array(word_hashes, dtype=numpy.int64).view(numpy.uint64)
+
+
+def get_simhash(text, shingle_size=3):
+    """
+    :return: SimHash of a text: a 64 bit fingerprint of its normalized word shingles, which differs
+        in few bits between texts that differ in few words.
+    :rtype: int
+    """
+    words = _WORD_REGEX.findall(normalize_text(text))
+    if not words:
+        return 0
+    if len(_word_hashes) > _MAX_CACHED_WORD_HASHES:
+        _word_hashes.clear()
+    # Words are hashed once, and the hash of a shingle is mixed from the hashes of its words.
+    word_hashes = _get_word_hashes(words)
+    shingle_count = max(len(words) - shingle_size + 1, 1)
+    shingle_hashes = numpy.zeros(shingle_count, dtype=numpy.uint64)
+    for offset in xrange(min(shingle_size, len(words))):
+        shingle_hashes = _mix_hashes(shingle_hashes ^ word_hashes[offset:offset + shingle_count])
+    # Each shingle votes for the bits set in its hash and against the others.
+    bit_counts = numpy.unpackbits(shingle_hashes.view(numpy.uint8).reshape(-1, 8),
+                                  axis=1).sum(axis=0)
+    return int(numpy.packbits(bit_counts * 2 > shingle_count).view('<u8')[0])
+
+
+def get_hamming_distance(first_fingerprint, second_fingerprint):
+    return bin(first_fingerprint ^ second_fingerprint).count('1')
+
+
+class SimHashIndex(object):
+    """
+    Finds SimHash fingerprints within a Hamming distance of a fingerprint without comparing it to
+    all of them: fingerprints are split into `max_distance + 1` bands, and two fingerprints within
+    the distance have at least one identical band, so only fingerprints sharing a band are compared.
+    """
+
+    def __init__(self, max_distance=6):
+        self.max_distance = max_distance
+        band_count = max_distance + 1
+        # (first bit, number of bits) of each band.
+        self._bands = [(SIMHASH_BITS * band_index // band_count,
+                        SIMHASH_BITS * (band_index + 1) // band_count -
+                        SIMHASH_BITS * band_index // band_count)
+                       for band_index in xrange(band_count)]
+        # Per band: band value -> (fingerprint, key) of the fingerprints with it.
+        self._band_fingerprints = [{} for _ in self._bands]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, fingerprint, key):
+        for band_fingerprints, band_value in zip(self._band_fingerprints,
+                                                 self._get_band_values(fingerprint)):
+            band_fingerprints.setdefault(band_value, []).append((fingerprint, key))
+        self._count += 1
+
+    def remove(self, fingerprint, key):
+        for band_fingerprints, band_value in zip(self._band_fingerprints,
+                                                 self._get_band_values(fingerprint)):
+            band_fingerprints[band_value].remove((fingerprint, key))
+        self._count -= 1
+
+    def find(self, fingerprint):
+        """
+        :return: Key of the nearest fingerprint within the maximal distance, None if there is none.
+        """
+        nearest_key, nearest_distance = None, self.max_distance + 1
+        for band_fingerprints, band_value in zip(self._band_fingerprints,
+                                                 self._get_band_values(fingerprint)):
+            for candidate_fingerprint, key in band_fingerprints.get(band_value, ()):
+                distance = get_hamming_distance(fingerprint, candidate_fingerprint)
+                if distance < nearest_distance:
+                    nearest_key, nearest_distance = key, distance
+        return nearest_key
+
+    def _get_band_values(self, fingerprint):
+        return [(fingerprint >> first_bit) & ((1 << bit_count) - 1) for first_bit, bit_count in
+                self._bands]
+
+
+class ExtractionDeduplicator(object):
+    """
+    Skips extraction of duplicate downloaded files, and collapses near duplicate articles, for the
+    extractions to a directory. Its state is saved as a hidden file in that directory.
+
+    A file is a duplicate if the hash of its normalized content (see
+    `MaterialExtractor.get_content_hash`) equals the hash of a file extracted before with the same
+    extractor and version, such as the same article downloaded from another URL. Snapshots of a
+    series (see `MaterialExtractor.get_deduplication_scope`), such as the pages of the landing
+    schedule, are compared only with the previous snapshot of their series, so a page which differs
+    only by its update time is a duplicate, and a page which returns to earlier content is not.
+    Duplicates are not extracted at all. Files whose downloaded files were removed are forgotten.
+
+    A single text material (such as an article) whose SimHash is within `max_distance` bits of the
+    SimHash of earlier material is a near duplicate, such as a lightly edited revision of an
+    article. It is saved under the file name of the earlier material, replacing it by the latest
+    revision by modification time of the downloaded files, whatever order they are extracted in.
+    """
+    FILE_NAME = '.deduplication.json'
+
+    def __init__(self, directory_path, max_distance=6):
+        self.directory_path = directory_path
+        self.file_path = os.path.join(directory_path, self.FILE_NAME)
+        self.stats = DeduplicationStats()
+        # Extractor, its version and content hash -> path of the first file with the content.
+        self._file_paths_by_content = {}
+        # Extractor, its version and series -> [content key, path] of the last snapshot checked.
+        self._last_snapshots = {}
+        # Downloaded file path -> its content key, and for snapshots the key of its series and the
+        # previous snapshot of the series, for files being extracted.
+        self._checked_content_keys = {}
+        self._fingerprint_index = SimHashIndex(max_distance)
+        # Downloaded file path -> (fingerprint, saved file path, modification time of the
+        # downloaded file) of its material.
+        self._fingerprints = {}
+        # Saved file path -> modification time of the downloaded file whose material is saved.
+        self._saved_file_times = {}
+        if os.path.exists(self.file_path):
+            with open(self.file_path) as deduplication_file:
+                state = json.load(deduplication_file)
+            self._file_paths_by_content = {
+                content_key: file_path for content_key, file_path in
+                state['content'].iteritems() if os.path.exists(file_path)}
+            self._last_snapshots = state.get('snapshots', {})
+            for downloaded_file_path, (fingerprint, saved_file_path, modification_time) in \
+                    state['fingerprints'].iteritems():
+                self._add_fingerprint(downloaded_file_path, fingerprint, saved_file_path,
+                                      modification_time)
+
+    def is_duplicate(self, downloaded_file_path, extractor_type):
+        """
+        Whether a downloaded file is a duplicate of a file extracted before (or being extracted).
+        Otherwise the file is considered extracted from now on, unless it is discarded.
+
+        :type extractor_type: Subclass of `webcrawler.data_extractor.MaterialExtractor`
+        """
+        downloaded_file_path = os.path.abspath(downloaded_file_path)
+        with open(downloaded_file_path, 'rb') as downloaded_file:
+            content = downloaded_file.read()
+        extractor_key = '%s:%s' % (extractor_type.__name__, extractor_type.VERSION)
+        content_key = '%s:%s' % (extractor_key, extractor_type.get_content_hash(content))
+        self.stats.file_count += 1
+        self.stats.byte_count += len(content)
+        scope = extractor_type.get_deduplication_scope(downloaded_file_path)
+        if scope is None:
+            original_file_path = self._file_paths_by_content.setdefault(content_key,
+                                                                        downloaded_file_path)
+            is_duplicate = original_file_path != downloaded_file_path
+            checked_content_key = (content_key, None, None)
+        else:
+            series_key = '%s:%s' % (extractor_key, scope)
+            previous_snapshot = self._last_snapshots.get(series_key)
+            is_duplicate = previous_snapshot is not None and \
+                previous_snapshot[0] == content_key and previous_snapshot[1] != downloaded_file_path
+            if not is_duplicate:
+                self._last_snapshots[series_key] = [content_key, downloaded_file_path]
+            checked_content_key = (content_key, series_key, previous_snapshot)
+        if is_duplicate:
+            self.stats.duplicate_file_count += 1
+            self.stats.duplicate_byte_count += len(content)
+            return True
+        self._checked_content_keys[downloaded_file_path] = checked_content_key
+        return False
+
+    def get_saved_file_path(self, downloaded_file_path, raw_materials):
+        """
+        :return: Path of the downloaded file whose material is near duplicate of this file's
+            material, under which its material should be saved, or the file's own path. None if
+            the material should not be saved, since the saved near duplicate material is of a file
+            downloaded later.
+        """
+        if len(raw_materials) != 1 or not hasattr(raw_materials[0], 'to_text'):
+            return downloaded_file_path
+        fingerprint = get_simhash(raw_materials[0].to_text())
+        modification_time = os.path.getmtime(downloaded_file_path)
+        # A file extracted again is compared with the other files.
+        self._remove_fingerprint(os.path.abspath(downloaded_file_path))
+        original_file_path = self._fingerprint_index.find(fingerprint)
+        saved_file_path = downloaded_file_path
+        if original_file_path is not None:
+            saved_file_path = self._fingerprints[original_file_path][1]
+            self.stats.near_duplicate_file_count += 1
+        self._add_fingerprint(os.path.abspath(downloaded_file_path), fingerprint,
+                              os.path.abspath(saved_file_path), modification_time)
+        if self._saved_file_times[os.path.abspath(saved_file_path)] > modification_time:
+            return None
+        return saved_file_path
+
+    def discard(self, downloaded_file_path):
+        """Forget a file that was checked, since its material could not be extracted or saved."""
+        downloaded_file_path = os.path.abspath(downloaded_file_path)
+        content_key, series_key, previous_snapshot = self._checked_content_keys.pop(
+            downloaded_file_path, (None, None, None))
+        if series_key is None:
+            if self._file_paths_by_content.get(content_key) == downloaded_file_path:
+                del self._file_paths_by_content[content_key]
+        elif self._last_snapshots.get(series_key) == [content_key, downloaded_file_path]:
+            if previous_snapshot is None:
+                del self._last_snapshots[series_key]
+            else:
+                self._last_snapshots[series_key] = previous_snapshot
+        self._remove_fingerprint(downloaded_file_path)
+
+    def save(self):
+        """Write the state to its file, replacing the previous one only when fully written."""
+        with common.atomic_write(self.file_path) as deduplication_file:
+            json.dump({'content': self._file_paths_by_content, 'snapshots': self._last_snapshots,
+                       'fingerprints': self._fingerprints}, deduplication_file)
+
+    def _add_fingerprint(self, downloaded_file_path, fingerprint, saved_file_path,
+                         modification_time):
+        self._fingerprints[downloaded_file_path] = (fingerprint, saved_file_path,
+                                                    modification_time)
+        self._fingerprint_index.add(fingerprint, downloaded_file_path)
+        self._saved_file_times[saved_file_path] = max(
+            self._saved_file_times.get(saved_file_path, modification_time), modification_time)
+
+    def _remove_fingerprint(self, downloaded_file_path):
+        if downloaded_file_path not in self._fingerprints:
+            return
+        fingerprint, saved_file_path, _ = self._fingerprints.pop(downloaded_file_path)
+        self._fingerprint_index.remove(fingerprint, downloaded_file_path)
+        # The latest material saved under the path is of the remaining files.
+        saved_file_times = [modification_time for _, other_saved_file_path, modification_time in
+                            self._fingerprints.itervalues() if
+                            other_saved_file_path == saved_file_path]
+        if saved_file_times:
+            self._saved_file_times[saved_file_path] = max(saved_file_times)
+        else:
+            del self._saved_file_times[saved_file_path]
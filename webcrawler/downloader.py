@@ -1,20 +1,31 @@
 import abc
 import datetime
+import hashlib
+import itertools
 import os
+import re
 import time
-import urllib
 import urlparse
 import warnings
+from multiprocessing.pool import ThreadPool
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
+from lxml import etree
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.support.wait import WebDriverWait
 
-from webcrawler import common
+from webcrawler import common, metrics
+from webcrawler.crawler import CrawlEngine, CrawlPolicy
+from webcrawler.data_extractor import FlightLandingScheduleExtractor
+from webcrawler.driver_pool import is_driver_open
+from webcrawler.fetcher import HttpFetcher
+from webcrawler.manifest import DownloadManifest
+from webcrawler.url_store import SeenUrlStore, normalize_url
 
 
 class DataDownloader(object):
@@ -25,76 +36,204 @@ class DataDownloader(object):
 
     def __init__(self, download_directory):
         self.download_directory = download_directory
+        self.manifest = DownloadManifest(download_directory)
 
     @abc.abstractmethod
     def download_data(self):
         """Download data from the website to the download directory."""
 
+    def _download_file(self, fetcher, url, download_file_path):
+        """
+        Download a URL to a file, unless the manifest shows that it did not change since it was last
+        downloaded. The server is asked with a conditional request, and if it responds with the full
+        content anyway, the content is compared by its hash.
+
+        :type fetcher: webcrawler.fetcher.HttpFetcher
+        :return: Whether the file was written.
+        :rtype: bool
+        """
+        response = fetcher.fetch(url, headers=self.manifest.get_conditional_headers(url))
+        return self._save_response(url, response, download_file_path)
+
+    def _save_response(self, url, response, download_file_path):
+        """
+        Write the content of a response for a URL to a file, unless the server responded that it
+        did not change or its hash equals the hash of the content last downloaded from the URL.
+
+        :type response: requests.Response
+        :return: Whether the file was written.
+        :rtype: bool
+        """
+        if response.status_code == requests.codes.not_modified:
+            self.manifest.record_unchanged(url)
+            self._record_unchanged_download()
+            return False
+        response.raise_for_status()
+        content_hash = hashlib.sha1(response.content).hexdigest()
+        if self.manifest.is_unchanged(url, content_hash):
+            self.manifest.record_download(url, download_file_path, response.headers, content_hash)
+            self._record_unchanged_download()
+            return False
+        with common.atomic_write(download_file_path, 'wb') as download_file:
+            download_file.write(response.content)
+        self.manifest.record_download(url, download_file_path, response.headers, content_hash)
+        self._record_written_download(len(response.content))
+        return True
+
+    def _record_written_download(self, size):
+        """Count a downloaded file written to the download directory in the metrics."""
+        downloader = type(self).__name__
+        metrics.increment('downloaded_files_total', downloader=downloader)
+        metrics.increment('downloaded_bytes_total', size, downloader=downloader)
+
+    def _record_unchanged_download(self):
+        """Count a download that was not written since it did not change in the metrics."""
+        metrics.increment('unchanged_downloads_total', downloader=type(self).__name__)
+
 
 class SeleniumDataDownloader(DataDownloader):
-    """Downloads the data using Selenium to bypass security issues."""
+    """
+    Downloads the data using Selenium to bypass security issues.
+
+    The web driver is started when needed, or leased from a `WebDriverPool` shared by several
+    downloaders, so that they use warm drivers and can download in parallel.
+    """
     __metaclass__ = abc.ABCMeta
 
-    def __init__(self, download_directory, web_driver_location, driver_type=webdriver.Chrome):
+    def __init__(self, download_directory, web_driver_location, driver_type=webdriver.Chrome,
+                 driver_pool=None):
         """
         :param web_driver_location: Location of the web-driver file.
         :param driver_type: Class of Selenium web-driver to use.
+        :param driver_pool: Pool to lease web drivers from, instead of starting them.
+        :type driver_pool: webcrawler.driver_pool.WebDriverPool
         """
         super(SeleniumDataDownloader, self).__init__(download_directory)
         self._driver_type = driver_type
         self._web_driver_location = web_driver_location
+        self._driver_pool = driver_pool
         self._web_driver = None
 
     def ensure_driver_is_open(self):
         """Open web driver if not already open"""
         if not self.is_driver_open:
-            if self._web_driver is not None:
-                # Clean everything left from last driver session.
-                self._web_driver.quit()
-            self._web_driver = self._driver_type(self._web_driver_location)
+            if self._driver_pool is not None:
+                if self._web_driver is not None:
+                    # The pool replaces drivers which are not open.
+                    self._driver_pool.release(self._web_driver)
+                self._web_driver = None
+                self._web_driver = self._driver_pool.lease()
+            else:
+                if self._web_driver is not None:
+                    # Clean everything left from last driver session.
+                    self._web_driver.quit()
+                self._web_driver = self._driver_type(self._web_driver_location)
             self._web_driver.get(self.DOWNLOAD_URL)
 
     def ensure_driver_is_closed(self):
-        """Close driver if not already closed."""
-        if self.is_driver_open:
+        """Close driver if not already closed, or return it to the driver pool."""
+        if self._driver_pool is not None:
+            if self._web_driver is not None:
+                self._driver_pool.release(self._web_driver)
+                self._web_driver = None
+        elif self.is_driver_open:
             self._web_driver.close()
 
     @property
     def is_driver_open(self):
-        if self._web_driver is None:
-            return False
-        try:
-            # noinspection PyStatementEffect
-            self._web_driver.current_url
-            return True
-        except WebDriverException:
-            return False
+        return is_driver_open(self._web_driver)
 
 
-class BBCNewsDownloader(DataDownloader):
-    """Downloads articles from BBC main web page and saves them as HTML files."""
+class BBCNewsDownloader(DataDownloader, CrawlPolicy):
+    """
+    Downloads articles from BBC main web page and saves them as HTML files.
+
+    The downloader is the link-selection policy of a crawl starting at the main page: it follows
+    links to news articles, and optionally to news section pages, whose articles are downloaded as
+    well when the crawl is deep enough.
+    """
     DOWNLOAD_URL = 'http://bbc.com'
+    ARTICLE_PRIORITY = 0
+    SECTION_PRIORITY = 1
+
+    _SECTION_PATH_REGEX = re.compile(r'^/news(/[a-z_-]+)*/?$')
+
+    def __init__(self, download_directory, fetcher=None, crawl_sections=False, max_depth=None,
+                 scheduler=None, skip_seen_articles=False):
+        """
+        :param fetcher: Fetcher used for all requests, controls download concurrency.
+        :type fetcher: webcrawler.fetcher.HttpFetcher
+        :param crawl_sections: Whether to follow links to news section pages.
+        :param max_depth: Number of links followed from the main page. Defaults to 2 when crawling
+            sections (main page -> section -> article), 1 otherwise.
+        :param scheduler: Politeness scheduler of the crawl, see `CrawlEngine`.
+        :type scheduler: webcrawler.crawler.PolitenessScheduler
+        :param skip_seen_articles: Whether to skip articles downloaded in previous runs, which are
+            remembered by a `SeenUrlStore` in the download directory. Otherwise articles are
+            requested again, and written only if they changed.
+        """
+        super(BBCNewsDownloader, self).__init__(download_directory)
+        self.fetcher = fetcher or HttpFetcher()
+        self.crawl_sections = crawl_sections
+        if max_depth is None:
+            max_depth = 2 if crawl_sections else 1
+        self.max_depth = max_depth
+        self.scheduler = scheduler
+        self.skip_seen_articles = skip_seen_articles
+        # Store of the articles downloaded by all runs, open while downloading.
+        self.seen_urls = None
+        # Normalized URLs of the articles selected.
+        self._article_urls = set()
 
     def download_data(self):
-        page_source = requests.get(self.DOWNLOAD_URL).text
-        soup = BeautifulSoup(page_source, common.WEB_SCRAPPING_PARSER)
+        """
+        :return: Statistics of the crawl.
+        :rtype: webcrawler.crawler.CrawlStats
+        """
+        self.manifest.start_run()
+        crawl_engine = CrawlEngine(self.fetcher, self, self.scheduler, self.max_depth)
+        if self.skip_seen_articles:
+            self.seen_urls = SeenUrlStore(self.download_directory)
+        try:
+            with metrics.measure('download', downloader=type(self).__name__):
+                return crawl_engine.crawl([self.DOWNLOAD_URL])
+        finally:
+            self.manifest.save()
+            if self.seen_urls is not None:
+                self.seen_urls.close()
+                self.seen_urls = None
+
+    def get_request_headers(self, url):
+        if url in self._article_urls:
+            return self.manifest.get_conditional_headers(url)
+        return None
+
+    def handle_response(self, url, response):
+        if url not in self._article_urls:
+            response.raise_for_status()
+            return
+        self._save_response(url, response,
+                            self._get_article_download_destination(urlparse.urlparse(url).path))
+        if self.seen_urls is not None:
+            self.seen_urls.add(url)
+
+    def select_links(self, url, page_source):
+        with metrics.measure('parse', parser=common.WEB_SCRAPPING_PARSER, source='link_selection'):
+            soup = BeautifulSoup(page_source, common.WEB_SCRAPPING_PARSER)
         all_article_tags = soup.find_all(name='a', attrs={'class': 'block-link__overlay-link',
                                                           'href': self._is_news_article_url,
                                                           'rev': self._is_rev_of_article})
         for tag in all_article_tags:
-            parent_tag_classes = tag.parent['class']
+            parent_tag_classes = tag.parent.get('class')
             if parent_tag_classes is None or 'media--icon' not in ''.join(parent_tag_classes):
-                self._download_article_from_html_tag(tag)
-
-    def _download_article_from_html_tag(self, article_tag):
-        """
-        :param bs4.Tag article_tag: BeatifulSoup tag with link to the article to download.
-        """
-        article_url = article_tag['href']
-        if article_url.endswith('/'):
-            article_url = article_url[:-1]
-        urllib.urlretrieve(self._get_article_full_url(article_url),
-                           self._get_article_download_destination(article_url))
+                article_full_url = normalize_url(self._get_article_full_url(tag['href']))
+                if self.seen_urls is not None and article_full_url in self.seen_urls:
+                    continue
+                self._article_urls.add(article_full_url)
+                yield article_full_url, self.ARTICLE_PRIORITY
+        if self.crawl_sections:
+            for tag in soup.find_all(name='a', href=self._is_news_section_url):
+                yield normalize_url(self._get_article_full_url(tag['href'])), self.SECTION_PRIORITY
 
     @staticmethod
     def _is_news_article_url(article_url):
@@ -105,6 +244,12 @@ class BBCNewsDownloader(DataDownloader):
         is_non_media_article = '/news/av/' not in article_url and '/news/live/' not in article_url
         return is_news_section and is_non_media_article
 
+    @classmethod
+    def _is_news_section_url(cls, url):
+        """Return whether the URL represents a page listing news articles of a section."""
+        return (url is not None and cls._is_news_article_url(url) and
+                cls._SECTION_PATH_REGEX.match(urlparse.urlparse(url).path) is not None)
+
     @staticmethod
     def _is_rev_of_article(rev_html_attribute):
         return rev_html_attribute is None or 'video' not in rev_html_attribute
@@ -122,32 +267,151 @@ class BBCNewsDownloader(DataDownloader):
         return article_full_url
 
 
+class _SchedulePage(object):
+    """Landing schedule page, parsed to find its update time and its postback links."""
+    _POST_BACK_HREF_REGEX = re.compile(r"__doPostBack\('([^']*)'")
+
+    def __init__(self, url, content):
+        """
+        :param content: Content of the HTTP response of the page, or the page source.
+        :type content: str | unicode
+        :raise ValueError: If the content is not a schedule page.
+        """
+        self.url = url
+        self.page_source = UnicodeDammit(content, is_html=True).unicode_markup
+        try:
+            self._document = lxml.html.document_fromstring(self.page_source)
+            self.update_time = common.extract_airport_schedule_update_time(
+                self._document.get_element_by_id(common.AIRPORT_SCHEDULE_UPDATE_TAG_ID)
+                .text_content())
+        except (etree.ParserError, KeyError, AttributeError):
+            raise ValueError('No schedule update time in page %s' % url)
+
+    def get_event_target(self, link_id):
+        """
+        :return: Event target posted back by the link with the id.
+        :raise ValueError: If there is no such link in the page.
+        """
+        links = self._document.xpath('//a[@id=$id]', id=link_id)
+        if links:
+            post_back_match = self._POST_BACK_HREF_REGEX.search(links[0].get('href', ''))
+            if post_back_match is not None:
+                return post_back_match.group(1)
+        raise ValueError('No postback link %s in page %s' % (link_id, self.url))
+
+    def get_page_number_event_targets(self):
+        """
+        :return: Event target posted back by the link to each page in the pager, by page number.
+        :rtype: dict[int, str]
+        """
+        return {page_number: event_target for page_number, _, event_target in
+                self._iter_page_number_links()}
+
+    def get_page_number_link_ids(self):
+        """
+        :return: Id of the link to each page in the pager, by page number.
+        :rtype: dict[int, str]
+        """
+        return {page_number: link.get('id') for page_number, link, _ in
+                self._iter_page_number_links() if link.get('id')}
+
+    def _iter_page_number_links(self):
+        """:return: Page number, link element and event target of every link to a page."""
+        for link in self._document.xpath('//form//a[@href]'):
+            post_back_match = self._POST_BACK_HREF_REGEX.search(link.get('href'))
+            link_text = link.text_content().strip()
+            if post_back_match is not None and link_text.isdigit():
+                yield int(link_text), link, post_back_match.group(1)
+
+    def get_post_back(self, event_target):
+        """
+        :return: URL and form fields to post to the server, for the page of the event target.
+        :rtype: (str, dict[str, str])
+        :raise ValueError: If the page has no ASP.NET page state to post back.
+        """
+        forms = self._document.forms
+        form_fields = {hidden_input.name: hidden_input.value or '' for hidden_input in
+                       forms[0].xpath('.//input[@type="hidden"]') if hidden_input.name} if \
+            forms else {}
+        if '__VIEWSTATE' not in form_fields:
+            raise ValueError('No ASP.NET page state in page %s' % self.url)
+        form_fields['__EVENTTARGET'] = event_target
+        form_fields['__EVENTARGUMENT'] = ''
+        return urlparse.urljoin(self.url, forms[0].get('action') or self.url), form_fields
+
+
 class FlightLandingScheduleDownloader(SeleniumDataDownloader):
     """
     Downloads real-time schedule of flight landings from Ben-Gurion airport.
+
+    Schedule pages are downloaded over plain HTTP when possible, replaying the ASP.NET postbacks
+    of the pager, and with the browser otherwise. With a driver pool, the browser downloads pages
+    linked by number from the pager in parallel.
     """
     DOWNLOAD_URL = 'http://www.iaa.gov.il/he-IL/airports/BenGurion/Pages/OnlineFlights.aspx'
     SECONDS_BETWEEN_SCHEDULE_UPDATES = 60 * 5
     SECONDS_TO_WAIT_FOR_SCHEDULE_LOADING = 10
     NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD = 3
+    # Seconds between checks of the page for a new schedule update, while waiting for it.
+    SECONDS_BETWEEN_PAGE_CHECKS = 1
+    # Once a schedule update is late, the page is reloaded after the minimal number of seconds,
+    # which is multiplied by the backoff factor after every reload up to the maximal number.
+    MIN_SECONDS_BETWEEN_PAGE_RELOADS = 5
+    MAX_SECONDS_BETWEEN_PAGE_RELOADS = 60
+    PAGE_RELOAD_BACKOFF_FACTOR = 2
+    # Once a schedule update is expected and until it is late, the page is reloaded this many times
+    # over the period in which the previous update was published, so that the period (and the
+    # delay of seeing an update) narrows down to the minimal number of seconds between reloads.
+    RELOADS_PER_PUBLICATION_PERIOD = 8
+    # Number of times all pages of a schedule update are downloaded, while some of the pages show
+    # another update (since the schedule was updated while they were downloaded).
+    SCHEDULE_DOWNLOAD_ATTEMPTS = 3
+
+    HTTP_DOWNLOAD_MODE = 'http'
+    BROWSER_DOWNLOAD_MODE = 'browser'
 
     _NEXT_PAGE_BUTTON_ID = 'ctl00_rptPaging_ctl06_aNext'
-    _SECONDS_TO_WAIT_BETWEEN_PAGE_TOGGLE = 1
 
-    def __init__(self, download_directory, web_driver_location, driver_type=webdriver.Chrome):
+    def __init__(self, download_directory, web_driver_location, driver_type=webdriver.Chrome,
+                 fetcher=None, use_http=True, driver_pool=None):
+        """
+        :param fetcher: Fetcher of the schedule pages over plain HTTP. When the pager links to
+            every page, the pages are fetched concurrently by its workers.
+        :type fetcher: webcrawler.fetcher.HttpFetcher
+        :param use_http: Whether to download the schedule over plain HTTP, falling back to the
+            browser when that fails.
+        """
         super(FlightLandingScheduleDownloader, self).__init__(download_directory,
-                                                              web_driver_location, driver_type)
+                                                              web_driver_location, driver_type,
+                                                              driver_pool)
+        self.fetcher = fetcher or HttpFetcher(workers=self.NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD)
+        self.use_http = use_http
+        # Mode (`HTTP_DOWNLOAD_MODE` or `BROWSER_DOWNLOAD_MODE`) of the last schedule download.
+        self.last_download_mode = None
         self._time_of_last_update_downloaded = None
+        # Earliest and latest time (since epoch) when the last downloaded update may have been
+        # published: after the last page load which showed the update before it, and before the
+        # page load which showed it.
+        self._last_update_publication_period = None
+        # Start time of the last page load which showed the last downloaded update.
+        self._time_of_last_load_of_downloaded_update = None
+        # Start time of the last load of the first page by the web driver.
+        self._time_of_first_page_load = None
+        # Page number -> hash of the landings in the page last written.
+        self._page_content_hashes = {}
+        self.written_page_count = 0
+        self.unchanged_page_count = 0
 
     def download_data(self):
-        update_time = self._wait_for_schedule_update_time()
-        self._time_of_last_update_downloaded = update_time
-        self._write_schedule_file(self._web_driver.page_source, 1)
-        for page_number in xrange(2, self.NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD + 1):
-            self._web_driver.find_element_by_id(self._NEXT_PAGE_BUTTON_ID).click()
-            time.sleep(self._SECONDS_TO_WAIT_BETWEEN_PAGE_TOGGLE)
-            self._write_schedule_file(self._web_driver.page_source, page_number)
-        self.ensure_driver_is_closed()
+        with metrics.measure('download', downloader=type(self).__name__):
+            if self.use_http:
+                try:
+                    self._download_schedule_pages_over_http(self._fetch_first_schedule_page())
+                    return
+                except (requests.RequestException, ValueError) as error:
+                    self._warn_about_http_download_failure(error)
+            self._download_schedule_pages(self._wait_for_schedule_update_time())
+            self.ensure_driver_is_closed()
 
     @property
     def last_schedule_update_time(self):
@@ -161,43 +425,332 @@ class FlightLandingScheduleDownloader(SeleniumDataDownloader):
     def expected_seconds_to_next_update(self):
         """
         Expected time left for next schedule update in seconds (schedule updates every
-        `SECONDS_BETWEEN_SCHEDULE_UPDATES` seconds.
+        `SECONDS_BETWEEN_SCHEDULE_UPDATES` seconds), counted from the earliest time the last
+        downloaded update may have been published, so it does not depend on the time zone of the
+        website nor on when the downloader happened to see the update.
 
-        :rtype: int
+        :rtype: float
         """
-        time_passed_since_last_update = datetime.datetime.now() - \
-                                        self.last_schedule_update_time
-        time_left_for_next_update = (datetime.timedelta(
-            seconds=self.SECONDS_BETWEEN_SCHEDULE_UPDATES) - time_passed_since_last_update)
-        seconds_to_next_update = time_left_for_next_update.total_seconds()
+        if self._last_update_publication_period is None:
+            return 0
+        earliest_publication_time, _ = self._last_update_publication_period
+        seconds_to_next_update = (earliest_publication_time +
+                                  self.SECONDS_BETWEEN_SCHEDULE_UPDATES - time.time())
         return seconds_to_next_update if seconds_to_next_update > 0 else 0
 
-    def _click_on_next_page(self):
-        try:
-            next_button = WebDriverWait(self._web_driver,
-                                        self.SECONDS_TO_WAIT_FOR_SCHEDULE_LOADING).until(
-                expected_conditions.presence_of_element_located(
-                    (By.ID, self._NEXT_PAGE_BUTTON_ID)))
-        except TimeoutException:
-            self._web_driver.close()
-            raise
-        next_button.click()
-
-    def download_data_perpetually(self):
-        if self.last_schedule_update_time is None:
-            self.download_data()
-            time.sleep(self.expected_seconds_to_next_update)
-        current_schedule_update_time = self._wait_for_schedule_update_time()
-        while True:
+    def _is_next_update_late(self):
+        """:return: Whether the next update should have been published by now."""
+        if self._last_update_publication_period is None:
+            return True
+        _, latest_publication_time = self._last_update_publication_period
+        return time.time() >= latest_publication_time + self.SECONDS_BETWEEN_SCHEDULE_UPDATES
+
+    def _get_seconds_to_next_page_load(self, seconds_between_late_reloads):
+        """
+        :param seconds_between_late_reloads: Seconds between reloads once the update is late.
+        :return: Seconds to wait before loading the page again while waiting for the next update.
+        """
+        seconds_to_next_update = self.expected_seconds_to_next_update
+        if seconds_to_next_update:
+            return seconds_to_next_update
+        if self._is_next_update_late():
+            return seconds_between_late_reloads
+        earliest_publication_time, latest_publication_time = self._last_update_publication_period
+        seconds_to_late_update = (latest_publication_time + self.SECONDS_BETWEEN_SCHEDULE_UPDATES -
+                                  time.time())
+        return max(self.MIN_SECONDS_BETWEEN_PAGE_RELOADS,
+                   min((latest_publication_time - earliest_publication_time) /
+                       self.RELOADS_PER_PUBLICATION_PERIOD, seconds_to_late_update))
+
+    def _record_new_update_seen(self):
+        """Narrow down when the update just seen (by a page load which ended now) was published."""
+        now = time.time()
+        earliest_publication_time = now - self.SECONDS_BETWEEN_SCHEDULE_UPDATES
+        if self._time_of_last_load_of_downloaded_update is not None:
+            earliest_publication_time = max(earliest_publication_time,
+                                            self._time_of_last_load_of_downloaded_update)
+        self._last_update_publication_period = (earliest_publication_time, now)
+        self._time_of_last_load_of_downloaded_update = None
+
+    def download_data_perpetually(self, max_updates=None):
+        """
+        Download every schedule update as soon as it is published, keeping the same browser session
+        between updates. Schedule pages that did not change since the previous update are not
+        written again.
+
+        :param max_updates: Number of schedule updates to download before returning, unlimited if
+            None.
+        """
+        downloaded_update_count = 0
+        while max_updates is None or downloaded_update_count < max_updates:
+            if self.use_http:
+                try:
+                    self._download_schedule_pages_over_http(
+                        self._wait_for_next_schedule_update_over_http())
+                    downloaded_update_count += 1
+                    continue
+                except (requests.RequestException, ValueError) as error:
+                    self._warn_about_http_download_failure(error)
             try:
-                while current_schedule_update_time < self.last_schedule_update_time:
-                    current_schedule_update_time = self._wait_for_schedule_update_time()
-                self.download_data()
-                time.sleep(self.expected_seconds_to_next_update)
-                current_schedule_update_time = self._wait_for_schedule_update_time()
+                self._download_schedule_pages(self._wait_for_next_schedule_update())
+                downloaded_update_count += 1
+                # The next update is waited for in the first page.
+                self._load_first_page(self._web_driver.get, self.DOWNLOAD_URL)
             except TimeoutException:
                 warnings.warn('Could not download flights schedule. Date: %s' %
                               datetime.datetime.now())
+            except ValueError as error:
+                warnings.warn('Could not download flights schedule: %s' % error)
+                self._load_first_page(self._web_driver.get, self.DOWNLOAD_URL)
+        self.ensure_driver_is_closed()
+
+    def _download_schedule_pages(self, update_time):
+        """
+        Write all schedule pages of the update shown in the first page, which is currently open.
+        When the schedule is updated while the pages are downloaded, all of them are downloaded
+        again from the reloaded first page.
+
+        :raise ValueError: If the pages show different updates in every attempt.
+        """
+        for attempt in xrange(self.SCHEDULE_DOWNLOAD_ATTEMPTS):
+            if attempt:
+                self._load_first_page(self._web_driver.get, self.DOWNLOAD_URL)
+                update_time = self._wait_for_schedule_update_time()
+            first_page_source = self._web_driver.page_source
+            page_sources = [first_page_source] + self._download_next_schedule_pages(
+                first_page_source)
+            if all(_SchedulePage(self.DOWNLOAD_URL, page_source).update_time == update_time for
+                   page_source in page_sources[1:]):
+                break
+        else:
+            raise ValueError('Schedule pages of update %s show other updates' % update_time)
+        self._time_of_last_update_downloaded = update_time
+        self.last_download_mode = self.BROWSER_DOWNLOAD_MODE
+        metrics.increment('schedule_updates_total', mode=self.BROWSER_DOWNLOAD_MODE)
+        for page_number, page_source in enumerate(page_sources, 1):
+            self._write_schedule_page(page_source, page_number)
+
+    def _download_next_schedule_pages(self, first_page_source):
+        """
+        Download the schedule pages after the first page, which is currently open. With a driver
+        pool and when the pager links to every page, pages are downloaded in parallel, otherwise
+        the downloader's driver clicks the next page button.
+
+        :return: Source of each page.
+        :rtype: list[unicode]
+        """
+        page_numbers = range(2, self.NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD + 1)
+        if self._driver_pool is not None and self._driver_pool.size > 1:
+            page_link_ids = _SchedulePage(self.DOWNLOAD_URL,
+                                          first_page_source).get_page_number_link_ids()
+            if all(page_number in page_link_ids for page_number in page_numbers):
+                return self._download_pages_with_pooled_drivers(
+                    [page_link_ids[page_number] for page_number in page_numbers])
+        page_sources = []
+        for _ in page_numbers:
+            try:
+                self._click_and_wait_for_page(self._web_driver, self._NEXT_PAGE_BUTTON_ID)
+            except TimeoutException:
+                self._web_driver.close()
+                raise
+            page_sources.append(self._web_driver.page_source)
+        return page_sources
+
+    def _download_pages_with_pooled_drivers(self, page_link_ids):
+        """
+        Download the pages linked from the first page at the same time: every free driver of the
+        driver pool downloads one page, and the downloader's own driver downloads the rest. Drivers
+        are not waited for, so downloaders sharing the pool never wait for each other.
+
+        :return: Source of each page.
+        :rtype: list[unicode]
+        """
+        pooled_drivers = []
+        for _ in page_link_ids[1:]:
+            try:
+                pooled_drivers.append(self._driver_pool.lease(timeout=0))
+            except TimeoutException:
+                break
+        own_page_count = len(page_link_ids) - len(pooled_drivers)
+        downloads = [(self._web_driver, page_link_ids[:own_page_count], False)]
+        downloads.extend((pooled_driver, [page_link_id], True) for pooled_driver, page_link_id in
+                         zip(pooled_drivers, page_link_ids[own_page_count:]))
+        thread_pool = ThreadPool(len(downloads))
+        try:
+            page_sources = thread_pool.map(self._download_linked_pages, downloads)
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+            for pooled_driver in pooled_drivers:
+                self._driver_pool.release(pooled_driver)
+        return list(itertools.chain.from_iterable(page_sources))
+
+    def _download_linked_pages(self, download):
+        """
+        :param download: Web driver, ids of the links to the pages to download one after the other
+            and whether the driver should open the first page before.
+        :return: Source of each page.
+        :rtype: list[unicode]
+        """
+        web_driver, page_link_ids, should_open_first_page = download
+        if should_open_first_page:
+            web_driver.get(self.DOWNLOAD_URL)
+        page_sources = []
+        for page_link_id in page_link_ids:
+            self._click_and_wait_for_page(web_driver, page_link_id)
+            page_sources.append(web_driver.page_source)
+        return page_sources
+
+    def _click_and_wait_for_page(self, web_driver, link_id):
+        """Click on a link of the pager and wait until the page it links to is loaded."""
+        wait = WebDriverWait(web_driver, self.SECONDS_TO_WAIT_FOR_SCHEDULE_LOADING)
+        with metrics.measure('browser_wait', wait='page_load'):
+            link = wait.until(expected_conditions.presence_of_element_located((By.ID, link_id)))
+            link.click()
+            wait.until(expected_conditions.staleness_of(link))
+            wait.until(expected_conditions.presence_of_element_located(
+                (By.ID, common.AIRPORT_SCHEDULE_UPDATE_TAG_ID)))
+
+    def _download_schedule_pages_over_http(self, first_page):
+        """
+        Fetch all schedule pages of the update shown in the first page and write them. When the
+        schedule is updated while the pages are fetched, all of them are fetched again from the
+        first page of the new update.
+
+        :type first_page: _SchedulePage
+        :raise ValueError: If the pages show different updates in every attempt.
+        """
+        for attempt in xrange(self.SCHEDULE_DOWNLOAD_ATTEMPTS):
+            if attempt:
+                first_page = self._fetch_first_schedule_page()
+            pages = [first_page] + self._fetch_next_schedule_pages(first_page)
+            if all(page.update_time == first_page.update_time for page in pages):
+                break
+        else:
+            raise ValueError('Schedule pages of update %s show other updates' %
+                             first_page.update_time)
+        self._time_of_last_update_downloaded = first_page.update_time
+        self.last_download_mode = self.HTTP_DOWNLOAD_MODE
+        metrics.increment('schedule_updates_total', mode=self.HTTP_DOWNLOAD_MODE)
+        for page_number, page in enumerate(pages, 1):
+            self._write_schedule_page(page.page_source, page_number)
+
+    def _fetch_first_schedule_page(self):
+        """:rtype: _SchedulePage"""
+        response = self.fetcher.fetch(self.DOWNLOAD_URL)
+        response.raise_for_status()
+        return _SchedulePage(self.DOWNLOAD_URL, response.content)
+
+    def _fetch_next_schedule_pages(self, first_page):
+        """
+        Fetch the schedule pages after the first page. When the pager links to every page, all
+        pages are posted back from the first page at once, otherwise every page is posted back from
+        the previous one with the next page button.
+
+        :type first_page: _SchedulePage
+        :rtype: list[_SchedulePage]
+        """
+        page_numbers = range(2, self.NUMBER_OF_SCHEDULE_PAGES_TO_DOWNLOAD + 1)
+        page_number_event_targets = first_page.get_page_number_event_targets()
+        if all(page_number in page_number_event_targets for page_number in page_numbers):
+            return self.fetcher.map(
+                lambda page_number: self._post_back(first_page,
+                                                    page_number_event_targets[page_number]),
+                page_numbers)
+        pages = [first_page]
+        for _ in page_numbers:
+            pages.append(self._post_back(pages[-1],
+                                         pages[-1].get_event_target(self._NEXT_PAGE_BUTTON_ID)))
+        return pages[1:]
+
+    def _post_back(self, page, event_target):
+        """
+        :type page: _SchedulePage
+        :return: The page the server responds with when the event target is clicked in the page.
+        :rtype: _SchedulePage
+        """
+        post_back_url, form_fields = page.get_post_back(event_target)
+        response = self.fetcher.post(post_back_url, form_fields)
+        response.raise_for_status()
+        return _SchedulePage(post_back_url, response.content)
+
+    def _wait_for_next_schedule_update_over_http(self):
+        """
+        Same as `_wait_for_next_schedule_update`, fetching the first page until it shows a new
+        update. Nothing changes a page fetched over HTTP, so until the update is expected the
+        downloader just sleeps.
+
+        :rtype: _SchedulePage
+        """
+        load_start_time = time.time()
+        first_page = self._fetch_first_schedule_page()
+        seconds_between_late_reloads = self.MIN_SECONDS_BETWEEN_PAGE_RELOADS
+        while first_page.update_time == self.last_schedule_update_time:
+            self._time_of_last_load_of_downloaded_update = load_start_time
+            is_update_late = self._is_next_update_late()
+            seconds_to_wait = self._get_seconds_to_next_page_load(seconds_between_late_reloads)
+            metrics.increment('sleep_seconds_total', seconds_to_wait, reason='schedule_update')
+            time.sleep(seconds_to_wait)
+            load_start_time = time.time()
+            first_page = self._fetch_first_schedule_page()
+            if is_update_late:
+                seconds_between_late_reloads = min(
+                    seconds_between_late_reloads * self.PAGE_RELOAD_BACKOFF_FACTOR,
+                    self.MAX_SECONDS_BETWEEN_PAGE_RELOADS)
+        self._record_new_update_seen()
+        return first_page
+
+    @staticmethod
+    def _warn_about_http_download_failure(error):
+        warnings.warn('Could not download flights schedule over HTTP, using the browser: %s' %
+                      error)
+
+    def _wait_for_next_schedule_update(self):
+        """
+        Wait until the schedule shows an update other than the last one downloaded and return its
+        time. Until the update is expected the page is only checked for changes. Afterwards it is
+        reloaded several times over the period in which the previous update was published, and at
+        growing intervals once the update is late.
+
+        :rtype: datetime.datetime
+        """
+        update_time = self._wait_for_schedule_update_time()
+        seconds_between_late_reloads = self.MIN_SECONDS_BETWEEN_PAGE_RELOADS
+        while update_time == self.last_schedule_update_time:
+            self._time_of_last_load_of_downloaded_update = self._time_of_first_page_load
+            is_update_late = self._is_next_update_late()
+            seconds_to_wait = self._get_seconds_to_next_page_load(seconds_between_late_reloads)
+            try:
+                with metrics.measure('browser_wait', wait='next_schedule_update'):
+                    update_time = WebDriverWait(self._web_driver, seconds_to_wait,
+                                                self.SECONDS_BETWEEN_PAGE_CHECKS).until(
+                        self._get_new_schedule_update_time)
+            except TimeoutException:
+                self._load_first_page(self._web_driver.refresh)
+                update_time = self._wait_for_schedule_update_time()
+                if is_update_late:
+                    seconds_between_late_reloads = min(
+                        seconds_between_late_reloads * self.PAGE_RELOAD_BACKOFF_FACTOR,
+                        self.MAX_SECONDS_BETWEEN_PAGE_RELOADS)
+        self._record_new_update_seen()
+        return update_time
+
+    def _load_first_page(self, load, *arguments):
+        """Load the first page with the web driver (e.g. with its `get`), recording the time."""
+        self._time_of_first_page_load = time.time()
+        load(*arguments)
+
+    def ensure_driver_is_open(self):
+        if not self.is_driver_open:
+            # The driver loads the first page when it is opened.
+            self._time_of_first_page_load = time.time()
+        super(FlightLandingScheduleDownloader, self).ensure_driver_is_open()
+
+    def _get_new_schedule_update_time(self, web_driver):
+        """:return: Schedule update time shown in the page if it was not downloaded, else None."""
+        update_time = common.extract_airport_schedule_update_time(
+            web_driver.find_element_by_id(common.AIRPORT_SCHEDULE_UPDATE_TAG_ID).text)
+        return update_time if update_time != self.last_schedule_update_time else None
 
     def _wait_for_schedule_update_time(self):
         """
@@ -206,19 +759,33 @@ class FlightLandingScheduleDownloader(SeleniumDataDownloader):
         """
         self.ensure_driver_is_open()
         try:
-            last_update_message = WebDriverWait(self._web_driver,
-                                                self.SECONDS_TO_WAIT_FOR_SCHEDULE_LOADING).until(
-                expected_conditions.presence_of_element_located(
-                    (By.ID, common.AIRPORT_SCHEDULE_UPDATE_TAG_ID))).text
+            with metrics.measure('browser_wait', wait='schedule_update_time'):
+                last_update_message = WebDriverWait(
+                    self._web_driver, self.SECONDS_TO_WAIT_FOR_SCHEDULE_LOADING).until(
+                    expected_conditions.presence_of_element_located(
+                        (By.ID, common.AIRPORT_SCHEDULE_UPDATE_TAG_ID))).text
         except TimeoutException:
             self._web_driver.close()
             raise
         return common.extract_airport_schedule_update_time(last_update_message)
 
+    def _write_schedule_page(self, page_source, page_number):
+        """Write a schedule page, unless its landings did not change since it was last written."""
+        content_hash = FlightLandingScheduleExtractor.get_landings_content_hash(page_source)
+        if self._page_content_hashes.get(page_number) == content_hash:
+            self.unchanged_page_count += 1
+            self._record_unchanged_download()
+            return
+        self._write_schedule_file(page_source, page_number)
+        self._page_content_hashes[page_number] = content_hash
+        self.written_page_count += 1
+
     def _write_schedule_file(self, page_source, page_number):
         """Write schedule page source to the download directory (download schedule file)."""
         download_file_name = 'flights_schedule_page{page_number}_{update_time}.html'.format(
             page_number=page_number, update_time=self.last_schedule_update_time)
         download_file_path = os.path.join(self.download_directory, download_file_name)
-        with open(download_file_path, 'w') as download_file:
-            download_file.write(page_source.encode('utf-8'))
+        content = page_source.encode('utf-8')
+        with common.atomic_write(download_file_path) as download_file:
+            download_file.write(content)
+        self._record_written_download(len(content))
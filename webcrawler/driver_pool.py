@@ -0,0 +1,243 @@
+import contextlib
+import os
+import threading
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+
+def is_driver_open(web_driver):
+    """Whether the web driver's session is still usable."""
+    if web_driver is None:
+        return False
+    try:
+        # noinspection PyStatementEffect
+        web_driver.current_url
+        return True
+    except WebDriverException:
+        return False
+
+
+def _get_process_memory_bytes(process_id):
+    """:return: Resident memory of a process (from /proc), None if unknown."""
+    try:
+        with open('/proc/%d/status' % process_id) as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def _get_child_process_ids(process_id):
+    child_process_ids = []
+    task_directory_path = '/proc/%d/task' % process_id
+    try:
+        for thread_id in os.listdir(task_directory_path):
+            with open(os.path.join(task_directory_path, thread_id, 'children')) as children_file:
+                child_process_ids.extend(int(child_id) for child_id in children_file.read().split())
+    except (IOError, OSError):
+        pass
+    return child_process_ids
+
+
+def get_driver_memory_bytes(web_driver):
+    """
+    :return: Resident memory of the driver's service process and all the processes it started
+        (e.g. the browser), None if the driver has no service process or memory is unknown.
+    """
+    service_process = getattr(getattr(web_driver, 'service', None), 'process', None)
+    if service_process is None:
+        return None
+    total_memory_bytes = 0
+    process_ids = [service_process.pid]
+    while process_ids:
+        process_id = process_ids.pop()
+        memory_bytes = _get_process_memory_bytes(process_id)
+        if memory_bytes is None:
+            continue
+        total_memory_bytes += memory_bytes
+        process_ids.extend(_get_child_process_ids(process_id))
+    return total_memory_bytes or None
+
+
+class WebDriverPool(object):
+    """
+    Thread-safe pool of warm web drivers, so that Selenium downloads do not pay for starting a
+    browser every time.
+
+    A driver is leased from the pool, used by a single thread and returned to it. Leased drivers
+    are checked to be open, and returned drivers are quit and replaced once they were used too many
+    times or their processes use too much memory, since browsers tend to grow over time.
+    """
+
+    def __init__(self, web_driver_location, driver_type=webdriver.Chrome, size=2, max_uses=100,
+                 max_memory_bytes=None):
+        """
+        :param web_driver_location: Location of the web-driver file.
+        :param driver_type: Class of Selenium web-driver to use.
+        :param size: Maximal number of drivers, leased or not.
+        :param max_uses: Number of leases after which a driver is replaced.
+        :param max_memory_bytes: Memory of a driver's processes above which it is replaced,
+            unlimited if None.
+        """
+        self.web_driver_location = web_driver_location
+        self.driver_type = driver_type
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_bytes = max_memory_bytes
+        self.created_driver_count = 0
+        self.recycled_driver_count = 0
+        self._idle_drivers = []
+        self._leased_drivers = set()
+        # Leased or idle driver -> number of times it was leased.
+        self._driver_uses = {}
+        # Drivers being started count towards the size of the pool.
+        self._starting_driver_count = 0
+        self._is_closed = False
+        self._condition = threading.Condition()
+
+    def start_drivers(self, count=None):
+        """Start drivers ahead of their first lease, up to `count` idle drivers (all by default)."""
+        drivers = []
+        try:
+            for _ in xrange(self.size if count is None else count):
+                driver = self.lease(timeout=0)
+                drivers.append(driver)
+        except TimeoutException:
+            pass
+        finally:
+            for driver in drivers:
+                self.release(driver)
+
+    def lease(self, timeout=None):
+        """
+        Take an open driver from the pool, starting a new driver if there is no idle driver and the
+        pool is not full. Release the driver when done, or use `leased_driver`.
+
+        :param timeout: Seconds to wait for a driver when the pool is full, unlimited if None.
+        :raise TimeoutException: If no driver was released in time.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            driver = self._take_idle_driver(deadline, timeout)
+            if driver is None:
+                break
+            # Checked outside the lock, since it is a request to the driver's service. The driver
+            # still counts towards the size of the pool meanwhile.
+            if is_driver_open(driver):
+                with self._condition:
+                    self._driver_uses[driver] += 1
+                    self._leased_drivers.add(driver)
+                return driver
+            with self._condition:
+                self._forget_driver(driver)
+                self._condition.notify()
+            self._quit_driver(driver)
+        try:
+            # Started outside the lock, since starting a browser takes long.
+            driver = self.driver_type(self.web_driver_location)
+        except Exception:
+            with self._condition:
+                self._starting_driver_count -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._starting_driver_count -= 1
+            self._driver_uses[driver] = 1
+            self._leased_drivers.add(driver)
+            self.created_driver_count += 1
+        return driver
+
+    def _take_idle_driver(self, deadline, timeout):
+        """
+        Wait until there is an idle driver or room for a new driver in the pool.
+
+        :return: The idle driver, or None if there is room for a new driver (which is counted as
+            starting).
+        :raise TimeoutException: If neither happened before the deadline.
+        """
+        with self._condition:
+            while True:
+                if self._is_closed:
+                    raise WebDriverException('The web driver pool was closed.')
+                if self._idle_drivers:
+                    return self._idle_drivers.pop()
+                if len(self._driver_uses) + self._starting_driver_count < self.size:
+                    self._starting_driver_count += 1
+                    return None
+                seconds_left = deadline - time.time() if deadline is not None else None
+                if seconds_left is not None and seconds_left <= 0:
+                    raise TimeoutException('No web driver was released in %s seconds.' % timeout)
+                self._condition.wait(seconds_left)
+
+    def release(self, driver):
+        """
+        Return a leased driver to the pool, which replaces it if needed.
+
+        :raise ValueError: If the driver is not leased from the pool, e.g. it was already released.
+        """
+        with self._condition:
+            if driver not in self._leased_drivers:
+                raise ValueError('The web driver is not leased from the pool.')
+            self._leased_drivers.remove(driver)
+            uses = self._driver_uses[driver]
+        should_recycle = (self._is_closed or uses >= self.max_uses or not is_driver_open(driver) or
+                          self._is_over_memory_limit(driver))
+        with self._condition:
+            # The pool may have been closed meanwhile.
+            should_recycle = should_recycle or self._is_closed
+            if should_recycle:
+                self._forget_driver(driver)
+                self.recycled_driver_count += 1
+            else:
+                self._idle_drivers.append(driver)
+            self._condition.notify()
+        if should_recycle:
+            self._quit_driver(driver)
+
+    @contextlib.contextmanager
+    def leased_driver(self, timeout=None):
+        """Context manager of a driver leased from the pool, see `lease`."""
+        driver = self.lease(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quit all idle drivers. Leased drivers are quit when they are released."""
+        with self._condition:
+            self._is_closed = True
+            idle_drivers, self._idle_drivers = self._idle_drivers, []
+            for driver in idle_drivers:
+                self._forget_driver(driver)
+            self._condition.notify_all()
+        for driver in idle_drivers:
+            self._quit_driver(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _is_over_memory_limit(self, driver):
+        if self.max_memory_bytes is None:
+            return False
+        memory_bytes = get_driver_memory_bytes(driver)
+        return memory_bytes is not None and memory_bytes > self.max_memory_bytes
+
+    def _forget_driver(self, driver):
+        """Remove a driver from the pool, making room for another. Called holding the lock."""
+        del self._driver_uses[driver]
+
+    @staticmethod
+    def _quit_driver(driver):
+        """Quit a driver removed from the pool, without holding the lock."""
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
@@ -0,0 +1,184 @@
+import itertools
+import multiprocessing
+import os
+import time
+import traceback
+import warnings
+
+from webcrawler import common, utils
+from webcrawler.ledger import ExtractionLedger
+
+# Seconds between saves of the extraction ledger during an extraction.
+_LEDGER_SAVE_INTERVAL_SECONDS = 10
+
+
+class ExtractionReport(object):
+    """Summary of the extraction of a directory."""
+
+    def __init__(self):
+        self.extracted_file_count = 0
+        # Files not extracted since they did not change since they were last extracted.
+        self.skipped_file_count = 0
+        # Files not extracted since they are duplicates of files extracted before, and files whose
+        # material replaced the near duplicate material of another file.
+        self.duplicate_file_count = 0
+        self.near_duplicate_file_count = 0
+        self.raw_material_count = 0
+        self.failed_files = {}
+        self.elapsed_seconds = 0.0
+
+    @property
+    def files_per_second(self):
+        processed_file_count = self.extracted_file_count + len(self.failed_files)
+        return processed_file_count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def deduplication_ratio(self):
+        """Rate of the new or changed files which were duplicates or near duplicates."""
+        checked_file_count = self.extracted_file_count + len(self.failed_files) + \
+            self.duplicate_file_count
+        if not checked_file_count:
+            return 0.0
+        return (self.duplicate_file_count + self.near_duplicate_file_count) / \
+            float(checked_file_count)
+
+
+def _extract_file(extraction_task):
+    """Extract a single file in a worker process, returning the error instead of raising it."""
+    extractor_type, downloaded_file_path, parser, result_cache, parsed_file_cache = extraction_task
+    try:
+        extractor = extractor_type(downloaded_file_path, parser, parsed_file_cache)
+        return downloaded_file_path, extractor.extract_and_measure(result_cache), None
+    except Exception:
+        return downloaded_file_path, None, traceback.format_exc()
+
+
+def extract_directory(extractor_type, source_directory, destination_directory, workers=None,
+                      chunk_size=16, writer=None, parser=common.WEB_SCRAPPING_PARSER,
+                      incremental=True, store=None, deduplicator=None, result_cache=None,
+                      parsed_file_cache=None):
+    """
+    Extract all files downloaded to a directory, spreading them across a pool of processes.
+    Raw material is passed to the writer as soon as each file is extracted. A file that fails to be
+    extracted or written is reported and skipped, without aborting the rest of the files.
+
+    Incremental extractions record the extracted files in an `ExtractionLedger` in the destination
+    directory, as they are written and periodically saved, so that only new or changed files are
+    extracted by the next extraction, also when the previous one crashed midway.
+
+    :param extractor_type: Extractor to extract each file with.
+    :type extractor_type: Subclass of `webcrawler.data_extractor.MaterialExtractor`
+    :param source_directory: Directory of downloaded files.
+    :param destination_directory: Directory to save the raw material to.
+    :param workers: Number of worker processes, defaults to the number of CPUs.
+        With a single worker files are extracted in the current process.
+    :param chunk_size: Number of files sent to a worker process at once.
+    :param writer: Function called with downloaded file path, its raw material and the destination
+        directory. Defaults to the extractor's `save_raw_material`.
+    :param parser: Parser used by the extractor, see `MaterialExtractor`.
+    :param incremental: Whether to extract only files that are new or changed since they were
+        extracted to the destination directory. Ignored without a destination directory.
+    :param store: Store to add the raw material to instead of passing it to the writer, whose
+        batches are written whenever the ledger is saved, so that recorded files are in the store.
+    :type store: webcrawler.sqlite_store.RawMaterialStore
+    :param deduplicator: Deduplicator of the destination directory, skipping files which are
+        duplicates of extracted files and collapsing near duplicate material.
+    :type deduplicator: webcrawler.dedup.ExtractionDeduplicator
+    :param result_cache: Cache of extracted material, shared by the worker processes, from which
+        the material of content extracted before is loaded instead of extracting it again.
+    :type result_cache: webcrawler.extraction_cache.ExtractionResultCache
+    :param parsed_file_cache: Cache of the content and parsed trees of the files, used by the
+        extractors when files are extracted in the current process (with a single worker).
+    :type parsed_file_cache: webcrawler.extraction_cache.ParsedFileCache
+    :rtype: ExtractionReport
+    """
+    writer = store.save_raw_material if store is not None else \
+        writer or extractor_type.save_raw_material
+    report = ExtractionReport()
+    start_time = time.time()
+    ledger = ExtractionLedger(destination_directory) if \
+        incremental and destination_directory is not None else None
+    # In download order, for writers that depend on it (such as `FlightEventRecorder`).
+    file_paths = sorted(utils.list_directory_files(source_directory), key=os.path.getmtime)
+    if ledger is not None:
+        changed_file_paths = [file_path for file_path in file_paths if
+                              ledger.needs_extraction(file_path, extractor_type)]
+        report.skipped_file_count = len(file_paths) - len(changed_file_paths)
+        file_paths = changed_file_paths
+    if deduplicator is not None:
+        unique_file_paths = []
+        for file_path in file_paths:
+            if not deduplicator.is_duplicate(file_path, extractor_type):
+                unique_file_paths.append(file_path)
+            elif ledger is not None:
+                ledger.record_extraction(file_path, extractor_type)
+        report.duplicate_file_count = len(file_paths) - len(unique_file_paths)
+        file_paths = unique_file_paths
+    if workers != 1:
+        # An in-process cache is not shared with the worker processes.
+        parsed_file_cache = None
+    extraction_tasks = [(extractor_type, file_path, parser, result_cache, parsed_file_cache) for
+                        file_path in file_paths]
+    try:
+        if workers == 1:
+            _write_extraction_results(itertools.imap(_extract_file, extraction_tasks), writer,
+                                      destination_directory, report, extractor_type, ledger, store,
+                                      deduplicator)
+        else:
+            pool = multiprocessing.Pool(workers)
+            try:
+                _write_extraction_results(
+                    pool.imap_unordered(_extract_file, extraction_tasks, chunk_size), writer,
+                    destination_directory, report, extractor_type, ledger, store, deduplicator)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        # Also saved after a failure, since the recorded files were fully written.
+        _save_ledger(ledger, store, deduplicator)
+    report.elapsed_seconds = time.time() - start_time
+    return report
+
+
+def _save_ledger(ledger, store, deduplicator):
+    """
+    Save the ledger and the deduplicator, once the raw material of the files they record is in the
+    store.
+    """
+    if store is not None:
+        store.flush()
+    if deduplicator is not None:
+        deduplicator.save()
+    if ledger is not None:
+        ledger.save()
+
+
+def _write_extraction_results(extraction_results, writer, destination_directory, report,
+                              extractor_type, ledger, store, deduplicator):
+    last_ledger_save_time = time.time()
+    for downloaded_file_path, raw_materials, error in extraction_results:
+        if error is None:
+            try:
+                saved_file_path = downloaded_file_path
+                if deduplicator is not None:
+                    saved_file_path = deduplicator.get_saved_file_path(downloaded_file_path,
+                                                                       raw_materials)
+                # Not saved when a later revision of the material was saved before.
+                if saved_file_path is not None:
+                    writer(saved_file_path, raw_materials, destination_directory)
+                report.near_duplicate_file_count += saved_file_path != downloaded_file_path
+            except Exception:
+                error = traceback.format_exc()
+        if error is None:
+            report.extracted_file_count += 1
+            report.raw_material_count += len(raw_materials)
+            if ledger is not None:
+                ledger.record_extraction(downloaded_file_path, extractor_type)
+                if time.time() - last_ledger_save_time >= _LEDGER_SAVE_INTERVAL_SECONDS:
+                    _save_ledger(ledger, store, deduplicator)
+                    last_ledger_save_time = time.time()
+        else:
+            if deduplicator is not None:
+                deduplicator.discard(downloaded_file_path)
+            report.failed_files[downloaded_file_path] = error
+            warnings.warn('Could not extract %s:\n%s' % (downloaded_file_path, error))
@@ -0,0 +1,256 @@
+import cPickle
+import hashlib
+import os
+import tempfile
+import threading
+import warnings
+
+from webcrawler import common
+
+
+class ParsedFileCache(object):
+    """
+    Thread-safe LRU cache of the content of downloaded files and of their parsed trees, so that
+    extracting the same files again (e.g. while developing an extractor) reads and parses each of
+    them once. Entries are keyed by file path and are used as long as the size and modification
+    time of the file do not change. The cache is bounded by the estimated memory of the cached
+    content and trees. Cached trees are shared, so extractors must not modify them.
+    """
+    # When the cache is full, least recently used entries are evicted until it is this full, so
+    # that the entries are ordered by use once per many additions rather than on every use.
+    _EVICTION_FILL_RATIO = 0.75
+    # Estimated memory of a parsed tree per byte of its file, by parser.
+    _TREE_MEMORY_FACTORS = {common.LXML_PARSER: 10}
+    _DEFAULT_TREE_MEMORY_FACTOR = 25
+
+    def __init__(self, max_bytes=2 ** 27):
+        self.max_bytes = max_bytes
+        self.hit_count = 0
+        self.miss_count = 0
+        self._byte_count = 0
+        self._use_count = 0
+        # (file path, parser or None for the content) -> [(size, modification time) of the file,
+        # content or tree, estimated bytes, use count at its last use].
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_content(self, file_path):
+        """
+        :return: Content of a file, read once while it does not change.
+        :rtype: str
+        """
+        return self._get(file_path, None, self._read_file, 1)
+
+    def get_tree(self, file_path, parser, parse):
+        """
+        :param parser: Name of the parser of the tree, see `MaterialExtractor`.
+        :param parse: Function parsing the content of the file to a tree, called on a miss.
+        :return: Parsed tree of a file, parsed once while the file does not change.
+        """
+        return self._get(file_path, parser, lambda _: parse(self.get_content(file_path)),
+                         self._TREE_MEMORY_FACTORS.get(parser, self._DEFAULT_TREE_MEMORY_FACTOR))
+
+    @staticmethod
+    def _read_file(file_path):
+        with open(file_path) as read_file:
+            return read_file.read()
+
+    def _get(self, file_path, parser, load, memory_factor):
+        key = (file_path, parser)
+        file_stat = os.stat(file_path)
+        file_state = (file_stat.st_size, file_stat.st_mtime)
+        # Hits do not take the lock: reading the dictionary is atomic, and an entry evicted at the
+        # same time is still a correct result.
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == file_state:
+            self._use_count += 1
+            entry[3] = self._use_count
+            self.hit_count += 1
+            return entry[1]
+        self.miss_count += 1
+        value = load(file_path)
+        estimated_bytes = file_stat.st_size * memory_factor
+        with self._lock:
+            self._remove_entry(key)
+            if estimated_bytes <= self.max_bytes:
+                self._use_count += 1
+                self._entries[key] = [file_state, value, estimated_bytes, self._use_count]
+                self._byte_count += estimated_bytes
+                if self._byte_count > self.max_bytes:
+                    self._evict_least_recently_used()
+        return value
+
+    def _evict_least_recently_used(self):
+        max_bytes = int(self.max_bytes * self._EVICTION_FILL_RATIO)
+        for key in sorted(self._entries, key=lambda key: self._entries[key][3]):
+            if self._byte_count <= max_bytes:
+                break
+            self._remove_entry(key)
+
+    def _remove_entry(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._byte_count -= entry[2]
+
+    def discard(self, file_path):
+        """Remove the content and trees of a file, so that they are read and parsed again."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == file_path]:
+                self._remove_entry(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._byte_count = 0
+
+
+# Cache shared by the extractors it is given to.
+parsed_file_cache = ParsedFileCache()
+
+
+class ExtractionResultCache(object):
+    """
+    Cache of extracted raw material on disk, keyed by the content hash of the downloaded file, the
+    extractor class and its `VERSION`, so that extracting content which was extracted before (by
+    another run, to another directory or from another copy of the file) only loads its material.
+    Changing `VERSION` of an extractor makes all its entries unused.
+
+    Every entry is a pickle file in the cache directory, written atomically, so the cache may be
+    shared by processes (such as the workers of `extraction.extract_directory`). When the total
+    size of the entries exceeds `max_bytes`, least recently used entries are removed, by their
+    modification time which is updated on every hit.
+    """
+    # When the cache is full, least recently used entries are removed until it is this full.
+    _EVICTION_FILL_RATIO = 0.75
+    _ENTRY_EXTENSION = '.pickle'
+
+    def __init__(self, directory_path, max_bytes=2 ** 30):
+        self.directory_path = directory_path
+        self.max_bytes = max_bytes
+        self.hit_count = 0
+        self.miss_count = 0
+        # Total size of the entries, counted on the first addition and then estimated by the
+        # additions of this process until the next eviction counts it again.
+        self._byte_count = None
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory_path):
+            os.makedirs(directory_path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_entry_path(self, content_hash, extractor_type):
+        key = '%s:%s.%s:%s' % (content_hash, extractor_type.__module__, extractor_type.__name__,
+                               extractor_type.VERSION)
+        key_hash = hashlib.sha1(key).hexdigest()
+        return os.path.join(self.directory_path, key_hash[:2], key_hash[2:] + self._ENTRY_EXTENSION)
+
+    def get(self, content_hash, extractor_type):
+        """
+        :param content_hash: SHA-1 hex digest of the content of the downloaded file.
+        :type extractor_type: Subclass of `webcrawler.data_extractor.MaterialExtractor`
+        :return: Raw material the extractor extracted from the content, None if it is not cached.
+        :rtype: list[webcrawler.raw_material.RawMaterial]
+        """
+        entry_path = self._get_entry_path(content_hash, extractor_type)
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                raw_materials = cPickle.load(entry_file)
+            os.utime(entry_path, None)
+        except (IOError, OSError):
+            self.miss_count += 1
+            return None
+        except Exception as error:
+            # A corrupt entry is extracted (and written) again.
+            warnings.warn('Could not load extraction cache entry %s: %s' % (entry_path, error))
+            self.miss_count += 1
+            return None
+        self.hit_count += 1
+        return raw_materials
+
+    def put(self, content_hash, extractor_type, raw_materials):
+        """
+        Cache raw material an extractor extracted from the content of a file, removing least
+        recently used entries if the cache is full.
+        """
+        entry_data = cPickle.dumps(raw_materials, cPickle.HIGHEST_PROTOCOL)
+        if len(entry_data) > self.max_bytes:
+            return
+        entry_path = self._get_entry_path(content_hash, extractor_type)
+        entry_directory = os.path.dirname(entry_path)
+        if not os.path.isdir(entry_directory):
+            try:
+                os.mkdir(entry_directory)
+            except OSError:
+                # Created by another process in the meantime.
+                pass
+        # A unique temporary file, since other processes may write the same entry.
+        temporary_file_descriptor, temporary_file_path = tempfile.mkstemp(prefix='.',
+                                                                          dir=entry_directory)
+        try:
+            with os.fdopen(temporary_file_descriptor, 'wb') as temporary_file:
+                temporary_file.write(entry_data)
+            os.rename(temporary_file_path, entry_path)
+        except BaseException:
+            if os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
+            raise
+        with self._lock:
+            if self._byte_count is None:
+                self._byte_count = sum(size for _, size, _ in self._list_entries())
+            else:
+                self._byte_count += len(entry_data)
+            if self._byte_count > self.max_bytes:
+                self._remove_least_recently_used()
+
+    def _list_entries(self):
+        """:return: (modification time, size, path) of every entry."""
+        entries = []
+        for subdirectory_name in os.listdir(self.directory_path):
+            subdirectory_path = os.path.join(self.directory_path, subdirectory_name)
+            if not os.path.isdir(subdirectory_path):
+                continue
+            for file_name in os.listdir(subdirectory_path):
+                if file_name.startswith('.') or not file_name.endswith(self._ENTRY_EXTENSION):
+                    continue
+                entry_path = os.path.join(subdirectory_path, file_name)
+                try:
+                    entry_stat = os.stat(entry_path)
+                except OSError:
+                    # Removed by another process in the meantime.
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+        return entries
+
+    def _remove_least_recently_used(self):
+        entries = sorted(self._list_entries())
+        self._byte_count = sum(size for _, size, _ in entries)
+        max_bytes = int(self.max_bytes * self._EVICTION_FILL_RATIO)
+        for _, size, entry_path in entries:
+            if self._byte_count <= max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            self._byte_count -= size
+
+    @property
+    def size(self):
+        """Total size in bytes of the entries in the cache."""
+        return sum(size for _, size, _ in self._list_entries())
+
+    def clear(self):
+        with self._lock:
+            for _, _, entry_path in self._list_entries():
+                os.remove(entry_path)
+            self._byte_count = 0
@@ -0,0 +1,126 @@
+import functools
+import threading
+import time
+import urlparse
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from webcrawler import metrics
+
+
+class HttpFetcher(object):
+    """
+    Fetches URLs over a shared keep-alive HTTP session.
+
+    Requests can be spread over a bounded pool of worker threads, while the number of requests sent
+    to the same host at once is capped. Failed requests are retried with exponential backoff.
+    """
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, workers=1, max_connections_per_host=None, timeout=10, retries=2,
+                 backoff_seconds=0.5):
+        """
+        :param workers: Number of URLs fetched at the same time by `map`.
+        :param max_connections_per_host: Maximal number of concurrent requests to a single host.
+            Defaults to the number of workers.
+        :param timeout: Seconds to wait for the server before giving up on a request.
+        :param retries: Number of times a failed request is sent again.
+        :param backoff_seconds: Seconds to wait before the first retry, doubled on each retry.
+        """
+        self.workers = workers
+        self.max_connections_per_host = max_connections_per_host or workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(self.max_connections_per_host, 10))
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._host_semaphores = {}
+        self._host_semaphores_lock = threading.Lock()
+
+    def fetch(self, url, headers=None):
+        """
+        Send a GET request, retrying on connection errors and on temporary server errors.
+
+        :param headers: Extra HTTP headers to send.
+        :type headers: dict
+        :rtype: requests.Response
+        """
+        return self._request('GET', url, headers=headers)
+
+    def post(self, url, data, headers=None):
+        """
+        Send a POST request of form data, retrying like `fetch`.
+        Meant for requests that only read data, such as ASP.NET postbacks.
+
+        :param data: Form fields to send.
+        :type data: dict
+        :rtype: requests.Response
+        """
+        return self._request('POST', url, data=data, headers=headers)
+
+    def _request(self, method, url, **request_arguments):
+        host = urlparse.urlparse(url).netloc
+        for attempt in xrange(self.retries + 1):
+            is_last_attempt = attempt == self.retries
+            try:
+                with self._get_host_semaphore(url):
+                    with metrics.measure('http_request', method=method, host=host):
+                        response = self._session.request(method, url, timeout=self.timeout,
+                                                         **request_arguments)
+                metrics.increment('http_responses_total', method=method, host=host,
+                                  status=response.status_code)
+                if is_last_attempt or response.status_code not in self.RETRY_STATUS_CODES:
+                    if metrics.is_enabled():
+                        metrics.increment('http_response_bytes_total', len(response.content),
+                                          host=host)
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if is_last_attempt:
+                    raise
+            metrics.increment('http_retries_total', method=method, host=host)
+            seconds_to_wait = self.backoff_seconds * 2 ** attempt
+            metrics.increment('sleep_seconds_total', seconds_to_wait, reason='http_backoff')
+            time.sleep(seconds_to_wait)
+
+    def map(self, function, items, return_exceptions=False):
+        """
+        Call `function` on every item using the fetcher's workers.
+        Meant for functions that mostly wait for `fetch`.
+
+        :param return_exceptions: Whether the exception of a failed call is returned in place of
+            its result, so that every item's failure is reported, instead of raising the first one.
+        :return: Results of the calls, in the order of the items.
+        :rtype: list
+        """
+        if return_exceptions:
+            function = functools.partial(_call_returning_exception, function)
+        if self.workers <= 1:
+            return [function(item) for item in items]
+        thread_pool = ThreadPool(self.workers)
+        try:
+            return thread_pool.map(function, items)
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+    def close(self):
+        self._session.close()
+
+    def _get_host_semaphore(self, url):
+        host = urlparse.urlparse(url).netloc
+        with self._host_semaphores_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self.max_connections_per_host)
+            return self._host_semaphores[host]
+
+
+def _call_returning_exception(function, item):
+    try:
+        return function(item)
+    except Exception as exception:
+        return exception
@@ -0,0 +1,124 @@
+# coding=utf-8
+"""
+Vectorized analytics of landing update history, over the NumPy columns of `FlightUpdateColumns`
+(read from a `FlightUpdateStore` or built with `FlightUpdateColumns.from_landing_updates`).
+"""
+import numpy
+
+from webcrawler.flight_store import minutes_to_datetime
+
+UNKNOWN_STATUS = 'unknown'
+NOT_FINAL_STATUS = 'not_final'
+FINAL_STATUS = 'final'
+ON_TIME_STATUS = 'on_time'
+EARLY_STATUS = 'early'
+DELAYED_STATUS = 'delayed'
+LANDING_STATUS = 'landing'
+LANDED_STATUS = 'landed'
+CANCELED_STATUS = 'canceled'
+# Status categories by their code in `get_status_category_codes`.
+STATUS_CATEGORIES = (UNKNOWN_STATUS, NOT_FINAL_STATUS, FINAL_STATUS, ON_TIME_STATUS, EARLY_STATUS,
+                     DELAYED_STATUS, LANDING_STATUS, LANDED_STATUS, CANCELED_STATUS)
+# Status texts of the airport's website (in Hebrew) -> status category.
+_STATUS_TEXT_CATEGORIES = {u'לא סופי': NOT_FINAL_STATUS,
+                           u'סופי': FINAL_STATUS,
+                           u'בזמן': ON_TIME_STATUS,
+                           u'הוקדמה': EARLY_STATUS,
+                           u'עיכוב': DELAYED_STATUS,
+                           u'מעוכבת': DELAYED_STATUS,
+                           u'בנחיתה': LANDING_STATUS,
+                           u'נחתה': LANDED_STATUS,
+                           u'מבוטלת': CANCELED_STATUS,
+                           u'בוטלה': CANCELED_STATUS}
+
+
+def get_status_category(status):
+    """
+    :param status: Status text of a landing update.
+    :type status: unicode
+    :return: Category of the status, one of `STATUS_CATEGORIES`.
+    :rtype: str
+    """
+    return _STATUS_TEXT_CATEGORIES.get(u' '.join(status.split()), UNKNOWN_STATUS)
+
+
+def get_status_category_codes(columns):
+    """
+    :type columns: webcrawler.flight_store.FlightUpdateColumns
+    :return: Code of the status category (index in `STATUS_CATEGORIES`) of each row.
+    :rtype: numpy.ndarray
+    """
+    category_codes = numpy.array([STATUS_CATEGORIES.index(get_status_category(status)) for status
+                                  in columns.dictionaries['status']], dtype=numpy.uint8)
+    if not len(category_codes):
+        return numpy.zeros(len(columns), dtype=numpy.uint8)
+    return category_codes[columns['status']]
+
+
+def punctuality_by(columns, column, row_indices=None, max_on_time_delay_minutes=15):
+    """
+    On-time statistics of flights grouped by the values of a column, e.g. company, flight_from or
+    terminal. Canceled flights and flights whose landing time is not a time are not counted.
+
+    :type columns: webcrawler.flight_store.FlightUpdateColumns
+    :param row_indices: Rows to include, the most recent update of each flight (flight number on a
+        date, see `FlightUpdateColumns.latest_per_flight`) by default.
+    :param max_on_time_delay_minutes: Largest delay of a flight that landed on time.
+    :return: Number of counted flights, rate of those on time and their mean delay in minutes by
+        value of the column.
+    :rtype: dict[unicode | int, (int, float, float)]
+    """
+    if row_indices is None:
+        row_indices = columns.latest_per_flight()
+    delays = columns.delay_minutes()[row_indices]
+    values = columns[column][row_indices]
+    is_counted = ~numpy.isnan(delays) & (get_status_category_codes(columns)[row_indices] !=
+                                         STATUS_CATEGORIES.index(CANCELED_STATUS))
+    delays, values = delays[is_counted], values[is_counted]
+    group_values, group_indices = numpy.unique(values, return_inverse=True)
+    counts = numpy.bincount(group_indices, minlength=len(group_values))
+    on_time_counts = numpy.bincount(group_indices, weights=delays <= max_on_time_delay_minutes,
+                                    minlength=len(group_values))
+    delay_sums = numpy.bincount(group_indices, weights=delays, minlength=len(group_values))
+    dictionary = columns.dictionaries.get(column)
+    return {(dictionary[value] if dictionary is not None else int(value)):
+            (int(count), on_time_count / count, delay_sum / count)
+            for value, count, on_time_count, delay_sum in
+            zip(group_values, counts, on_time_counts, delay_sums)}
+
+
+def status_transitions(columns, row_indices=None, minutes_per_period=None):
+    """
+    Count changes of status category between consecutive updates of the same flight (flight number
+    on a date, see `FlightUpdateColumns.flight_days`).
+
+    :type columns: webcrawler.flight_store.FlightUpdateColumns
+    :param row_indices: Rows to include, all rows by default.
+    :param minutes_per_period: If given, transitions are also grouped by the period (of this many
+        minutes) of the update in which the new status appeared.
+    :return: Number of transitions by (previous category, new category), or by (start time of the
+        period, previous category, new category) if grouped by period.
+    :rtype: dict[tuple, int]
+    """
+    ordered_rows = columns.order_by_flight(row_indices)
+    flight_numbers = columns['flight_number'][ordered_rows]
+    flight_days = columns.flight_days()[ordered_rows]
+    times = columns['schedule_update_minutes'][ordered_rows]
+    categories = get_status_category_codes(columns)[ordered_rows].astype(numpy.int64)
+    is_transition = (flight_numbers[1:] == flight_numbers[:-1]) & \
+        (flight_days[1:] == flight_days[:-1]) & (categories[1:] != categories[:-1])
+    category_count = len(STATUS_CATEGORIES)
+    transition_codes = categories[:-1][is_transition] * category_count + \
+        categories[1:][is_transition]
+    if minutes_per_period is None:
+        counts = numpy.bincount(transition_codes, minlength=category_count ** 2)
+        return {(STATUS_CATEGORIES[code // category_count],
+                 STATUS_CATEGORIES[code % category_count]): int(counts[code])
+                for code in numpy.flatnonzero(counts)}
+    periods, period_indices = numpy.unique(times[1:][is_transition] // minutes_per_period,
+                                           return_inverse=True)
+    counts = numpy.bincount(period_indices * category_count ** 2 + transition_codes)
+    return {(minutes_to_datetime(periods[code // category_count ** 2] * minutes_per_period),
+             STATUS_CATEGORIES[code // category_count % category_count],
+             STATUS_CATEGORIES[code % category_count]): int(counts[code])
+            for code in numpy.flatnonzero(counts)}
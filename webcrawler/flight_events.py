@@ -0,0 +1,350 @@
+import json
+import os
+import warnings
+
+from webcrawler import common
+from webcrawler.data_extractor import FlightLandingScheduleExtractor
+from webcrawler.raw_material import FlightLandingUpdate
+
+NEW_FLIGHT_EVENT = 'new_flight'
+# The flight is not in the schedule anymore.
+REMOVED_FLIGHT_EVENT = 'removed_flight'
+TIME_CHANGED_EVENT = 'time_changed'
+STATUS_CHANGED_EVENT = 'status_changed'
+TERMINAL_CHANGED_EVENT = 'terminal_changed'
+# Company or origin changed.
+DETAILS_CHANGED_EVENT = 'details_changed'
+
+# Fields of `FlightLandingUpdate.to_dict` whose change is reported by each event type.
+_EVENT_FIELDS = ((TIME_CHANGED_EVENT, (FlightLandingUpdate.PLANNED_TIME_FIELD,
+                                       FlightLandingUpdate.UPDATED_TIME_FIELD)),
+                 (STATUS_CHANGED_EVENT, (FlightLandingUpdate.STATUS_FIELD,)),
+                 (TERMINAL_CHANGED_EVENT, (FlightLandingUpdate.TERMINAL_FIELD,)),
+                 (DETAILS_CHANGED_EVENT, (FlightLandingUpdate.COMPANY_FIELD,
+                                          FlightLandingUpdate.FLIGHT_FROM_FIELD)))
+_STATE_FIELDS = (FlightLandingUpdate.COMPANY_FIELD, FlightLandingUpdate.FLIGHT_FROM_FIELD,
+                 FlightLandingUpdate.PLANNED_TIME_FIELD, FlightLandingUpdate.UPDATED_TIME_FIELD,
+                 FlightLandingUpdate.TERMINAL_FIELD, FlightLandingUpdate.STATUS_FIELD)
+
+
+def _get_state(landing_update):
+    """:return: Fields of a landing update which describe the flight (all but number and time)."""
+    landing_update_dict = landing_update.to_dict()
+    return {field: landing_update_dict[field] for field in _STATE_FIELDS}
+
+
+def get_flight_key(landing_update):
+    """
+    :return: Flight number and date (ISO formatted) of the flight of a landing update, since flight
+        numbers repeat every day.
+    :rtype: (unicode, str)
+    """
+    return landing_update.flight_number, landing_update.flight_date.isoformat()
+
+
+class FlightEvent(object):
+    """A change in the state of a flight, seen in the schedule update at `timestamp`."""
+    __slots__ = ('timestamp', 'event_type', 'flight_number', 'changes', 'flight_date')
+
+    def __init__(self, timestamp, event_type, flight_number, changes, flight_date=None):
+        """
+        :param timestamp: Schedule update time as seconds since epoch.
+        :param event_type: One of the `*_EVENT` constants.
+        :param changes: New values of the changed fields, by their `FlightLandingUpdate.to_dict`
+            names. A new flight has all the fields of its state, a removed flight none.
+        :type changes: dict
+        :param flight_date: ISO formatted date of the flight, see `get_flight_key`.
+        :type flight_date: str
+        """
+        self.timestamp = timestamp
+        self.event_type = event_type
+        self.flight_number = flight_number
+        self.changes = changes
+        self.flight_date = flight_date
+
+    @property
+    def time(self):
+        return common.timestamp_to_datetime(self.timestamp)
+
+    @property
+    def flight_key(self):
+        """Flight number and date of the flight, see `get_flight_key`."""
+        return self.flight_number, self.flight_date
+
+    def to_list(self):
+        """:return: JSON-serializable list of the event, shorter than a dictionary."""
+        return [self.timestamp, self.event_type, self.flight_number, self.changes,
+                self.flight_date]
+
+    @classmethod
+    def from_list(cls, event_list):
+        return cls(*event_list)
+
+    def __eq__(self, other):
+        return isinstance(other, FlightEvent) and self.to_list() == other.to_list()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'FlightEvent(%r)' % self.to_list()
+
+
+class FlightStateTracker(object):
+    """
+    Keeps the last known state of every flight (by flight number and date, see `get_flight_key`)
+    and turns landing updates into the events that changed it, so that unchanged flights of
+    repeated schedule downloads produce nothing.
+
+    Updates must arrive in schedule update time order (per flight): updates older than the known
+    state of their flight are ignored.
+    """
+
+    def __init__(self, landing_updates=()):
+        """
+        :param landing_updates: Last known state of flights, see `FlightEventLog.get_state_at`.
+        """
+        # Flight key -> (timestamp of its last update, its state).
+        self._states = {}
+        self.ignored_update_count = 0
+        for landing_update in landing_updates:
+            self._states[get_flight_key(landing_update)] = (
+                landing_update.schedule_update_timestamp, _get_state(landing_update))
+
+    def __len__(self):
+        return len(self._states)
+
+    def diff(self, landing_updates):
+        """
+        :type landing_updates: list[FlightLandingUpdate]
+        :return: Events of new flights and changed flights, in the order of the updates.
+        :rtype: list[FlightEvent]
+        """
+        events = []
+        for landing_update in landing_updates:
+            timestamp = landing_update.schedule_update_timestamp
+            flight_number, flight_date = flight_key = get_flight_key(landing_update)
+            state = _get_state(landing_update)
+            last_timestamp, last_state = self._states.get(flight_key, (None, None))
+            if last_state is None:
+                events.append(FlightEvent(timestamp, NEW_FLIGHT_EVENT, flight_number, state,
+                                          flight_date))
+            elif timestamp < last_timestamp:
+                self.ignored_update_count += 1
+                continue
+            else:
+                for event_type, fields in _EVENT_FIELDS:
+                    changes = {field: state[field] for field in fields if
+                               state[field] != last_state[field]}
+                    if changes:
+                        events.append(FlightEvent(timestamp, event_type, flight_number, changes,
+                                                  flight_date))
+            self._states[flight_key] = (timestamp, state)
+        return events
+
+    def diff_snapshot(self, landing_updates):
+        """
+        Same as `diff` for all the landing updates of a schedule update, also removing the flights
+        which are not in the schedule anymore. No updates are no snapshot, and remove nothing.
+
+        :type landing_updates: list[FlightLandingUpdate]
+        :return: Events of new flights and changed flights, in the order of the updates, followed by
+            events of removed flights.
+        :rtype: list[FlightEvent]
+        """
+        if not landing_updates:
+            return []
+        events = self.diff(landing_updates)
+        present_flight_keys = set(get_flight_key(landing_update) for landing_update in
+                                  landing_updates)
+        events.extend(self.remove(
+            [flight_key for flight_key in self._states if flight_key not in present_flight_keys],
+            max(landing_update.schedule_update_timestamp for landing_update in landing_updates)))
+        return events
+
+    def remove(self, flight_keys, timestamp):
+        """
+        Forget flights which are not in the schedule anymore, as of a schedule update.
+
+        :param flight_keys: Keys of the flights, see `get_flight_key`. Unknown flights are ignored.
+        :param timestamp: Schedule update time as seconds since epoch.
+        :return: Events of the removed flights.
+        :rtype: list[FlightEvent]
+        """
+        events = []
+        for flight_key in sorted(flight_keys):
+            if self._states.pop(flight_key, None) is not None:
+                flight_number, flight_date = flight_key
+                events.append(FlightEvent(timestamp, REMOVED_FLIGHT_EVENT, flight_number, {},
+                                          flight_date))
+        return events
+
+
+class FlightEventLog(object):
+    """
+    Append-only log of flight events, one JSON list per line. The state of all flights at any time
+    is rebuilt by replaying the events up to that time, so the log grows with the changes of flights
+    rather than with the number of schedule downloads.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def append(self, events):
+        """:type events: list[FlightEvent]"""
+        if not events:
+            return
+        lines = [json.dumps(event.to_list(), separators=(',', ':')) + '\n' for event in events]
+        with open(self.file_path, 'a+b') as log_file:
+            log_file.seek(0, os.SEEK_END)
+            if log_file.tell():
+                log_file.seek(-1, os.SEEK_END)
+                if log_file.read(1) != '\n':
+                    # Do not append to a line cut by a crash.
+                    lines.insert(0, '\n')
+            log_file.seek(0, os.SEEK_END)
+            log_file.writelines(lines)
+
+    def iter_events(self, end_time=None):
+        """
+        :param end_time: Only events until this time (inclusive) are returned, all if None.
+        :type end_time: datetime
+        :rtype: collections.Iterator[FlightEvent]
+        """
+        if not os.path.exists(self.file_path):
+            return
+        end_timestamp = common.datetime_to_timestamp(end_time) if end_time is not None else None
+        with open(self.file_path) as log_file:
+            for line_number, line in enumerate(log_file, 1):
+                try:
+                    event = FlightEvent.from_list(json.loads(line))
+                except ValueError:
+                    # A line cut by a crash while appending.
+                    warnings.warn('Skipping invalid line %d of %s' % (line_number, self.file_path))
+                    continue
+                if end_timestamp is not None and event.timestamp > end_timestamp:
+                    continue
+                yield event
+
+    def get_state_at(self, time=None):
+        """
+        :param time: Time of the state, the latest state if None.
+        :type time: datetime
+        :return: Landing update of every flight in the schedule at the time, as of its last change.
+            The schedule update time of each update is the time of that change.
+        :rtype: list[FlightLandingUpdate]
+        """
+        states = {}
+        for event in self.iter_events(time):
+            if event.event_type == REMOVED_FLIGHT_EVENT:
+                states.pop(event.flight_key, None)
+                continue
+            timestamp, state = states.get(event.flight_key, (0, {}))
+            if event.event_type == NEW_FLIGHT_EVENT:
+                state = {}
+            state.update(event.changes)
+            states[event.flight_key] = (max(event.timestamp, timestamp), state)
+        return [FlightLandingUpdate(
+            common.timestamp_to_datetime(timestamp), state[FlightLandingUpdate.COMPANY_FIELD],
+            flight_number, state[FlightLandingUpdate.FLIGHT_FROM_FIELD],
+            state[FlightLandingUpdate.PLANNED_TIME_FIELD],
+            state[FlightLandingUpdate.UPDATED_TIME_FIELD],
+            state[FlightLandingUpdate.TERMINAL_FIELD], state[FlightLandingUpdate.STATUS_FIELD])
+            for (flight_number, _), (timestamp, state) in states.iteritems()]
+
+
+class FlightEventRecorder(object):
+    """
+    Records the changes in extracted landing updates to a `FlightEventLog`, continuing from the
+    state the log already holds.
+
+    Flights are recorded as removed when they are missing from a full snapshot of the schedule
+    (see `add_snapshot`), or when schedule pages are recorded one by one, once they are missing
+    from the pages they were on and from all other pages. Since unchanged pages are not downloaded
+    again, the latest version of each page seen by the recorder is taken as its current version.
+    """
+
+    def __init__(self, log_file_path):
+        self.log = FlightEventLog(log_file_path)
+        self.tracker = FlightStateTracker(self.log.get_state_at())
+        # Page (see `FlightLandingScheduleExtractor.get_deduplication_scope`) -> keys of the flights
+        # in its latest version.
+        self._page_flight_keys = {}
+        # Keys of flights which left a page in the current schedule update, and its timestamp.
+        self._left_flight_keys = set()
+        self._page_update_timestamp = None
+
+    def add(self, landing_updates):
+        """
+        :type landing_updates: list[FlightLandingUpdate]
+        :return: The recorded events.
+        :rtype: list[FlightEvent]
+        """
+        events = self.tracker.diff(landing_updates)
+        self.log.append(events)
+        return events
+
+    def add_snapshot(self, landing_updates):
+        """
+        Record all landing updates of a schedule update, see `FlightStateTracker.diff_snapshot`.
+
+        :type landing_updates: list[FlightLandingUpdate]
+        :return: The recorded events.
+        :rtype: list[FlightEvent]
+        """
+        events = self.tracker.diff_snapshot(landing_updates)
+        self.log.append(events)
+        return events
+
+    def add_page(self, page, landing_updates):
+        """
+        Record the landing updates of a schedule page. Flights which left pages of a schedule update
+        are removed once the pages of a later update are recorded (or on `flush`).
+
+        :param page: Name of the page, e.g. its number.
+        :type landing_updates: list[FlightLandingUpdate]
+        :return: The recorded events.
+        :rtype: list[FlightEvent]
+        """
+        events = []
+        if landing_updates:
+            timestamp = max(landing_update.schedule_update_timestamp for landing_update in
+                            landing_updates)
+            if self._page_update_timestamp is None or timestamp > self._page_update_timestamp:
+                events.extend(self._remove_left_flights())
+                self._page_update_timestamp = timestamp
+        events.extend(self.tracker.diff(landing_updates))
+        flight_keys = set(get_flight_key(landing_update) for landing_update in landing_updates)
+        self._left_flight_keys.update(self._page_flight_keys.get(page, set()) - flight_keys)
+        self._page_flight_keys[page] = flight_keys
+        self.log.append(events)
+        return events
+
+    def flush(self):
+        """
+        Record the flights which left the pages of the last schedule update recorded by `add_page`,
+        when no more pages of that update are expected.
+
+        :return: The recorded events.
+        :rtype: list[FlightEvent]
+        """
+        events = self._remove_left_flights()
+        self.log.append(events)
+        return events
+
+    def _remove_left_flights(self):
+        present_flight_keys = set().union(*self._page_flight_keys.itervalues())
+        events = self.tracker.remove(self._left_flight_keys - present_flight_keys,
+                                     self._page_update_timestamp)
+        self._left_flight_keys = set()
+        return events
+
+    def save_raw_material(self, downloaded_file_path, raw_materials, directory_path=None):
+        """
+        Record the changes in landing updates extracted from a downloaded schedule page, see
+        `add_page`. Can be used as the writer of `extraction.extract_directory` (with a single
+        worker, so that pages are extracted in download order) or of a pipeline extraction stage,
+        ignoring its directory.
+        """
+        self.add_page(FlightLandingScheduleExtractor.get_deduplication_scope(downloaded_file_path),
+                      raw_materials)
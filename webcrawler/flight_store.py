@@ -0,0 +1,430 @@
+import json
+import mmap
+import os
+import re
+import struct
+
+import numpy
+
+from webcrawler import common, utils
+from webcrawler.raw_material import FlightLandingUpdate
+
+_TIME_OF_DAY_REGEX = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)$')
+_MINUTES_PER_DAY = 24 * 60
+
+
+def datetime_to_minutes(time):
+    """:return: Minutes since epoch of a naive datetime, the way it is stored in segments."""
+    return common.datetime_to_timestamp(time) // 60
+
+
+def minutes_to_datetime(minutes):
+    return common.timestamp_to_datetime(int(minutes) * 60)
+
+
+def _encode_time_of_day(time_of_day, other_values):
+    """
+    :return: Minutes since midnight of an 'HH:MM' time, or -(index + 1) of any other value in
+        `other_values`, to which it is added if needed.
+    """
+    match = _TIME_OF_DAY_REGEX.match(time_of_day)
+    if match:
+        return int(match.group(1)) * 60 + int(match.group(2))
+    if time_of_day not in other_values:
+        other_values.append(time_of_day)
+    return -(other_values.index(time_of_day) + 1)
+
+
+def _decode_time_of_day(code, other_values):
+    if code >= 0:
+        return u'%02d:%02d' % divmod(code, 60)
+    return other_values[-code - 1]
+
+
+class FlightUpdateSegment(object):
+    """
+    A single file of landing updates stored column by column.
+
+    The file starts with a JSON header which holds the number of rows, the dictionaries of the
+    dictionary-encoded columns and the location of each column, followed by the raw column arrays.
+    Columns are read by memory-mapping the file, without copying or parsing rows.
+    """
+    MAGIC = 'FLSEG001'
+    FILE_EXTENSION = '.seg'
+    _HEADER_LENGTH_FORMAT = '<I'
+    _COLUMN_ALIGNMENT = 8
+
+    # Column name -> NumPy type of its values.
+    COLUMN_TYPES = (('schedule_update_minutes', '<i8'),
+                    ('company', '<u4'),
+                    ('flight_number', '<u4'),
+                    ('flight_from', '<u4'),
+                    ('planned_time', '<i2'),
+                    ('updated_time', '<i2'),
+                    ('terminal', '<i2'),
+                    ('status', '<u4'))
+    DICTIONARY_COLUMNS = ('company', 'flight_number', 'flight_from', 'status')
+    TIME_OF_DAY_COLUMNS = ('planned_time', 'updated_time')
+
+    @classmethod
+    def encode(cls, landing_updates):
+        """
+        :type landing_updates: list[FlightLandingUpdate]
+        :return: Arrays of the columns in `COLUMN_TYPES` order, values of the dictionary-encoded
+            columns by code and values of the time-of-day columns which are not times.
+        :rtype: (list[numpy.ndarray], dict[str, list[unicode]], list[unicode])
+        """
+        dictionaries = {column: {} for column in cls.DICTIONARY_COLUMNS}
+        other_time_values = []
+        rows = []
+        for landing_update in landing_updates:
+            rows.append((
+                landing_update.schedule_update_timestamp // 60,
+                dictionaries['company'].setdefault(landing_update.company,
+                                                   len(dictionaries['company'])),
+                dictionaries['flight_number'].setdefault(landing_update.flight_number,
+                                                         len(dictionaries['flight_number'])),
+                dictionaries['flight_from'].setdefault(landing_update.flight_from,
+                                                       len(dictionaries['flight_from'])),
+                _encode_time_of_day(landing_update.planned_time, other_time_values),
+                _encode_time_of_day(landing_update.updated_time, other_time_values),
+                landing_update.terminal,
+                dictionaries['status'].setdefault(landing_update.status,
+                                                  len(dictionaries['status']))))
+        column_values = zip(*rows) if rows else [()] * len(cls.COLUMN_TYPES)
+        column_arrays = [numpy.array(values, dtype=column_type) for values, (_, column_type) in
+                         zip(column_values, cls.COLUMN_TYPES)]
+        return (column_arrays, {column: sorted(dictionary, key=dictionary.get) for
+                                column, dictionary in dictionaries.iteritems()}, other_time_values)
+
+    @classmethod
+    def write(cls, file_path, landing_updates):
+        """
+        Write landing updates to a new segment file.
+
+        :type landing_updates: list[FlightLandingUpdate]
+        """
+        column_arrays, dictionaries, other_time_values = cls.encode(landing_updates)
+        header = {'row_count': len(column_arrays[0]),
+                  'dictionaries': dictionaries,
+                  'other_time_values': other_time_values,
+                  'column_offsets': {}}
+        # Column offsets depend on the header length, so they are computed with an upper bound of
+        # the header length and the header is padded to it.
+        header_space = len(json.dumps(header)) + 64 * len(cls.COLUMN_TYPES)
+        offset = cls._align(len(cls.MAGIC) + struct.calcsize(cls._HEADER_LENGTH_FORMAT) +
+                            header_space)
+        for (column, _), column_array in zip(cls.COLUMN_TYPES, column_arrays):
+            header['column_offsets'][column] = offset
+            offset = cls._align(offset + column_array.nbytes)
+        encoded_header = json.dumps(header).ljust(header_space)
+
+        with common.atomic_write(file_path, 'wb') as segment_file:
+            segment_file.write(cls.MAGIC)
+            segment_file.write(struct.pack(cls._HEADER_LENGTH_FORMAT, len(encoded_header)))
+            segment_file.write(encoded_header)
+            for column, column_array in zip(cls.COLUMN_TYPES, column_arrays):
+                segment_file.seek(header['column_offsets'][column[0]])
+                segment_file.write(column_array.tostring())
+
+    @classmethod
+    def read(cls, file_path):
+        """
+        :return: Header of the segment, and its columns as arrays backed by the mapped file.
+        :rtype: (dict, dict[str, numpy.ndarray])
+        """
+        with open(file_path, 'rb') as segment_file:
+            if os.fstat(segment_file.fileno()).st_size == 0:
+                raise ValueError('Empty segment file: %s' % file_path)
+            mapped_file = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped_file[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError('Not a flight update segment: %s' % file_path)
+        header_start = len(cls.MAGIC) + struct.calcsize(cls._HEADER_LENGTH_FORMAT)
+        header_length, = struct.unpack(cls._HEADER_LENGTH_FORMAT,
+                                       mapped_file[len(cls.MAGIC):header_start])
+        header = json.loads(mapped_file[header_start:header_start + header_length])
+        columns = {column: numpy.frombuffer(mapped_file, dtype=column_type,
+                                            count=header['row_count'],
+                                            offset=header['column_offsets'][column])
+                   for column, column_type in cls.COLUMN_TYPES}
+        return header, columns
+
+    @classmethod
+    def _align(cls, offset):
+        return -(-offset // cls._COLUMN_ALIGNMENT) * cls._COLUMN_ALIGNMENT
+
+
+class FlightUpdateColumns(object):
+    """
+    Landing updates of a store as NumPy columns, for vectorized queries over many rows.
+    Dictionary-encoded columns hold codes into the store-wide dictionaries in `dictionaries`.
+    """
+
+    def __init__(self, columns, dictionaries, other_time_values):
+        """
+        :type columns: dict[str, numpy.ndarray]
+        :type dictionaries: dict[str, list[unicode]]
+        :type other_time_values: list[unicode]
+        """
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.other_time_values = other_time_values
+
+    @classmethod
+    def from_landing_updates(cls, landing_updates):
+        """
+        Columns of landing updates in memory, without a store.
+
+        :type landing_updates: list[FlightLandingUpdate]
+        :rtype: FlightUpdateColumns
+        """
+        column_arrays, dictionaries, other_time_values = FlightUpdateSegment.encode(landing_updates)
+        return cls({column: column_array for (column, _), column_array in
+                    zip(FlightUpdateSegment.COLUMN_TYPES, column_arrays)}, dictionaries,
+                   other_time_values)
+
+    def __len__(self):
+        return len(self.columns['schedule_update_minutes'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def flight_days(self):
+        """
+        :return: Day (since epoch) of the planned landing of each row, like
+            `FlightLandingUpdate.flight_date`: the day on which the planned time is nearest to the
+            schedule update time, or the day of the update if the planned time is not a time.
+        :rtype: numpy.ndarray
+        """
+        times = self.columns['schedule_update_minutes']
+        planned_times = self.columns['planned_time'].astype(numpy.int64)
+        planned_minutes = times - times % _MINUTES_PER_DAY + planned_times
+        planned_minutes -= _MINUTES_PER_DAY * (planned_minutes - times > _MINUTES_PER_DAY // 2)
+        planned_minutes += _MINUTES_PER_DAY * (times - planned_minutes > _MINUTES_PER_DAY // 2)
+        return numpy.where(planned_times >= 0, planned_minutes, times) // _MINUTES_PER_DAY
+
+    def _get_flight_codes(self, row_indices, per_date):
+        """
+        :return: Code of the flight of each of the rows, increasing with flight number and then
+            with flight date, and the number of codes.
+        :rtype: (numpy.ndarray, int)
+        """
+        flight_numbers = self.columns['flight_number'][row_indices]
+        if not per_date:
+            return flight_numbers, len(self.dictionaries['flight_number'])
+        days = self.flight_days()[row_indices]
+        days -= days.min()
+        day_count = int(days.max()) + 1
+        code_count = len(self.dictionaries['flight_number']) * day_count
+        if code_count <= len(days):
+            # Every flight number on every day has a code, which takes no sorting.
+            return flight_numbers * day_count + days, code_count
+        flight_keys, flight_codes = numpy.unique((flight_numbers.astype(numpy.int64) << 32) | days,
+                                                 return_inverse=True)
+        return flight_codes, len(flight_keys)
+
+    def latest_per_flight(self, per_date=True):
+        """
+        :param per_date: Whether a flight is a flight number on a date (see `flight_days`), since
+            flight numbers repeat every day, or all the flights of a flight number.
+        :return: Row indices of the most recent update of each flight, ordered by flight.
+        :rtype: numpy.ndarray
+        """
+        times = self.columns['schedule_update_minutes']
+        if not len(times):
+            return numpy.array([], dtype=numpy.intp)
+        flight_codes, flight_count = self._get_flight_codes(slice(None), per_date)
+        # Linear in the number of rows (after coding the flights), unlike sorting them by flight
+        # and time.
+        latest_times = numpy.full(flight_count, times.min(), dtype=times.dtype)
+        numpy.maximum.at(latest_times, flight_codes, times)
+        latest_rows = numpy.flatnonzero(times == latest_times[flight_codes])[::-1]
+        # Of several updates of a flight at the same time, the last row is taken.
+        _, first_indices = numpy.unique(flight_codes[latest_rows], return_index=True)
+        return latest_rows[first_indices]
+
+    def order_by_flight(self, row_indices=None, per_date=True):
+        """
+        :param row_indices: Rows to order, all rows by default.
+        :param per_date: Whether flights are grouped by flight number and date, see
+            `latest_per_flight`.
+        :return: Row indices sorted by flight, and by schedule update time within each flight.
+        :rtype: numpy.ndarray
+        """
+        if row_indices is None:
+            row_indices = numpy.arange(len(self))
+        times = self.columns['schedule_update_minutes'][row_indices]
+        if not len(times):
+            return row_indices
+        flight_codes, _ = self._get_flight_codes(row_indices, per_date)
+        # A single integer key sorts several times faster than `numpy.lexsort` of both columns.
+        keys = (flight_codes.astype(numpy.int64) << 32) | (times - times.min())
+        return row_indices[numpy.argsort(keys)]
+
+    def in_time_range(self, start_time=None, end_time=None):
+        """
+        :type start_time: datetime
+        :type end_time: datetime
+        :return: Row indices of updates with schedule update time in [start_time, end_time).
+        :rtype: numpy.ndarray
+        """
+        times = self.columns['schedule_update_minutes']
+        in_range = numpy.ones(len(times), dtype=bool)
+        if start_time is not None:
+            in_range &= times >= datetime_to_minutes(start_time)
+        if end_time is not None:
+            in_range &= times < datetime_to_minutes(end_time)
+        return numpy.flatnonzero(in_range)
+
+    def delay_minutes(self):
+        """
+        :return: Minutes between planned and updated landing time of each row, NaN where one of
+            them is not a time. Delays are wrapped around midnight into [-12, 12) hours.
+        :rtype: numpy.ndarray
+        """
+        planned_times = self.columns['planned_time'].astype(numpy.float64)
+        updated_times = self.columns['updated_time'].astype(numpy.float64)
+        delays = (updated_times - planned_times + 12 * 60) % (24 * 60) - 12 * 60
+        delays[(planned_times < 0) | (updated_times < 0)] = numpy.nan
+        return delays
+
+    def delays_by_origin(self, row_indices=None):
+        """
+        :param row_indices: Rows to include, all rows by default.
+        :return: Number of rows with known delay and mean delay in minutes by origin.
+        :rtype: dict[unicode, (int, float)]
+        """
+        delays = self.delay_minutes()
+        origins = self.columns['flight_from']
+        if row_indices is not None:
+            delays, origins = delays[row_indices], origins[row_indices]
+        is_known = ~numpy.isnan(delays)
+        delays, origins = delays[is_known], origins[is_known]
+        origin_count = len(self.dictionaries['flight_from'])
+        counts = numpy.bincount(origins, minlength=origin_count)
+        sums = numpy.bincount(origins, weights=delays, minlength=origin_count)
+        return {self.dictionaries['flight_from'][origin]: (int(counts[origin]),
+                                                           sums[origin] / counts[origin])
+                for origin in numpy.flatnonzero(counts)}
+
+    def to_landing_updates(self, row_indices):
+        """:rtype: list[FlightLandingUpdate]"""
+        columns, dictionaries = self.columns, self.dictionaries
+        return [FlightLandingUpdate(
+            minutes_to_datetime(columns['schedule_update_minutes'][row]),
+            dictionaries['company'][columns['company'][row]],
+            dictionaries['flight_number'][columns['flight_number'][row]],
+            dictionaries['flight_from'][columns['flight_from'][row]],
+            _decode_time_of_day(columns['planned_time'][row], self.other_time_values),
+            _decode_time_of_day(columns['updated_time'][row], self.other_time_values),
+            int(columns['terminal'][row]),
+            dictionaries['status'][columns['status'][row]]) for row in row_indices]
+
+
+class FlightUpdateStore(object):
+    """
+    Append-only store of landing updates in a directory of `FlightUpdateSegment` files.
+    Every append writes a new segment, and `compact` merges all segments into one.
+    """
+    SEGMENT_FILE_NAME_FORMAT = 'segment_{number:08d}' + FlightUpdateSegment.FILE_EXTENSION
+
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        if not os.path.exists(directory_path):
+            os.mkdir(directory_path)
+
+    @property
+    def segment_paths(self):
+        return sorted(file_path for file_path in utils.list_directory_files(self.directory_path)
+                      if file_path.endswith(FlightUpdateSegment.FILE_EXTENSION))
+
+    def append(self, landing_updates):
+        """
+        Store landing updates in a new segment.
+
+        :type landing_updates: list[FlightLandingUpdate]
+        """
+        if not landing_updates:
+            return
+        segment_paths = self.segment_paths
+        next_segment_number = int(os.path.basename(segment_paths[-1])[8:16]) + 1 \
+            if segment_paths else 0
+        FlightUpdateSegment.write(
+            os.path.join(self.directory_path,
+                         self.SEGMENT_FILE_NAME_FORMAT.format(number=next_segment_number)),
+            landing_updates)
+
+    def read_columns(self):
+        """
+        Read all segments into columns, re-encoding dictionary codes with store-wide dictionaries.
+
+        :rtype: FlightUpdateColumns
+        """
+        dictionaries = {column: [] for column in FlightUpdateSegment.DICTIONARY_COLUMNS}
+        dictionary_codes = {column: {} for column in FlightUpdateSegment.DICTIONARY_COLUMNS}
+        other_time_values = []
+        segment_columns = {column: [] for column, _ in FlightUpdateSegment.COLUMN_TYPES}
+        for segment_path in self.segment_paths:
+            header, columns = FlightUpdateSegment.read(segment_path)
+            for column, values in columns.iteritems():
+                if column in dictionary_codes:
+                    code_mapping = numpy.array(
+                        [dictionary_codes[column].setdefault(value, len(dictionary_codes[column]))
+                         for value in header['dictionaries'][column]], dtype=values.dtype)
+                    values = code_mapping[values] if len(code_mapping) else values
+                elif column in FlightUpdateSegment.TIME_OF_DAY_COLUMNS:
+                    values = self._recode_other_time_values(values, header['other_time_values'],
+                                                            other_time_values)
+                segment_columns[column].append(values)
+        for column, codes in dictionary_codes.iteritems():
+            dictionaries[column] = sorted(codes, key=codes.get)
+        columns = {}
+        for column, column_type in FlightUpdateSegment.COLUMN_TYPES:
+            arrays = segment_columns[column]
+            columns[column] = numpy.concatenate(arrays) if arrays else \
+                numpy.array([], dtype=column_type)
+        return FlightUpdateColumns(columns, dictionaries, other_time_values)
+
+    def compact(self):
+        """Merge all segments into a single segment."""
+        segment_paths = self.segment_paths
+        if len(segment_paths) < 2:
+            return
+        columns = self.read_columns()
+        landing_updates = columns.to_landing_updates(xrange(len(columns)))
+        self.append(landing_updates)
+        for segment_path in segment_paths:
+            os.remove(segment_path)
+
+    @staticmethod
+    def _recode_other_time_values(values, segment_other_values, other_values):
+        if not segment_other_values:
+            return values
+        for other_value in segment_other_values:
+            if other_value not in other_values:
+                other_values.append(other_value)
+        # Segment code -(index + 1) -> store code, applied to all codes at once, so that codes
+        # which were already recoded are not recoded again.
+        code_mapping = numpy.array([-(other_values.index(other_value) + 1) for other_value in
+                                    segment_other_values], dtype=values.dtype)
+        values = values.copy()
+        is_other_value = values < 0
+        values[is_other_value] = code_mapping[-values[is_other_value] - 1]
+        return values
+
+
+def convert_json_directory(json_directory_path, store, batch_size=100000):
+    """
+    Add landing updates saved as JSON files (by `utils.save_landing_updates_to_directory`) to a
+    store.
+
+    :type store: FlightUpdateStore
+    :param batch_size: Number of landing updates loaded before they are written as a segment.
+    """
+    landing_updates = []
+    for file_path in utils.list_directory_files(json_directory_path):
+        landing_updates.append(FlightLandingUpdate.load(file_path))
+        if len(landing_updates) == batch_size:
+            store.append(landing_updates)
+            landing_updates = []
+    store.append(landing_updates)
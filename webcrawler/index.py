@@ -0,0 +1,243 @@
+import bisect
+import cPickle
+import os
+import re
+
+from webcrawler import common, utils
+from webcrawler.common import to_unicode
+from webcrawler.query import normalize_text
+
+
+def get_material_text(raw_material):
+    """
+    :return: All the text of a raw material, as searched by the analyzers.
+    :rtype: unicode
+    """
+    if hasattr(raw_material, 'to_text'):
+        return to_unicode(raw_material.to_text())
+    material_dict = raw_material.to_dict()
+    return u'\n'.join(to_unicode(element) for element in
+                      material_dict.keys() + material_dict.values())
+
+
+class InvertedIndex(object):
+    """
+    Persistent inverted index of the raw material files in a directory, saved as a hidden file in
+    that directory.
+
+    Maps every (normalized) term to the files containing it, with the positions of the term in each
+    file, so that files which may contain a text are found without loading any file. The index is
+    updated incrementally: only new or modified files are indexed again.
+    """
+    FILE_NAME = '.inverted_index'
+    # Changed whenever terms are found differently, so that indexes saved before are rebuilt.
+    FORMAT_VERSION = 2
+    _TERM_REGEX = re.compile(r'\w+', re.UNICODE)
+    # Length of the substrings of terms indexed in memory to find the terms containing a text.
+    _TRIGRAM_LENGTH = 3
+
+    def __init__(self, directory_path, material_type):
+        """
+        :param material_type: The type of material the indexed files represent.
+        :type material_type: Subclass of `RawMaterial`
+        """
+        self.directory_path = directory_path
+        self.material_type = material_type
+        self.file_path = os.path.join(directory_path, self.FILE_NAME)
+        self._next_file_id = 0
+        # File name -> (file id, size, modification time).
+        self._files = {}
+        # File id -> file name.
+        self._file_names = {}
+        # File id -> terms of the file.
+        self._file_terms = {}
+        # Term -> {file id: positions of the term in the file}.
+        self._postings = {}
+        # Lookups of partial terms, built in memory on first use after the terms changed: sorted
+        # terms (for prefixes), sorted reversed terms (for suffixes) and trigram -> terms
+        # containing it.
+        self._sorted_terms = None
+        self._sorted_reversed_terms = None
+        self._trigram_terms = None
+        if os.path.exists(self.file_path):
+            with open(self.file_path, 'rb') as index_file:
+                index_data = cPickle.load(index_file)
+            # Indexes of other formats start empty, so all files are indexed again on update.
+            if len(index_data) == 5 and index_data[0] == self.FORMAT_VERSION:
+                (_, self._next_file_id, self._files, self._file_terms,
+                 self._postings) = index_data
+            self._file_names = {file_id: file_name for file_name, (file_id, _, _) in
+                                self._files.iteritems()}
+
+    @classmethod
+    def exists(cls, directory_path):
+        """Whether an index was saved in the directory."""
+        return os.path.exists(os.path.join(directory_path, cls.FILE_NAME))
+
+    @classmethod
+    def tokenize(cls, text):
+        """
+        :return: Terms of the normalized text, see `query.normalize_text`.
+        :rtype: list[unicode]
+        """
+        return cls._TERM_REGEX.findall(normalize_text(text))
+
+    @property
+    def file_count(self):
+        return len(self._files)
+
+    def update(self):
+        """
+        Index files added to the directory or modified since they were indexed, forget files removed
+        from it and save the index if anything changed.
+
+        :return: Whether the index changed.
+        :rtype: bool
+        """
+        current_files = {}
+        for file_path in utils.list_directory_files(self.directory_path):
+            file_stat = os.stat(file_path)
+            current_files[os.path.basename(file_path)] = (file_stat.st_size, file_stat.st_mtime)
+        removed_file_names = [file_name for file_name in self._files if
+                              file_name not in current_files]
+        changed_file_names = [file_name for file_name, file_state in current_files.iteritems() if
+                              file_name not in self._files or
+                              self._files[file_name][1:] != file_state]
+        for file_name in removed_file_names + changed_file_names:
+            self._remove_file(file_name)
+        for file_name in changed_file_names:
+            self._add_file(file_name, *current_files[file_name])
+        is_changed = bool(removed_file_names or changed_file_names)
+        if is_changed or not os.path.exists(self.file_path):
+            self.save()
+        return is_changed
+
+    def save(self):
+        """Write the index to its file, replacing the previous one only when fully written."""
+        with common.atomic_write(self.file_path, 'wb') as index_file:
+            cPickle.dump((self.FORMAT_VERSION, self._next_file_id, self._files, self._file_terms,
+                          self._postings), index_file, cPickle.HIGHEST_PROTOCOL)
+
+    def get_candidate_file_paths(self, text):
+        """
+        Find files which may contain a text, ignoring case. Every file which contains the text is
+        returned, but some returned files may not contain it, so they should still be searched.
+
+        :return: Paths of candidate files, None if the text has no terms to look up.
+        :rtype: list[str]
+        """
+        query_terms = self.tokenize(text)
+        if not query_terms:
+            return None
+        term_postings = [self._get_matching_postings(query_terms, term_index) for term_index in
+                         xrange(len(query_terms))]
+        candidate_file_ids = set(term_postings[0])
+        for postings in term_postings[1:]:
+            candidate_file_ids.intersection_update(postings)
+        return [os.path.join(self.directory_path, self._file_names[file_id]) for file_id in
+                candidate_file_ids if self._has_consecutive_terms(file_id, term_postings)]
+
+    def _get_matching_postings(self, query_terms, term_index):
+        """
+        Postings of all indexed terms that the query term at the index can be part of in a matching
+        text. A single query term may appear anywhere in a term, the first query term may be a
+        suffix of a term, the last a prefix and terms in the middle must match exactly.
+
+        :return: Positions of matching terms by file id.
+        :rtype: dict[int, set[int]]
+        """
+        query_term = query_terms[term_index]
+        is_first, is_last = term_index == 0, term_index == len(query_terms) - 1
+        if is_first and is_last:
+            matching_terms = self._get_terms_containing(query_term)
+        elif is_first:
+            if self._sorted_reversed_terms is None:
+                self._sorted_reversed_terms = sorted(term[::-1] for term in self._postings)
+            matching_terms = [term[::-1] for term in
+                              self._get_prefixed_terms(self._sorted_reversed_terms,
+                                                       query_term[::-1])]
+        elif is_last:
+            if self._sorted_terms is None:
+                self._sorted_terms = sorted(self._postings)
+            matching_terms = self._get_prefixed_terms(self._sorted_terms, query_term)
+        else:
+            matching_terms = [query_term] if query_term in self._postings else []
+        matching_postings = {}
+        for term in matching_terms:
+            for file_id, positions in self._postings[term].iteritems():
+                matching_postings.setdefault(file_id, set()).update(positions)
+        return matching_postings
+
+    @staticmethod
+    def _get_prefixed_terms(sorted_terms, prefix):
+        """:return: Terms of a sorted list which start with the prefix."""
+        terms = []
+        for term_index in xrange(bisect.bisect_left(sorted_terms, prefix), len(sorted_terms)):
+            if not sorted_terms[term_index].startswith(prefix):
+                break
+            terms.append(sorted_terms[term_index])
+        return terms
+
+    def _get_terms_containing(self, text):
+        """:return: Indexed terms which contain the text."""
+        if len(text) < self._TRIGRAM_LENGTH:
+            # Too short to have a trigram, and contained in a large part of the terms anyway.
+            return [term for term in self._postings if text in term]
+        if self._trigram_terms is None:
+            self._trigram_terms = {}
+            for term in self._postings:
+                for trigram in self._get_trigrams(term):
+                    self._trigram_terms.setdefault(trigram, set()).add(term)
+        # The terms of the rarest trigrams are intersected first, keeping the sets small.
+        trigram_terms = sorted((self._trigram_terms.get(trigram, ()) for trigram in
+                                self._get_trigrams(text)), key=len)
+        candidate_terms = set(trigram_terms[0])
+        for terms in trigram_terms[1:]:
+            if not candidate_terms:
+                break
+            candidate_terms.intersection_update(terms)
+        # Having all the trigrams of the text does not mean having the text.
+        return [term for term in candidate_terms if text in term]
+
+    @classmethod
+    def _get_trigrams(cls, text):
+        return set(text[start:start + cls._TRIGRAM_LENGTH] for start in
+                   xrange(len(text) - cls._TRIGRAM_LENGTH + 1))
+
+    @staticmethod
+    def _has_consecutive_terms(file_id, term_postings):
+        """Whether the file has the matching terms of every query term one after the other."""
+        first_term_positions = term_postings[0][file_id]
+        return any(all(position + term_index in postings[file_id] for term_index, postings in
+                       enumerate(term_postings[1:], 1)) for position in first_term_positions)
+
+    def _add_file(self, file_name, file_size, file_modification_time):
+        file_id = self._next_file_id
+        self._next_file_id += 1
+        raw_material = self.material_type.load(os.path.join(self.directory_path, file_name))
+        file_postings = {}
+        for position, term in enumerate(self.tokenize(get_material_text(raw_material))):
+            file_postings.setdefault(term, []).append(position)
+        for term, positions in file_postings.iteritems():
+            self._postings.setdefault(term, {})[file_id] = positions
+        self._files[file_name] = (file_id, file_size, file_modification_time)
+        self._file_names[file_id] = file_name
+        self._file_terms[file_id] = file_postings.keys()
+        self._clear_term_lookups()
+
+    def _remove_file(self, file_name):
+        if file_name not in self._files:
+            return
+        file_id = self._files.pop(file_name)[0]
+        del self._file_names[file_id]
+        for term in self._file_terms.pop(file_id):
+            term_postings = self._postings[term]
+            del term_postings[file_id]
+            if not term_postings:
+                del self._postings[term]
+        self._clear_term_lookups()
+
+    def _clear_term_lookups(self):
+        self._sorted_terms = None
+        self._sorted_reversed_terms = None
+        self._trigram_terms = None
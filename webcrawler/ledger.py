@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+from webcrawler import common
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_file_content_hash(file_path):
+    """:return: SHA-1 hex digest of a file's content, read in chunks."""
+    content_hash = hashlib.sha1()
+    with open(file_path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(_HASH_CHUNK_SIZE), ''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class ExtractionLedger(object):
+    """
+    Record of the downloaded files extracted to a directory, saved as a hidden file in that
+    directory.
+
+    For each extracted file (by path) the ledger keeps its size, modification time and content hash
+    and the extractor it was extracted with, so that only new or changed files, or files of an
+    extractor whose `VERSION` changed, are extracted again. Size and modification time are compared
+    first, so unchanged files are not read at all; files that were touched without changing are
+    recognized by their content hash.
+    A file is recorded only after its raw material was written, so files whose extraction was
+    interrupted by a crash are extracted again on the next run.
+    """
+    FILE_NAME = '.extraction_ledger.json'
+
+    SIZE_FIELD = 'size'
+    MODIFICATION_TIME_FIELD = 'mtime'
+    CONTENT_HASH_FIELD = 'content_hash'
+    EXTRACTOR_FIELD = 'extractor'
+    EXTRACTOR_VERSION_FIELD = 'extractor_version'
+
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        self.file_path = os.path.join(directory_path, self.FILE_NAME)
+        # Downloaded file path -> its entry.
+        self._entries = {}
+        # Downloaded file path -> (size, modification time, content hash) when it was last checked.
+        self._checked_file_states = {}
+        if os.path.exists(self.file_path):
+            with open(self.file_path) as ledger_file:
+                self._entries = json.load(ledger_file)['entries']
+
+    def __len__(self):
+        return len(self._entries)
+
+    def needs_extraction(self, downloaded_file_path, extractor_type):
+        """
+        :param extractor_type: Extractor the file is about to be extracted with.
+        :type extractor_type: Subclass of `webcrawler.data_extractor.MaterialExtractor`
+        :return: Whether the file is new, changed or was extracted by another extractor (version)
+            since it was recorded.
+        :rtype: bool
+        """
+        key = os.path.abspath(downloaded_file_path)
+        file_stat = os.stat(downloaded_file_path)
+        entry = self._entries.get(key)
+        is_same_extractor = entry is not None and \
+            entry[self.EXTRACTOR_FIELD] == extractor_type.__name__ and \
+            entry[self.EXTRACTOR_VERSION_FIELD] == extractor_type.VERSION
+        if is_same_extractor and entry[self.SIZE_FIELD] == file_stat.st_size and \
+                entry[self.MODIFICATION_TIME_FIELD] == file_stat.st_mtime:
+            return False
+        content_hash = get_file_content_hash(downloaded_file_path)
+        if is_same_extractor and entry[self.CONTENT_HASH_FIELD] == content_hash:
+            entry[self.SIZE_FIELD] = file_stat.st_size
+            entry[self.MODIFICATION_TIME_FIELD] = file_stat.st_mtime
+            return False
+        # The state is kept from before the extraction, so a file changed while being extracted is
+        # extracted again next time.
+        self._checked_file_states[key] = (file_stat.st_size, file_stat.st_mtime, content_hash)
+        return True
+
+    def record_extraction(self, downloaded_file_path, extractor_type):
+        """Record that the file's raw material was written, after checking `needs_extraction`."""
+        key = os.path.abspath(downloaded_file_path)
+        size, modification_time, content_hash = self._checked_file_states.pop(key)
+        self._entries[key] = {self.SIZE_FIELD: size,
+                              self.MODIFICATION_TIME_FIELD: modification_time,
+                              self.CONTENT_HASH_FIELD: content_hash,
+                              self.EXTRACTOR_FIELD: extractor_type.__name__,
+                              self.EXTRACTOR_VERSION_FIELD: extractor_type.VERSION}
+
+    def save(self):
+        """Write the ledger to its file, replacing the previous one only when fully written."""
+        with common.atomic_write(self.file_path) as ledger_file:
+            json.dump({'entries': self._entries}, ledger_file)
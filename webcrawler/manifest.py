@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+
+from webcrawler import common
+
+
+class DownloadManifest(object):
+    """
+    Record of the files downloaded to a directory, saved as a hidden file in that directory.
+
+    For each downloaded URL the manifest keeps its HTTP validators (ETag, Last-Modified), the hash
+    of its content, when it was fetched and the number of the last download run in which its content
+    changed. This allows sending conditional requests, skipping unchanged files and processing only
+    files that changed since a certain run.
+    """
+    FILE_NAME = '.download_manifest.json'
+
+    URL_FIELD = 'url'
+    FILE_NAME_FIELD = 'file_name'
+    ETAG_FIELD = 'etag'
+    LAST_MODIFIED_FIELD = 'last_modified'
+    CONTENT_HASH_FIELD = 'content_hash'
+    FETCH_TIME_FIELD = 'fetch_time'
+    CHANGED_IN_RUN_FIELD = 'changed_in_run'
+
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        self.file_path = os.path.join(directory_path, self.FILE_NAME)
+        self._lock = threading.Lock()
+        self._run_number = 0
+        self._entries = {}
+        if os.path.exists(self.file_path):
+            with open(self.file_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            self._run_number = manifest['run_number']
+            self._entries = manifest['entries']
+
+    @property
+    def run_number(self):
+        """Number of the current (or last) download run, starting from 1."""
+        return self._run_number
+
+    def start_run(self):
+        """Start a new download run. Files changed from now on are marked with its number."""
+        self._run_number += 1
+        return self._run_number
+
+    def get_entry(self, url):
+        """
+        :return: Manifest entry of the URL, None if it was never downloaded.
+        :rtype: dict
+        """
+        return self._entries.get(url)
+
+    def get_conditional_headers(self, url):
+        """
+        :return: HTTP headers which make the server respond with 304 if the URL was not modified
+            since its last download.
+        :rtype: dict
+        """
+        entry = self.get_entry(url)
+        if entry is None or not os.path.exists(self._get_file_path(entry)):
+            return {}
+        headers = {}
+        if entry[self.ETAG_FIELD]:
+            headers['If-None-Match'] = entry[self.ETAG_FIELD]
+        if entry[self.LAST_MODIFIED_FIELD]:
+            headers['If-Modified-Since'] = entry[self.LAST_MODIFIED_FIELD]
+        return headers
+
+    def is_unchanged(self, url, content_hash):
+        """Whether the URL was already downloaded with the same content."""
+        entry = self.get_entry(url)
+        return entry is not None and entry[self.CONTENT_HASH_FIELD] == content_hash and \
+            os.path.exists(self._get_file_path(entry))
+
+    def record_download(self, url, file_path, response_headers, content_hash):
+        """
+        Record the URL as downloaded to a file in the current run.
+
+        :param response_headers: Headers of the HTTP response, used as validators for the next run.
+        :type response_headers: dict
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry[self.CONTENT_HASH_FIELD] != content_hash:
+                changed_in_run = self._run_number
+            else:
+                changed_in_run = entry[self.CHANGED_IN_RUN_FIELD]
+            self._entries[url] = {
+                self.URL_FIELD: url,
+                self.FILE_NAME_FIELD: os.path.relpath(file_path, self.directory_path),
+                self.ETAG_FIELD: response_headers.get('ETag'),
+                self.LAST_MODIFIED_FIELD: response_headers.get('Last-Modified'),
+                self.CONTENT_HASH_FIELD: content_hash,
+                self.FETCH_TIME_FIELD: time.time(),
+                self.CHANGED_IN_RUN_FIELD: changed_in_run}
+
+    def record_unchanged(self, url):
+        """Record the URL as fetched in the current run without changes."""
+        with self._lock:
+            self._entries[url][self.FETCH_TIME_FIELD] = time.time()
+
+    def changed_since(self, run_number):
+        """
+        :return: Paths of downloaded files whose content changed after the given run.
+        :rtype: list[str]
+        """
+        return [self._get_file_path(entry) for entry in self._entries.itervalues()
+                if entry[self.CHANGED_IN_RUN_FIELD] > run_number]
+
+    def save(self):
+        """Write the manifest to its file, replacing the previous one only when fully written."""
+        with self._lock:
+            with common.atomic_write(self.file_path) as manifest_file:
+                json.dump({'run_number': self._run_number, 'entries': self._entries},
+                          manifest_file)
+
+    def _get_file_path(self, entry):
+        return os.path.join(self.directory_path, entry[self.FILE_NAME_FIELD])
@@ -0,0 +1,232 @@
+"""
+Instrumentation of the crawler: counters and latency histograms of HTTP requests, browser waits,
+downloads, parsing and extraction, loading and dumping of raw material and analysis, exported as
+Prometheus text or as JSON lines.
+
+Metrics are disabled by default, and then every instrumented call only checks a flag. Enable them
+with `enable()` before running the crawler, and export them with `to_prometheus_text` or
+`write_json_lines`. Metrics are kept per process, so metrics of extraction worker processes (see
+`extraction.extract_directory`) are not seen by the process that started them.
+"""
+import bisect
+import json
+import threading
+import time
+
+COUNTER_TYPE = 'counter'
+HISTOGRAM_TYPE = 'histogram'
+# Upper bounds of histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 300.0)
+
+
+class _Histogram(object):
+    __slots__ = ('bucket_counts', 'count', 'sum')
+
+    def __init__(self, bucket_count):
+        # The last bucket counts values above the largest upper bound.
+        self.bucket_counts = [0] * (bucket_count + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class _NullTimer(object):
+    """Timer returned by `MetricsRegistry.measure` while metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ('_registry', '_operation', '_labels', '_start_time')
+
+    def __init__(self, registry, operation, labels):
+        self._registry = registry
+        self._operation = operation
+        self._labels = labels
+
+    def __enter__(self):
+        self._start_time = time.time()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self._registry.observe(self._operation + '_seconds', time.time() - self._start_time,
+                               **self._labels)
+        if exception_type is not None:
+            self._registry.increment(self._operation + '_errors_total', **self._labels)
+        return False
+
+
+class MetricsRegistry(object):
+    """
+    Counters and histograms, each identified by a name and labels (keyword arguments whose values
+    are converted to strings), created when first updated. Thread-safe.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """:param buckets: Upper bounds of the buckets of histograms, in increasing order."""
+        self.enabled = False
+        self.buckets = tuple(buckets)
+        # (name, sorted labels) -> counter value or `_Histogram`.
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1, **labels):
+        """Add an amount (e.g. of items or bytes) to a counter, named with a _total suffix."""
+        if not self.enabled:
+            return
+        key = (name, _get_label_items(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Add a value (usually seconds) to a histogram."""
+        if not self.enabled:
+            return
+        key = (name, _get_label_items(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            histogram.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            histogram.count += 1
+            histogram.sum += value
+
+    def measure(self, operation, **labels):
+        """
+        Measure the duration of an operation in a with statement, recorded in the histogram
+        <operation>_seconds. If the operation raises an exception, it is also counted by the counter
+        <operation>_errors_total.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, operation, labels)
+
+    def get_counter(self, name, **labels):
+        """:return: Value of a counter, 0 if it was never incremented."""
+        return self._counters.get((name, _get_label_items(labels)), 0)
+
+    def get_histogram(self, name, **labels):
+        """:return: Number and sum of the values added to a histogram."""
+        histogram = self._histograms.get((name, _get_label_items(labels)))
+        return (histogram.count, histogram.sum) if histogram is not None else (0, 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus_text(self, prefix='webcrawler_'):
+        """
+        :param prefix: Prefix of the exported metric names.
+        :return: Metrics in the Prometheus text exposition format.
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.iteritems())
+            histograms = sorted((key, (list(histogram.bucket_counts), histogram.count,
+                                       histogram.sum)) for key, histogram in
+                                self._histograms.iteritems())
+        last_name = None
+        for (name, label_items), value in counters:
+            if name != last_name:
+                lines.append('# TYPE %s%s %s' % (prefix, name, COUNTER_TYPE))
+                last_name = name
+            lines.append('%s%s%s %s' % (prefix, name, _format_labels(label_items),
+                                        _format_value(value)))
+        for (name, label_items), (bucket_counts, count, value_sum) in histograms:
+            if name != last_name:
+                lines.append('# TYPE %s%s %s' % (prefix, name, HISTOGRAM_TYPE))
+                last_name = name
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+                cumulative_count += bucket_count
+                bucket_label_items = label_items + (('le', _format_value(upper_bound)),)
+                lines.append('%s%s_bucket%s %d' % (prefix, name,
+                                                   _format_labels(bucket_label_items),
+                                                   cumulative_count))
+            lines.append('%s%s_sum%s %s' % (prefix, name, _format_labels(label_items),
+                                            _format_value(value_sum)))
+            lines.append('%s%s_count%s %d' % (prefix, name, _format_labels(label_items), count))
+        return ''.join(line + '\n' for line in lines)
+
+    def to_json_lines(self):
+        """
+        :return: A JSON object per metric, one per line, with the current time, so that snapshots
+            appended to the same file can be compared over time.
+        :rtype: str
+        """
+        snapshot_time = time.time()
+        records = []
+        with self._lock:
+            for (name, label_items), value in sorted(self._counters.iteritems()):
+                records.append({'time': snapshot_time, 'name': name, 'type': COUNTER_TYPE,
+                                'labels': dict(label_items), 'value': value})
+            for (name, label_items), histogram in sorted(self._histograms.iteritems()):
+                records.append({'time': snapshot_time, 'name': name, 'type': HISTOGRAM_TYPE,
+                                'labels': dict(label_items), 'count': histogram.count,
+                                'sum': histogram.sum, 'buckets': list(self.buckets),
+                                'bucket_counts': list(histogram.bucket_counts)})
+        return ''.join(json.dumps(record, sort_keys=True) + '\n' for record in records)
+
+    def write_json_lines(self, file_path):
+        """Append the metrics to a file, see `to_json_lines`."""
+        json_lines = self.to_json_lines()
+        with open(file_path, 'a') as metrics_file:
+            metrics_file.write(json_lines)
+
+
+def _get_label_items(labels):
+    return tuple(sorted((name, value if isinstance(value, str) else
+                         unicode(value).encode('utf-8')) for name, value in labels.iteritems()))
+
+
+def _format_labels(label_items):
+    if not label_items:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, value.replace('\\', r'\\').replace('"', r'\"')
+                                          .replace('\n', r'\n'))
+                             for name, value in label_items)
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Registry of the crawler's instrumentation.
+registry = MetricsRegistry()
+increment = registry.increment
+observe = registry.observe
+measure = registry.measure
+
+
+def enable():
+    registry.enabled = True
+
+
+def disable():
+    registry.enabled = False
+
+
+def is_enabled():
+    return registry.enabled
+
+
+def reset():
+    registry.reset()
+
+
+def to_prometheus_text(prefix='webcrawler_'):
+    return registry.to_prometheus_text(prefix)
+
+
+def write_json_lines(file_path):
+    registry.write_json_lines(file_path)
@@ -0,0 +1,396 @@
+import os
+import Queue
+import threading
+import time
+import traceback
+import warnings
+
+from webcrawler import analyzers, common, metrics, utils
+from webcrawler.ledger import ExtractionLedger
+
+# Put in the queue of a stage to stop one of its workers.
+_END_OF_ITEMS = object()
+
+
+class StageStats(object):
+    """Counters of a pipeline stage, see `Pipeline.stats`."""
+
+    def __init__(self, name):
+        self.name = name
+        self.processed_count = 0
+        self.failed_count = 0
+        # Items passed to the next stage.
+        self.output_count = 0
+        # Seconds workers spent processing items, and waiting for room in the next stage's queue.
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.elapsed_seconds = 0.0
+
+    @property
+    def items_per_second(self):
+        return self.processed_count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def __str__(self):
+        return ('{name}: {processed} processed ({rate:.1f}/sec), {failed} failed, {output} passed '
+                'on, queue depth {depth} (max {max_depth}), busy {busy:.2f}s, blocked '
+                '{blocked:.2f}s').format(
+            name=self.name, processed=self.processed_count, rate=self.items_per_second,
+            failed=self.failed_count, output=self.output_count, depth=self.queue_depth,
+            max_depth=self.max_queue_depth, busy=self.busy_seconds, blocked=self.blocked_seconds)
+
+
+class PipelineStage(object):
+    """
+    A step of a `Pipeline`: worker threads that take items from a bounded queue, process them and
+    pass their results to the next stage.
+    """
+
+    def __init__(self, name, process, workers=1, queue_size=100, flush=None,
+                 seconds_between_flushes=1.0):
+        """
+        :param process: Function called with every item, returning the items to pass to the next
+            stage (an iterable) or None. Items that fail are reported and skipped.
+        :param workers: Number of threads processing items of this stage.
+        :param queue_size: Maximal number of items waiting for this stage. When the queue is full
+            the previous stage waits, so a slow stage slows down the stages before it instead of
+            items piling up in memory.
+        :param flush: Function called (by one worker at a time) once items were processed, at most
+            every `seconds_between_flushes`, and when the pipeline is closed. Meant for work
+            that is better done in batches, such as saving or indexing.
+        """
+        self.name = name
+        self.process = process
+        self.workers = workers
+        self.flush = flush
+        self.seconds_between_flushes = seconds_between_flushes
+        self.queue = Queue.Queue(queue_size)
+        self._stats = StageStats(name)
+        self._stats_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._threads = []
+
+    def stats(self):
+        """:rtype: StageStats"""
+        with self._stats_lock:
+            stats = StageStats(self.name)
+            stats.__dict__.update(self._stats.__dict__)
+        stats.queue_depth = self.queue.qsize()
+        return stats
+
+    def _put(self, item):
+        self.queue.put(item)
+        queue_depth = self.queue.qsize()
+        with self._stats_lock:
+            self._stats.max_queue_depth = max(self._stats.max_queue_depth, queue_depth)
+
+    def _start(self, next_stage):
+        self._threads = [threading.Thread(target=self._work, args=(next_stage,),
+                                          name='%s-%d' % (self.name, worker_index))
+                         for worker_index in xrange(self.workers)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def _stop(self):
+        """Stop the workers once they processed all queued items, and flush."""
+        for _ in self._threads:
+            self.queue.put(_END_OF_ITEMS)
+        for thread in self._threads:
+            thread.join()
+        self._flush()
+
+    def _work(self, next_stage):
+        last_flush_time = time.time()
+        has_unflushed_items = False
+        while True:
+            timeout = None
+            if has_unflushed_items and self.flush is not None:
+                timeout = max(0, last_flush_time + self.seconds_between_flushes - time.time())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Queue.Empty:
+                pass
+            else:
+                if item is _END_OF_ITEMS:
+                    return
+                self._process_item(item, next_stage)
+                has_unflushed_items = True
+            if has_unflushed_items and self.flush is not None and \
+                    time.time() - last_flush_time >= self.seconds_between_flushes:
+                self._flush()
+                last_flush_time = time.time()
+                has_unflushed_items = False
+
+    def _process_item(self, item, next_stage):
+        start_time = time.time()
+        try:
+            output_items = list(self.process(item) or ())
+            error = None
+        except Exception:
+            output_items = []
+            error = traceback.format_exc()
+        process_end_time = time.time()
+        metrics.observe('pipeline_stage_seconds', process_end_time - start_time, stage=self.name)
+        if error is not None:
+            metrics.increment('pipeline_stage_errors_total', stage=self.name)
+            warnings.warn('Stage %s could not process %r:\n%s' % (self.name, item, error))
+        if next_stage is not None:
+            for output_item in output_items:
+                next_stage._put(output_item)
+        with self._stats_lock:
+            self._stats.processed_count += 1
+            self._stats.failed_count += error is not None
+            self._stats.output_count += len(output_items) if next_stage is not None else 0
+            self._stats.busy_seconds += process_end_time - start_time
+            self._stats.blocked_seconds += time.time() - process_end_time
+
+    def _flush(self):
+        if self.flush is None:
+            return
+        with self._flush_lock:
+            try:
+                self.flush()
+            except Exception:
+                warnings.warn('Stage %s could not flush:\n%s' % (self.name, traceback.format_exc()))
+
+
+class Pipeline(object):
+    """
+    Chain of `PipelineStage`s running concurrently, each stage passing its results to the next
+    through a bounded queue. Use as a context manager, which starts the stages and closes them:
+
+        with Pipeline([PipelineStage('parse', parse), PipelineStage('save', save)]) as pipeline:
+            for item in items:
+                pipeline.put(item)
+    """
+
+    def __init__(self, stages):
+        """:type stages: list[PipelineStage]"""
+        self.stages = stages
+        self._start_time = None
+        self._end_time = None
+
+    def start(self):
+        self._start_time = time.time()
+        for stage, next_stage in zip(self.stages, self.stages[1:] + [None]):
+            stage._start(next_stage)
+
+    def put(self, item):
+        """Pass an item to the first stage, waiting while its queue is full."""
+        self.stages[0]._put(item)
+
+    def close(self):
+        """Wait until all items passed through the pipeline and stop it."""
+        for stage in self.stages:
+            stage._stop()
+        self._end_time = time.time()
+
+    def stats(self):
+        """
+        :return: Current counters of every stage.
+        :rtype: list[StageStats]
+        """
+        elapsed_seconds = (self._end_time or time.time()) - self._start_time if \
+            self._start_time is not None else 0.0
+        stage_stats = [stage.stats() for stage in self.stages]
+        for stats in stage_stats:
+            stats.elapsed_seconds = elapsed_seconds
+        return stage_stats
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class DirectoryWatcher(object):
+    """
+    Watches a directory for new and modified files, by polling the size and modification time of
+    its files. Hidden files are ignored, so files written with `common.atomic_write` are seen only
+    once fully written.
+    """
+
+    def __init__(self, directory_path, seconds_between_polls=0.5):
+        self.directory_path = directory_path
+        self.seconds_between_polls = seconds_between_polls
+        # File path -> (size, modification time) when last seen.
+        self._file_states = {}
+
+    def poll(self):
+        """
+        :return: Paths of files added or modified since the last poll (all files on the first one).
+        :rtype: list[str]
+        """
+        changed_file_paths = []
+        for file_path in utils.list_directory_files(self.directory_path):
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                # Removed since it was listed.
+                continue
+            file_state = (file_stat.st_size, file_stat.st_mtime)
+            if self._file_states.get(file_path) != file_state:
+                self._file_states[file_path] = file_state
+                changed_file_paths.append(file_path)
+        return sorted(changed_file_paths)
+
+    def watch(self, callback, stop_event):
+        """
+        Call a function with every new or modified file until the event is set, polling once more
+        after it is set.
+
+        :type stop_event: threading.Event
+        """
+        while True:
+            is_stopping = stop_event.is_set()
+            for file_path in self.poll():
+                callback(file_path)
+            if is_stopping:
+                return
+            stop_event.wait(self.seconds_between_polls)
+
+
+def create_extraction_stage(extractor_type, destination_directory, writer=None,
+                            parser=common.WEB_SCRAPPING_PARSER, workers=1, queue_size=100,
+                            store=None, deduplicator=None, result_cache=None):
+    """
+    :param store: Store to add the raw material to instead of passing it to the writer, see
+        `extraction.extract_directory`.
+    :type store: webcrawler.sqlite_store.RawMaterialStore
+    :param deduplicator: Deduplicator of the destination directory, see
+        `extraction.extract_directory`. Duplicate files, and revisions of material earlier than
+        the near duplicate material saved before, are not passed on.
+    :type deduplicator: webcrawler.dedup.ExtractionDeduplicator
+    :param result_cache: Cache of extracted material, see `extraction.extract_directory`.
+    :type result_cache: webcrawler.extraction_cache.ExtractionResultCache
+    :return: Stage extracting downloaded files (by path) and saving their raw material, like
+        `extraction.extract_directory`, and passing on the raw material. Files are recorded in the
+        `ExtractionLedger` of the destination directory, so unchanged files are skipped.
+    :rtype: PipelineStage
+    """
+    writer = store.save_raw_material if store is not None else \
+        writer or extractor_type.save_raw_material
+    ledger = ExtractionLedger(destination_directory)
+    ledger_lock = threading.Lock()
+    # Notified when a file is no longer being extracted.
+    ledger_condition = threading.Condition(ledger_lock)
+    extracting_file_paths = set()
+
+    def extract(downloaded_file_path):
+        with ledger_condition:
+            # A file passed again while being extracted by another worker (e.g. modified since)
+            # waits for that extraction, and is then extracted again only if it changed.
+            while downloaded_file_path in extracting_file_paths:
+                ledger_condition.wait()
+            if not ledger.needs_extraction(downloaded_file_path, extractor_type):
+                return None
+            if deduplicator is not None and \
+                    deduplicator.is_duplicate(downloaded_file_path, extractor_type):
+                ledger.record_extraction(downloaded_file_path, extractor_type)
+                return None
+            extracting_file_paths.add(downloaded_file_path)
+        try:
+            return extract_new_file(downloaded_file_path)
+        finally:
+            with ledger_condition:
+                extracting_file_paths.discard(downloaded_file_path)
+                ledger_condition.notify_all()
+
+    def extract_new_file(downloaded_file_path):
+        try:
+            raw_materials = extractor_type(downloaded_file_path, parser).extract_and_measure(
+                result_cache)
+            saved_file_path = downloaded_file_path
+            if deduplicator is not None:
+                with ledger_lock:
+                    saved_file_path = deduplicator.get_saved_file_path(downloaded_file_path,
+                                                                       raw_materials)
+            # Not saved when a later revision of the material was saved before.
+            if saved_file_path is not None:
+                writer(saved_file_path, raw_materials, destination_directory)
+        except Exception:
+            if deduplicator is not None:
+                with ledger_lock:
+                    deduplicator.discard(downloaded_file_path)
+            raise
+        with ledger_lock:
+            ledger.record_extraction(downloaded_file_path, extractor_type)
+        return raw_materials if saved_file_path is not None else None
+
+    def save_ledger():
+        with ledger_lock:
+            # Recorded files' raw material is written to the store before the ledger is saved.
+            if store is not None:
+                store.flush()
+            if deduplicator is not None:
+                deduplicator.save()
+            ledger.save()
+    return PipelineStage('extract', extract, workers, queue_size, flush=save_ledger)
+
+
+def create_sink_stage(sinks=(), material_type=None, index_directory=None, queue_size=100,
+                      seconds_between_index_updates=1.0):
+    """
+    :param sinks: Functions called with every raw material, e.g. an analyzer or a corpus writer.
+    :param index_directory: Directory of raw material of the given type whose `InvertedIndex` is
+        updated as material arrives (at most every `seconds_between_index_updates`), so that
+        `analyzers` searches find it. Not indexed if None.
+    :rtype: PipelineStage
+    """
+    def sink(raw_material):
+        for material_sink in sinks:
+            material_sink(raw_material)
+
+    update_index = None
+    if index_directory is not None:
+        update_index = lambda: analyzers.index_material_directory(material_type, index_directory)
+    return PipelineStage('sink', sink, queue_size=queue_size, flush=update_index,
+                         seconds_between_flushes=seconds_between_index_updates)
+
+
+def run_download_pipeline(downloader, extractor_type, material_type, raw_material_directory,
+                          parser=common.WEB_SCRAPPING_PARSER, sinks=(), perpetually=False,
+                          seconds_between_polls=0.5, queue_size=100, store=None):
+    """
+    Download, extract and index data in one go: while the downloader runs, every file written to its
+    download directory is extracted to the raw material directory, passed to the sinks and indexed,
+    so it is searchable within seconds of being downloaded rather than after a batch extraction.
+
+    :type downloader: webcrawler.downloader.DataDownloader
+    :param extractor_type: Extractor of the downloaded files.
+    :param material_type: Type of raw material extracted, which is indexed.
+    :param perpetually: Whether to download with `download_data_perpetually` (until interrupted)
+        instead of `download_data`.
+    :param seconds_between_polls: Seconds between checks of the download directory for new files.
+    :param store: Store to add the raw material to, instead of files in the raw material directory
+        which keeps only the extraction ledger. The raw material is still passed to the sinks, but
+        not indexed.
+    :type store: webcrawler.sqlite_store.RawMaterialStore
+    :return: Counters of the extraction and sink stages.
+    :rtype: list[StageStats]
+    """
+    pipeline = Pipeline([create_extraction_stage(extractor_type, raw_material_directory,
+                                                 parser=parser, queue_size=queue_size,
+                                                 store=store),
+                         create_sink_stage(sinks, material_type,
+                                           raw_material_directory if store is None else None,
+                                           queue_size)])
+    watcher = DirectoryWatcher(downloader.download_directory, seconds_between_polls)
+    stop_event = threading.Event()
+    watcher_thread = threading.Thread(target=watcher.watch, args=(pipeline.put, stop_event),
+                                      name='watch')
+    with pipeline:
+        watcher_thread.start()
+        try:
+            if perpetually:
+                downloader.download_data_perpetually()
+            else:
+                downloader.download_data()
+        finally:
+            stop_event.set()
+            watcher_thread.join()
+    return pipeline.stats()
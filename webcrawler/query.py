@@ -0,0 +1,298 @@
+import collections
+import re
+import threading
+import unicodedata
+import weakref
+
+from webcrawler.common import to_unicode
+from webcrawler.raw_material import JsonRawMaterial
+
+# Characters removed from normalized text: bidirectional controls, which are invisible and common
+# around Hebrew in web pages, and Hebrew points (niqqud) and cantillation marks, so that pointed
+# words match unpointed ones. Hebrew punctuation (maqaf, paseq, sof pasuq) is kept.
+_REMOVED_CHARACTERS_REGEX = re.compile(u'[\u200e\u200f\u202a-\u202e\u2066-\u2069'
+                                       u'\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]')
+
+
+def normalize_text(text, case_sensitive=False):
+    """
+    Normalize text for searching: NFKC Unicode normalization (which also turns Hebrew presentation
+    forms into plain letters), without the characters of `_REMOVED_CHARACTERS_REGEX` and
+    lower-cased unless case sensitive.
+
+    :rtype: unicode
+    """
+    normalized_text = _REMOVED_CHARACTERS_REGEX.sub(u'', unicodedata.normalize('NFKC',
+                                                                              to_unicode(text)))
+    return normalized_text if case_sensitive else normalized_text.lower()
+
+
+# Separates the values of JSON material in its normalized text, so that a searched text (in which
+# it never appears) is not found across two of them.
+_FIELD_SEPARATOR = u'\x00'
+# (Field name, case sensitive) -> normalized field name. Field names are few, so it is unbounded.
+_normalized_field_names = {}
+# Case sensitive -> all the normalized field names, so that most texts are rejected at once.
+_all_normalized_field_names = {False: set(), True: set()}
+
+
+def normalize_field_name(field, case_sensitive=False):
+    """Same as `normalize_text` for the field names of JSON material, which are normalized once."""
+    key = (field, case_sensitive)
+    normalized_field = _normalized_field_names.get(key)
+    if normalized_field is None:
+        normalized_field = _normalized_field_names[key] = normalize_text(field, case_sensitive)
+        _all_normalized_field_names[case_sensitive].add(normalized_field)
+    return normalized_field
+
+
+def normalize_field_values(material_dict, case_sensitive=False):
+    """
+    :param material_dict: Fields of JSON material, as returned by its `to_dict`.
+    :return: Normalized text of all the values of the fields (in the order of the dictionary),
+        separated by a character which searched texts do not contain, so that no text is found
+        across two values.
+    :rtype: unicode
+    """
+    # Normalized all at once, which is much faster than normalizing each value.
+    return normalize_text(_FIELD_SEPARATOR.join(to_unicode(value) for value in
+                                                material_dict.itervalues()), case_sensitive)
+
+
+def _normalize_material(raw_material, case_sensitive):
+    """
+    :return: Normalized text of a text material. For JSON material, normalized text of all its
+        values (see `normalize_field_values`), and (field, normalized field, normalized value) of
+        each of its fields, kept in the search cache of the material if it has one.
+    :rtype: unicode | (unicode, tuple)
+    """
+    if hasattr(raw_material, 'to_text'):
+        return normalize_text(raw_material.to_text(), case_sensitive)
+    if isinstance(raw_material, JsonRawMaterial):
+        search_cache = raw_material.search_cache
+        cache_key = ('normalized_material', case_sensitive)
+        if search_cache is not None:
+            normalized_material = search_cache.get(cache_key)
+            if normalized_material is not None:
+                return normalized_material
+        material_dict = raw_material.to_dict()
+        values_text = normalize_field_values(material_dict, case_sensitive)
+        field_values = tuple((field, normalize_field_name(field, case_sensitive), value) for
+                             field, value in zip(material_dict,
+                                                 values_text.split(_FIELD_SEPARATOR)))
+        normalized_material = (values_text, field_values)
+        if search_cache is not None:
+            search_cache[cache_key] = normalized_material
+        return normalized_material
+    raise NotImplementedError('No analyzer for this type of material.')
+
+
+def _get_normalized_length(normalized_material):
+    if isinstance(normalized_material, unicode):
+        return len(normalized_material)
+    values_text, field_values = normalized_material
+    return len(values_text) + sum(len(value) for _, _, value in field_values)
+
+
+class NormalizedTextCache(object):
+    """
+    Thread-safe LRU cache of the normalized text of raw materials, so that querying the same
+    materials many times normalizes each of them once. The cache holds weak references to the
+    materials, so it does not keep them alive and drops their text once they are gone, and is
+    bounded both by number of materials and by total length of the cached text.
+    """
+    # When the cache is full, least recently used entries are evicted until it is this full, so
+    # that the entries are ordered by use once per many additions rather than on every use.
+    _EVICTION_FILL_RATIO = 0.75
+
+    def __init__(self, max_entries=100000, max_characters=2 ** 24):
+        self.max_entries = max_entries
+        self.max_characters = max_characters
+        self.hit_count = 0
+        self.miss_count = 0
+        self._character_count = 0
+        self._use_count = 0
+        # (material id, case sensitive) -> [weak reference to the material, normalized material,
+        # use count at its last use].
+        self._entries = {}
+        # Keys of entries whose material is gone. Filled by weak reference callbacks, which may run
+        # at any time (even while the lock is held), so they only append to it.
+        self._dead_keys = collections.deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, raw_material, case_sensitive=False):
+        """
+        :return: Normalized text of a material, see `_normalize_material`.
+        :rtype: unicode | (unicode, tuple)
+        """
+        key = (id(raw_material), case_sensitive)
+        # Hits do not take the lock: reading the dictionary is atomic, and an entry evicted at the
+        # same time is still a correct result.
+        entry = self._entries.get(key)
+        # A new material may have the id of a material that is gone.
+        if entry is not None and entry[0]() is raw_material:
+            self._use_count += 1
+            entry[2] = self._use_count
+            self.hit_count += 1
+            return entry[1]
+        self.miss_count += 1
+        normalized_material = _normalize_material(raw_material, case_sensitive)
+        normalized_length = _get_normalized_length(normalized_material)
+        if normalized_length > self.max_characters:
+            return normalized_material
+        try:
+            material_reference = weakref.ref(raw_material,
+                                             lambda _, key=key: self._dead_keys.append(key))
+        except TypeError:
+            # Materials that cannot be weakly referenced are not cached.
+            return normalized_material
+        with self._lock:
+            self._remove_dead_entries()
+            self._remove_entry(key)
+            self._use_count += 1
+            self._entries[key] = [material_reference, normalized_material, self._use_count]
+            self._character_count += normalized_length
+            if len(self._entries) > self.max_entries or \
+                    self._character_count > self.max_characters:
+                self._evict_least_recently_used()
+        return normalized_material
+
+    def _evict_least_recently_used(self):
+        max_entries = int(self.max_entries * self._EVICTION_FILL_RATIO)
+        max_characters = int(self.max_characters * self._EVICTION_FILL_RATIO)
+        for key in sorted(self._entries, key=lambda key: self._entries[key][2]):
+            if len(self._entries) <= max_entries and self._character_count <= max_characters:
+                break
+            self._remove_entry(key)
+
+    def _remove_dead_entries(self):
+        while self._dead_keys:
+            key = self._dead_keys.popleft()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is None:
+                self._remove_entry(key)
+
+    def _remove_entry(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._character_count -= _get_normalized_length(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dead_keys.clear()
+            self._character_count = 0
+
+
+# Cache used by queries by default.
+normalized_text_cache = NormalizedTextCache()
+
+
+class TextQuery(object):
+    """
+    A text search compiled once and applied to many raw materials.
+
+    Text is searched in normalized material text (see `normalize_text`). In text material (with
+    `to_text`) the whole text is searched; in JSON material every value is searched, or only the
+    values of certain fields. A literal or whole word text equal to a field name of JSON material
+    (e.g. 'status') also matches it, but is not found inside field names.
+    """
+    LITERAL = 'literal'
+    REGEX = 'regex'
+    WHOLE_WORD = 'whole_word'
+
+    def __init__(self, text, mode=LITERAL, case_sensitive=False, fields=None,
+                 cache=normalized_text_cache):
+        """
+        :param text: Searched text, or a regular expression in `REGEX` mode.
+        :param mode: `LITERAL` finds the text anywhere, `WHOLE_WORD` only where it is not part of
+            a longer word and `REGEX` finds matches of a regular expression.
+        :param fields: Names of the JSON material fields (as in `to_dict`) whose values are
+            searched, all values (and field names) if None. Ignored for text material.
+        :param cache: Cache of normalized material text, None to normalize material every time,
+            e.g. when every material is searched once.
+        :type cache: NormalizedTextCache
+        """
+        if mode not in (self.LITERAL, self.REGEX, self.WHOLE_WORD):
+            raise ValueError('Unknown query mode: %s' % mode)
+        self.text = text
+        self.mode = mode
+        self.case_sensitive = case_sensitive
+        self.fields = frozenset(fields) if fields is not None else None
+        self.cache = cache
+        self._normalized_text = normalize_text(text, case_sensitive)
+        self._regex = None
+        flags = re.UNICODE if case_sensitive else re.UNICODE | re.IGNORECASE
+        if mode == self.REGEX:
+            self._regex = re.compile(to_unicode(text), flags)
+        elif mode == self.WHOLE_WORD:
+            self._regex = re.compile(r'(?<!\w)%s(?!\w)' % re.escape(self._normalized_text), flags)
+
+    def matches(self, raw_material):
+        """Whether the material contains the text."""
+        searched_text, field_values = self._get_searched_text(raw_material)
+        if isinstance(searched_text, unicode):
+            return self._search(searched_text) or self._count_field_names(field_values) > 0
+        return any(self._search(value) for value in searched_text)
+
+    def count(self, raw_material):
+        """
+        :return: Number of (non-overlapping) matches of the text in the material, including the
+            field names of JSON material equal to the text.
+        """
+        searched_text, field_values = self._get_searched_text(raw_material)
+        if isinstance(searched_text, unicode):
+            return self._count(searched_text) + self._count_field_names(field_values)
+        return sum(self._count(value) for value in searched_text)
+
+    def _get_searched_text(self, raw_material):
+        """
+        :return: Normalized text to search as a whole, or the normalized values to search one by
+            one: those of certain fields of JSON material, or all its values for regular
+            expressions, which may match the separator of values. Also the names of the fields of
+            JSON material which are compared with the text, in (field, normalized field, value)
+            triples, if any.
+        :rtype: (unicode | list[unicode], Sequence)
+        """
+        if self.cache is not None:
+            normalized_material = self.cache.get(raw_material, self.case_sensitive)
+        else:
+            normalized_material = _normalize_material(raw_material, self.case_sensitive)
+        if isinstance(normalized_material, unicode):
+            return normalized_material, []
+        values_text, field_values = normalized_material
+        if self.fields is not None:
+            return [value for field, _, value in field_values if field in self.fields], []
+        if self.mode == self.REGEX:
+            return values_text.split(_FIELD_SEPARATOR), []
+        return values_text, field_values
+
+    def _count_field_names(self, field_values):
+        """
+        :return: Number of the normalized field names of (field, normalized field, value) triples
+            equal to the text.
+        """
+        # Field names were normalized with the material, so a text which is no field name at all
+        # (almost every searched text) is rejected by one lookup.
+        if self._normalized_text not in _all_normalized_field_names[self.case_sensitive]:
+            return 0
+        return sum(1 for _, normalized_field, _ in field_values if
+                   normalized_field == self._normalized_text)
+
+    def _search(self, searched_text):
+        if self._regex is None:
+            return self._normalized_text in searched_text
+        return self._regex.search(searched_text) is not None
+
+    def _count(self, searched_text):
+        if self._regex is None:
+            return searched_text.count(self._normalized_text) if self._normalized_text else 0
+        return sum(1 for _ in self._regex.finditer(searched_text))
+
+    def __repr__(self):
+        return 'TextQuery(%r, mode=%r, case_sensitive=%r, fields=%r)' % (
+            self.text, self.mode, self.case_sensitive,
+            sorted(self.fields) if self.fields is not None else None)
@@ -1,11 +1,47 @@
 import abc
 import json
+import mmap
+import os
+import re
 from datetime import datetime
 
+from webcrawler import common, metrics
+
+# Shared instances of frequently repeated strings, see `_intern`. New strings are not added when
+# full, so that strings which are rarely repeated don't grow it without a bound.
+_interned_strings = {}
+_MAX_INTERNED_STRINGS = 10000
+_TIME_OF_DAY_REGEX = re.compile(r'\s*(\d\d?):(\d\d)\s*$')
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _intern(string):
+    """
+    :return: A single shared instance of equal strings (works for unicode too, unlike `intern`).
+    Meant for strings with few distinct values, such as statuses.
+    """
+    interned_string = _interned_strings.get(string)
+    if interned_string is not None:
+        return interned_string
+    if len(_interned_strings) < _MAX_INTERNED_STRINGS:
+        _interned_strings[string] = string
+    return string
+
+
+def _to_utf8(text):
+    return text.encode('utf-8') if isinstance(text, unicode) else text
+
+
+def _record_bytes(operation, material_type, size):
+    """Count bytes of material files loaded or dumped in the metrics."""
+    metrics.increment('raw_material_bytes_total', size, operation=operation,
+                      material=material_type.__name__)
+
 
 class RawMaterial(object):
     """Serializable object which contains raw material (after extraction)."""
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     @abc.abstractmethod
     def dump(self, file_path):
@@ -16,10 +52,22 @@ class RawMaterial(object):
     def load(cls, file_path):
         """Load material from a file."""
 
+    @classmethod
+    def iter_load(cls, file_paths):
+        """
+        Load material from files one by one, so that only a single material has to be in memory
+        at a time.
+
+        :rtype: collections.Iterator[RawMaterial]
+        """
+        for file_path in file_paths:
+            yield cls.load(file_path)
+
 
 class JsonRawMaterial(RawMaterial):
     """`RawMaterial` that can be serialized from and into JSON."""
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     @abc.abstractmethod
     def to_dict(self):
@@ -33,14 +81,29 @@ class JsonRawMaterial(RawMaterial):
     def from_dict(cls, dictionary):
         """Create a JsonRawMaterial from a JSON-like compatible dictionary"""
 
+    @property
+    def search_cache(self):
+        """
+        :return: Dictionary in which searches keep what they compute from the material (which is
+            immutable), so that searching it again does not compute it again (see
+            `query._normalize_material`), or None if the material keeps nothing.
+        :rtype: dict | None
+        """
+        return None
+
     def dump(self, file_path):
-        with open(file_path, 'w') as output_file:
-            json.dump(self.to_dict(), output_file, indent=2)
+        with metrics.measure('raw_material_dump', material=type(self).__name__):
+            with common.atomic_write(file_path) as output_file:
+                json.dump(self.to_dict(), output_file, indent=2)
+                _record_bytes('dump', type(self), output_file.tell())
 
     @classmethod
     def load(cls, file_path):
-        with open(file_path) as json_file:
-            return cls.from_dict(json.load(json_file))
+        with metrics.measure('raw_material_load', material=cls.__name__):
+            with open(file_path) as json_file:
+                material_dict = json.load(json_file)
+                _record_bytes('load', cls, json_file.tell())
+            return cls.from_dict(material_dict)
 
     def __str__(self):
         return str(self.to_dict())
@@ -52,27 +115,47 @@ class BBCRawArticle(RawMaterial):
     END_OF_INTRODUCTION = '\n--------END-OF-INTRODUCTION----------\n'
     END_OF_PARAGRAPH = '\n--------END-OF-PARAGRAPH----------\n'
 
+    # Weak references let `query.NormalizedTextCache` cache text without keeping articles alive.
+    __slots__ = ('_header', '_introduction', '_paragraphs', '__weakref__')
+
     def __init__(self, header, introduction, paragraphs):
         self._header = header
         self._introduction = introduction
         self._paragraphs = paragraphs
 
+    def __reduce__(self):
+        return BBCRawArticle, (self.header, self.introduction, self.paragraphs)
+
     def dump(self, file_path):
-        with open(file_path, 'a') as output_file:
-            output_file.write(self.header + self.END_OF_HEADER)
-            output_file.write(self.introduction + self.END_OF_INTRODUCTION)
-            paragraphs = [paragraph.encode('utf-8') + self.END_OF_PARAGRAPH for paragraph in
-                          self.paragraphs]
-            output_file.writelines(paragraphs)
+        with metrics.measure('raw_material_dump', material=type(self).__name__):
+            with common.atomic_write(file_path) as output_file:
+                output_file.write(_to_utf8(self.header) + self.END_OF_HEADER)
+                output_file.write(_to_utf8(self.introduction) + self.END_OF_INTRODUCTION)
+                paragraphs = [_to_utf8(paragraph) + self.END_OF_PARAGRAPH for paragraph in
+                              self.paragraphs]
+                output_file.writelines(paragraphs)
+                _record_bytes('dump', type(self), output_file.tell())
 
     @classmethod
     def load(cls, file_path):
-        with open(file_path) as raw_article_file:
-            content = raw_article_file.read()
-        header, after_header = content.split(cls.END_OF_HEADER)
-        introduction, after_introduction = after_header.split(cls.END_OF_INTRODUCTION)
-        paragraphs = after_introduction.split(cls.END_OF_PARAGRAPH)
-        return cls(header, introduction, paragraphs)
+        with metrics.measure('raw_material_load', material=cls.__name__):
+            with open(file_path) as raw_article_file:
+                content = raw_article_file.read()
+            _record_bytes('load', cls, len(content))
+            header, after_header = content.split(cls.END_OF_HEADER)
+            introduction, after_introduction = after_header.split(cls.END_OF_INTRODUCTION)
+            paragraphs = after_introduction.split(cls.END_OF_PARAGRAPH)
+            return cls(header, introduction, paragraphs)
+
+    @classmethod
+    def iter_load(cls, file_paths):
+        """
+        Load articles one by one as `MappedBBCRawArticle`, without reading them into memory.
+        Every mapped article holds an open file until it is gone, so articles which are kept
+        should be loaded with `load` instead.
+        """
+        for file_path in file_paths:
+            yield MappedBBCRawArticle.load(file_path)
 
     @property
     def header(self):
@@ -95,6 +178,69 @@ class BBCRawArticle(RawMaterial):
         return '\n'.join(all_text_chapters)
 
 
+class MappedBBCRawArticle(BBCRawArticle):
+    """
+    `BBCRawArticle` loaded from a memory-mapped file.
+    Only the location of the header and introduction is found when loading, and the text is read
+    from the file only when accessed. Paragraphs are split each time they are accessed.
+    """
+    __slots__ = ('_mapped_file', '_header_end', '_introduction_end')
+
+    def __init__(self, mapped_file, header_end, introduction_end):
+        """
+        :param mapped_file: Content of a file dumped by `BBCRawArticle.dump`.
+        :type mapped_file: mmap.mmap
+        :param header_end: Index of the end of the header in the file.
+        :param introduction_end: Index of the end of the introduction in the file.
+        """
+        super(MappedBBCRawArticle, self).__init__(None, None, None)
+        self._mapped_file = mapped_file
+        self._header_end = header_end
+        self._introduction_end = introduction_end
+
+    @classmethod
+    def load(cls, file_path):
+        with metrics.measure('raw_material_load', material=cls.__name__):
+            with open(file_path, 'rb') as raw_article_file:
+                if os.fstat(raw_article_file.fileno()).st_size == 0:
+                    raise ValueError('Empty article file: %s' % file_path)
+                mapped_file = mmap.mmap(raw_article_file.fileno(), 0, access=mmap.ACCESS_READ)
+            # Mapped, not read: only the parts of the file accessed later are read.
+            _record_bytes('load', cls, len(mapped_file))
+            header_end = mapped_file.find(cls.END_OF_HEADER)
+            introduction_end = mapped_file.find(cls.END_OF_INTRODUCTION, header_end)
+            if header_end < 0 or introduction_end < 0:
+                raise ValueError('Not a dumped article: %s' % file_path)
+            return cls(mapped_file, header_end, introduction_end)
+
+    @property
+    def header(self):
+        return self._mapped_file[:self._header_end]
+
+    @property
+    def introduction(self):
+        return self._mapped_file[self._header_end + len(self.END_OF_HEADER):
+                                 self._introduction_end]
+
+    @property
+    def paragraphs(self):
+        return list(self.iter_paragraphs())
+
+    def iter_paragraphs(self):
+        """
+        Read paragraphs from the file one by one.
+        :rtype: collections.Iterator[str]
+        """
+        paragraph_start = self._introduction_end + len(self.END_OF_INTRODUCTION)
+        while True:
+            paragraph_end = self._mapped_file.find(self.END_OF_PARAGRAPH, paragraph_start)
+            if paragraph_end < 0:
+                yield self._mapped_file[paragraph_start:]
+                return
+            yield self._mapped_file[paragraph_start:paragraph_end]
+            paragraph_start = paragraph_end + len(self.END_OF_PARAGRAPH)
+
+
 class FlightLandingUpdate(JsonRawMaterial):
     """Contains raw data of a single flight landing update."""
     SCHEDULE_UPDATE_TIME_FIELD = 'schedule_update_time'
@@ -108,16 +254,29 @@ class FlightLandingUpdate(JsonRawMaterial):
 
     SCHEDULE_TIME_FORMAT = '%Y-%m-%d %H:%M'
 
+    # Updates are kept by millions, so they have no instance dictionary, repeated strings are shared
+    # and the schedule update time is kept as a timestamp. Weak references let
+    # `query.NormalizedTextCache` cache updates' text without keeping them alive.
+    __slots__ = ('_schedule_update_timestamp', '_company', '_flight_number', '_flight_from',
+                 '_planned_time', '_updated_time', '_terminal', '_status', '_search_cache',
+                 '__weakref__')
+
     def __init__(self, schedule_update_time, company, flight_number, flight_from, planned_time,
                  updated_time, terminal, status):
-        self._schedule_update_time = schedule_update_time
-        self._company = company
+        self._schedule_update_timestamp = common.datetime_to_timestamp(schedule_update_time)
+        self._company = _intern(company)
         self._flight_number = flight_number
-        self._flight_from = flight_from
+        self._flight_from = _intern(flight_from)
         self._planned_time = planned_time
         self._updated_time = updated_time
         self._terminal = terminal
-        self._status = status
+        self._status = _intern(status)
+        self._search_cache = None
+
+    def __reduce__(self):
+        return FlightLandingUpdate, (self.schedule_update_time, self.company, self.flight_number,
+                                     self.flight_from, self.planned_time, self.updated_time,
+                                     self.terminal, self.status)
 
     @property
     def schedule_update_time(self):
@@ -125,7 +284,15 @@ class FlightLandingUpdate(JsonRawMaterial):
         :return: When the Airport's landing schedule was updated before downloading this update.
         :rtype: datetime
         """
-        return self._schedule_update_time
+        return common.timestamp_to_datetime(self._schedule_update_timestamp)
+
+    @property
+    def schedule_update_timestamp(self):
+        """
+        :return: `schedule_update_time` as seconds since epoch, cheaper to compare.
+        :rtype: int
+        """
+        return self._schedule_update_timestamp
 
     @property
     def company(self):
@@ -155,16 +322,45 @@ class FlightLandingUpdate(JsonRawMaterial):
     def status(self):
         return self._status
 
+    @property
+    def flight_date(self):
+        """
+        :return: Date of the planned landing, on which the planned time is nearest to the schedule
+            update time (the schedule shows flights of less than half a day before and after it).
+            The date of the schedule update if the planned time is not a time of day.
+        :rtype: datetime.date
+        """
+        planned_time_match = _TIME_OF_DAY_REGEX.match(self.planned_time)
+        if planned_time_match is None:
+            return self.schedule_update_time.date()
+        hour, minute = map(int, planned_time_match.groups())
+        update_timestamp = self._schedule_update_timestamp
+        planned_timestamp = update_timestamp - update_timestamp % _SECONDS_PER_DAY + \
+            hour * 3600 + minute * 60
+        if planned_timestamp - update_timestamp > _SECONDS_PER_DAY // 2:
+            planned_timestamp -= _SECONDS_PER_DAY
+        elif update_timestamp - planned_timestamp > _SECONDS_PER_DAY // 2:
+            planned_timestamp += _SECONDS_PER_DAY
+        return common.timestamp_to_datetime(planned_timestamp).date()
+
+    @property
+    def search_cache(self):
+        # Created on first use, so that updates which are never searched keep no dictionary.
+        if self._search_cache is None:
+            self._search_cache = {}
+        return self._search_cache
+
     def to_dict(self):
-        return {self.SCHEDULE_UPDATE_TIME_FIELD: datetime.strftime(self.schedule_update_time,
-                                                                   self.SCHEDULE_TIME_FORMAT),
-                self.COMPANY_FIELD: self.company,
-                self.FLIGHT_NUMBER_FIELD: self.flight_number,
-                self.FLIGHT_FROM_FIELD: self.flight_from,
-                self.PLANNED_TIME_FIELD: self.planned_time,
-                self.UPDATED_TIME_FIELD: self.updated_time,
-                self.TERMINAL_FIELD: self.terminal,
-                self.STATUS_FIELD: self.status}
+        return {
+            self.SCHEDULE_UPDATE_TIME_FIELD: datetime.strftime(self.schedule_update_time,
+                                                               self.SCHEDULE_TIME_FORMAT),
+            self.COMPANY_FIELD: self.company,
+            self.FLIGHT_NUMBER_FIELD: self.flight_number,
+            self.FLIGHT_FROM_FIELD: self.flight_from,
+            self.PLANNED_TIME_FIELD: self.planned_time,
+            self.UPDATED_TIME_FIELD: self.updated_time,
+            self.TERMINAL_FIELD: self.terminal,
+            self.STATUS_FIELD: self.status}
 
     @classmethod
     def from_dict(cls, dictionary):
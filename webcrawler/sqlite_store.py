@@ -0,0 +1,441 @@
+import collections
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from webcrawler import common, metrics, utils
+from webcrawler.common import to_unicode
+from webcrawler.query import normalize_text
+from webcrawler.raw_material import BBCRawArticle, FlightLandingUpdate
+
+_TIME_OF_DAY_REGEX = re.compile('^%s$' % common.HOUR_REGEX)
+# Texts shorter than this have no trigram, so they are searched by a scan instead of the index.
+_MIN_INDEXED_TEXT_LENGTH = 3
+
+ARTICLE_FIELDS = ('header', 'introduction', 'paragraphs')
+# Column of every `FlightLandingUpdate.to_dict` field, in table order.
+LANDING_UPDATE_COLUMNS = collections.OrderedDict((
+    (FlightLandingUpdate.SCHEDULE_UPDATE_TIME_FIELD, 'schedule_update_time'),
+    (FlightLandingUpdate.COMPANY_FIELD, 'company'),
+    (FlightLandingUpdate.FLIGHT_NUMBER_FIELD, 'flight_number'),
+    (FlightLandingUpdate.FLIGHT_FROM_FIELD, 'flight_from'),
+    (FlightLandingUpdate.PLANNED_TIME_FIELD, 'planned_time'),
+    (FlightLandingUpdate.UPDATED_TIME_FIELD, 'updated_time'),
+    (FlightLandingUpdate.TERMINAL_FIELD, 'terminal'),
+    (FlightLandingUpdate.STATUS_FIELD, 'status')))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    article_id TEXT NOT NULL UNIQUE,
+    header TEXT,
+    introduction TEXT,
+    paragraphs TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    header, introduction, paragraphs, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS landing_updates (
+    id INTEGER PRIMARY KEY,
+    schedule_update_time INTEGER NOT NULL,
+    company TEXT,
+    flight_number TEXT NOT NULL,
+    flight_from TEXT,
+    planned_time TEXT,
+    updated_time TEXT,
+    terminal INTEGER,
+    status TEXT,
+    delay_minutes INTEGER,
+    flight_date TEXT NOT NULL,
+    UNIQUE (flight_number, flight_date, schedule_update_time));
+CREATE INDEX IF NOT EXISTS landing_updates_by_origin ON landing_updates (flight_from,
+                                                                         schedule_update_time);
+CREATE INDEX IF NOT EXISTS landing_updates_by_time ON landing_updates (schedule_update_time);
+CREATE VIRTUAL TABLE IF NOT EXISTS landing_updates_fts USING fts5(
+    schedule_update_time, company, flight_number, flight_from, planned_time, updated_time,
+    terminal, status, tokenize='trigram');
+'''
+_LANDING_UPDATE_SELECTED_COLUMNS = ', '.join('landing_updates.' + column for column in
+                                             LANDING_UPDATE_COLUMNS.itervalues())
+
+
+def _get_minutes_of_day(time_of_day):
+    match = _TIME_OF_DAY_REGEX.match(time_of_day or '')
+    if match is None:
+        return None
+    hours, minutes = time_of_day.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def get_delay_minutes(planned_time, updated_time):
+    """
+    :return: Minutes between planned and updated landing time, wrapped around midnight into
+        [-12, 12) hours like `FlightUpdateColumns.delay_minutes`, None if one of them is not a time.
+    :rtype: int
+    """
+    planned_minutes = _get_minutes_of_day(planned_time)
+    updated_minutes = _get_minutes_of_day(updated_time)
+    if planned_minutes is None or updated_minutes is None:
+        return None
+    return (updated_minutes - planned_minutes + 12 * 60) % (24 * 60) - 12 * 60
+
+
+def _contains_text(value, text, case_sensitive):
+    """SQL function finding normalized text in a normalized value, for texts without trigrams."""
+    if value is None:
+        return False
+    return text in (value if case_sensitive else value.lower())
+
+
+def _get_match_expression(columns, normalized_text):
+    """:return: FTS5 query of the text as a phrase, only in the given columns."""
+    return '{%s} : "%s"' % (' '.join(columns), normalized_text.replace('"', '""'))
+
+
+class RawMaterialStore(object):
+    """
+    SQLite database of raw material, so that it is searched and queried by the database instead of
+    by loading every file of a directory.
+
+    BBC articles are kept in a table by article id, with an FTS5 index of their normalized header,
+    introduction and paragraphs (see `query.normalize_text`). The index uses the trigram tokenizer,
+    so that text is found anywhere in words like `analyzers.has_text` finds it, rather than only
+    as whole words. Landing updates are kept in a table by flight (number and date, see
+    `flight_events.get_flight_key`) and schedule update time, with indexed origin and schedule
+    update time, their delay and a similar index of their values. Adding an article with an
+    existing id, or an update of a flight at an existing schedule update time, replaces it.
+
+    Material is added in batches, each written in a single transaction, so call `flush` to write
+    the material added so far (queries do it first), or use as a context manager.
+    Requires SQLite 3.34 or later, with FTS5.
+    """
+    def __init__(self, database_path, batch_size=1000):
+        """:param batch_size: Number of added materials of a type written in one transaction."""
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending_articles = []
+        self._pending_landing_updates = []
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        self._connection.create_function('contains_text', 3, _contains_text)
+        self._connection.executescript(_SCHEMA)
+
+    def add_article(self, article_id, raw_article):
+        """
+        :param article_id: Unique name of the article.
+        :type article_id: basestring
+        :type raw_article: BBCRawArticle
+        """
+        paragraphs = [to_unicode(paragraph) for paragraph in raw_article.paragraphs]
+        header, introduction = to_unicode(raw_article.header), to_unicode(raw_article.introduction)
+        with self._lock:
+            self._pending_articles.append((to_unicode(article_id), header, introduction,
+                                           paragraphs))
+            if len(self._pending_articles) >= self.batch_size:
+                self._write_articles()
+
+    def add_landing_updates(self, landing_updates):
+        """:type landing_updates: list[FlightLandingUpdate]"""
+        with self._lock:
+            for landing_update in landing_updates:
+                self._pending_landing_updates.append(landing_update)
+                if len(self._pending_landing_updates) >= self.batch_size:
+                    self._write_landing_updates()
+
+    def save_raw_material(self, downloaded_file_path, raw_materials, directory_path=None):
+        """
+        Add raw material extracted from a downloaded file, using the file name as article id.
+        Can be used as the writer of `extraction.extract_directory`, ignoring its directory.
+        """
+        landing_updates = []
+        for raw_material in raw_materials:
+            if isinstance(raw_material, BBCRawArticle):
+                self.add_article(os.path.splitext(os.path.basename(downloaded_file_path))[0],
+                                 raw_material)
+            elif isinstance(raw_material, FlightLandingUpdate):
+                landing_updates.append(raw_material)
+            else:
+                raise TypeError('Cannot store material of type %s' % type(raw_material).__name__)
+        self.add_landing_updates(landing_updates)
+
+    def flush(self):
+        """Write the material added so far."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def article_count(self):
+        return self._query_value('SELECT COUNT(*) FROM articles')
+
+    @property
+    def landing_update_count(self):
+        return self._query_value('SELECT COUNT(*) FROM landing_updates')
+
+    def get_article(self, article_id):
+        """
+        :rtype: BBCRawArticle
+        :raise KeyError: If there is no article with the id in the store.
+        """
+        rows = self._query('get_article', 'SELECT header, introduction, paragraphs FROM articles '
+                                          'WHERE article_id = ?', (to_unicode(article_id),))
+        if not rows:
+            raise KeyError(article_id)
+        header, introduction, paragraphs = rows[0]
+        return BBCRawArticle(header, introduction, json.loads(paragraphs))
+
+    def iter_articles(self):
+        """
+        Read all articles in the order they were added.
+        :rtype: collections.Iterator[(unicode, BBCRawArticle)]
+        """
+        last_id = 0
+        while True:
+            # Read in pages, so that the store is not locked while the caller handles articles.
+            rows = self._query('iter_articles', 'SELECT id, article_id, header, introduction, '
+                                                'paragraphs FROM articles WHERE id > ? ORDER BY id '
+                                                'LIMIT ?', (last_id, self.batch_size))
+            if not rows:
+                return
+            for last_id, article_id, header, introduction, paragraphs in rows:
+                yield article_id, BBCRawArticle(header, introduction, json.loads(paragraphs))
+
+    def search_articles(self, text, fields=None, case_sensitive=False):
+        """
+        Search for text in articles the way `analyzers.has_text` does, using the full-text index.
+
+        :param fields: Names of the searched article fields, of `ARTICLE_FIELDS`, all if None.
+        :param case_sensitive: Whether to search the text with matched case.
+        :return: Ids of the articles which contain the text, in the order they were added.
+        :rtype: list[unicode]
+        """
+        condition, parameters = self._get_text_condition('articles_fts', ARTICLE_FIELDS, text,
+                                                         fields, case_sensitive)
+        return [article_id for article_id, in self._query(
+            'search_articles', 'SELECT articles.article_id FROM articles_fts JOIN articles ON '
+                               'articles.id = articles_fts.rowid WHERE %s ORDER BY articles.id' %
+                               condition, parameters)]
+
+    def search_landing_updates(self, text, fields=None, case_sensitive=False):
+        """
+        Search for text in the values of landing updates, using the full-text index.
+
+        :param fields: Names of the searched fields (as in `FlightLandingUpdate.to_dict`), all if
+            None.
+        :param case_sensitive: Whether to search the text with matched case.
+        :return: Landing updates with a value which contains the text, in the order they were added.
+        :rtype: list[FlightLandingUpdate]
+        """
+        if fields is not None:
+            fields = [LANDING_UPDATE_COLUMNS.get(field, field) for field in fields]
+        condition, parameters = self._get_text_condition(
+            'landing_updates_fts', LANDING_UPDATE_COLUMNS.values(), text, fields, case_sensitive)
+        return self._query_landing_updates(
+            'search_landing_updates', 'FROM landing_updates_fts JOIN landing_updates ON '
+                                      'landing_updates.id = landing_updates_fts.rowid WHERE %s '
+                                      'ORDER BY landing_updates.id' % condition, parameters)
+
+    def find_landing_updates(self, flight_number=None, flight_from=None, start_time=None,
+                             end_time=None):
+        """
+        :param flight_number: Flight of the updates, any flight if None.
+        :param flight_from: Origin of the updates, any origin if None.
+        :type start_time: datetime
+        :type end_time: datetime
+        :return: Landing updates with schedule update time in [start_time, end_time), ordered by
+            schedule update time and flight.
+        :rtype: list[FlightLandingUpdate]
+        """
+        conditions, parameters = self._get_time_conditions(start_time, end_time)
+        if flight_number is not None:
+            conditions.append('flight_number = ?')
+            parameters.append(to_unicode(flight_number))
+        if flight_from is not None:
+            conditions.append('flight_from = ?')
+            parameters.append(to_unicode(flight_from))
+        return self._query_landing_updates(
+            'find_landing_updates', 'FROM landing_updates WHERE %s ORDER BY schedule_update_time, '
+                                    'flight_number' % (' AND '.join(conditions) or '1'),
+            parameters)
+
+    def find_delayed_landing_updates(self, max_on_time_delay_minutes=15, start_time=None,
+                                     end_time=None):
+        """
+        :param max_on_time_delay_minutes: Largest delay of a flight that lands on time.
+        :return: Landing updates whose updated time is later than planned by more than the
+            on-time delay, with schedule update time in [start_time, end_time), ordered by schedule
+            update time and flight.
+        :rtype: list[FlightLandingUpdate]
+        """
+        conditions, parameters = self._get_time_conditions(start_time, end_time)
+        conditions.append('delay_minutes > ?')
+        parameters.append(max_on_time_delay_minutes)
+        return self._query_landing_updates(
+            'find_delayed_landing_updates', 'FROM landing_updates WHERE %s ORDER BY '
+                                            'schedule_update_time, flight_number' %
+                                            ' AND '.join(conditions), parameters)
+
+    def latest_per_flight(self):
+        """
+        :return: Most recent landing update of each flight (number and date, since flight numbers
+            repeat every day), ordered by flight number and date, like
+            `FlightUpdateColumns.latest_per_flight`.
+        :rtype: list[FlightLandingUpdate]
+        """
+        # SQLite takes the other columns from the row with the maximal time.
+        return self._query_landing_updates(
+            'latest_per_flight', ', MAX(schedule_update_time) FROM landing_updates GROUP BY '
+                                 'flight_number, flight_date ORDER BY flight_number, flight_date',
+            ())
+
+    def _flush(self):
+        if self._pending_articles:
+            self._write_articles()
+        if self._pending_landing_updates:
+            self._write_landing_updates()
+
+    def _write_articles(self):
+        # Of several articles with the same id in a batch, only the last is written.
+        articles = collections.OrderedDict()
+        for article in self._pending_articles:
+            articles.pop(article[0], None)
+            articles[article[0]] = article
+        self._pending_articles = []
+        with metrics.measure('store_write', material=BBCRawArticle.__name__), self._connection:
+            self._connection.executemany(
+                'DELETE FROM articles_fts WHERE rowid = '
+                '(SELECT id FROM articles WHERE article_id = ?)',
+                [(article_id,) for article_id in articles])
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO articles (article_id, header, introduction, paragraphs) '
+                'VALUES (?, ?, ?, ?)',
+                [(article_id, header, introduction, json.dumps(paragraphs)) for
+                 article_id, header, introduction, paragraphs in articles.itervalues()])
+            self._connection.executemany(
+                'INSERT INTO articles_fts (rowid, header, introduction, paragraphs) '
+                'SELECT id, ?, ?, ? FROM articles WHERE article_id = ?',
+                [(normalize_text(header, case_sensitive=True),
+                  normalize_text(introduction, case_sensitive=True),
+                  normalize_text(u'\n'.join(paragraphs), case_sensitive=True), article_id) for
+                 article_id, header, introduction, paragraphs in articles.itervalues()])
+        metrics.increment('stored_materials_total', len(articles),
+                          material=BBCRawArticle.__name__)
+
+    def _write_landing_updates(self):
+        # Of several updates of a flight at the same time in a batch, only the last is written.
+        rows = collections.OrderedDict()
+        for landing_update in self._pending_landing_updates:
+            key = (to_unicode(landing_update.flight_number),
+                   to_unicode(landing_update.flight_date.isoformat()),
+                   landing_update.schedule_update_timestamp)
+            rows.pop(key, None)
+            rows[key] = (landing_update.schedule_update_timestamp,
+                         to_unicode(landing_update.company), key[0],
+                         to_unicode(landing_update.flight_from),
+                         to_unicode(landing_update.planned_time),
+                         to_unicode(landing_update.updated_time), landing_update.terminal,
+                         to_unicode(landing_update.status),
+                         get_delay_minutes(landing_update.planned_time,
+                                           landing_update.updated_time), key[1])
+        self._pending_landing_updates = []
+        with metrics.measure('store_write', material=FlightLandingUpdate.__name__), \
+                self._connection:
+            self._connection.executemany(
+                'DELETE FROM landing_updates_fts WHERE rowid = (SELECT id FROM landing_updates '
+                'WHERE flight_number = ? AND flight_date = ? AND schedule_update_time = ?)',
+                rows.keys())
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO landing_updates (%s, delay_minutes, flight_date) VALUES '
+                '(%s)' % (', '.join(LANDING_UPDATE_COLUMNS.itervalues()),
+                          ', '.join('?' * (len(LANDING_UPDATE_COLUMNS) + 2))), rows.itervalues())
+            self._connection.executemany(
+                'INSERT INTO landing_updates_fts (rowid, %s) SELECT id, %s FROM landing_updates '
+                'WHERE flight_number = ? AND flight_date = ? AND schedule_update_time = ?' %
+                (', '.join(LANDING_UPDATE_COLUMNS.itervalues()),
+                 ', '.join('?' * len(LANDING_UPDATE_COLUMNS))),
+                [[normalize_text(value, case_sensitive=True) for value in
+                  self._get_landing_update_text_values(row)] + list(key) for key, row in
+                 rows.iteritems()])
+        metrics.increment('stored_materials_total', len(rows),
+                          material=FlightLandingUpdate.__name__)
+
+    @staticmethod
+    def _get_landing_update_text_values(row):
+        """:return: Values of a landing update row as they appear in its `to_dict`."""
+        schedule_update_time = common.timestamp_to_datetime(row[0]).strftime(
+            FlightLandingUpdate.SCHEDULE_TIME_FORMAT)
+        return (schedule_update_time,) + row[1:len(LANDING_UPDATE_COLUMNS)]
+
+    @staticmethod
+    def _get_text_condition(fts_table, all_columns, text, columns, case_sensitive):
+        """:return: SQL condition of an FTS table finding text in columns, and its parameters."""
+        columns = all_columns if columns is None else list(columns)
+        unknown_columns = set(columns) - set(all_columns)
+        if unknown_columns:
+            raise ValueError('Unknown fields: %s' % ', '.join(sorted(unknown_columns)))
+        if not columns:
+            return '0', []
+        normalized_text = normalize_text(text, case_sensitive=True)
+        if len(normalized_text) < _MIN_INDEXED_TEXT_LENGTH:
+            searched_text = normalized_text if case_sensitive else normalized_text.lower()
+            condition = ' OR '.join('contains_text(%s.%s, ?, ?)' % (fts_table, column) for
+                                    column in columns)
+            return '(%s)' % condition, [searched_text, case_sensitive] * len(columns)
+        # The index ignores case, so with matched case its results are checked.
+        condition = '%s MATCH ?' % fts_table
+        parameters = [_get_match_expression(columns, normalized_text)]
+        if case_sensitive:
+            condition += ' AND (%s)' % ' OR '.join('instr(%s.%s, ?) > 0' % (fts_table, column) for
+                                                   column in columns)
+            parameters.extend([normalized_text] * len(columns))
+        return condition, parameters
+
+    @staticmethod
+    def _get_time_conditions(start_time, end_time):
+        conditions, parameters = [], []
+        if start_time is not None:
+            conditions.append('schedule_update_time >= ?')
+            parameters.append(common.datetime_to_timestamp(start_time))
+        if end_time is not None:
+            conditions.append('schedule_update_time < ?')
+            parameters.append(common.datetime_to_timestamp(end_time))
+        return conditions, parameters
+
+    def _query_landing_updates(self, query_name, sql_after_columns, parameters):
+        rows = self._query(query_name, 'SELECT %s %s' % (_LANDING_UPDATE_SELECTED_COLUMNS,
+                                                         sql_after_columns), parameters)
+        return [FlightLandingUpdate(common.timestamp_to_datetime(row[0]), *row[1:8]) for row in
+                rows]
+
+    def _query(self, query_name, sql, parameters):
+        """:return: All rows of a query, after writing the material added so far."""
+        with self._lock:
+            self._flush()
+            with metrics.measure('store_query', query=query_name):
+                return self._connection.execute(sql, parameters).fetchall()
+
+    def _query_value(self, sql):
+        return self._query('count', sql, ())[0][0]
+
+
+def convert_material_directory(material_type, directory_path, store):
+    """
+    Add raw material dumped as files to a store, using file names as article ids.
+
+    :param material_type: `BBCRawArticle` or `FlightLandingUpdate`.
+    :type store: RawMaterialStore
+    """
+    file_paths = utils.list_directory_files(directory_path)
+    for file_path, raw_material in itertools.izip(file_paths, material_type.iter_load(file_paths)):
+        store.save_raw_material(file_path, [raw_material])
+    store.flush()
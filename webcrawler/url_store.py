@@ -0,0 +1,251 @@
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+import urllib
+import urlparse
+
+from webcrawler import common
+from webcrawler.common import to_unicode
+
+# Query parameters which only track where a link was clicked, and do not change the page.
+TRACKING_QUERY_PARAMETERS = frozenset(['fbclid', 'gclid', 'ocid', 'ns_mchannel', 'ns_source',
+                                       'ns_campaign', 'ns_linkname', 'ns_fee'])
+TRACKING_QUERY_PARAMETER_PREFIXES = ('utm_', 'at_')
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_query_parameter(name):
+    name = name.lower()
+    return name in TRACKING_QUERY_PARAMETERS or name.startswith(TRACKING_QUERY_PARAMETER_PREFIXES)
+
+
+def normalize_url(url, base_url=None):
+    """
+    Normalize a URL so that URLs of the same page are equal: relative URLs are resolved against the
+    base URL, the scheme and host are lower-cased, default ports, fragments, tracking query
+    parameters and trailing slashes are removed and the remaining query parameters are sorted.
+
+    :rtype: str
+    """
+    if base_url is not None:
+        url = urlparse.urljoin(base_url, url)
+    parsed_url = urlparse.urlsplit(to_unicode(url).encode('utf-8'))
+    scheme = parsed_url.scheme.lower()
+    host = (parsed_url.hostname or '').lower()
+    if parsed_url.port is not None and parsed_url.port != _DEFAULT_PORTS.get(scheme):
+        host = '%s:%d' % (host, parsed_url.port)
+    path = parsed_url.path.rstrip('/') or '/'
+    query_parameters = sorted((name, value) for name, value in
+                              urlparse.parse_qsl(parsed_url.query, keep_blank_values=True) if
+                              not _is_tracking_query_parameter(name))
+    return urlparse.urlunsplit((scheme, host, path, urllib.urlencode(query_parameters), ''))
+
+
+class BloomFilter(object):
+    """
+    Set of strings with a fixed memory size, which may falsely report that it contains a string
+    (with a bounded probability), but never misses a string that was added.
+    """
+    _HEADER_FORMAT = '<QQQ'
+
+    def __init__(self, capacity, false_positive_rate=0.001):
+        """
+        :param capacity: Number of strings for which the false positive rate is kept.
+        :param false_positive_rate: Probability that a string which was not added is reported as
+            added, once `capacity` strings were added.
+        """
+        self.bit_count = max(int(math.ceil(-capacity * math.log(false_positive_rate) /
+                                           math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.bit_count / float(capacity) * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.bit_count + 7) // 8)
+
+    @property
+    def size_in_bytes(self):
+        return len(self._bits)
+
+    @property
+    def expected_false_positive_rate(self):
+        """Probability of a false positive with the strings added so far."""
+        return (1 - math.exp(-self.hash_count * self.count / float(self.bit_count))) ** \
+            self.hash_count
+
+    def get_capacity(self, false_positive_rate):
+        """:return: Number of strings up to which the expected false positive rate is kept."""
+        return int(-self.bit_count / float(self.hash_count) *
+                   math.log(1 - false_positive_rate ** (1.0 / self.hash_count)))
+
+    def add(self, string):
+        for bit_index in self._get_bit_indices(string):
+            self._bits[bit_index >> 3] |= 1 << (bit_index & 7)
+        self.count += 1
+
+    def __contains__(self, string):
+        bits = self._bits
+        return all(bits[bit_index >> 3] & (1 << (bit_index & 7)) for bit_index in
+                   self._get_bit_indices(string))
+
+    def dump(self, file_path):
+        """Write the filter to a file, replacing the previous one only when fully written."""
+        with common.atomic_write(file_path, 'wb') as filter_file:
+            filter_file.write(struct.pack(self._HEADER_FORMAT, self.bit_count, self.hash_count,
+                                          self.count))
+            filter_file.write(self._bits)
+
+    @classmethod
+    def load(cls, file_path):
+        """:rtype: BloomFilter"""
+        bloom_filter = cls.__new__(cls)
+        with open(file_path, 'rb') as filter_file:
+            bloom_filter.bit_count, bloom_filter.hash_count, bloom_filter.count = struct.unpack(
+                cls._HEADER_FORMAT, filter_file.read(struct.calcsize(cls._HEADER_FORMAT)))
+            bloom_filter._bits = bytearray(filter_file.read())
+        return bloom_filter
+
+    def _get_bit_indices(self, string):
+        # Double hashing: the k hash functions are combinations of two independent hashes.
+        first_hash, second_hash = struct.unpack('<QQ', hashlib.md5(string).digest())
+        return [(first_hash + index * second_hash) % self.bit_count for index in
+                xrange(self.hash_count)]
+
+
+class SeenUrlStats(object):
+    """Statistics of the lookups in a `SeenUrlStore`."""
+
+    def __init__(self):
+        self.url_count = 0
+        self.lookup_count = 0
+        # Lookups answered by the Bloom filter alone: the URL was surely not seen.
+        self.filter_negative_count = 0
+        # Lookups of URLs which were not seen, but which the Bloom filter reported as seen.
+        self.false_positive_count = 0
+        self.expected_false_positive_rate = 0.0
+        self.filter_size_in_bytes = 0
+
+    @property
+    def false_positive_rate(self):
+        """Observed rate of false positives among lookups of URLs that were not seen."""
+        unseen_lookup_count = self.filter_negative_count + self.false_positive_count
+        if not unseen_lookup_count:
+            return 0.0
+        return self.false_positive_count / float(unseen_lookup_count)
+
+
+class SeenUrlStore(object):
+    """
+    Persistent set of normalized URLs, saved as hidden files in a directory, remembering which URLs
+    were already downloaded across runs.
+
+    URLs are kept exactly in an SQLite table. In front of it, a Bloom filter held in memory answers
+    most lookups of new URLs without touching the disk, so lookups take constant time and memory is
+    bounded by the number of URLs rather than their length. The filter starts small and is rebuilt
+    twice as large from the table whenever it holds more URLs than it was sized for.
+    Call `flush` to persist the URLs added, or use as a context manager.
+    """
+    FILE_NAME = '.seen_urls.sqlite'
+    FILTER_FILE_NAME = '.seen_urls.bloom'
+    # Growth of the capacity of the Bloom filter when it is rebuilt.
+    _FILTER_GROWTH_FACTOR = 2
+
+    def __init__(self, directory_path, expected_url_count=10 ** 5, false_positive_rate=0.001):
+        """
+        :param expected_url_count: Number of URLs the Bloom filter is first sized for (about 1.8
+            bytes per URL for the default rate).
+        :param false_positive_rate: Rate of lookups of new URLs which have to be checked on disk.
+        """
+        self.directory_path = directory_path
+        self.false_positive_rate = false_positive_rate
+        self.file_path = os.path.join(directory_path, self.FILE_NAME)
+        self.filter_file_path = os.path.join(directory_path, self.FILTER_FILE_NAME)
+        self._lock = threading.Lock()
+        self._stats = SeenUrlStats()
+        self._connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        self._connection.text_factory = str
+        self._connection.execute('CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY)')
+        # URLs are never deleted, so the largest row id is the number of URLs.
+        url_count = self._connection.execute('SELECT MAX(rowid) FROM urls').fetchone()[0] or 0
+        self._bloom_filter = None
+        self._filter_capacity = 0
+        # Whether the filter changed since it was last saved.
+        self._is_filter_changed = False
+        if os.path.exists(self.filter_file_path):
+            self._bloom_filter = BloomFilter.load(self.filter_file_path)
+            self._filter_capacity = self._bloom_filter.get_capacity(false_positive_rate)
+            if self._bloom_filter.count != url_count:
+                # URLs were added after the filter was saved.
+                self._bloom_filter = None
+        if self._bloom_filter is None:
+            self._rebuild_filter(max(expected_url_count, url_count))
+
+    def __contains__(self, url):
+        """:param url: URL, normalized by `normalize_url`."""
+        with self._lock:
+            return self._contains(url)
+
+    def add(self, url):
+        """
+        :param url: URL, normalized by `normalize_url`.
+        :return: Whether the URL was added, False if it was already seen.
+        :rtype: bool
+        """
+        with self._lock:
+            if self._contains(url):
+                return False
+            self._connection.execute('INSERT INTO urls VALUES (?)', (url,))
+            self._bloom_filter.add(url)
+            self._is_filter_changed = True
+            if self._bloom_filter.count > self._filter_capacity:
+                self._rebuild_filter(self._FILTER_GROWTH_FACTOR * self._bloom_filter.count)
+            return True
+
+    def __len__(self):
+        return self._bloom_filter.count
+
+    @property
+    def stats(self):
+        """:rtype: SeenUrlStats"""
+        self._stats.url_count = len(self)
+        self._stats.expected_false_positive_rate = self._bloom_filter.expected_false_positive_rate
+        self._stats.filter_size_in_bytes = self._bloom_filter.size_in_bytes
+        return self._stats
+
+    def flush(self):
+        """Save the URLs added so far."""
+        with self._lock:
+            self._connection.commit()
+            if self._is_filter_changed:
+                self._bloom_filter.dump(self.filter_file_path)
+                self._is_filter_changed = False
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _rebuild_filter(self, capacity):
+        """Replace the Bloom filter by one sized for a number of URLs, holding all the URLs."""
+        self._bloom_filter = BloomFilter(capacity, self.false_positive_rate)
+        self._filter_capacity = capacity
+        for url, in self._connection.execute('SELECT url FROM urls'):
+            self._bloom_filter.add(url)
+        self._is_filter_changed = True
+
+    def _contains(self, url):
+        self._stats.lookup_count += 1
+        if url not in self._bloom_filter:
+            self._stats.filter_negative_count += 1
+            return False
+        is_seen = self._connection.execute('SELECT 1 FROM urls WHERE url = ?',
+                                           (url,)).fetchone() is not None
+        if not is_seen:
+            self._stats.false_positive_count += 1
+        return is_seen
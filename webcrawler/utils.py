@@ -20,10 +20,27 @@ def save_landing_updates_to_directory(landing_updates, directory_path):
         landing_update.dump(landing_update_file_path)
 
 
+def list_directory_files(directory_path):
+    """
+    :return: Paths of files in the directory, excluding hidden files such as the download manifest.
+    :rtype: list[str]
+    """
+    return [os.path.join(directory_path, file_name) for file_name in os.listdir(directory_path)
+            if not file_name.startswith('.')]
+
+
 def load_raw_material_from_files(material_type, file_paths):
     return [material_type.load(file_path) for file_path in file_paths]
 
 
+def iter_load_raw_material_from_files(material_type, file_paths):
+    """
+    Load raw material from files lazily, one file at a time.
+    Read `RawMaterial.iter_load` for further documentation.
+    """
+    return material_type.iter_load(file_paths)
+
+
 def get_most_recent_landing_updates(landing_updates):
     """
     :type landing_updates: list[FlightLandingUpdate]
@@ -33,7 +50,7 @@ def get_most_recent_landing_updates(landing_updates):
     most_recent_landing_updates = {}
     for landing_update in landing_updates:
         saved_landing_update = most_recent_landing_updates.get(landing_update.flight_number)
-        if saved_landing_update is None or \
-                landing_update.schedule_update_time > saved_landing_update.schedule_update_time:
+        if saved_landing_update is None or landing_update.schedule_update_timestamp > \
+                saved_landing_update.schedule_update_timestamp:
             most_recent_landing_updates[landing_update.flight_number] = landing_update
     return most_recent_landing_updates.values()